@@ -12,7 +12,10 @@ import sys
 import socket
 import random
 import logging
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import contextmanager
 from multiprocessing.pool import ThreadPool
 from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils.debug_utils import config_module_logging
@@ -84,6 +87,12 @@ BGP_SCALE_T1S = [
     't1-isolated-d510u2', 't1-isolated-d510u2s2'
 ]
 ROUTES_BATCH_SIZE = 200
+# Number of routes per batch is adapted to the response latency of exabgp http api within these limits
+MIN_ROUTES_BATCH_SIZE = 50
+MAX_ROUTES_BATCH_SIZE = 2000
+TARGET_BATCH_LATENCY = 0.5
+# Max number of batches being posted to one exabgp http api at the same time
+MAX_INFLIGHT_BATCHES = 2
 
 # Describe default number of COLOs
 COLO_NUMBER = 30
@@ -175,35 +184,116 @@ def read_topo(topo_name, path):
         return {}
 
 
-def change_routes(action, ptf_ip, port, routes, routes_batch_size=ROUTES_BATCH_SIZE):
-    logging.debug("action = {}, ptf_ip = {}, port = {}, routes_batch_size = {}, routes = {}"
-                  .format(action, ptf_ip, port, routes_batch_size, routes))
-    messages = []
+# Idle keep-alive HTTP sessions to exabgp http api, by url
+_session_pool = {}
+_session_pool_lock = threading.Lock()
+
+
+@contextmanager
+def exabgp_session(url):
+    """
+    Borrow a keep-alive HTTP session to exabgp http api from the pool.
+    A session is used by one thread at a time, it is returned to the pool for the next batches of routes.
+    """
+    with _session_pool_lock:
+        sessions = _session_pool.setdefault(url, [])
+        session = sessions.pop() if sessions else requests.Session()
+    try:
+        yield session
+    finally:
+        with _session_pool_lock:
+            _session_pool[url].append(session)
+
+
+class BatchSizer(object):
+    """
+    Adapt number of routes per batch to the response latency of exabgp http api.
+    Batch size is doubled while exabgp responds in less than half of TARGET_BATCH_LATENCY and halved when
+    exabgp responds slower than TARGET_BATCH_LATENCY.
+    """
+
+    def __init__(self, size=ROUTES_BATCH_SIZE, min_size=MIN_ROUTES_BATCH_SIZE, max_size=MAX_ROUTES_BATCH_SIZE,
+                 target_latency=TARGET_BATCH_LATENCY):
+        self.min_size = min(min_size, size)
+        self.max_size = max(max_size, size)
+        self.size = size
+        self.target_latency = target_latency
+        self._lock = threading.Lock()
+
+    def update(self, batch_len, latency):
+        with self._lock:
+            if latency > self.target_latency:
+                self.size = max(self.min_size, self.size // 2)
+            elif latency < self.target_latency / 2 and batch_len >= self.size:
+                self.size = min(self.max_size, self.size * 2)
+
+
+def generate_route_messages(action, routes):
     for prefix, nexthop, aspath in routes:
         if aspath:
-            messages.append(
-                "{} route {} next-hop {} as-path [ {} ]".format(action, prefix, nexthop, aspath))
+            yield "{} route {} next-hop {} as-path [ {} ]".format(action, prefix, nexthop, aspath)
         else:
-            messages.append(
-                "{} route {} next-hop {}".format(action, prefix, nexthop))
+            yield "{} route {} next-hop {}".format(action, prefix, nexthop)
+
+
+def post_batch(url, batch_messages, sizer):
+    data = {"commands": ";".join(batch_messages)}
+    logging.debug("Posting to url={} data={}".format(url, json.dumps(data)))
+    start = time.time()
+    with exabgp_session(url) as session:
+        post_data_to_url(url, data, session=session)
+    sizer.update(len(batch_messages), time.time() - start)
+    return len(batch_messages)
+
+
+def change_routes(action, ptf_ip, port, routes, routes_batch_size=ROUTES_BATCH_SIZE):
+    """
+    Announce or withdraw routes through exabgp http api of one neighbor.
+    Route commands are generated lazily and posted in batches over keep-alive sessions. Up to MAX_INFLIGHT_BATCHES
+    batches are posted at the same time. The batch size starts from routes_batch_size and is adapted to the
+    response latency of exabgp.
+
+    Returns:
+        Number of routes posted per second.
+    """
+    logging.debug("action = {}, ptf_ip = {}, port = {}, routes_batch_size = {}, routes = {}"
+                  .format(action, ptf_ip, port, routes_batch_size, routes))
     wait_for_http(ptf_ip, port, timeout=60)
     url = "http://%s:%d" % (ptf_ip, port)
-    for i in range(0, len(messages), routes_batch_size):
-        batch_messages = messages[i:i+routes_batch_size]
-        data = {"commands": ";".join(batch_messages)}
-        logging.debug("Posting to url={} data={}".format(url, json.dumps(data)))
-        post_data_to_url(url, data)
+    messages = generate_route_messages(action, routes)
+    sizer = BatchSizer(routes_batch_size)
+
+    start = time.time()
+    posted = 0
+    with ThreadPoolExecutor(max_workers=MAX_INFLIGHT_BATCHES) as executor:
+        inflight = set()
+        while True:
+            if len(inflight) >= MAX_INFLIGHT_BATCHES:
+                done, inflight = wait(inflight, return_when=FIRST_COMPLETED)
+                posted += sum(future.result() for future in done)
+            batch_messages = list(itertools.islice(messages, sizer.size))
+            if not batch_messages:
+                break
+            inflight.add(executor.submit(post_batch, url, batch_messages, sizer))
+        posted += sum(future.result() for future in inflight)
+
+    elapsed = time.time() - start
+    rate = posted / elapsed if elapsed > 0 else 0
+    logging.info("{} {} routes to {} in {:.2f} seconds, {:.0f} routes/s, final batch size {}"
+                 .format(action, posted, url, elapsed, rate, sizer.size))
+    return rate
 
 
-def post_data_to_url(url, data):
+def post_data_to_url(url, data, session=None):
     # nosemgrep-next-line
     # Flaky error `ConnectionResetError(104, 'Connection reset by peer')` may happen while using `requests.post`
     # To avoid this error, we add sleep time before sending request.
     # We use a "backoff" algorithm here, the maximum retry times is five.
     # If one retry fails, we increase the waiting time.
+    post = session.post if session else requests.post
     for i in range(0, 5):
         try:
-            r = requests.post(url, data=data, timeout=360, proxies={"http": None, "https": None})
+            r = post(url, data=data, timeout=360, proxies={"http": None, "https": None})
             break
         except Exception as e:
             logging.debug("Got exception {}, will try to connect again".format(e))
@@ -239,7 +329,10 @@ def send_routes_in_parallel(route_set):
     Returns:
         None
     """
-    # Create a pool of worker processes
+    if not route_set:
+        return
+
+    # Create a pool of worker threads
     pool = ThreadPool(processes=len(route_set))
 
     # Use the ThreadPool.map function to apply the function to each set of routes
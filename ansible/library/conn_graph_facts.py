@@ -3,18 +3,21 @@
 from ansible.module_utils.basic import AnsibleModule
 import yaml
 import os
+import hashlib
+import json
 import logging
+import tempfile
 import traceback
 
 try:
     from ansible.module_utils.debug_utils import config_module_logging
-    from ansible.module_utils.graph_utils import LabGraph
+    from ansible.module_utils.graph_utils import LabGraph, get_file_signature, is_private_file, make_private_dir
 except ImportError:
     # Add parent dir for using outside Ansible
     import sys
     sys.path.append('..')
     from module_utils.debug_utils import config_module_logging
-    from module_utils.graph_utils import LabGraph
+    from module_utils.graph_utils import LabGraph, get_file_signature, is_private_file, make_private_dir
 
 config_module_logging('conn_graph_facts')
 
@@ -55,6 +58,12 @@ options:
         device entry in graph facts.
         required: False
 
+    cache_dir:
+        Folder for caching the hostnames of each group and the graph facts built from the csv files. The cache of a
+        group is used until any csv file of the group is changed. Empty string disables the cache.
+        required: False
+        default: conn_graph_facts_cache_<uid> under the system temporary folder
+
     Mutually exclusive options: host, hosts, anchor
 
 Ansible_facts:
@@ -114,6 +123,55 @@ EXAMPLES = '''
 
 LAB_GRAPHFILE_PATH = "files/"
 LAB_GRAPH_GROUPS_FILE = "graph_groups.yml"
+LAB_GRAPH_CACHE_DIR = os.path.join(tempfile.gettempdir(), "conn_graph_facts_cache_{}".format(os.getuid()))
+
+
+class GroupHostnamesIndex(object):
+    """Persistent index of hostnames in each graph group
+
+    Hostnames of a group are read from its devices csv file only when the file is changed, so finding the group of
+    hosts doesn't need to build the graph facts of all the groups.
+    """
+
+    def __init__(self, path, cache_dir):
+        self.path = path
+        self.index_file = None
+        self.index = {}
+        self.changed = False
+        if cache_dir:
+            path_digest = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:12]
+            self.index_file = os.path.join(cache_dir, "graph_index_{}.json".format(path_digest))
+            try:
+                if is_private_file(self.index_file):
+                    with open(self.index_file) as f:
+                        self.index = json.load(f)
+            except (IOError, OSError, ValueError):
+                self.index = {}
+
+    def get_hostnames(self, group):
+        devices_file = os.path.join(self.path, LabGraph.SUPPORTED_CSV_FILES["devices"].format(group))
+        signature = get_file_signature(devices_file)
+        entry = self.index.get(group)
+        if entry and entry["signature"] == signature:
+            return set(entry["hostnames"])
+
+        hostnames = LabGraph.read_hostnames(self.path, group)
+        self.index[group] = {"signature": signature, "hostnames": hostnames}
+        self.changed = True
+        return set(hostnames)
+
+    def save(self):
+        if not self.index_file or not self.changed:
+            return
+        cache_dir = os.path.dirname(self.index_file)
+        try:
+            make_private_dir(cache_dir)
+            fd, tmp_file = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.index, f)
+            os.rename(tmp_file, self.index_file)
+        except (IOError, OSError) as e:
+            logging.debug("Unable to save graph group index {}: {}".format(self.index_file, repr(e)))
 
 
 def find_graph(hostnames, part=False, forced_mgmt_routes=None):
@@ -131,31 +189,31 @@ def find_graph(hostnames, part=False, forced_mgmt_routes=None):
     with open(graph_group_file) as fd:
         graph_groups = yaml.safe_load(fd)
 
-    target_graph = None
+    index = GroupHostnamesIndex(LAB_GRAPHFILE_PATH, LAB_GRAPH_CACHE_DIR)
     target_group = None
     for group in graph_groups:
         logging.debug("Looking at graph files of group {} for hosts {}".format(group, hostnames))
-        lab_graph = LabGraph(LAB_GRAPHFILE_PATH, group, forced_mgmt_routes=forced_mgmt_routes)
-        graph_hostnames = set(lab_graph.graph_facts["devices"].keys())
+        graph_hostnames = index.get_hostnames(group)
         logging.debug("For graph group {}, got hostnames {}".format(group, graph_hostnames))
 
         if not part:
             if set(hostnames) <= graph_hostnames:
-                target_graph = lab_graph
                 target_group = group
                 break
         else:
             THRESHOLD = 0.8
             in_graph_hostnames = set(hostnames).intersection(graph_hostnames)
             if len(in_graph_hostnames) * 1.0 / len(hostnames) >= THRESHOLD:
-                target_graph = lab_graph
                 target_group = group
                 break
+    index.save()
 
-    if target_graph is not None:
-        logging.debug("Returning lab graph of group {} for hosts {}".format(target_group, hostnames))
+    if target_group is None:
+        return None
 
-    return target_graph
+    logging.debug("Returning lab graph of group {} for hosts {}".format(target_group, hostnames))
+    return LabGraph(LAB_GRAPHFILE_PATH, target_group, forced_mgmt_routes=forced_mgmt_routes,
+                    cache_dir=LAB_GRAPH_CACHE_DIR)
 
 
 def main():
@@ -168,6 +226,7 @@ def main():
             anchor=dict(required=False, type='list'),
             ignore_errors=dict(required=False, type='bool', default=False),
             forced_mgmt_routes=dict(required=False, type='list'),
+            cache_dir=dict(required=False, type='str', default=None),
         ),
         mutually_exclusive=[['host', 'hosts', 'anchor']],
         supports_check_mode=True
@@ -189,12 +248,16 @@ def main():
         if m_args["filepath"]:
             global LAB_GRAPHFILE_PATH
             LAB_GRAPHFILE_PATH = m_args['filepath']
+        if m_args["cache_dir"] is not None:
+            global LAB_GRAPH_CACHE_DIR
+            LAB_GRAPH_CACHE_DIR = m_args["cache_dir"]
 
         if m_args["group"]:
             lab_graph = LabGraph(
                 LAB_GRAPHFILE_PATH,
                 m_args["group"],
-                forced_mgmt_routes=m_args.get("forced_mgmt_routes")
+                forced_mgmt_routes=m_args.get("forced_mgmt_routes"),
+                cache_dir=LAB_GRAPH_CACHE_DIR
             )
         else:
             # When calling passed in anchor instead of hostnames,
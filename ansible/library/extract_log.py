@@ -1,17 +1,16 @@
 #!/usr/bin/python
 
 from ansible.module_utils.basic import AnsibleModule
-from functools import cmp_to_key
 import datetime
 import traceback
 import logging.handlers
 import logging
 import hashlib
-import sys
+import json
+import shutil
 import re
 import gzip
 import os
-import locale
 DOCUMENTATION = '''
 module:  extract_log
 version_added:  "1.0"
@@ -42,6 +41,13 @@ Options:
       required: True
       Default: None
 
+    - option-name: index_file
+      description: a file where byte offsets of start strings found in the log files are cached between runs.
+                   Files are identified by device, inode and a hash of their first bytes, so rotated files
+                   are not scanned again after they are renamed by logrotate.
+      required: False
+      Default: /tmp/extract_log.<directory>.<file_prefix>.idx
+
 '''
 
 EXAMPLES = '''
@@ -89,25 +95,146 @@ EXAMPLES = '''
 logger = logging.getLogger('ExtractLog')
 
 
-def extract_lines(directory, filename, target_string):
-    path = os.path.join(directory, filename)
-    file = None
+# Start strings containing the LogAnalyzer start marker prefix share one index token,
+# so the index built for one test run is reused for the following ones
+LOGANALYZER_START_MARKER = 'start-LogAnalyzer'
+INDEX_VERSION = 1
+# Number of bytes from the beginning of a file hashed to detect reused inodes and truncated files
+INDEX_HEAD_SIZE = 4096
+# Number of attempts to extract logs when log files were rotated while they were being processed
+EXTRACT_ATTEMPTS = 3
+
+
+class LogRotatedError(Exception):
+    """Raised when a log file was rotated while it was being processed."""
+    pass
+
+
+def open_log(path, expected_stat=None):
+    """Opens log file in binary mode, verifies that it is the same file which was listed"""
+    raw = open(path, 'rb')
+    if expected_stat is not None:
+        st = os.fstat(raw.fileno())
+        if (st.st_dev, st.st_ino) != (expected_stat.st_dev, expected_stat.st_ino):
+            raw.close()
+            raise LogRotatedError("{} was rotated".format(path))
     if 'gz' in path:
-        file = gzip.open(path, mode='rt')
-    else:
-        file = open(path)
-    result = None
-    with file:
-        # This might be a gunzip file or logrotate issue, there has
-        # been '\x00's in front of the log entry timestamp which
-        # messes up with the comparator.
-        # Prehandle lines to remove these sub-strings
-        dt = datetime.datetime.fromtimestamp(os.path.getctime(path))
-        sz = os.path.getsize(path)
-        result = [(filename, dt, line.replace('\x00', ''), sz)
-                  for line in file if target_string in line and 'extract_log' not in line]
+        return gzip.GzipFile(fileobj=raw, mode='rb')
+    return raw
 
-    return result
+
+def index_token(target_string):
+    """Returns the string which is indexed in the log files to find @target_string"""
+    if LOGANALYZER_START_MARKER in target_string:
+        return LOGANALYZER_START_MARKER
+    return target_string
+
+
+def default_index_file(directory, prefixname):
+    return '/tmp/extract_log.{}.{}.idx'.format(directory.strip('/').replace('/', '_'), prefixname)
+
+
+class MarkerIndex(object):
+    """Byte offsets of the lines containing an index token, per log file.
+
+    Log files are keyed by device and inode, which are kept when logrotate renames a file. A hash of the first
+    bytes of the file protects against reused inodes and truncated files. Compressed files never change, so
+    they are scanned only once. Plain files are only appended to, so the scan is resumed from the last
+    indexed offset.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.files = {}
+        self.dirty = False
+        try:
+            with open(path) as fp:
+                data = json.load(fp)
+            if data.get('version') == INDEX_VERSION:
+                self.files = data['files']
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            logger.debug("extract_log index {} is not available, it will be rebuilt".format(path))
+
+    def save(self, keep_keys=None):
+        if keep_keys is not None:
+            for key in list(self.files):
+                if key not in keep_keys:
+                    del self.files[key]
+                    self.dirty = True
+        if not self.dirty:
+            return
+        tmp_path = '{}.{}.tmp'.format(self.path, os.getpid())
+        try:
+            with open(tmp_path, 'w') as fp:
+                json.dump({'version': INDEX_VERSION, 'files': self.files}, fp)
+            os.rename(tmp_path, self.path)
+            self.dirty = False
+        except (IOError, OSError) as e:
+            logger.warning("Failed to save extract_log index {}: {}".format(self.path, e))
+
+    @staticmethod
+    def file_key(st):
+        return '{}:{}'.format(st.st_dev, st.st_ino)
+
+    @staticmethod
+    def head_hash(path, length):
+        with open(path, 'rb') as fp:
+            return hashlib.md5(fp.read(length)).hexdigest()
+
+    def find_lines(self, path, st, token):
+        """Returns list of (offset, line) for every line containing @token in the log file.
+        Offsets are in bytes of the uncompressed content of the file."""
+        key = self.file_key(st)
+        compressed = 'gz' in path
+        # The file keeps growing while it is processed, so the size is taken from the current state of the file
+        current = os.stat(path)
+        if (current.st_dev, current.st_ino) != (st.st_dev, st.st_ino):
+            raise LogRotatedError("{} was rotated".format(path))
+        size = current.st_size
+        entry = self.files.get(key)
+        if entry is not None:
+            head_len = entry['head_len']
+            if size < head_len or self.head_hash(path, head_len) != entry['head']:
+                entry = None
+            elif not compressed and any(cached['offset'] > size for cached in entry['tokens'].values()):
+                # the file was truncated and written again
+                entry = None
+        if entry is None:
+            head_len = min(size, INDEX_HEAD_SIZE)
+            entry = {'head_len': head_len, 'head': self.head_hash(path, head_len), 'tokens': {}}
+            self.files[key] = entry
+            self.dirty = True
+
+        cached = entry['tokens'].get(token)
+        if cached is not None and (compressed or cached['offset'] == size):
+            return [tuple(item) for item in cached['lines']]
+
+        start = cached['offset'] if cached is not None else 0
+        lines = list(cached['lines']) if cached is not None else []
+        token_bytes = token.encode('utf-8')
+        offset = start
+        indexed_offset = start
+        tail = []
+        with open_log(path, st) as fp:
+            if start:
+                fp.seek(start)
+            for line in fp:
+                if token_bytes in line:
+                    item = [offset, line.decode('utf-8', 'replace')]
+                    if line.endswith(b'\n') or compressed:
+                        lines.append(item)
+                    else:
+                        tail.append(item)
+                offset += len(line)
+                # A partial line at the end of a file being written is indexed on the next run
+                if line.endswith(b'\n') or compressed:
+                    indexed_offset = offset
+        logger.debug("extract_log indexed {} from offset {} to {}, {} lines found".format(
+            path, start, indexed_offset, len(lines) + len(tail)))
+
+        entry['tokens'][token] = {'offset': indexed_offset, 'lines': lines}
+        self.dirty = True
+        return [tuple(item) for item in lines + tail]
 
 
 def extract_number(s):
@@ -119,54 +246,43 @@ def extract_number(s):
         return int(ns[0])
 
 
+MONTHS = {name: number for number, name in enumerate(
+    ('jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'), 1)}
+
+# Mon DD HH:MM:SS[.ffffff], optionally prefixed with the year
+BSD_DATE_RE = re.compile(r'(?:(\d{4}) )?(\S{3})\s{1,2}(\d{1,2}) (\d{2}):(\d{2}):(\d{2})(?:\.(\d{1,6}))?')
+# YYYY-MM-DDTHH:MM:SS.ffffff or YYYY-MM-DD.HH:MM:SS.ffffff, parsed by fixed offsets
+ISO_DATE_RE = re.compile(r'\d{4}-\d{2}-\d{2}[T.]\d{2}:\d{2}:\d{2}\.\d{6}')
+
+
+def parse_microseconds(fraction):
+    """Converts fraction of a second (1 to 6 digits) to microseconds the same way as strptime %f"""
+    if not fraction:
+        return 0
+    return int(fraction.ljust(6, '0'))
+
+
 def convert_date(fct, s):
+    """Parses timestamp at the beginning of the log line @s.
+    @fct is the file creation time, its year is used for timestamps without the year"""
     dt = None
-    re_result = re.findall(r'^\S{3}\s{1,2}\d{1,2} \d{2}:\d{2}:\d{2}\.?\d*', s)
-    if len(re_result) == 0:
-        re_result_with_year = re.findall(r'^\d{4}\s{1}\S{3}\s{1,2}\d{1,2} \d{2}:\d{2}:\d{2}\.?\d*', s)
-    else:
-        re_result_with_year = list()
-    # Workaround for pytest-ansible
-    loc = locale.getlocale()
-    locale.setlocale(locale.LC_ALL, (None, None))
-
-    if len(re_result) > 0:
-        str_date = '{:04d} '.format(fct.year) + re_result[0]
-        try:
-            dt = datetime.datetime.strptime(str_date, '%Y %b %d %X.%f')
-        except ValueError:
-            dt = datetime.datetime.strptime(str_date, '%Y %b %d %X')
+    m = BSD_DATE_RE.match(s)
+    if m is not None:
+        year, month, day, hour, minute, second, fraction = m.groups()
+        month = MONTHS.get(month.lower())
+        if month is None:
+            raise ValueError("Unknown month in date of the line: {}".format(s))
+        dt = datetime.datetime(int(year) if year else fct.year, month, int(day),
+                               int(hour), int(minute), int(second), parse_microseconds(fraction))
         # Handle the wrap around of year (Dec 31 to Jan 1)
         # Generally, last metadata change time should be larger than generated log message timestamp
         # but we still perform some wrap around test to avoid the race condition
         # 183 is the number of days in half year, just a reasonable choice
-        if (dt - fct).days > 183:
-            dt.replace(year=dt.year - 1)
-    elif len(re_result_with_year) > 0:
-        str_date = re_result_with_year[0]
-        dt = datetime.datetime.strptime(str_date, '%Y %b %d %X.%f')
-    else:
-        re_result = re.findall(
-            r'^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}\.\d{6}', s)
-        if len(re_result) > 0:
-            str_date = re_result[0]
-            str_date = str_date.replace("T", " ")
-            dt = datetime.datetime.strptime(str_date, '%Y-%m-%d %X.%f')
-        else:
-            re_result = re.findall(
-                r'^\d{4}-\d{2}-\d{2}\.\d{2}:\d{2}:\d{2}\.\d{6}', s)
-            if len(re_result) > 0:
-                str_date = re_result[0]
-                dt = datetime.datetime.strptime(str_date, '%Y-%m-%d.%X.%f')
-
-            else:
-                re_result = re.findall(
-                    r'^\d{4} \w{3} \d{2} \d{2}:\d{2}:\d{2}\.\d{6}', s)
-                if len(re_result) > 0:
-                    str_date = re_result[0]
-                    dt = datetime.datetime.strptime(str_date, '%Y %b %d %H:%M:%S.%f')
-
-    locale.setlocale(locale.LC_ALL, loc)
+        if not year and (dt - fct).days > 183:
+            dt = dt.replace(year=dt.year - 1)
+    elif ISO_DATE_RE.match(s):
+        dt = datetime.datetime(int(s[0:4]), int(s[5:7]), int(s[8:10]),
+                               int(s[11:13]), int(s[14:16]), int(s[17:19]), int(s[20:26]))
 
     if dt is None:
         dt = datetime.datetime.min
@@ -174,60 +290,42 @@ def convert_date(fct, s):
     return dt
 
 
-def comparator(left, right):
-    nl = extract_number(left[0])
-    nr = extract_number(right[0])
-    if nl == nr:
-        dl = convert_date(left[1], left[2])
-        dr = convert_date(right[1], right[2])
-        if dl == dr:
-            return 0
-        elif dl < dr:
-            return -1
-        else:
-            return 1
-    elif nl > nr:
-        return -1
-    else:
-        return 1
-
-
-def filename_comparator(left, right):
-    """Compares log filenames, assumes file with greater number is
-    older, e.g syslog.2 is older than syslog.1. This is how logrotate is currently configured.
-    Returns 0 if log files l and r are the same,
-    1 if log file l is older then r and -1 if l is newer then r"""
-
-    nl = extract_number(left)
-    nr = extract_number(right)
-    if nl == nr:
-        return 0
-    elif nl > nr:
-        return 1
-    else:
-        return -1
+def line_sort_key(line):
+    """Sort key for (filename, file creation time, line, ...) tuples,
+    lines from older files and with older timestamps go first"""
+    return -extract_number(line[0]), convert_date(line[1], line[2])
 
 
 def list_files(directory, prefixname):
     """Returns a sorted list(sort order is from newer to older)
     of files in @directory starting with @prefixname
-    (Comparator used is @filename_comparator)"""
+    Files with greater number are older, e.g syslog.2 is older than syslog.1.
+    This is how logrotate is currently configured."""
 
-    if sys.version_info < (3, 0):
-        return sorted([filename for filename in os.listdir(directory)
-                       if filename.startswith(prefixname)], cmp=filename_comparator)
-    else:
-        return sorted([filename for filename in os.listdir(directory)
-                       if filename.startswith(prefixname)], key=cmp_to_key(filename_comparator))
+    return sorted([filename for filename in os.listdir(directory)
+                   if filename.startswith(prefixname)], key=extract_number)
+
+
+def extract_lines(directory, filename, target_string, index, st):
+    """Returns list of (filename, ctime, line, size, offset) for lines containing @target_string"""
+    path = os.path.join(directory, filename)
+    # This might be a gunzip file or logrotate issue, there has
+    # been '\x00's in front of the log entry timestamp which
+    # messes up with the comparator.
+    # Prehandle lines to remove these sub-strings
+    dt = datetime.datetime.fromtimestamp(st.st_ctime)
+    return [(filename, dt, line.replace('\x00', ''), st.st_size, offset)
+            for offset, line in index.find_lines(path, st, index_token(target_string))
+            if target_string in line and 'extract_log' not in line]
 
 
-def extract_latest_line_with_string(directory, filenames, start_string):
+def extract_latest_line_with_string(directory, filenames, start_string, index, stats):
     """Extracts latest line with string @start_string. Assumes @filenames are sorted
     and first file in @filenames is the newest log file"""
 
     target_lines = []
     for filename in filenames:
-        extracted_lines = extract_lines(directory, filename, start_string)
+        extracted_lines = extract_lines(directory, filename, start_string, index, stats[filename])
         if extracted_lines:
             # found lines are the lates since we start from the newest file
             # assignt to target_lines and break the loop
@@ -235,10 +333,7 @@ def extract_latest_line_with_string(directory, filenames, start_string):
             break
 
     # find the latest line from traget_lines comparing by date in line
-    target = target_lines[0] if len(target_lines) > 0 else None
-    for line in target_lines:
-        if comparator(line, target) > 0:
-            target = line
+    target = max(target_lines, key=line_sort_key) if target_lines else None
 
     if target is None:
         raise Exception("{} was not found in {}".format(
@@ -247,59 +342,78 @@ def extract_latest_line_with_string(directory, filenames, start_string):
     return target
 
 
+def find_copy_offset(directory, filename, target_string, index, st):
+    """Returns offset of the first line containing @target_string in the file, the copy starts from it"""
+    path = os.path.join(directory, filename)
+    for offset, line in index.find_lines(path, st, index_token(target_string)):
+        if target_string in line:
+            return offset
+    return 0
+
+
 def calculate_files_to_copy(filenames, file_with_latest_line):
     files_to_copy = filenames[:filenames.index(file_with_latest_line) + 1]
     return files_to_copy
 
 
-def combine_logs_and_save(directory, filenames, start_string, target_string, target_filename):
-    do_copy = False
-    line_processed = 0
-    line_copied = 0
-    with open(target_filename, 'w') as fp:
-        for filename in reversed(filenames):
+def combine_logs_and_save(directory, filenames, start_offset, target_filename, stats):
+    """Copies @filenames from the oldest to the newest one into @target_filename,
+    the oldest file is copied from @start_offset"""
+    bytes_copied = 0
+    with open(target_filename, 'wb') as fp:
+        for idx, filename in enumerate(reversed(filenames)):
             path = os.path.join(directory, filename)
-            dt = datetime.datetime.fromtimestamp(os.path.getctime(path))
-            sz = os.path.getsize(path)
-            logger.debug(
-                "extract_log combine_logs from file {} create time {}, size {}".format(path, dt, sz))
-            file = None
-            if 'gz' in path:
-                file = gzip.open(path, mode='rt')
-            else:
-                file = open(path)
-
-            with file:
-                for line in file:
-                    line_processed += 1
-                    if do_copy is False:
-                        if line == start_string or target_string in line:
-                            do_copy = True
-                            fp.write(line)
-                            line_copied += 1
-                    else:
-                        fp.write(line)
-                        line_copied += 1
+            st = stats[filename]
+            logger.debug("extract_log combine_logs from file {} create time {}, size {}".format(
+                path, datetime.datetime.fromtimestamp(st.st_ctime), st.st_size))
+            with open_log(path, st) as file:
+                if idx == 0 and start_offset:
+                    file.seek(start_offset)
+                start = fp.tell()
+                shutil.copyfileobj(file, fp)
+                bytes_copied += fp.tell() - start
 
-            logger.debug("extract_log combine_logs from file {}, {} lines processed, {} lines copied".format(
-                path, line_processed, line_copied))
+            logger.debug("extract_log combine_logs from file {}, {} bytes copied".format(path, bytes_copied))
 
 
-def extract_log(directory, prefixname, target_string, target_filename):
-    logger.debug("extract_log for start string {}".format(
-        target_string.replace("start-", "")))
+def stat_files(directory, filenames):
+    stats = {}
+    for filename in filenames:
+        stats[filename] = os.stat(os.path.join(directory, filename))
+    return stats
+
+
+def _extract_log(directory, prefixname, target_string, target_filename, index):
     filenames = list_files(directory, prefixname)
     logger.debug("extract_log from files {}".format(filenames))
-    file_with_latest_line, file_create_time, latest_line, file_size = extract_latest_line_with_string(
-        directory, filenames, target_string)
+    stats = stat_files(directory, filenames)
+    file_with_latest_line, file_create_time, latest_line, file_size, _ = extract_latest_line_with_string(
+        directory, filenames, target_string, index, stats)
     m = hashlib.md5()
     m.update(latest_line.encode('utf-8'))
     logger.debug("extract_log start file {} size {}, ctime {}, latest line md5sum {}".format(
         file_with_latest_line, file_size, file_create_time, m.hexdigest()))
     files_to_copy = calculate_files_to_copy(filenames, file_with_latest_line)
     logger.debug("extract_log subsequent files {}".format(files_to_copy))
-    combine_logs_and_save(directory, files_to_copy,
-                          latest_line, target_string, target_filename)
+    start_offset = find_copy_offset(directory, file_with_latest_line, target_string, index,
+                                    stats[file_with_latest_line])
+    combine_logs_and_save(directory, files_to_copy, start_offset, target_filename, stats)
+    index.save(keep_keys=set(MarkerIndex.file_key(st) for st in stats.values()))
+
+
+def extract_log(directory, prefixname, target_string, target_filename, index_file=None):
+    logger.debug("extract_log for start string {}".format(
+        target_string.replace("start-", "")))
+    index = MarkerIndex(index_file or default_index_file(directory, prefixname))
+    for attempt in range(1, EXTRACT_ATTEMPTS + 1):
+        try:
+            _extract_log(directory, prefixname, target_string, target_filename, index)
+            break
+        except (LogRotatedError, FileNotFoundError) as e:
+            # logrotate renamed or removed a file after the files were listed, list them again
+            if attempt == EXTRACT_ATTEMPTS:
+                raise
+            logger.debug("extract_log attempt {} failed, log files were rotated: {}".format(attempt, e))
     filenames = list_files(directory, prefixname)
     logger.debug("extract_log check logs files {}".format(filenames))
 
@@ -311,6 +425,7 @@ def main():
             file_prefix=dict(required=True, type='str'),
             start_string=dict(required=True, type='str'),
             target_filename=dict(required=True, type='str'),
+            index_file=dict(required=False, type='str', default=None),
         ),
         supports_check_mode=False)
 
@@ -322,7 +437,7 @@ def main():
 
     try:
         extract_log(p['directory'], p['file_prefix'],
-                    p['start_string'], p['target_filename'])
+                    p['start_string'], p['target_filename'], p['index_file'])
     except Exception:
         tb = traceback.format_exc()
         module.fail_json(msg=tb)
@@ -0,0 +1,157 @@
+#!/usr/bin/python
+from ansible.module_utils.basic import AnsibleModule
+import hashlib
+import json
+import re
+import traceback
+
+DOCUMENTATION = '''
+---
+module: redis_dump_digest
+version_added: "1.0"
+short_description: Digest tree of a redis-dump file on the device.
+description:
+    - Reads a JSON file written by redis-dump on the device and returns one of
+    - the digest of every table (prefix of the keys before the first ':' or '|') and the number of keys and values
+      of the dump,
+    - the digest of every key of some tables,
+    - the entries of some keys.
+    - Comparing the digests of two dumps tells which tables and keys differ, so only the entries of these keys need
+      to be fetched from the device.
+options:
+    path:
+        description:
+            - Path of the redis-dump file on the device.
+        required: true
+    ignore_fields:
+        description:
+            - Names of the fields left out of the digests, at any depth of the entries.
+        required: false
+        default: []
+    tables:
+        description:
+            - Return the digest of every key of these tables.
+        required: false
+    keys:
+        description:
+            - Return the entries of these keys, keys not in the dump are left out.
+        required: false
+'''
+
+EXAMPLES = '''
+- name: Get the digest of every table of a dump
+  redis_dump_digest:
+    path: /var/tmp/db_comparison/after_warmboot/APPL.json
+    ignore_fields: ["expireat", "ttl"]
+
+- name: Get the digest of every key of table PORT_TABLE
+  redis_dump_digest:
+    path: /var/tmp/db_comparison/after_warmboot/APPL.json
+    ignore_fields: ["expireat", "ttl"]
+    tables: ["PORT_TABLE"]
+'''
+
+RETURN = '''
+digest_tree:
+    description: Digest of every table and number of keys and values, returned when tables and keys are not set.
+    returned: success
+    type: dict
+key_digests:
+    description: Digest of every key of the tables, returned when tables is set.
+    returned: success
+    type: dict
+entries:
+    description: Entries of the keys, returned when keys is set.
+    returned: success
+    type: dict
+'''
+
+TABLE_SEPARATOR = re.compile(r"[:|]")
+
+
+def table_name(key):
+    """Table of a key, the prefix before the first separator."""
+    return TABLE_SEPARATOR.split(key, 1)[0]
+
+
+def strip_ignored(value, ignore_fields):
+    """Copy of value without the fields named in ignore_fields, at any depth."""
+    if isinstance(value, dict):
+        return {k: strip_ignored(v, ignore_fields) for k, v in value.items() if k not in ignore_fields}
+    return value
+
+
+def entry_digest(entry, ignore_fields):
+    """Digest of an entry of the dump, without the ignored fields."""
+    data = json.dumps(strip_ignored(entry, ignore_fields), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+
+def get_key_digests(dump, ignore_fields, tables=None):
+    """Digest of every key of the dump, or of the keys of the tables when tables is set."""
+    return {key: entry_digest(entry, ignore_fields) for key, entry in dump.items()
+            if tables is None or table_name(key) in tables}
+
+
+def get_digest_tree(dump, ignore_fields):
+    """Digest of every table of the dump and the number of keys and values of the dump.
+
+    The values are the fields below the 'value' of the entries, counted with and without the ignored fields.
+    """
+    table_keys = {}
+    for key, digest in get_key_digests(dump, ignore_fields).items():
+        table_keys.setdefault(table_name(key), []).append((key, digest))
+    tables = {}
+    for table, keys in table_keys.items():
+        h = hashlib.sha1()
+        for key, digest in sorted(keys):
+            h.update(key.encode("utf-8"))
+            h.update(b"\0")
+            h.update(digest.encode("ascii"))
+        tables[table] = h.hexdigest()
+
+    values_incl_volatile = 0
+    values_excl_volatile = 0
+    for entry in dump.values():
+        fields = entry.get("value") if isinstance(entry, dict) else None
+        if isinstance(fields, dict):
+            values_incl_volatile += len(fields)
+            values_excl_volatile += len([field for field in fields if field not in ignore_fields])
+    return {
+        "total_keys": len(dump),
+        "total_values_incl_volatile": values_incl_volatile,
+        "total_values_excl_volatile": values_excl_volatile,
+        "tables": tables,
+    }
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            path=dict(required=True, type='str'),
+            ignore_fields=dict(required=False, type='list', default=[]),
+            tables=dict(required=False, type='list', default=None),
+            keys=dict(required=False, type='list', default=None),
+        ),
+        supports_check_mode=True
+    )
+    m_args = module.params
+    ignore_fields = set(m_args['ignore_fields'])
+    try:
+        with open(m_args['path']) as f:
+            dump = json.load(f)
+        results = {}
+        if m_args['tables'] is not None:
+            results['key_digests'] = get_key_digests(dump, ignore_fields, set(m_args['tables']))
+        if m_args['keys'] is not None:
+            results['entries'] = {key: dump[key] for key in m_args['keys'] if key in dump}
+        if not results:
+            results['digest_tree'] = get_digest_tree(dump, ignore_fields)
+    except Exception as e:
+        module.fail_json(msg="Failed to read redis dump {}: {}\n{}".format(
+            m_args['path'], repr(e), traceback.format_exc()))
+    module.exit_json(changed=False, **results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+#!/usr/bin/python
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.multi_asic_utils import load_db_config
+import traceback
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+try:
+    from swsscommon.swsscommon import SonicDBConfig, SonicV2Connector
+except ImportError:
+    SonicDBConfig = SonicV2Connector = None
+
+DOCUMENTATION = '''
+---
+module: sonic_db_batch
+version_added: "1.0"
+short_description: Run a batch of read operations on the SONiC redis databases in one shot.
+description:
+    - Every HGETALL and HGET of the batch is sent to redis in one pipeline per database, so reading
+      thousands of entries costs one ansible round trip and a few redis round trips.
+    - Keys are looked up with SCAN, never with the blocking KEYS command.
+    - The redis python client is used if it is installed, else the commands are run one by one through
+      SonicV2Connector.
+options:
+    operations:
+        description:
+            - List of operations, each one is a dict with 'op' and 'db' (database name, e.g. ASIC_DB).
+            - "op: hgetall, keys: [<key>, ...] - returns {<key>: {<field>: <value>}}, {} for missing keys."
+            - "op: hget, items: [[<key>, <field>], ...] - returns [<value>, ...], null for missing fields."
+            - keys and items may be empty lists, the results are empty then.
+            - "op: scan, pattern: <pattern>, hgetall: <bool> - returns the sorted list of matching keys, or
+               {<key>: {<field>: <value>}} of the matching keys when hgetall is true."
+        required: true
+    namespace:
+        description:
+            - Namespace of the databases, the global namespace when not set.
+        required: false
+    scan_count:
+        description:
+            - COUNT hint of the SCAN commands.
+        required: false
+        default: 1000
+'''
+
+EXAMPLES = '''
+- name: Get the route entries and the attributes of two ports of ASIC_DB
+  sonic_db_batch:
+    namespace: asic0
+    operations:
+      - op: scan
+        db: ASIC_DB
+        pattern: "ASIC_STATE:SAI_OBJECT_TYPE_ROUTE_ENTRY:*"
+        hgetall: true
+      - op: hgetall
+        db: ASIC_DB
+        keys:
+          - "ASIC_STATE:SAI_OBJECT_TYPE_PORT:oid:0x1000000000002"
+          - "ASIC_STATE:SAI_OBJECT_TYPE_PORT:oid:0x1000000000003"
+'''
+
+RETURN = '''
+results:
+    description: Result of each operation, in the order of the operations.
+    returned: success
+    type: list
+'''
+
+OPERATION_ARGS = {
+    "hgetall": ("keys",),
+    "hget": ("items",),
+    "scan": ("pattern",),
+}
+LIST_ARGS = ("keys", "items")
+
+
+class ConnectorClient(object):
+    """Subset of the redis client used by run_operations(), on top of SonicV2Connector."""
+
+    def __init__(self, db, namespace):
+        self.db = db
+        self.conn = SonicV2Connector(use_unix_socket_path=True, namespace=namespace or "")
+        self.conn.connect(db)
+
+    def scan_iter(self, match, count):
+        cursor = 0
+        while True:
+            cursor, keys = self.conn.scan(self.db, cursor, match, count)
+            for key in keys:
+                yield key
+            if not cursor:
+                break
+
+    def pipeline(self, transaction=False):
+        return ConnectorPipeline(self.conn, self.db)
+
+
+class ConnectorPipeline(object):
+    """Runs the commands one by one when executed, SonicV2Connector has no pipeline."""
+
+    def __init__(self, conn, db):
+        self.conn = conn
+        self.db = db
+        self.commands = []
+
+    def hgetall(self, key):
+        self.commands.append(lambda: self.conn.get_all(self.db, key))
+
+    def hget(self, key, field):
+        self.commands.append(lambda: self.conn.get(self.db, key, field))
+
+    def execute(self):
+        return [command() for command in self.commands]
+
+
+def get_client(db, namespace):
+    """Get a client of database db in namespace."""
+    if redis is None:
+        return ConnectorClient(db, namespace)
+    namespace = namespace or ""
+    socket_path = SonicDBConfig.getDbSock(db, namespace)
+    if socket_path:
+        return redis.Redis(unix_socket_path=socket_path, db=SonicDBConfig.getDbId(db, namespace),
+                           decode_responses=True)
+    return redis.Redis(host=SonicDBConfig.getDbHostname(db, namespace), port=SonicDBConfig.getDbPort(db, namespace),
+                       db=SonicDBConfig.getDbId(db, namespace), decode_responses=True)
+
+
+def validate_operations(operations):
+    """Return an error message if an operation is malformed, else None."""
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict):
+            return "Operation {} is not a dict".format(index)
+        op = operation.get("op")
+        if op not in OPERATION_ARGS:
+            return "Operation {} has unsupported op {}, supported: {}".format(
+                index, op, ", ".join(sorted(OPERATION_ARGS)))
+        for arg in ("db",) + OPERATION_ARGS[op]:
+            if arg not in operation:
+                return "Operation {} ({}) misses argument {}".format(index, op, arg)
+            # Lists of keys and items may be empty, the results are empty then
+            if arg in LIST_ARGS:
+                if not isinstance(operation[arg], list):
+                    return "Operation {} ({}) argument {} is not a list".format(index, op, arg)
+            elif not operation[arg]:
+                return "Operation {} ({}) has empty argument {}".format(index, op, arg)
+    return None
+
+
+def run_operations(get_client, operations, namespace=None, scan_count=1000):
+    """Run the operations, see DOCUMENTATION.
+
+    The SCANs run first, then all the HGETALL and HGET of a database, including the ones of the keys found by
+    'scan' operations with 'hgetall', are sent in one pipeline.
+
+    Args:
+        get_client: Function (db, namespace) returning a redis client of the database.
+        operations: List of operations.
+        namespace: Namespace of the databases.
+        scan_count: COUNT hint of SCAN.
+
+    Returns:
+        list: Result of each operation.
+    """
+    clients = {}
+
+    def client(db):
+        if db not in clients:
+            clients[db] = get_client(db, namespace)
+        return clients[db]
+
+    # Commands of every database: list of (operation index, key, field or None)
+    commands = {}
+    scanned = {}
+    for index, operation in enumerate(operations):
+        db = operation["db"]
+        op = operation["op"]
+        if op == "scan":
+            keys = sorted(set(client(db).scan_iter(match=operation["pattern"], count=scan_count)))
+            scanned[index] = keys
+            if operation.get("hgetall"):
+                commands.setdefault(db, []).extend((index, key, None) for key in keys)
+        elif op == "hgetall":
+            commands.setdefault(db, []).extend((index, key, None) for key in operation["keys"])
+        else:
+            commands.setdefault(db, []).extend((index, key, field) for key, field in operation["items"])
+
+    replies = {}
+    for db, db_commands in commands.items():
+        if not db_commands:
+            continue
+        pipe = client(db).pipeline(transaction=False)
+        for _, key, field in db_commands:
+            if field is None:
+                pipe.hgetall(key)
+            else:
+                pipe.hget(key, field)
+        replies[db] = pipe.execute()
+
+    results = []
+    for index, operation in enumerate(operations):
+        op = operation["op"]
+        if op == "scan" and not operation.get("hgetall"):
+            results.append(scanned[index])
+        elif op == "hget":
+            results.append([])
+        else:
+            results.append({})
+    for db, db_commands in commands.items():
+        for (index, key, field), reply in zip(db_commands, replies.get(db, [])):
+            if field is None:
+                results[index][key] = dict(reply or {})
+            else:
+                results[index].append(reply)
+    return results
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            operations=dict(required=True, type='list'),
+            namespace=dict(required=False, default=None),
+            scan_count=dict(required=False, type='int', default=1000),
+        ),
+        supports_check_mode=True
+    )
+    m_args = module.params
+    error = validate_operations(m_args['operations'])
+    if error:
+        module.fail_json(msg=error)
+    if SonicDBConfig is None:
+        module.fail_json(msg="swsscommon is not installed")
+    try:
+        load_db_config()
+        results = run_operations(get_client, m_args['operations'], namespace=m_args['namespace'],
+                                 scan_count=m_args['scan_count'])
+    except Exception as e:
+        module.fail_json(msg="Failed to run sonic-db operations: {}\n{}".format(repr(e), traceback.format_exc()))
+    module.exit_json(changed=False, results=results)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,13 @@
 import csv
+import hashlib
+import inspect
+import json
 import os
 import logging
 import ipaddress
+import pickle
+import sys
+import tempfile
 import six
 from operator import itemgetter
 from itertools import groupby
@@ -12,6 +18,46 @@ try:
 except ImportError:
     from module_utils.port_utils import get_port_alias_to_name_map
 
+# Bump it when the format of cached graph facts is changed
+GRAPH_CACHE_VERSION = 1
+
+_code_digest = None
+
+
+def get_code_digest():
+    """Digest of the code building graph facts. Cached graph facts are invalid once the code is changed."""
+    global _code_digest
+    if _code_digest is None:
+        digest = hashlib.sha1()
+        for module_name in (__name__, get_port_alias_to_name_map.__module__):
+            digest.update(inspect.getsource(sys.modules[module_name]).encode("utf-8"))
+        _code_digest = digest.hexdigest()
+    return _code_digest
+
+
+def get_file_signature(path):
+    """Get modification time and size of a file, None if the file doesn't exist."""
+    try:
+        st = os.stat(path)
+        return [st.st_mtime, st.st_size]
+    except OSError:
+        return None
+
+
+def is_private_file(path):
+    """Check if a file is owned by the current user and not writable by others.
+
+    Cache files are read from a folder under the shared temp folder, files planted there by other users are ignored.
+    """
+    st = os.stat(path)
+    return st.st_uid == os.getuid() and not st.st_mode & 0o022
+
+
+def make_private_dir(path):
+    """Create a folder accessible only by the current user, if it doesn't exist."""
+    if not os.path.exists(path):
+        os.makedirs(path, 0o700)
+
 
 class LabGraph(object):
 
@@ -25,7 +71,16 @@ class LabGraph(object):
         "serial_links": "sonic_{}_serial_links.csv",
     }
 
-    def __init__(self, path, group, forced_mgmt_routes=None):
+    def __init__(self, path, group, forced_mgmt_routes=None, cache_dir=None):
+        """Load graph facts of a group from the csv files
+
+        Args:
+            path (str): Folder of the csv graph files.
+            group (str): Group of the csv graph files.
+            forced_mgmt_routes (list, optional): Forced management routes added to each device entry.
+            cache_dir (str, optional): Folder for caching the built graph facts. Cached graph facts are used until
+                any csv file of the group is changed. Defaults to None, which disables the cache.
+        """
         self.path = path
         self.group = group
         self.csv_files = {k: os.path.join(self.path, v.format(group)) for k, v in self.SUPPORTED_CSV_FILES.items()}
@@ -39,10 +94,74 @@ class LabGraph(object):
         self._cache_port_name_to_alias = {}
 
         self.csv_facts = {}
-        self.read_csv_files()
-
         self.graph_facts = {}
-        self.csv_to_graph_facts()
+        self.cache_file = None
+        if cache_dir:
+            key = json.dumps([os.path.abspath(path), group, self.forced_mgmt_routes_v4, self.forced_mgmt_routes_v6])
+            self.cache_file = os.path.join(
+                cache_dir, "{}_{}.pickle".format(group, hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]))
+
+        # Files are checked before reading them, so a file changed while reading it invalidates the cache
+        signature = self._cache_signature() if self.cache_file else None
+        if not self._load_cache(signature):
+            self.read_csv_files()
+            self.csv_to_graph_facts()
+            self._save_cache(signature)
+
+    @classmethod
+    def read_hostnames(cls, path, group):
+        """Read hostnames of the devices in a group, without building the graph facts"""
+        devices_file = os.path.join(path, cls.SUPPORTED_CSV_FILES["devices"].format(group))
+        if not os.path.exists(devices_file):
+            return []
+        with open(devices_file) as csvfile:
+            return [row["Hostname"] for row in csv.DictReader(csvfile)]
+
+    def _cache_signature(self):
+        try:
+            code_digest = get_code_digest()
+        except (IOError, OSError, TypeError) as e:
+            logging.debug("Unable to get source of graph utils, graph facts are not cached: {}".format(repr(e)))
+            return None
+        return {
+            "version": GRAPH_CACHE_VERSION,
+            "code": code_digest,
+            "files": {k: get_file_signature(v) for k, v in self.csv_files.items()}
+        }
+
+    def _load_cache(self, signature):
+        if not signature:
+            return False
+        try:
+            if not is_private_file(self.cache_file):
+                logging.debug("Cached graph facts {} are not owned by current user".format(self.cache_file))
+                return False
+            with open(self.cache_file, "rb") as f:
+                cached = pickle.load(f)
+        except Exception as e:
+            logging.debug("Unable to load cached graph facts {}: {}".format(self.cache_file, repr(e)))
+            return False
+        if cached.get("signature") != signature:
+            logging.debug("Cached graph facts {} are outdated".format(self.cache_file))
+            return False
+        self.csv_facts = cached["csv_facts"]
+        self.graph_facts = cached["graph_facts"]
+        logging.debug("Loaded cached graph facts of group {} from {}".format(self.group, self.cache_file))
+        return True
+
+    def _save_cache(self, signature):
+        if not signature:
+            return
+        cache_dir = os.path.dirname(self.cache_file)
+        try:
+            make_private_dir(cache_dir)
+            fd, tmp_file = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump({"signature": signature, "csv_facts": self.csv_facts, "graph_facts": self.graph_facts},
+                            f, pickle.HIGHEST_PROTOCOL)
+            os.rename(tmp_file, self.cache_file)
+        except (IOError, OSError) as e:
+            logging.debug("Unable to cache graph facts to {}: {}".format(self.cache_file, repr(e)))
 
     def read_csv_files(self):
         for k, v in self.csv_files.items():
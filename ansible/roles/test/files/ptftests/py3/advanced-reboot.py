@@ -73,6 +73,7 @@ import scapy.all as scapyall
 from scapy.arch.linux import attach_filter as attach_filter
 
 import sad_path as sp
+import flow_analyzer
 
 from ptf import config
 from ptf.base_tests import BaseTest
@@ -1953,8 +1954,8 @@ class ReloadTest(BaseTest):
     def sniff_in_background(self, wait=None):
         """
         This function listens on all ports, in both directions, for the TCP src=1234 dst=5000 packets, until timeout.
-        Once found, all packets are dumped to local pcap file,
-        and all packets are saved to self.packets as scapy type(pcap format).
+        Once found, all packets are dumped to local pcap file. If the pcap file can't be examined by flow_analyzer,
+        all packets are saved to self.packets as scapy type(pcap format).
         """
         if not wait:
             wait = self.time_to_listen + self.test_params['sniff_time_incr']
@@ -1988,8 +1989,12 @@ class ReloadTest(BaseTest):
             else:
                 self.start_sniffer_on_ptf(self.capture_pcap, sniff_filter, wait)
 
-            self.packets = scapyall.rdpcap(self.capture_pcap)
-            self.log("Number of all packets captured: {}".format(len(self.packets)))
+            if flow_analyzer.HAS_NUMPY and not self.vnet:
+                # The capture is parsed by flow_analyzer in examine_flow(), without loading it by scapy
+                self.packets = None
+            else:
+                self.packets = scapyall.rdpcap(self.capture_pcap)
+                self.log("Number of all packets captured: {}".format(len(self.packets)))
         except Exception:
             traceback_msg = traceback.format_exc()
             self.log("Error in tcpdump_sniff: {}".format(traceback_msg))
@@ -2110,7 +2115,7 @@ class ReloadTest(BaseTest):
             # This is a unique (no flooded) received packet.
             # for dualtor, t1->server rcvd pkt will have src MAC as vlan_mac,
             # and server->t1 rcvd pkt will have src MAC as dut_mac
-            self.unique_id.append(int(bytes(packet[scapyall.TCP].payload)))
+            self.unique_id.add(int(bytes(packet[scapyall.TCP].payload)))
             return True
         elif packet[scapyall.Ether].dst == self.dut_mac or packet[scapyall.Ether].dst == self.vlan_mac:
             # This is a sent packet.
@@ -2128,166 +2133,48 @@ class ReloadTest(BaseTest):
         All disruptions are saved to self.lost_packets dictionary, in format:
         disrupt_start_id = (missing_packets_count, disrupt_time, disrupt_start_timestamp, disrupt_stop_timestamp)
         """
-        if filename:
-            all_packets = scapyall.rdpcap(filename)
-        elif self.packets:
-            all_packets = self.packets
-        else:
-            self.log("Filename and self.packets are not defined.")
-            self.fails['dut'].add("Filename and self.packets are not defined")
-            return None
-        # Filter out packets and remove floods:
-        # This list will contain all unique Payload ID, to filter out received floods.
-        self.unique_id = list()
-        filtered_packets = [pkt for pkt in all_packets if
-                            scapyall.TCP in pkt and
-                            scapyall.ICMP not in pkt and
-                            pkt[scapyall.TCP].sport == 1234 and
-                            pkt[scapyall.TCP].dport == 5000 and
-                            self.check_tcp_payload(pkt) and
-                            self.no_flood(pkt)
-                            ]
-
-        if self.vnet:
-            decap_packets = [scapyall.Ether(bytes(pkt.payload.payload.payload)[8:]) for pkt in all_packets if
-                             scapyall.UDP in pkt and
-                             pkt[scapyall.UDP].sport == 1234
-                             ]
-            filtered_decap_packets = [pkt for pkt in decap_packets if
-                                      scapyall.TCP in pkt and
-                                      scapyall.ICMP not in pkt and
-                                      pkt[scapyall.TCP].sport == 1234 and
-                                      pkt[scapyall.TCP].dport == 5000 and
-                                      self.check_tcp_payload(pkt) and
-                                      self.no_flood(pkt)
-                                      ]
-            filtered_packets = filtered_packets + filtered_decap_packets
-
-        # Re-arrange packets, if delayed, by Payload ID and Timestamp:
-        packets = sorted(filtered_packets, key=lambda packet: (
-            int(bytes(packet[scapyall.TCP].payload)), float(packet.time)))
-        self.lost_packets = dict()
+        filtered_filename = ('/tmp/capture_filtered.pcap' if self.logfile_suffix is None
+                             else "/tmp/capture_filtered_%s.pcap" % self.logfile_suffix)
+        if filename is None and getattr(self, 'packets', None) is None and os.path.exists(self.capture_pcap):
+            # The capture was not loaded by scapy, see tcpdump_sniff()
+            filename = self.capture_pcap
+        flow = None
+        if filename and flow_analyzer.HAS_NUMPY and not self.vnet:
+            try:
+                flow = flow_analyzer.analyze_flow_capture(filename, [self.dut_mac, self.vlan_mac], log=self.log,
+                                                          filtered_filename=filtered_filename)
+            except flow_analyzer.UnsupportedCapture as e:
+                self.log("Examine the capture by scapy: {}".format(e))
+        if flow is None:
+            flow = self.examine_scapy_flow(filename, filtered_filename)
+            if flow is None:
+                return None
+
+        self.lost_packets = flow['lost_packets']
         self.max_disrupt, self.total_disruption = 0, 0
-        sent_packets = dict()
-        # Track packet id's that were neither sent or received
-        missing_sent_and_received_packet_id_sequences = []
         self.fails['dut'].add("Sniffer failed to capture any traffic")
-        self.assertTrue(packets, "Sniffer failed to capture any traffic")
+        self.assertTrue(flow['packet_count'], "Sniffer failed to capture any traffic")
         self.fails['dut'].clear()
-        prev_payload = None
-        if packets:
-            prev_payload, prev_time = -1, 0
-            sent_payload = 0
-            received_counter = 0    # Counts packets from dut.
-            received_but_not_sent_packets = set()
-            sent_counter = 0
-            received_t1_to_vlan = 0
-            received_vlan_to_t1 = 0
-            missed_vlan_to_t1 = 0
-            missed_t1_to_vlan = 0
-            flooded_pkts = []
-            self.disruption_start, self.disruption_stop = None, None
-            for packet in packets:
-                if packet[scapyall.Ether].dst == self.dut_mac or packet[scapyall.Ether].dst == self.vlan_mac:
-                    # This is a sent packet - keep track of it as payload_id:timestamp.
-                    # for dualtor both MACs are needed:
-                    #   t1->server sent pkt will have dst MAC as dut_mac,
-                    #   and server->t1 sent pkt will have dst MAC as vlan_mac
-                    sent_payload = int(bytes(packet[scapyall.TCP].payload))
-                    if sent_payload in sent_packets:
-                        flooded_pkts.append(sent_payload)
-                    sent_packets[sent_payload] = float(packet.time)
-                    sent_counter += 1
-                    continue
-                if packet[scapyall.Ether].src == self.dut_mac or packet[scapyall.Ether].src == self.vlan_mac:
-                    # This is a received packet.
-                    # for dualtor both MACs are needed:
-                    #   t1->server rcvd pkt will have src MAC as vlan_mac,
-                    #   and server->t1 rcvd pkt will have src MAC as dut_mac
-                    received_time = float(packet.time)
-                    received_payload = int(bytes(packet[scapyall.TCP].payload))
-                    if (received_payload % 5) == 0:   # From vlan to T1.
-                        received_vlan_to_t1 += 1
-                    else:
-                        received_t1_to_vlan += 1
-                    received_counter += 1
-                if not (received_payload and received_time):
-                    # This is the first valid received packet.
-                    prev_payload = received_payload
-                    prev_time = received_time
-                    continue
-                if received_payload - prev_payload > 1:
-                    if received_payload not in sent_packets:
-                        self.log("Ignoring received packet with payload {}, as it was not sent".format(
-                            received_payload))
-                        received_but_not_sent_packets.add(received_payload)
-                        continue
-                    # Packets in a row are missing, a potential disruption.
-                    self.log(
-                        "received_payload: {} (at {}), prev_payload: {} (at {}), "
-                        "sent_counter: {}, received_counter: {}".format(
-                            received_payload, datetime.datetime.fromtimestamp(received_time),
-                            prev_payload, datetime.datetime.fromtimestamp(prev_time),
-                            sent_counter, received_counter
-                        )
-                    )
-                    # How many packets lost in a row.
-                    lost_id = (received_payload - 1) - prev_payload
-
-                    # Find previous sequential sent packet that was captured
-                    missing_sent_and_received_pkt_count = 0
-                    prev_pkt_pt = prev_payload + 1
-                    prev_sent_packet_time = None
-                    while prev_pkt_pt < received_payload:
-                        if prev_pkt_pt in sent_packets:
-                            prev_sent_packet_time = sent_packets[prev_pkt_pt]
-                            break  # Found it
-                        else:
-                            if prev_pkt_pt not in received_but_not_sent_packets:
-                                missing_sent_and_received_pkt_count += 1
-                            prev_pkt_pt += 1
-                    if missing_sent_and_received_pkt_count > 0:
-                        missing_sent_and_received_packet_id_sequences_fmtd = \
-                            str(prev_payload + 1) if missing_sent_and_received_pkt_count == 1\
-                            else "{}-{}".format(prev_payload + 1, received_payload - 1)
-                        missing_sent_and_received_packet_id_sequences.append(
-                            missing_sent_and_received_packet_id_sequences_fmtd)
-                    if prev_sent_packet_time is not None:
-                        # Disruption occurred - some sent packets were not received
-
-                        # How long disrupt lasted.
-                        this_sent_packet_time = sent_packets[received_payload]
-                        disrupt = this_sent_packet_time - prev_sent_packet_time
-
-                        # Add disrupt to the dict:
-                        self.lost_packets[prev_payload] = (
-                            lost_id, disrupt, received_time - disrupt, received_time)
-                        self.log("Disruption between packet ID %d and %d. For %.4f " % (
-                            prev_payload, received_payload, disrupt))
-                        for lost_index in range(prev_payload + 1, received_payload):
-                            # lost received for packet sent from vlan to T1.
-                            if lost_index in sent_packets:
-                                if (lost_index % 5) == 0:
-                                    missed_vlan_to_t1 += 1
-                                else:
-                                    missed_t1_to_vlan += 1
-                        self.log("")
-                        if not self.disruption_start:
-                            self.disruption_start = datetime.datetime.fromtimestamp(
-                               float(prev_time))
-                        self.disruption_stop = datetime.datetime.fromtimestamp(
-                            float(received_time))
-                prev_payload = received_payload
-                prev_time = received_time
-            self.log(
-                "**************** Packet received summary: ********************")
-            self.log("*********** Sent packets captured - {}".format(sent_counter))
-            self.log("*********** received packets captured - t1-to-vlan - {}".format(received_t1_to_vlan))
-            self.log("*********** received packets captured - vlan-to-t1 - {}".format(received_vlan_to_t1))
-            self.log("*********** Missed received packets - t1-to-vlan - {}".format(missed_t1_to_vlan))
-            self.log("*********** Missed received packets - vlan-to-t1 - {}".format(missed_vlan_to_t1))
-            self.log("*********** Flooded pkts - {}".format(flooded_pkts))
-            self.log("**************************************************************")
+        prev_payload = flow['prev_payload']
+        received_counter = flow['received_counter']
+        sent_counter = flow['sent_counter']
+        received_t1_to_vlan = flow['received_t1_to_vlan']
+        received_vlan_to_t1 = flow['received_vlan_to_t1']
+        missed_t1_to_vlan = flow['missed_t1_to_vlan']
+        missed_vlan_to_t1 = flow['missed_vlan_to_t1']
+        missing_sent_and_received_packet_id_sequences = flow['missing_sequences']
+        self.disruption_start, self.disruption_stop = [
+            datetime.datetime.fromtimestamp(timestamp) if timestamp is not None else None
+            for timestamp in (flow['disruption_start'], flow['disruption_stop'])]
+        self.log(
+            "**************** Packet received summary: ********************")
+        self.log("*********** Sent packets captured - {}".format(sent_counter))
+        self.log("*********** received packets captured - t1-to-vlan - {}".format(received_t1_to_vlan))
+        self.log("*********** received packets captured - vlan-to-t1 - {}".format(received_vlan_to_t1))
+        self.log("*********** Missed received packets - t1-to-vlan - {}".format(missed_t1_to_vlan))
+        self.log("*********** Missed received packets - vlan-to-t1 - {}".format(missed_vlan_to_t1))
+        self.log("*********** Flooded pkts - {}".format(flow['flooded_pkts']))
+        self.log("**************************************************************")
         self.fails['dut'].add("Sniffer failed to filter any traffic from DUT")
         self.assertTrue(received_counter,
                         "Sniffer failed to filter any traffic from DUT")
@@ -2358,11 +2245,53 @@ class ReloadTest(BaseTest):
             self.fails["dut"].add(message)
 
         self.log("Total incoming packets captured %d" % received_counter)
-        if packets:
-            filename = ('/tmp/capture_filtered.pcap' if self.logfile_suffix is None
-                        else "/tmp/capture_filtered_%s.pcap" % self.logfile_suffix)
-            scapyall.wrpcap(filename, packets)
-            self.log("Filtered pcap dumped to %s" % filename)
+
+    def examine_scapy_flow(self, filename, filtered_filename):
+        """
+        Examine the flow by loading the packets as scapy objects, for captures not supported by flow_analyzer.
+        Filtered packets are dumped to filtered_filename.
+        """
+        if filename:
+            all_packets = scapyall.rdpcap(filename)
+        elif getattr(self, 'packets', None):
+            all_packets = self.packets
+        else:
+            self.log("Filename and self.packets are not defined.")
+            self.fails['dut'].add("Filename and self.packets are not defined")
+            return None
+        # Filter out packets and remove floods:
+        # This set will contain all unique Payload ID, to filter out received floods.
+        self.unique_id = set()
+        filtered_packets = [pkt for pkt in all_packets if
+                            scapyall.TCP in pkt and
+                            scapyall.ICMP not in pkt and
+                            pkt[scapyall.TCP].sport == 1234 and
+                            pkt[scapyall.TCP].dport == 5000 and
+                            self.check_tcp_payload(pkt) and
+                            self.no_flood(pkt)
+                            ]
+
+        if self.vnet:
+            decap_packets = [scapyall.Ether(bytes(pkt.payload.payload.payload)[8:]) for pkt in all_packets if
+                             scapyall.UDP in pkt and
+                             pkt[scapyall.UDP].sport == 1234
+                             ]
+            filtered_decap_packets = [pkt for pkt in decap_packets if
+                                      scapyall.TCP in pkt and
+                                      scapyall.ICMP not in pkt and
+                                      pkt[scapyall.TCP].sport == 1234 and
+                                      pkt[scapyall.TCP].dport == 5000 and
+                                      self.check_tcp_payload(pkt) and
+                                      self.no_flood(pkt)
+                                      ]
+            filtered_packets = filtered_packets + filtered_decap_packets
+
+        flow = flow_analyzer.analyze_scapy_packets(filtered_packets, [self.dut_mac, self.vlan_mac], log=self.log)
+        if filtered_packets:
+            scapyall.wrpcap(filtered_filename, sorted(
+                filtered_packets, key=lambda packet: (int(bytes(packet[scapyall.TCP].payload)), float(packet.time))))
+            self.log("Filtered pcap dumped to %s" % filtered_filename)
+        return flow
 
     def check_forwarding_stop(self, signal):
         self.asic_start_recording_vlan_reachability()
@@ -0,0 +1,781 @@
+"""
+Analyzer of the data plane flow captured by the advanced-reboot test and by DualTorIO of the dual-ToR tests.
+
+The sender of the test puts a sequential ID into the TCP payload of every packet. The analyzer finds gaps in the
+IDs of the packets received from the DUT, which are treated as disruptions of the data plane forwarding.
+
+Captures of long reboots have millions of packets. Building a scapy object for each of them takes many minutes and
+gigabytes of memory, so read_flow_capture() parses the raw pcap/pcapng file instead: only the record boundaries are
+walked in Python, the header fields and the payload ID are extracted at fixed offsets for a chunk of records at once
+with NumPy, and only a few compact columns of the flow packets are kept.
+
+For advanced-reboot, analyze_flow() computes the same result as analyze_scapy_packets(), which examines a list of
+scapy packets one by one, with vectorized operations and a Python loop over the gaps only. For DualTorIO, the packets
+are grouped by server address and analyze_server_flows() examines the flow of each server, in a process pool for
+big captures.
+
+The module is loaded by tests/common/dualtor/dual_tor_io.py from this file, it must not import other PTF modules.
+"""
+import collections
+import datetime
+import ipaddress
+import mmap
+import multiprocessing
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+TCP_SPORT = 1234
+TCP_DPORT = 5000
+
+# Number of records parsed at once, bounds the memory used by temporary arrays
+CHUNK_SIZE = 32768
+# Payloads longer than this or not made of digits only are parsed by int() one by one
+MAX_PAYLOAD_LEN = 128
+# Number of trailing payload digits converted by the vectorized parser, leading digits must be '0'
+MAX_ID_DIGITS = 18
+
+LINKTYPE_ETHERNET = 1
+ETH_P_8021Q = 0x8100
+ETH_P_IP = 0x0800
+ETH_P_IPV6 = 0x86dd
+IPPROTO_TCP = 6
+
+# Flags of the flow packets
+SENT = 1        # Sent to the DUT
+RECEIVED = 2    # Received from the DUT
+
+# Flows of the servers are examined in a process pool if the capture has more flow packets than this
+PARALLEL_THRESHOLD = 1000000
+
+PCAP_MAGIC_USEC = 0xa1b2c3d4
+PCAP_MAGIC_NSEC = 0xa1b23c4d
+PCAPNG_SHB = 0x0a0d0d0a
+PCAPNG_BYTE_ORDER_MAGIC = 0x1a2b3c4d
+PCAPNG_IDB = 1
+PCAPNG_SPB = 3
+PCAPNG_EPB = 6
+PCAPNG_OPT_TSRESOL = 9
+PCAPNG_OPT_TSOFFSET = 14
+
+
+class UnsupportedCapture(Exception):
+    """The capture can't be parsed by read_flow_capture(), it should be examined by scapy."""
+    pass
+
+
+FlowCapture = collections.namedtuple('FlowCapture', [
+    'filename',     # Captured file
+    'total',        # Number of all records in the file
+    'payload_id',   # Payload IDs of the flow packets, in the order of capture
+    'time',         # Timestamps as float seconds
+    'flags',        # SENT and RECEIVED flags
+    'src_ip',       # IPv4 addresses as integers, 0 for IPv6 packets
+    'dst_ip',
+    'data_offset',  # Offset of the packet data in the file
+    'caplen',       # Captured and original length of the packets
+    'wirelen',
+])
+
+FLOW_CAPTURE_DTYPES = {
+    'payload_id': 'int64', 'time': 'float64', 'flags': 'uint8', 'src_ip': 'uint32', 'dst_ip': 'uint32',
+    'data_offset': 'int64', 'caplen': 'uint32', 'wirelen': 'uint32',
+}
+
+
+def mac_to_int(mac):
+    return int(mac.replace(':', '').replace('-', ''), 16)
+
+
+def _gather(data, index):
+    return data[np.minimum(index, len(data) - 1)].astype(np.int64)
+
+
+def _be16(data, index):
+    return (_gather(data, index) << 8) | _gather(data, index + 1)
+
+
+def _parse_payload_ids(data, start, length, filler=None):
+    """
+    @summary: Convert the decimal payloads to integers like int() does for the common case: ASCII digits, optionally
+              mixed with filler chars which are removed before the conversion, with at most MAX_ID_DIGITS
+              significant digits.
+    @param data: Content of the capture file.
+    @param start: Offsets of the payloads in the file.
+    @param length: Lengths of the payloads, all of them must be in range 1..MAX_PAYLOAD_LEN.
+    @param filler: Filler char of the payloads.
+    @return: Tuple of the payload IDs and the mask of payloads which were converted.
+    """
+    cols = np.arange(int(length.max()))
+    inside = cols < length[:, None]
+    raw = data[np.minimum(start[:, None] + cols, len(data) - 1)]
+    digits = raw - np.uint8(ord('0'))
+    is_digit = (digits < 10) & inside
+    skipped = ~inside
+    if filler is not None:
+        skipped |= raw == ord(filler)
+    ok = np.all(is_digit | skipped, axis=1) & np.any(is_digit, axis=1)
+
+    # Decimal exponent of each digit is the number of digits following it
+    exponent = np.cumsum(is_digit[:, ::-1], axis=1)[:, ::-1] - is_digit
+    # Only leading zeros may be beyond MAX_ID_DIGITS, otherwise the value may not fit into 64 bits
+    significant = exponent < MAX_ID_DIGITS
+    ok &= ~np.any(is_digit & ~significant & (digits != 0), axis=1)
+    weights = (10 ** np.arange(MAX_ID_DIGITS, dtype=np.int64))[np.minimum(exponent, MAX_ID_DIGITS - 1)]
+    values = (np.where(is_digit & significant, digits, 0) * weights).sum(axis=1)
+    return values, ok
+
+
+def _extract_flow_packets(data, start, caplen, sport, dport, filler):
+    """
+    @summary: Find the packets of the flow in a chunk of records and extract their header fields.
+    @param data: Content of the capture file.
+    @param start: Offsets of the packet data in the file.
+    @param caplen: Captured lengths of the packets.
+    @param sport: TCP source port of the flow.
+    @param dport: TCP destination port of the flow.
+    @param filler: Filler char of the payloads.
+    @return: Tuple of the mask of the flow packets, their payload IDs, source and destination MACs and source and
+             destination IPv4 addresses.
+    """
+    size = len(data)
+    mac = data[np.minimum(start[:, None] + np.arange(12), size - 1)].astype(np.uint64)
+    shifts = np.arange(40, -8, -8, dtype=np.uint64)
+    dst_mac = (mac[:, :6] << shifts).sum(axis=1, dtype=np.uint64)
+    src_mac = (mac[:, 6:] << shifts).sum(axis=1, dtype=np.uint64)
+
+    ethertype = _be16(data, start + 12)
+    vlan = ethertype == ETH_P_8021Q
+    l3 = np.where(vlan, 18, 14)
+    ethertype = np.where(vlan, _be16(data, start + 16), ethertype)
+
+    ver_ihl = _gather(data, start + l3)
+    ihl = (ver_ihl & 0xf) * 4
+    ipv4 = (ethertype == ETH_P_IP) & ((ver_ihl >> 4) == 4) & (ihl >= 20)
+    # Non-first fragments don't have TCP header
+    ipv4 &= (_be16(data, start + l3 + 6) & 0x1fff) == 0
+    ipv6 = (ethertype == ETH_P_IPV6) & ((ver_ihl >> 4) == 6)
+    proto = np.where(ipv4, _gather(data, start + l3 + 9), _gather(data, start + l3 + 6))
+    l4 = np.where(ipv4, l3 + ihl, l3 + 40)
+    ip_end = np.where(ipv4, l3 + _be16(data, start + l3 + 2), l3 + 40 + _be16(data, start + l3 + 4))
+
+    flow = (ipv4 | ipv6) & (proto == IPPROTO_TCP) & (l4 + 20 <= caplen)
+    flow &= (_be16(data, start + l4) == sport) & (_be16(data, start + l4 + 2) == dport)
+    payload_start = l4 + (_gather(data, start + l4 + 12) >> 4) * 4
+    payload_len = np.minimum(ip_end, caplen) - payload_start
+    # int() of an empty payload fails
+    flow &= payload_len > 0
+
+    payload_id = np.zeros(len(start), dtype=np.int64)
+    candidates = np.flatnonzero(flow)
+    fast = candidates[payload_len[candidates] <= MAX_PAYLOAD_LEN]
+    parsed = np.zeros(len(start), dtype=bool)
+    if len(fast):
+        payload_id[fast], parsed[fast] = _parse_payload_ids(data, start[fast] + payload_start[fast],
+                                                            payload_len[fast], filler)
+
+    for index in candidates[~parsed[candidates]]:
+        offset = int(start[index] + payload_start[index])
+        payload = bytes(data[offset:offset + int(payload_len[index])])
+        if filler is not None:
+            payload = payload.replace(filler.encode(), b'')
+        try:
+            value = int(payload)
+        except ValueError:
+            flow[index] = False
+            continue
+        if not -2 ** 63 <= value < 2 ** 63:
+            raise UnsupportedCapture("Payload ID {} doesn't fit into 64 bits".format(value))
+        payload_id[index] = value
+
+    src_ip = np.where(ipv4, (_be16(data, start + l3 + 12) << 16) | _be16(data, start + l3 + 14), 0)
+    dst_ip = np.where(ipv4, (_be16(data, start + l3 + 16) << 16) | _be16(data, start + l3 + 18), 0)
+    return flow, payload_id, src_mac, dst_mac, src_ip, dst_ip
+
+
+def _walk_pcap(buf, size, endian):
+    """
+    @summary: Walk the records of a pcap file.
+    @return: Generator of chunks, each is a list of the record header offsets.
+    """
+    caplen_at = struct.Struct(endian + 'I').unpack_from
+    offsets = []
+    offset = 24
+    while offset + 16 <= size:
+        caplen = caplen_at(buf, offset + 8)[0]
+        if offset + 16 + caplen > size:
+            break
+        offsets.append(offset)
+        if len(offsets) == CHUNK_SIZE:
+            yield offsets
+            offsets = []
+        offset += 16 + caplen
+    if offsets:
+        yield offsets
+
+
+def _parse_idb(buf, offset, length, endian):
+    linktype, = struct.unpack_from(endian + 'H', buf, offset + 8)
+    resolution, tsoffset = 10 ** 6, 0
+    option = offset + 16
+    while option + 4 <= offset + length - 4:
+        code, option_len = struct.unpack_from(endian + 'HH', buf, option)
+        if code == 0:
+            break
+        if code == PCAPNG_OPT_TSRESOL:
+            value = buf[option + 4]
+            resolution = (2 if value & 0x80 else 10) ** (value & 0x7f)
+        elif code == PCAPNG_OPT_TSOFFSET:
+            tsoffset, = struct.unpack_from(endian + 'q', buf, option + 4)
+        option += 4 + (option_len + 3) // 4 * 4
+    return linktype, resolution, tsoffset
+
+
+def _walk_pcapng(buf, size):
+    """
+    @summary: Walk the enhanced packet blocks of a pcapng file.
+    @return: Generator of chunks, each is a tuple of the block offsets, timestamp resolutions and timestamp offsets
+             of the packets. Chunks are split by sections, each section has its own byte order and interfaces.
+    """
+    offsets, interfaces = [], []
+    endian = '<'
+    offset = 0
+    while offset + 12 <= size:
+        block_type, = struct.unpack_from(endian + 'I', buf, offset)
+        if block_type == PCAPNG_SHB:
+            if offsets:
+                yield endian, offsets, interfaces
+                offsets = []
+            magic, = struct.unpack_from('<I', buf, offset + 8)
+            endian = '<' if magic == PCAPNG_BYTE_ORDER_MAGIC else '>'
+            interfaces = []
+        block_len, = struct.unpack_from(endian + 'I', buf, offset + 4)
+        if block_len < 12 or offset + block_len > size:
+            break
+        if block_type == PCAPNG_EPB:
+            offsets.append(offset)
+            if len(offsets) == CHUNK_SIZE:
+                yield endian, offsets, interfaces
+                offsets = []
+        elif block_type == PCAPNG_IDB:
+            interfaces = interfaces + [_parse_idb(buf, offset, block_len, endian)]
+        elif block_type == PCAPNG_SPB:
+            raise UnsupportedCapture("Simple packet blocks without timestamp are not supported")
+        offset += block_len
+    if offsets:
+        yield endian, offsets, interfaces
+
+
+def _read_records(buf, size):
+    """
+    @summary: Read the record headers of a pcap or pcapng file.
+    @return: Generator of chunks. Each chunk is a tuple of data offsets, captured lengths, original lengths,
+             timestamp seconds and nanoseconds of the records.
+    """
+    data = np.frombuffer(buf, dtype=np.uint8, count=size)
+    magic = bytes(data[:4])
+    if magic == struct.pack('<I', PCAPNG_SHB):
+        for endian, offsets, interfaces in _walk_pcapng(buf, size):
+            offsets = np.array(offsets, dtype=np.int64)
+            fields = data[offsets[:, None] + np.arange(8, 28)].view(endian + 'u4').astype(np.int64)
+            iface, ticks_high, ticks_low, caplen, wirelen = fields.T
+            if len(interfaces) == 0 or iface.max() >= len(interfaces):
+                raise UnsupportedCapture("Packet block refers to an unknown interface")
+            linktype, resolution, tsoffset = [np.array(field, dtype=np.int64)[iface] for field in zip(*interfaces)]
+            if np.any(linktype != LINKTYPE_ETHERNET):
+                raise UnsupportedCapture("Only Ethernet link type is supported")
+            ticks = (ticks_high << 32) | ticks_low
+            yield offsets + 28, caplen, wirelen, ticks // resolution + tsoffset, ticks % resolution, resolution
+        return
+
+    for endian in ('<', '>'):
+        magic, = struct.unpack_from(endian + 'I', buf, 0)
+        if magic in (PCAP_MAGIC_USEC, PCAP_MAGIC_NSEC):
+            break
+    else:
+        raise UnsupportedCapture("Unknown capture file format")
+    linktype, = struct.unpack_from(endian + 'I', buf, 20)
+    if linktype & 0xffff != LINKTYPE_ETHERNET:
+        raise UnsupportedCapture("Only Ethernet link type is supported")
+    resolution = 10 ** 6 if magic == PCAP_MAGIC_USEC else 10 ** 9
+    for offsets in _walk_pcap(buf, size, endian):
+        offsets = np.array(offsets, dtype=np.int64)
+        fields = data[offsets[:, None] + np.arange(16)].view(endian + 'u4').astype(np.int64)
+        sec, frac, caplen, wirelen = fields.T
+        yield offsets + 16, caplen, wirelen, sec, frac, np.full(len(offsets), resolution, dtype=np.int64)
+
+
+def read_flow_capture(filename, sent_macs, received_macs, sport=TCP_SPORT, dport=TCP_DPORT, payload_filler=None):
+    """
+    @summary: Read the packets of the test flow (TCP packets with decimal payload) from a capture file.
+    @param filename: Path of a pcap or pcapng file with Ethernet link type.
+    @param sent_macs: MAC addresses of the DUT, packets sent to them are flagged as SENT.
+    @param received_macs: MAC addresses of the DUT, packets sent from them are flagged as RECEIVED.
+    @param sport: TCP source port of the flow.
+    @param dport: TCP destination port of the flow.
+    @param payload_filler: Char padding the payload IDs, it is removed before converting the payload to integer.
+    @return: FlowCapture. Its arrays hold the flow packets which are sent or received, in the order of capture.
+    @raise UnsupportedCapture: If the file can't be parsed without scapy.
+    """
+    sent_macs = np.array([mac_to_int(mac) for mac in sent_macs], dtype=np.uint64)
+    received_macs = np.array([mac_to_int(mac) for mac in received_macs], dtype=np.uint64)
+    with open(filename, 'rb') as f:
+        size = f.seek(0, 2)
+        if size < 24:
+            raise UnsupportedCapture("Capture file is too short")
+        # The mapping is released together with the last array viewing it
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    data = np.frombuffer(buf, dtype=np.uint8)
+    total = 0
+    columns = collections.defaultdict(list)
+    for start, caplen, wirelen, sec, frac, resolution in _read_records(buf, size):
+        total += len(start)
+        flow, payload_id, src_mac, dst_mac, src_ip, dst_ip = _extract_flow_packets(
+            data, start, caplen, sport, dport, payload_filler)
+        flags = np.where(np.isin(dst_mac, sent_macs), SENT, 0) | np.where(np.isin(src_mac, received_macs), RECEIVED, 0)
+        kept = flow & (flags != 0)
+        for name, values in (('payload_id', payload_id), ('time', sec + frac / resolution), ('flags', flags),
+                             ('src_ip', src_ip), ('dst_ip', dst_ip), ('data_offset', start), ('caplen', caplen),
+                             ('wirelen', wirelen)):
+            columns[name].append(values[kept].astype(FLOW_CAPTURE_DTYPES[name]))
+
+    return FlowCapture(filename, total, **{
+        name: np.concatenate(columns[name]) if columns[name] else np.zeros(0, dtype=FLOW_CAPTURE_DTYPES[name])
+        for name in FLOW_CAPTURE_DTYPES})
+
+
+def write_pcap(capture, filename, indexes):
+    """
+    @summary: Copy packets of the capture to a pcap file with microsecond timestamps, like scapy wrpcap() does.
+    @param capture: FlowCapture returned by read_flow_capture().
+    @param filename: Path of the pcap file to write.
+    @param indexes: Indexes of the flow packets to write, in the order of writing.
+    """
+    header = struct.Struct('<IIII')
+    with open(capture.filename, 'rb') as src, open(filename, 'wb') as dst:
+        buf = mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            dst.write(struct.pack('<IHHiIII', PCAP_MAGIC_USEC, 2, 4, 0, 0, 262144, LINKTYPE_ETHERNET))
+            for chunk_start in range(0, len(indexes), CHUNK_SIZE):
+                chunk = indexes[chunk_start:chunk_start + CHUNK_SIZE]
+                usec = np.round(capture.time[chunk] * 10 ** 6).astype(np.int64)
+                records = []
+                for offset, caplen, wirelen, sec, usec in zip(capture.data_offset[chunk].tolist(),
+                                                              capture.caplen[chunk].tolist(),
+                                                              capture.wirelen[chunk].tolist(),
+                                                              (usec // 10 ** 6).tolist(),
+                                                              (usec % 10 ** 6).tolist()):
+                    records.append(header.pack(sec, usec, caplen, wirelen))
+                    records.append(buf[offset:offset + caplen])
+                dst.write(b''.join(records))
+        finally:
+            buf.close()
+
+
+def _new_flow_result():
+    return {
+        'packet_count': 0,          # Number of flow packets examined, after removing floods
+        'sent_counter': 0,          # Packets sent to DUT
+        'received_counter': 0,      # Packets received from DUT
+        'received_t1_to_vlan': 0,
+        'received_vlan_to_t1': 0,
+        'missed_t1_to_vlan': 0,     # Sent packets lost in disruptions
+        'missed_vlan_to_t1': 0,
+        'flooded_pkts': [],         # IDs of the packets sent more than once
+        'lost_packets': {},         # disrupt_start_id: (lost_count, disrupt_time, disrupt_start, disrupt_stop)
+        'disruption_start': None,   # Timestamp of the last received packet before the first disruption
+        'disruption_stop': None,    # Timestamp of the first received packet after the last disruption
+        'missing_sequences': [],    # IDs of packets neither sent nor received
+        'prev_payload': None,       # ID of the last received packet
+    }
+
+
+def _log_disruption(log, received_payload, received_time, prev_payload, prev_time, sent_counter, received_counter):
+    log("received_payload: {} (at {}), prev_payload: {} (at {}), sent_counter: {}, received_counter: {}".format(
+        received_payload, datetime.datetime.fromtimestamp(received_time),
+        prev_payload, datetime.datetime.fromtimestamp(prev_time),
+        sent_counter, received_counter))
+
+
+def analyze_scapy_packets(packets, macs, log=None, payload_id=None):
+    """
+    @summary: Find disruptions in the flow by examining scapy packets one by one.
+    @param packets: Flow packets with unique received payload IDs (floods removed).
+    @param macs: MAC addresses of the DUT. Packets sent to them are sent packets, packets sent from them are
+                 received packets.
+    @param log: Function for logging messages.
+    @param payload_id: Function returning payload ID of a packet.
+    @return: Dictionary of the results, see _new_flow_result().
+    """
+    import scapy.all as scapyall
+
+    log = log or (lambda message: None)
+    if payload_id is None:
+        def payload_id(packet):
+            return int(bytes(packet[scapyall.TCP].payload))
+
+    macs = [mac.lower() for mac in macs]
+    result = _new_flow_result()
+    lost_packets = result['lost_packets']
+    missing_sequences = result['missing_sequences']
+    # Re-arrange packets, if delayed, by Payload ID and Timestamp:
+    packets = sorted(packets, key=lambda packet: (payload_id(packet), float(packet.time)))
+    result['packet_count'] = len(packets)
+    sent_packets = dict()
+    if not packets:
+        return result
+
+    prev_payload, prev_time = -1, 0
+    received_counter = 0
+    sent_counter = 0
+    received_but_not_sent_packets = set()
+    for packet in packets:
+        if packet[scapyall.Ether].dst.lower() in macs:
+            # This is a sent packet - keep track of it as payload_id:timestamp.
+            # for dualtor both MACs are needed:
+            #   t1->server sent pkt will have dst MAC as dut_mac,
+            #   and server->t1 sent pkt will have dst MAC as vlan_mac
+            sent_payload = payload_id(packet)
+            if sent_payload in sent_packets:
+                result['flooded_pkts'].append(sent_payload)
+            sent_packets[sent_payload] = float(packet.time)
+            sent_counter += 1
+            continue
+        if packet[scapyall.Ether].src.lower() in macs:
+            # This is a received packet.
+            # for dualtor both MACs are needed:
+            #   t1->server rcvd pkt will have src MAC as vlan_mac,
+            #   and server->t1 rcvd pkt will have src MAC as dut_mac
+            received_time = float(packet.time)
+            received_payload = payload_id(packet)
+            if (received_payload % 5) == 0:   # From vlan to T1.
+                result['received_vlan_to_t1'] += 1
+            else:
+                result['received_t1_to_vlan'] += 1
+            received_counter += 1
+        if not (received_payload and received_time):
+            # This is the first valid received packet.
+            prev_payload = received_payload
+            prev_time = received_time
+            continue
+        if received_payload - prev_payload > 1:
+            if received_payload not in sent_packets:
+                log("Ignoring received packet with payload {}, as it was not sent".format(received_payload))
+                received_but_not_sent_packets.add(received_payload)
+                continue
+            # Packets in a row are missing, a potential disruption.
+            _log_disruption(log, received_payload, received_time, prev_payload, prev_time, sent_counter,
+                            received_counter)
+            # How many packets lost in a row.
+            lost_id = (received_payload - 1) - prev_payload
+
+            # Find previous sequential sent packet that was captured
+            missing_sent_and_received_pkt_count = 0
+            prev_pkt_pt = prev_payload + 1
+            prev_sent_packet_time = None
+            while prev_pkt_pt < received_payload:
+                if prev_pkt_pt in sent_packets:
+                    prev_sent_packet_time = sent_packets[prev_pkt_pt]
+                    break  # Found it
+                else:
+                    if prev_pkt_pt not in received_but_not_sent_packets:
+                        missing_sent_and_received_pkt_count += 1
+                    prev_pkt_pt += 1
+            if missing_sent_and_received_pkt_count > 0:
+                missing_sequences.append(
+                    str(prev_payload + 1) if missing_sent_and_received_pkt_count == 1
+                    else "{}-{}".format(prev_payload + 1, received_payload - 1))
+            if prev_sent_packet_time is not None:
+                # Disruption occurred - some sent packets were not received
+
+                # How long disrupt lasted.
+                this_sent_packet_time = sent_packets[received_payload]
+                disrupt = this_sent_packet_time - prev_sent_packet_time
+
+                # Add disrupt to the dict:
+                lost_packets[prev_payload] = (lost_id, disrupt, received_time - disrupt, received_time)
+                log("Disruption between packet ID %d and %d. For %.4f " % (prev_payload, received_payload, disrupt))
+                for lost_index in range(prev_payload + 1, received_payload):
+                    # lost received for packet sent from vlan to T1.
+                    if lost_index in sent_packets:
+                        if (lost_index % 5) == 0:
+                            result['missed_vlan_to_t1'] += 1
+                        else:
+                            result['missed_t1_to_vlan'] += 1
+                log("")
+                if result['disruption_start'] is None:
+                    result['disruption_start'] = float(prev_time)
+                result['disruption_stop'] = float(received_time)
+        prev_payload = received_payload
+        prev_time = received_time
+
+    result.update(sent_counter=sent_counter, received_counter=received_counter, prev_payload=prev_payload)
+    return result
+
+
+def remove_floods(payload_id, flags):
+    """
+    @summary: Find the packets which are not received floods.
+    @param payload_id: Payload IDs of the packets in the order of capture.
+    @param flags: SENT and RECEIVED flags of the packets.
+    @return: Mask of the packets sent to the DUT and the first received packet of each payload ID.
+    """
+    first = np.zeros(len(payload_id), dtype=bool)
+    received_indexes = np.flatnonzero(flags & RECEIVED)
+    _, first_indexes = np.unique(payload_id[received_indexes], return_index=True)
+    first[received_indexes[first_indexes]] = True
+    return first | ((flags & SENT) != 0)
+
+
+def analyze_flow(payload_id, time, flags, log=None):
+    """
+    @summary: Find disruptions in the flow. The result is the same as analyze_scapy_packets() gives for the
+              same packets.
+    @param payload_id: Payload IDs of the flow packets, floods removed by remove_floods().
+    @param time: Timestamps of the packets.
+    @param flags: SENT and RECEIVED flags of the packets.
+    @param log: Function for logging messages.
+    @return: Tuple of dictionary of the results, see _new_flow_result(), and the indexes of the packets sorted
+             by payload ID and timestamp.
+    """
+    log = log or (lambda message: None)
+    result = _new_flow_result()
+    # Stable sort, packets with the same ID and timestamp stay in the order of capture
+    order = np.lexsort((time, payload_id))
+    result['packet_count'] = len(order)
+    if not len(order):
+        return result, order
+
+    ids = payload_id[order]
+    times = time[order]
+    is_sent = (flags[order] & SENT) != 0
+    sent_pos = np.flatnonzero(is_sent)
+    sent_ids = ids[sent_pos]
+    sent_times = times[sent_pos]
+    uniq_sent_ids = np.unique(sent_ids)
+    # Number of sent IDs divisible by 5 (from vlan to T1) before each unique sent ID
+    vlan_to_t1_before = np.concatenate(([0], np.cumsum(uniq_sent_ids % 5 == 0)))
+    result['sent_counter'] = len(sent_pos)
+    result['flooded_pkts'] = sent_ids[1:][np.diff(sent_ids) == 0].tolist()
+
+    # Packets which are not sent are received, as floods are removed
+    recv_pos = np.flatnonzero(~is_sent)
+    recv_ids = ids[recv_pos]
+    recv_times = times[recv_pos]
+    result['received_counter'] = len(recv_pos)
+    result['received_vlan_to_t1'] = int(np.count_nonzero(recv_ids % 5 == 0))
+    result['received_t1_to_vlan'] = len(recv_pos) - result['received_vlan_to_t1']
+    if not len(recv_pos):
+        result['prev_payload'] = -1
+        return result, order
+
+    # Received packets continuing the sequence need no processing. The rest are handled one by one below, a packet
+    # following an ignored packet is handled too as its previous payload is not the one right before it.
+    prev_ids = np.concatenate(([-1], recv_ids[:-1]))
+    candidates = np.flatnonzero((recv_ids - prev_ids > 1) | (recv_ids == 0) | (recv_times == 0)).tolist()
+    candidates.reverse()
+
+    lost_packets = result['lost_packets']
+    prev_payload, prev_time = -1, 0
+    received_but_not_sent_packets = set()
+    last_handled = -1
+    forced = None
+    while candidates or forced is not None:
+        if forced is not None and (not candidates or forced <= candidates[-1]):
+            index = forced
+            if candidates and candidates[-1] == forced:
+                candidates.pop()
+        else:
+            index = candidates.pop()
+        forced = None
+        if index > last_handled + 1:
+            prev_payload, prev_time = int(recv_ids[index - 1]), float(recv_times[index - 1])
+        last_handled = index
+
+        received_payload, received_time = int(recv_ids[index]), float(recv_times[index])
+        if not (received_payload and received_time):
+            prev_payload, prev_time = received_payload, received_time
+            continue
+        if received_payload - prev_payload <= 1:
+            prev_payload, prev_time = received_payload, received_time
+            continue
+
+        # Sent packets with the same ID are only known if they are before the received packet in sorted order
+        pos = recv_pos[index]
+        last_sent = int(np.searchsorted(sent_pos, pos)) - 1
+        if last_sent < 0 or sent_ids[last_sent] != received_payload:
+            log("Ignoring received packet with payload {}, as it was not sent".format(received_payload))
+            received_but_not_sent_packets.add(received_payload)
+            if index + 1 < len(recv_ids):
+                forced = index + 1
+            continue
+
+        _log_disruption(log, received_payload, received_time, prev_payload, prev_time, int(pos - index),
+                        index + 1)
+        lost_id = (received_payload - 1) - prev_payload
+
+        # Find previous sequential sent packet that was captured
+        first_sent = int(np.searchsorted(sent_ids, prev_payload + 1))
+        found = first_sent < len(sent_ids) and sent_ids[first_sent] < received_payload
+        missing_end = int(sent_ids[first_sent]) if found else received_payload
+        missing_count = (missing_end - prev_payload - 1) - sum(
+            1 for packet_id in received_but_not_sent_packets if prev_payload < packet_id < missing_end)
+        if missing_count > 0:
+            result['missing_sequences'].append(
+                str(prev_payload + 1) if missing_count == 1
+                else "{}-{}".format(prev_payload + 1, received_payload - 1))
+        if found:
+            prev_sent_packet_time = float(sent_times[np.searchsorted(sent_ids, missing_end, side='right') - 1])
+            disrupt = float(sent_times[last_sent]) - prev_sent_packet_time
+            lost_packets[prev_payload] = (lost_id, disrupt, received_time - disrupt, received_time)
+            log("Disruption between packet ID %d and %d. For %.4f " % (prev_payload, received_payload, disrupt))
+            lost_start = np.searchsorted(uniq_sent_ids, prev_payload + 1)
+            lost_stop = np.searchsorted(uniq_sent_ids, received_payload)
+            missed_vlan_to_t1 = int(vlan_to_t1_before[lost_stop] - vlan_to_t1_before[lost_start])
+            result['missed_vlan_to_t1'] += missed_vlan_to_t1
+            result['missed_t1_to_vlan'] += int(lost_stop - lost_start) - missed_vlan_to_t1
+            log("")
+            if result['disruption_start'] is None:
+                result['disruption_start'] = float(prev_time)
+            result['disruption_stop'] = received_time
+        prev_payload, prev_time = received_payload, received_time
+
+    if last_handled < len(recv_ids) - 1:
+        prev_payload = int(recv_ids[-1])
+    result['prev_payload'] = prev_payload
+    return result, order
+
+
+def analyze_flow_capture(filename, macs, log=None, filtered_filename=None):
+    """
+    @summary: Read the flow packets from a capture file and find disruptions in the flow.
+    @param filename: Path of the pcap or pcapng file.
+    @param macs: MAC addresses of the DUT, as strings.
+    @param log: Function for logging messages.
+    @param filtered_filename: If specified, the examined packets are written to this pcap file, sorted by payload
+                              ID and timestamp.
+    @return: Dictionary of the results, see _new_flow_result().
+    @raise UnsupportedCapture: If the file can't be parsed without scapy.
+    """
+    capture = read_flow_capture(filename, macs, macs)
+    if log:
+        log("Number of all packets captured: {}, flow packets: {}".format(capture.total, len(capture.payload_id)))
+    kept = np.flatnonzero(remove_floods(capture.payload_id, capture.flags))
+    result, order = analyze_flow(capture.payload_id[kept], capture.time[kept], capture.flags[kept], log=log)
+    if filtered_filename and len(order):
+        write_pcap(capture, filtered_filename, kept[order])
+        if log:
+            log("Filtered pcap dumped to {}".format(filtered_filename))
+    return result
+
+
+def examine_server_flow(payload_id, time, flags, sent_count=None):
+    """
+    @summary: Find disruptions and duplications in the flow of a server.
+    @param payload_id: Payload IDs of the packets of the server, sorted by payload ID and timestamp.
+    @param time: Timestamps of the packets.
+    @param flags: SENT and RECEIVED flags of the packets.
+    @param sent_count: Number of packets sent to the server by the test.
+    @return: Dictionary of the results. 'disruptions' and 'duplications' are lists of ranges of received packets,
+             'disruption_before_traffic' and 'disruption_after_traffic' are IDs of the first and the last received
+             packets if some packets at the beginning or the end of the flow were lost, or False.
+    """
+    is_sent = (flags & SENT) != 0
+    received_ids = payload_id[~is_sent]
+    received_times = time[~is_sent]
+    gaps = np.diff(received_ids)
+
+    disruptions = [{
+        'start_time': float(received_times[index - 1]),
+        'end_time': float(received_times[index]),
+        'start_id': int(received_ids[index - 1]),
+        'end_id': int(received_ids[index])
+    } for index in (np.flatnonzero(gaps > 1) + 1).tolist()]
+
+    # Consecutive packets with the same payload are grouped as one duplication
+    duplicate_indexes = np.flatnonzero(gaps == 0) + 1
+    duplications = []
+    for group in np.split(duplicate_indexes, np.flatnonzero(np.diff(received_ids[duplicate_indexes])) + 1):
+        if len(group):
+            duplications.append({
+                'start_time': float(received_times[group[0]]),
+                'end_time': float(received_times[group[-1]]),
+                'start_id': int(received_ids[group[0]]),
+                'end_id': int(received_ids[group[-1]]),
+                'duplication_count': len(group)
+            })
+
+    disruption_before_traffic = False
+    disruption_after_traffic = False
+    if len(received_ids):
+        # Some disruption started before traffic started, or continued after the traffic finished
+        if received_ids[0] != 0:
+            disruption_before_traffic = int(received_ids[0])
+        if sent_count is not None and received_ids[-1] != sent_count - 1:
+            disruption_after_traffic = int(received_ids[-1])
+
+    return {
+        'sent_packets': int(np.count_nonzero(is_sent)),
+        'received_packets': len(received_ids),
+        'disruption_before_traffic': disruption_before_traffic,
+        'disruption_after_traffic': disruption_after_traffic,
+        'duplications': duplications,
+        'disruptions': disruptions
+    }
+
+
+def _examine_server_flow_task(args):
+    return examine_server_flow(*args)
+
+
+def group_by_server(capture, address_field):
+    """
+    @summary: Group the flow packets by server address.
+    @param capture: FlowCapture returned by read_flow_capture().
+    @param address_field: 'src_ip' or 'dst_ip', the field holding the server address.
+    @return: Dictionary, key is the server IPv4 address, value is the indexes of its packets sorted by payload ID
+             and timestamp. Packets without IPv4 address are skipped.
+    """
+    addresses = getattr(capture, address_field)
+    order = np.lexsort((capture.time, capture.payload_id, addresses))
+    order = order[addresses[order] != 0]
+    groups = {}
+    for indexes in np.split(order, np.flatnonzero(np.diff(addresses[order])) + 1):
+        if len(indexes):
+            groups[str(ipaddress.IPv4Address(int(addresses[indexes[0]])))] = indexes
+    return groups
+
+
+def analyze_server_flows(capture, address_field, sent_counts=None, processes=None):
+    """
+    @summary: Find disruptions and duplications in the flow of each server.
+    @param capture: FlowCapture returned by read_flow_capture().
+    @param address_field: 'src_ip' or 'dst_ip', the field holding the server address.
+    @param sent_counts: Dictionary of the number of packets sent to each server.
+    @param processes: Max number of processes examining the flows. By default, the flows are examined in a process
+                      pool of CPU count processes if the capture has more than PARALLEL_THRESHOLD flow packets.
+                      The pool needs the module to be registered in sys.modules under its name.
+    @return: Tuple of dictionary of results of each server, see examine_server_flow(), and the packet groups
+             returned by group_by_server().
+    """
+    sent_counts = sent_counts or {}
+    groups = group_by_server(capture, address_field)
+    tasks = [(capture.payload_id[indexes], capture.time[indexes], capture.flags[indexes], sent_counts.get(server))
+             for server, indexes in groups.items()]
+    if processes is None:
+        processes = os.cpu_count() if len(capture.payload_id) > PARALLEL_THRESHOLD else 1
+    processes = min(processes, len(tasks))
+
+    if processes > 1 and 'fork' in multiprocessing.get_all_start_methods():
+        # Forked workers inherit the module even if it was loaded by path, it only needs to be in sys.modules
+        with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('fork')) as executor:
+            results = list(executor.map(_examine_server_flow_task, tasks))
+    else:
+        results = [examine_server_flow(*task) for task in tasks]
+    return dict(zip(groups, results)), groups
@@ -25,6 +25,7 @@ Usage:          Examples of how to use log analyzer
 
 import sys
 import getopt
+import itertools
 import re
 import os
 import os.path
@@ -388,11 +389,13 @@ class AnsibleLogAnalyzer:
 
         ret_code = False
 
-        if ((match_messages_regex is not None) and (match_messages_regex.findall(str))):
+        # search() stops at the first hit while findall() scans the whole line,
+        # both are equivalent for the purpose of a boolean check.
+        if ((match_messages_regex is not None) and (match_messages_regex.search(str))):
             if (ignore_messages_regex is None):
                 ret_code = True
 
-            elif (not ignore_messages_regex.findall(str)):
+            elif (not ignore_messages_regex.search(str)):
                 self.print_diagnostic_message('matching line: %s' % str)
                 ret_code = True
 
@@ -413,125 +416,190 @@ class AnsibleLogAnalyzer:
             if (expect_messages_regex is not None) and (expect_messages_regex.match(str)):
                 ret_code = True
         else:
-            if (expect_messages_regex is not None) and (expect_messages_regex.findall(str)):
+            if (expect_messages_regex is not None) and (expect_messages_regex.search(str)):
                 ret_code = True
 
         return ret_code
 
-    def analyze_file(self, log_file_path, match_messages_regex, ignore_messages_regex, expect_messages_regex,
-                     maximum_log_length=None):
+    def classify_marker(self, line, start_marker, end_marker):
         '''
-        @summary: Analyze input file content for messages matching input regex
-                  expressions. See line_matches() for details on matching criteria.
+        @summary: Detect which LogAnalyzer marker, if any, is carried by the log line.
+                  Markers are checked in the same priority as they always were during analysis.
 
-        @param log_file_path: Patch to the log file.
+        @return: One of 'end', 'end_ignore', 'start_ignore', 'start' or None.
+        '''
+        if end_marker in line:
+            return 'end'
+        elif self.end_ignore_marker_prefix in line:
+            return 'end_ignore'
+        elif self.start_ignore_marker_prefix in line:
+            return 'start_ignore'
+        elif line.find(start_marker) != -1 and 'extract_log' not in line:
+            return 'start'
+        return None
+    # ---------------------------------------------------------------------
 
-        @param match_messages_regex:
-            regex class instance containing messages to match against.
+    def locate_markers(self, log_file, start_marker, end_marker):
+        '''
+        @summary: Forward scan of the log file which only looks for markers.
+                  Markers located before the last start marker are dropped, since
+                  analysis never goes beyond the last start marker.
 
-        @param ignore_messages_regex:
-            regex class instance containing messages to ignore match against.
+        @param log_file: Opened log file.
 
-        @param expect_messages_regex:
-            regex class instance containing messages that are expected to appear in logfile.
+        @return: Tuple (list of (line_index, marker_kind, line), number of lines in the file)
+        '''
+        markers = []
+        line_count = 0
+        for line_count, line in enumerate(log_file, 1):
+            # All markers except user provided start marker contain the 'LogAnalyzer' word
+            if 'LogAnalyzer' not in line and start_marker not in line:
+                continue
+            kind = self.classify_marker(line, start_marker, end_marker)
+            if kind is None:
+                continue
+            if kind == 'start':
+                markers = []
+            markers.append((line_count - 1, kind, line))
 
-        @param end_marker_regex - end marker
+        return markers, line_count
+    # ---------------------------------------------------------------------
 
-        @param maximum_log_length - The long log message (length > maximum_log_length) will be dropped by LogAnalyzer.
+    def get_analysis_ranges(self, markers, line_count, check_marker, start_marker, end_marker):
+        '''
+        @summary: Walk the markers from the end of the file towards the start marker and
+                  compute which lines must be analyzed. Markers are validated exactly
+                  the same way as when the whole log was walked backwards line by line.
+
+        @param markers: List of markers returned by locate_markers().
+        @param line_count: Number of lines in the log file.
+        @param check_marker: Whether start/end markers are required for the log file.
+
+        @return: Tuple (list of half-open (first_line, last_line) ranges ordered by line index,
+                 found_start_marker, found_end_marker)
+        '''
+        in_analysis_range = not check_marker
+        found_start_marker = False
+        found_end_marker = False
+        ignore_marker_run_ids = []
+        ranges = []
+        upper = line_count
+
+        for index, kind, line in reversed(markers):
+            if in_analysis_range and index + 1 < upper:
+                ranges.append((index + 1, upper))
+            upper = index
+
+            if kind == 'end':
+                self.print_diagnostic_message(
+                    'found end marker: %s' % end_marker)
+                if (found_end_marker):
+                    print('ERROR: duplicate end marker found')
+                    sys.exit(err_duplicate_end_marker)
+                found_end_marker = True
+                in_analysis_range = True
+            elif kind == 'end_ignore':
+                marker_run_id = line.split(
+                    self.end_ignore_marker_prefix)[1]
+                ignore_marker_run_ids.append(marker_run_id)
+                self.print_diagnostic_message('found end ignore marker: %s'
+                                              % line[line.index(self.end_ignore_marker_prefix):])
+                if not in_analysis_range:
+                    print('ERROR: duplicate end ignore marker found')
+                    sys.exit(err_end_ignore_marker)
+                in_analysis_range = False
+            elif kind == 'start_ignore':
+                marker_run_id = ignore_marker_run_ids.pop()
+                self.print_diagnostic_message('found start ignore marker: %s'
+                                              % line[line.index(self.start_ignore_marker_prefix):])
+                if in_analysis_range or marker_run_id not in line:
+                    print('ERROR: unexpected start ignore marker found')
+                    sys.exit(err_start_ignore_marker)
+                in_analysis_range = True
+            else:
+                self.print_diagnostic_message(
+                    'found start marker: %s' % start_marker)
+                found_start_marker = True
+                if (not in_analysis_range):
+                    print(
+                        ('ERROR: found start marker:%s without corresponding end marker' % line))
+                    sys.exit(err_no_end_marker)
+                break
+        else:
+            if in_analysis_range and upper > 0:
+                ranges.append((0, upper))
+
+        ranges.reverse()
+        return ranges, found_start_marker, found_end_marker
+    # ---------------------------------------------------------------------
+
+    def analyze_lines(self, lines, match_messages_regex, ignore_messages_regex, expect_messages_regex,
+                      skip_long_lines, maximum_log_length, matching_lines, expected_lines):
+        '''
+        @summary: Check lines against the regular expressions and collect matching and expected lines.
+        '''
+        for line in lines:
+            # Skip long logs in sairedis recording since most likely
+            # they are bulk set operations for non-default routes
+            # without much insight while they are time consuming to analyze
+            # In advanced_reboot test, we need to analyze the bulk operations for mac learning
+            # So we need to allow long lines
+            if skip_long_lines and len(line) > maximum_log_length:
+                continue
+
+            if self.line_is_expected(line, expect_messages_regex):
+                expected_lines.append(line)
+
+            elif self.line_matches(line, match_messages_regex, ignore_messages_regex):
+                matching_lines.append(line)
+    # ---------------------------------------------------------------------
 
-        @return: List of strings match search criteria.
+    def stream_file(self, log_file_path, match_messages_regex, ignore_messages_regex, expect_messages_regex,
+                    maximum_log_length=None):
         '''
+        @summary: Analyze input file content in bounded memory.
 
+        The file is read twice: first pass only looks for the markers, which define
+        the ranges to be analyzed, second pass checks the lines inside those ranges
+        against the regular expressions. Lines which were appended to the file after
+        the first pass are not analyzed.
+
+        @return: Lists of matching and expected strings, in the order they appear in the file.
+        '''
         self.print_diagnostic_message('analyzing file: %s' % log_file_path)
 
-        # -- indicates whether log analyzer currently is in the log range between start
-        # -- and end marker. see analyze_file method.
         check_marker = self.require_marker_check(log_file_path)
-        in_analysis_range = not check_marker
-        stdin_as_input = self.is_filename_stdin(log_file_path)
+        if maximum_log_length is None:
+            maximum_log_length = MAX_LOG_MESSAGE_LENGTH
+        skip_long_lines = not check_marker
         matching_lines = []
         expected_lines = []
-        found_start_marker = False
-        found_end_marker = False
-        if stdin_as_input:
-            log_file = sys.stdin
-        else:
-            log_file = open(log_file_path, 'r')
+
+        if self.is_filename_stdin(log_file_path):
+            # stdin can not be read twice, and markers are not checked for it anyway
+            self.analyze_lines(sys.stdin, match_messages_regex, ignore_messages_regex, expect_messages_regex,
+                               skip_long_lines, maximum_log_length, matching_lines, expected_lines)
+            return matching_lines, expected_lines
 
         start_marker = self.create_start_marker()
         end_marker = self.create_end_marker()
 
-        ignore_marker_run_ids = []
-        for rev_line in reversed(log_file.readlines()):
-            if stdin_as_input:
-                in_analysis_range = True
-            else:
-                if end_marker in rev_line:
-                    self.print_diagnostic_message(
-                        'found end marker: %s' % end_marker)
-                    if (found_end_marker):
-                        print('ERROR: duplicate end marker found')
-                        sys.exit(err_duplicate_end_marker)
-                    found_end_marker = True
-                    in_analysis_range = True
-                    continue
-                elif self.end_ignore_marker_prefix in rev_line:
-                    marker_run_id = rev_line.split(
-                        self.end_ignore_marker_prefix)[1]
-                    ignore_marker_run_ids.append(marker_run_id)
-                    self.print_diagnostic_message('found end ignore marker: %s'
-                                                  % rev_line[rev_line.index(self.end_ignore_marker_prefix):])
-                    if not in_analysis_range:
-                        print('ERROR: duplicate end ignore marker found')
-                        sys.exit(err_end_ignore_marker)
-                    in_analysis_range = False
-                    continue
-
-                elif self.start_ignore_marker_prefix in rev_line:
-                    marker_run_id = ignore_marker_run_ids.pop()
-                    self.print_diagnostic_message('found start ignore marker: %s'
-                                                  % rev_line[rev_line.index(self.start_ignore_marker_prefix):])
-                    if in_analysis_range or marker_run_id not in rev_line:
-                        print('ERROR: unexpected start ignore marker found')
-                        sys.exit(err_start_ignore_marker)
-                    in_analysis_range = True
-                    continue
-
-            if not stdin_as_input:
-                if rev_line.find(start_marker) != -1 and 'extract_log' not in rev_line:
-                    self.print_diagnostic_message(
-                        'found start marker: %s' % start_marker)
-                    if (found_start_marker):
-                        print('ERROR: duplicate start marker found')
-                        sys.exit(err_duplicate_start_marker)
-                    found_start_marker = True
-
-                    if (not in_analysis_range):
-                        print(
-                            ('ERROR: found start marker:%s without corresponding end marker' % rev_line))
-                        sys.exit(err_no_end_marker)
-                    in_analysis_range = False
-                    break
+        with open(log_file_path, 'r') as log_file:
+            markers, line_count = self.locate_markers(log_file, start_marker, end_marker)
+
+        ranges, found_start_marker, found_end_marker = self.get_analysis_ranges(
+            markers, line_count, check_marker, start_marker, end_marker)
+
+        with open(log_file_path, 'r') as log_file:
+            position = 0
+            for first, last in ranges:
+                self.analyze_lines(itertools.islice(log_file, first - position, last - position),
+                                   match_messages_regex, ignore_messages_regex, expect_messages_regex,
+                                   skip_long_lines, maximum_log_length, matching_lines, expected_lines)
+                position = last
 
-            if in_analysis_range:
-                # Skip long logs in sairedis recording since most likely
-                # they are bulk set operations for non-default routes
-                # without much insight while they are time consuming to analyze
-                # In advanced_reboot test, we need to analyze the bulk operations for mac learning
-                # So we need to allow long lines
-                if maximum_log_length is None:
-                    maximum_log_length = MAX_LOG_MESSAGE_LENGTH
-                if not check_marker and len(rev_line) > maximum_log_length:
-                    continue
-
-                if self.line_is_expected(rev_line, expect_messages_regex):
-                    expected_lines.append(rev_line)
-
-                elif self.line_matches(rev_line, match_messages_regex, ignore_messages_regex):
-                    matching_lines.append(rev_line)
-
-        # care about the markers only if input is not stdin or no need to check start marker
-        if not stdin_as_input and check_marker:
+        # care about the markers only if no need to check start marker
+        if check_marker:
             if (not found_start_marker):
                 print('ERROR: start marker was not found')
                 sys.exit(err_no_start_marker)
@@ -543,6 +611,35 @@ class AnsibleLogAnalyzer:
         return matching_lines, expected_lines
     # ---------------------------------------------------------------------
 
+    def analyze_file(self, log_file_path, match_messages_regex, ignore_messages_regex, expect_messages_regex,
+                     maximum_log_length=None):
+        '''
+        @summary: Analyze input file content for messages matching input regex
+                  expressions. See line_matches() for details on matching criteria.
+
+        @param log_file_path: Patch to the log file.
+
+        @param match_messages_regex:
+            regex class instance containing messages to match against.
+
+        @param ignore_messages_regex:
+            regex class instance containing messages to ignore match against.
+
+        @param expect_messages_regex:
+            regex class instance containing messages that are expected to appear in logfile.
+
+        @param maximum_log_length - The long log message (length > maximum_log_length) will be dropped by LogAnalyzer.
+
+        @return: List of strings match search criteria, starting from the end of the file.
+        '''
+        matching_lines, expected_lines = self.stream_file(log_file_path, match_messages_regex,
+                                                          ignore_messages_regex, expect_messages_regex,
+                                                          maximum_log_length=maximum_log_length)
+        matching_lines.reverse()
+        expected_lines.reverse()
+        return matching_lines, expected_lines
+    # ---------------------------------------------------------------------
+
     def analyze_file_list(self, log_file_list, match_messages_regex, ignore_messages_regex, expect_messages_regex,
                           maximum_log_length=None):
         '''
@@ -570,12 +667,9 @@ class AnsibleLogAnalyzer:
         for log_file in log_file_list:
             if not len(log_file):
                 continue
-            match_strings, expect_strings = self.analyze_file(log_file, match_messages_regex, ignore_messages_regex,
-                                                              expect_messages_regex,
-                                                              maximum_log_length=maximum_log_length)
-
-            match_strings.reverse()
-            expect_strings.reverse()
+            match_strings, expect_strings = self.stream_file(log_file, match_messages_regex, ignore_messages_regex,
+                                                             expect_messages_regex,
+                                                             maximum_log_length=maximum_log_length)
             res[log_file] = [match_strings, expect_strings]
 
         return res
@@ -5480,6 +5480,8 @@ class Net(object):
     def session_close(self):
         putils.exec_foreach(self.cfg.faster_init, self.topo.duts,
                             self._session_close_dut)
+        stats = Template.get_cache_stats()
+        self.logger.info("TEXTFSM CACHE: {}".format(", ".join("{}={}".format(k, v) for k, v in stats.items())))
 
     def init_per_test(self, devname):
 
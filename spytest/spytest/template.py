@@ -2,7 +2,9 @@ import sys
 import os
 import re
 import json
-from collections import OrderedDict
+import threading
+import time
+from collections import OrderedDict, defaultdict
 
 bundled_parser = os.getenv("SPYTEST_TEXTFSM_USE_BUNDLED_PARSER")
 if bundled_parser:
@@ -19,6 +21,69 @@ from spytest import env  # noqa: E402
 import utilities.common as utils  # noqa: E402
 
 
+class TemplateCache(object):
+    """
+    Cache shared by all the Template instances.
+
+    The index rows matched by the commands are kept in a LRU, None is cached for the
+    commands without template. Compiled TextFSM state machines are pooled by template
+    path, a parse takes one out of the pool, resets it and puts it back, so that
+    the devices parsing in parallel threads never share a state machine.
+    """
+
+    def __init__(self, max_rows=None):
+        self.max_rows = max_rows or env.getint("SPYTEST_TEXTFSM_CACHE_SIZE", 4096)
+        self.lock = threading.Lock()
+        self.rows = OrderedDict()
+        self.fsms = defaultdict(list)
+        self.stats = OrderedDict()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.rows.clear()
+            self.fsms.clear()
+            for name in ["row_hits", "row_misses", "fsm_hits", "fsm_misses"]:
+                self.stats[name] = 0
+
+    def get_row(self, key, finder):
+        with self.lock:
+            if key in self.rows:
+                self.rows.move_to_end(key)
+                self.stats["row_hits"] += 1
+                return self.rows[key]
+            self.stats["row_misses"] += 1
+        row = finder()
+        with self.lock:
+            self.rows[key] = row
+            while len(self.rows) > self.max_rows:
+                self.rows.popitem(last=False)
+        return row
+
+    def acquire_fsm(self, tmpl_path):
+        with self.lock:
+            pool = self.fsms[tmpl_path]
+            if pool:
+                self.stats["fsm_hits"] += 1
+                fsm = pool.pop()
+                fsm.Reset()
+                return fsm
+            self.stats["fsm_misses"] += 1
+        with open(tmpl_path, "r") as tmpl_fp:
+            return textfsm.TextFSM(tmpl_fp)
+
+    def release_fsm(self, tmpl_path, fsm):
+        with self.lock:
+            self.fsms[tmpl_path].append(fsm)
+
+    def get_stats(self):
+        with self.lock:
+            return OrderedDict(self.stats)
+
+
+cache = TemplateCache()
+
+
 class Template(object):
 
     def __init__(self, platform=None, cli=None, root=None):
@@ -41,23 +106,57 @@ class Template(object):
             self.cli_tables[index] = clitable.CliTable(index, self.root)
         self.platform = platform
         self.cli = cli
+        self.cache_key = (self.root, tuple(self.cli_tables), platform, cli)
 
-    # find the template given command
-    def get_tmpl(self, cmd):
+    def _find_row(self, cmd):
         attrs = dict(Command=cmd)
         for cli_table in self.cli_tables.values():
             row_idx = cli_table.index.GetRowMatch(attrs)
             if row_idx != 0:
-                return cli_table.index.index[row_idx]['Template']
+                return [cli_table, cli_table.index.index[row_idx]['Template']]
         return None
 
+    # find the index table and template given command
+    def find_row(self, cmd):
+        return cache.get_row(self.cache_key + (cmd,), lambda: self._find_row(cmd))
+
+    # find the template given command
+    def get_tmpl(self, cmd):
+        row = self.find_row(cmd)
+        return row[1] if row else None
+
     def get_table(self, cmd):
-        attrs = dict(Command=cmd)
-        for cli_table in self.cli_tables.values():
-            row_idx = cli_table.index.GetRowMatch(attrs)
-            if row_idx != 0:
-                return cli_table
-        return None
+        row = self.find_row(cmd)
+        return row[0] if row else None
+
+    def _find_parse_tmpl(self, cli_table, attrs):
+        row_idx = cli_table.index.GetRowMatch(attrs)
+        if not row_idx:
+            raise clitable.CliTableError('No template found for attributes: "%s"' % attrs)
+        return cli_table.index.index[row_idx]['Template']
+
+    # parse the output like CliTable.ParseCmd but with the cached state machines
+    def parse_cmd(self, cli_table, output, attrs):
+        key = self.cache_key + ("parse", attrs["Command"])
+        tmpls = cache.get_row(key, lambda: self._find_parse_tmpl(cli_table, attrs))
+        table, keys = None, set()
+        for tmpl in tmpls.split(':'):
+            tmpl_path = os.path.join(cli_table.template_dir, tmpl)
+            fsm = cache.acquire_fsm(tmpl_path)
+            try:
+                if not keys:
+                    keys = set(fsm.GetValuesByAttrib('Key'))
+                part = clitable.texttable.TextTable()
+                part.header = fsm.header
+                for record in fsm.ParseText(output):
+                    part.Append(record)
+            finally:
+                cache.release_fsm(tmpl_path, fsm)
+            if table is None:
+                table = part
+            else:
+                table.extend(part, set(keys))
+        return table
 
     # retrieve template and sample file given the command
     def read_sample(self, cmd):
@@ -98,8 +197,8 @@ class Template(object):
         if not cli_table:
             raise ValueError('Unable to parse command "%s"' % (cmd))
 
-        cli_table.ParseCmd(output, attrs)
-        objs = self.result(cli_table.header, cli_table)
+        table = self.parse_cmd(cli_table, output, attrs)
+        objs = self.result(table.header, table)
         return [tmpl_file, objs]
 
     def result(self, header, rows):
@@ -160,18 +259,67 @@ class Template(object):
     # apply the given template on given data
     def apply_textfsm(self, tmpl_file, data):
         tmpl_file2 = os.path.join(self.root, tmpl_file)
-        tmpl_fp = open(tmpl_file2, "r")
-        re_table = textfsm.TextFSM(tmpl_fp)
-        out = re_table.ParseText(data)
-        tmpl_fp.close()
-        objs = self.result(re_table.header, out)
-        return re_table.header, objs
+        re_table = cache.acquire_fsm(tmpl_file2)
+        try:
+            out = re_table.ParseText(data)
+            header = list(re_table.header)
+        finally:
+            cache.release_fsm(tmpl_file2, re_table)
+        objs = self.result(header, out)
+        return header, objs
+
+    @staticmethod
+    def get_cache_stats():
+        return cache.get_stats()
+
+    # time parsing of the sample files with cold and warm cache
+    # <template>.txt and <template>_<n>.txt are parsed by the template
+    # saved <template>.<md5>.info.log/data.log are parsed by the command
+    def benchmark(self, path=None, iterations=10):
+        samples, path = [], path or self.samples
+        for txt_file in utils.list_files_tree(path, "*.txt"):
+            name = re.sub(r"_\d$", "", os.path.splitext(os.path.basename(txt_file))[0])
+            if os.path.isfile(os.path.join(self.root, name + ".tmpl")):
+                data = "\n".join(utils.read_lines(txt_file, []))
+                samples.append([self.apply_textfsm, name + ".tmpl", data])
+        for info_file in utils.list_files_tree(path, "*.info.log"):
+            lines = utils.read_lines(info_file, [])
+            for i in range(0, len(lines), 4):
+                tmpl, cmd, _, md5 = [data.strip() for data in lines[i:i + 4]]
+                data_file = os.path.join(path, "{}.{}.data.log".format(tmpl, md5))
+                data = "\n".join(utils.read_lines(data_file, []))
+                samples.append([lambda cmd, data: self.apply(data, cmd), cmd, data])
+        if not samples:
+            return None
+        cache.clear()
+        start = time.time()
+        for func, arg, data in samples:
+            func(arg, data)
+        cold = time.time() - start
+        start = time.time()
+        for _ in range(iterations):
+            for func, arg, data in samples:
+                func(arg, data)
+        warm = (time.time() - start) / iterations
+        return OrderedDict([("samples", len(samples)), ("cold", cold), ("warm", warm),
+                            ("stats", cache.get_stats())])
 
 
 if __name__ == "__main__":
     template = Template()
+    if len(sys.argv) > 1 and sys.argv[1] == "--benchmark":
+        path = sys.argv[2] if len(sys.argv) > 2 else None
+        rv = template.benchmark(path)
+        if not rv:
+            print("No samples found in {}".format(path or template.samples))
+            sys.exit(0)
+        print("Parsed {} samples: cold cache {:.3f} msec warm cache {:.3f} msec".format(
+              rv["samples"], rv["cold"] * 1000, rv["warm"] * 1000))
+        print("Cache stats: {}".format(dict(rv["stats"])))
+        sys.exit(0)
     if len(sys.argv) <= 2:
         print("USAGE: template.py <command> <data file> [<template file>]")
+        print("       template.py --benchmark [<samples dir>]")
         sys.exit(0)
 
     cmd, data_file = sys.argv[1:3]
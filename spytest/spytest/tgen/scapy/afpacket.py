@@ -6,9 +6,17 @@ in the data returned by recv. Instead, it delivers the VLAN TCI in a control
 message. Python 2.x doesn't have built-in support for recvmsg, so we have to
 use ctypes to call it. The recv function exported by this module reconstructs
 the VLAN tag if it was offloaded.
+
+RxRing and TxRing use PACKET_MMAP TPACKET_V3 rings instead of a syscall per
+frame: RxRing returns all the frames of a block filled by the kernel at once
+and TxRing queues frames in the ring and sends them with one syscall.
 """
 
+import mmap
+import select
+import socket
 import struct
+import threading
 from ctypes import sizeof
 from ctypes import get_errno
 from ctypes import byref
@@ -29,6 +37,30 @@ ETH_P_8021Q = 0x8100
 SOL_PACKET = 263
 PACKET_AUXDATA = 8
 TP_STATUS_VLAN_VALID = 1 << 4
+TP_STATUS_VLAN_TPID_VALID = 1 << 6
+
+PACKET_RX_RING = 5
+PACKET_VERSION = 10
+PACKET_TX_RING = 13
+TPACKET_V3 = 2
+
+TP_STATUS_KERNEL = 0
+TP_STATUS_USER = 1
+TP_STATUS_AVAILABLE = 0
+TP_STATUS_SEND_REQUEST = 1
+TP_STATUS_WRONG_FORMAT = 1 << 2
+
+# struct tpacket_req3
+TPACKET_REQ3 = struct.Struct("IIIIIII")
+# struct tpacket_block_desc: block_status, num_pkts, offset_to_first_pkt
+BLOCK_STATUS_OFFSET = 8
+BLOCK_HDR = struct.Struct("III")
+# struct tpacket3_hdr: tp_next_offset, tp_sec, tp_nsec, tp_snaplen, tp_len, tp_status,
+# tp_mac, tp_net, tp_rxhash, tp_vlan_tci, tp_vlan_tpid
+TPACKET3_HDR = struct.Struct("IIIIIIHHIIH")
+TP_STATUS_OFFSET = 20
+# TPACKET_ALIGN(sizeof(struct tpacket3_hdr)), where the kernel expects TX frame data
+TPACKET3_DATA_OFFSET = 48
 
 
 class struct_iovec(Structure):
@@ -131,3 +163,165 @@ def recv(sk, bufsize):
         return buf.raw[:12] + tag + buf.raw[12:rv]
     else:
         return buf.raw[:rv]
+
+
+class RxRing(object):
+    """
+    TPACKET_V3 receive ring of an AF_PACKET socket
+
+    The kernel fills blocks of variable size frames and hands over a block when
+    it is full or when the block timeout expires.
+    """
+
+    def __init__(self, sk, block_size=1 << 20, block_nr=16, frame_size=2048, timeout_ms=10):
+        """
+        @sk Bound AF_PACKET socket, it is used only for the ring afterwards
+        @block_size Size of a block, multiple of the page size
+        @block_nr Number of blocks
+        @frame_size Nominal frame size, frames larger than this are received too
+        @timeout_ms Time after which a partially filled block is handed over
+        """
+        self.sk = sk
+        self.block_size = block_size
+        self.block_nr = block_nr
+        frame_nr = (block_size // frame_size) * block_nr
+        sk.setsockopt(SOL_PACKET, PACKET_VERSION, TPACKET_V3)
+        sk.setsockopt(SOL_PACKET, PACKET_RX_RING, TPACKET_REQ3.pack(
+            block_size, block_nr, frame_size, frame_nr, timeout_ms, 0, 0))
+        self.ring = mmap.mmap(sk.fileno(), block_size * block_nr)
+        self.poller = select.poll()
+        self.poller.register(sk.fileno(), select.POLLIN | select.POLLERR)
+        self.block = 0
+
+    def close(self):
+        self.ring.close()
+
+    def recv(self, timeout=1.0):
+        """
+        Receive the frames of the next block filled by the kernel
+        @timeout Max time to wait for a block in seconds
+        Returns list of frames, empty if no block is filled in time
+        """
+        ring = self.ring
+        offset = self.block * self.block_size
+        status, num_pkts, pkt = BLOCK_HDR.unpack_from(ring, offset + BLOCK_STATUS_OFFSET)
+        if not status & TP_STATUS_USER:
+            self.poller.poll(int(timeout * 1000))
+            status, num_pkts, pkt = BLOCK_HDR.unpack_from(ring, offset + BLOCK_STATUS_OFFSET)
+            if not status & TP_STATUS_USER:
+                return []
+
+        frames = []
+        pkt += offset
+        for _ in range(num_pkts):
+            next_offset, _, _, snaplen, _, tp_status, tp_mac, _, _, vlan_tci, vlan_tpid = \
+                TPACKET3_HDR.unpack_from(ring, pkt)
+            start = pkt + tp_mac
+            if vlan_tci != 0 or tp_status & TP_STATUS_VLAN_VALID:
+                # Insert VLAN tag
+                if not tp_status & TP_STATUS_VLAN_TPID_VALID:
+                    vlan_tpid = ETH_P_8021Q
+                tag = struct.pack("!HH", vlan_tpid, vlan_tci)
+                frames.append(ring[start:start + 12] + tag + ring[start + 12:start + snaplen])
+            else:
+                frames.append(ring[start:start + snaplen])
+            pkt += next_offset
+
+        # hand the block back to the kernel
+        struct.pack_into("I", ring, offset + BLOCK_STATUS_OFFSET, TP_STATUS_KERNEL)
+        self.block = (self.block + 1) % self.block_nr
+        return frames
+
+
+class TxRing(object):
+    """
+    TPACKET_V3 transmit ring of an AF_PACKET socket bound to an interface
+
+    Frames are queued in the ring and sent by flush() with a single syscall.
+    """
+
+    def __init__(self, iface, frame_size=16384, frame_nr=256):
+        """
+        @iface Interface to send the frames to
+        @frame_size Size of a ring slot, frames up to frame_size - 48 bytes can be sent
+        @frame_nr Number of slots
+        """
+        self.iface = iface
+        self.frame_size = frame_size
+        self.frame_nr = frame_nr
+        self.max_len = frame_size - TPACKET3_DATA_OFFSET
+        self.lock = threading.Lock()
+        self.sk = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, 0)
+        try:
+            self.sk.setsockopt(SOL_PACKET, PACKET_VERSION, TPACKET_V3)
+            # one slot per block keeps the blocks page aligned
+            self.sk.setsockopt(SOL_PACKET, PACKET_TX_RING, TPACKET_REQ3.pack(
+                frame_size, frame_nr, frame_size, frame_nr, 0, 0, 0))
+            self.sk.bind((iface, 0))
+            self.ring = mmap.mmap(self.sk.fileno(), frame_size * frame_nr)
+        except Exception:
+            self.sk.close()
+            raise
+        self.frame = 0
+        self.pending = 0
+
+    def close(self):
+        self.ring.close()
+        self.sk.close()
+
+    def _wait_slot(self, offset):
+        status = struct.unpack_from("I", self.ring, offset + TP_STATUS_OFFSET)[0]
+        if status == TP_STATUS_AVAILABLE:
+            return
+        self._flush()
+        for _ in range(1000):
+            status = struct.unpack_from("I", self.ring, offset + TP_STATUS_OFFSET)[0]
+            if status == TP_STATUS_AVAILABLE:
+                return
+            if status & TP_STATUS_WRONG_FORMAT:
+                # the kernel dropped the frame, reuse the slot
+                struct.pack_into("I", self.ring, offset + TP_STATUS_OFFSET, TP_STATUS_AVAILABLE)
+                return
+            select.select([], [self.sk], [], 0.001)
+        raise RuntimeError("TX ring of {} is stuck".format(self.iface))
+
+    def queue(self, data):
+        """
+        Put a frame into the ring, it is sent by the next flush()
+        Returns number of bytes queued
+        """
+        length = len(data)
+        if length > self.max_len:
+            raise ValueError("frame of {} bytes exceeds TX ring slot".format(length))
+        with self.lock:
+            offset = self.frame * self.frame_size
+            self._wait_slot(offset)
+            start = offset + TPACKET3_DATA_OFFSET
+            self.ring[start:start + length] = data
+            TPACKET3_HDR.pack_into(self.ring, offset, 0, 0, 0, length, length, TP_STATUS_SEND_REQUEST,
+                                   TPACKET3_DATA_OFFSET, 0, 0, 0, 0)
+            self.frame = (self.frame + 1) % self.frame_nr
+            self.pending += 1
+        return length
+
+    def _flush(self):
+        if self.pending:
+            self.pending = 0
+            self.sk.send(b"")
+
+    def flush(self):
+        """
+        Send all the queued frames
+        """
+        with self.lock:
+            self._flush()
+
+    def send(self, data, flush=True):
+        """
+        Queue a frame and send it unless flush is False
+        Returns number of bytes sent or queued
+        """
+        rv = self.queue(data)
+        if flush:
+            self.flush()
+        return rv
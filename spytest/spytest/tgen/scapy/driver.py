@@ -121,8 +121,7 @@ class ScapyDriver(object):
             # read packets
             while self.rx_any_enable():
                 try:
-                    packet = self.packet.readp(self.iface, self.port)
-                    if packet:
+                    for packet in self.packet.readp_list(self.iface, self.port):
                         self.handle_recv(packet)
                 except Exception as e:
                     if str(e) != "[Errno 100] Network is down":
@@ -443,7 +442,9 @@ class ScapyDriver(object):
                     ipg = self.packet.build_ipg(pwa_next)
                     pwa_next.tx_time = self.utils.clock() + ipg - build_time - send_time
                     pwa_next_list.append(pwa_next)
+            self.packet.flush_tx()
             pwa_list = pwa_next_list
+        self.packet.flush_tx()
         self.logger.debug("{} {} Completed {}".format(func, self.iface, tx_count))
 
     def pwa_sort(self, pwa):
@@ -454,6 +455,9 @@ class ScapyDriver(object):
         if self.dbg > 2 or (self.dbg > 1 and pwa.left != 0):
             self.logger.debug("stream: {} delay: {} pps: {}".format(pwa.stream.stream_id, delay, pwa.rate_pps))
         delay = 0 if delay < 0 else delay
+        if delay > 0:
+            # send the queued frames before waiting
+            self.packet.flush_tx()
         if delay > 1.0 / 10:
             self.utils.msleep(delay * 1000, 10)
         elif delay > 1.0 / 100:
@@ -5,6 +5,7 @@ import copy
 import random
 import binascii
 import socket
+import struct
 import afpacket
 import traceback
 
@@ -31,6 +32,7 @@ from interface import PacketInterface
 from bgp_exabgp import ExaBgp
 from dot1x import Dot1x
 from dhcps import Dhcps
+from stream_template import StreamTemplate
 
 try:
     print("SCAPY VERSION = {}".format(Conf().version))
@@ -126,6 +128,50 @@ stale_list_ignore = [
     "ipv6_dst_count",
 ]
 
+# frames of these types are counted without building scapy packet
+ETH_P_IP = 0x0800
+ETH_P_IPV6 = 0x86DD
+ETH_P_ARP = 0x0806
+VLAN_TPIDS = (0x8100, 0x88A8, 0x9100)
+IPPROTO_ICMP = 1
+IPPROTO_TCP = 6
+IPPROTO_UDP = 17
+IPPROTO_ICMPV6 = 58
+# BOOTP and tunnels which may carry protocol packets
+PROTOCOL_UDP_PORTS = (67, 68, 4789)
+
+
+def is_protocol_frame(data):
+    """
+    check if the frame may carry packets handled by PacketProtocol
+    only common data traffic is recognized, anything else needs scapy
+    """
+    try:
+        offset = 12
+        ether_type = struct.unpack_from("!H", data, offset)[0]
+        while ether_type in VLAN_TPIDS:
+            offset += 4
+            ether_type = struct.unpack_from("!H", data, offset)[0]
+        offset += 2
+        if ether_type == ETH_P_ARP:
+            return False
+        if ether_type == ETH_P_IP:
+            proto = bytearray(data[offset + 9:offset + 10])[0]
+            l4_offset = offset + (bytearray(data[offset:offset + 1])[0] & 0x0F) * 4
+        elif ether_type == ETH_P_IPV6:
+            proto = bytearray(data[offset + 6:offset + 7])[0]
+            l4_offset = offset + 40
+        else:
+            return True
+        if proto in (IPPROTO_TCP, IPPROTO_ICMP, IPPROTO_ICMPV6):
+            return False
+        if proto == IPPROTO_UDP:
+            sport, dport = struct.unpack_from("!HH", data, l4_offset)
+            return sport in PROTOCOL_UDP_PORTS or dport in PROTOCOL_UDP_PORTS
+    except Exception:
+        pass
+    return True
+
 
 class ScapyPacket(object):
 
@@ -151,10 +197,17 @@ class ScapyPacket(object):
         self.rx_sock = None
         self.tx_sock = None
         self.tx_sock_failed = False
+        self.rx_ring = None
+        self.tx_ring = None
+        self.tx_ring_failed = False
+        self.use_ring = bool(os.getenv("SPYTEST_SCAPY_USE_RING", "0") != "0")
+        self.use_template = bool(os.getenv("SPYTEST_SCAPY_USE_TEMPLATE", "1") != "0")
         self.finished = False
         self.mtu = 9194
         self.use_bridge = bool(os.getenv("SPYTEST_SCAPY_USE_BRIDGE", "1") != "0")
         self.logger.info("use_bridge = {}".format(self.use_bridge))
+        self.logger.info("use_ring = {}".format(self.use_ring))
+        self.logger.info("use_template = {}".format(self.use_template))
         self.pp = PacketProtocol(self)
         self.pi = PacketInterface(self)
         self.bgp = ExaBgp(self)
@@ -261,9 +314,12 @@ class ScapyPacket(object):
         self.dot1x.cleanup()
         self.dhcps.cleanup()
         self.finished = True
+        self.rx_ring = self.close_sock(self.rx_ring)
         self.rx_sock = self.close_sock(self.rx_sock)
+        self.tx_ring = self.close_sock(self.tx_ring)
         self.tx_sock = self.close_sock(self.tx_sock)
         self.tx_sock_failed = False
+        self.tx_ring_failed = False
         self.init_bridge(self.iface)
         self.finished = False
 
@@ -282,6 +338,11 @@ class ScapyPacket(object):
                 raise exp
             raise RunTimeException(exp, msg)
         afpacket.enable_auxdata(self.rx_sock)
+        if self.use_ring:
+            try:
+                self.rx_ring = afpacket.RxRing(self.rx_sock)
+            except Exception as exp:
+                self.error("Failed to create RX ring {} {}".format(self.iface, exp))
 
     def set_link(self, status):
         msg = "link:{} status:{}".format(self.iface, status)
@@ -321,7 +382,50 @@ class ScapyPacket(object):
 
         return packet
 
-    def sendp(self, pkt, data, iface, stream_name, left):
+    def readp_list(self, iface, port):
+        """
+        read the received packets, all frames of a block when RX ring is used
+        frames are returned as bytes unless protocol handling or debug needs scapy packet
+        """
+        if not self.rx_ring:
+            packet = self.readp(iface, port)
+            return [packet] if packet else []
+
+        try:
+            frames = self.rx_ring.recv()
+        except Exception as exp:
+            if self.finished:
+                return []
+            raise exp
+        if not frames:
+            return []
+
+        self.stats_lock.acquire()
+        self.rx_count = self.rx_count + len(frames)
+        self.stats_lock.release()
+        self.trace_stats()
+
+        packets = []
+        for data in frames:
+            if self.dbg <= 1 and not is_protocol_frame(data):
+                packets.append(data)
+                continue
+            packet = Ether(data)
+            if self.dbg > 1:
+                cmd = "" if not self.show_summary else packet.command()
+                msg = "readp:{} len:{} count:{} {}".format
+                self.logger.debug(msg(iface, len(data), self.rx_count, cmd))
+            if self.dbg > 3:
+                self.trace_packet(packet, self.hex)
+            self.pp.process_rx(port, packet)
+            packets.append(packet)
+
+        # handle protocol timers
+        self.pp.process_periodic(port)
+
+        return packets
+
+    def sendp(self, pkt, data, iface, stream_name, left, defer=False):
         self.stats_lock.acquire()
         self.tx_count = self.tx_count + 1
         self.stats_lock.release()
@@ -335,7 +439,7 @@ class ScapyPacket(object):
         if self.dbg > 3:
             self.trace_packet(pkt, self.hex)
 
-        return self.send(data, iface)
+        return self.send(data, iface, defer=defer)
 
     def mkcmd(self, data):
         try:
@@ -349,7 +453,7 @@ class ScapyPacket(object):
         cmd = self.mkcmd(data)
         return "{}:{} len:{} {} {}".format(func, iface, len(data), cmd, str(exp))
 
-    def send(self, data, iface, trace=False):
+    def send(self, data, iface, trace=False, defer=False):
 
         if trace and self.dbg > 2:
             cmd = self.mkcmd(data)
@@ -359,6 +463,21 @@ class ScapyPacket(object):
         if self.dry:
             return
 
+        # try sending using TX ring, deferred frames are sent by flush_tx
+        if self.use_ring and iface == self.iface:
+            if not self.tx_ring and not self.tx_ring_failed:
+                try:
+                    self.tx_ring = afpacket.TxRing(iface)
+                except Exception as exp:
+                    self.tx_ring_failed = True
+                    self.error("Failed to create TX ring {} {}".format(iface, exp))
+            if self.tx_ring:
+                try:
+                    data = data if isinstance(data, memoryview) else self.utils.tobytes(data)
+                    return self.tx_ring.send(data, flush=not defer)
+                except Exception as exp:
+                    self.logger.debug(self.expmsg(data, iface, exp, "ring-send"))
+
         if not self.tx_sock:
             try:
                 self.tx_sock = L2Socket(iface)
@@ -379,7 +498,7 @@ class ScapyPacket(object):
 
         # try sending using legacy method
         try:
-            return sendp(data, iface=iface, verbose=False)
+            return sendp(self.utils.tobytes(data), iface=iface, verbose=False)
         except Exception as exp:
             err2 = self.expmsg(data, iface, exp, "scapy-sendp")
             if self.is_vde:
@@ -389,6 +508,10 @@ class ScapyPacket(object):
         self.logger.error("Failed to send normal {}".format(err1))
         self.logger.error("Failed to send legacy {}".format(err2))
 
+    def flush_tx(self):
+        if self.tx_ring:
+            self.tx_ring.flush()
+
     def trace_stats(self):
         # self.logger.debug("Name: {} RX: {} TX: {}".format(self.iface, self.rx_count, self.tx_count))
         pass
@@ -414,6 +537,13 @@ class ScapyPacket(object):
             self.logger.debug(hexdump(pkt, dump=True))
 
     def send_packet(self, pwa, iface, stream_name, left):
+        if pwa.template:
+            # frame buffer is reused for the next packet of the stream
+            bstr = pwa.template.build(pwa.pad_len, pwa.add_signature)
+            pkt = Ether(bytes(bstr)) if self.dbg > 2 else None
+            self.sendp(pkt, bstr, iface, stream_name, left, defer=True)
+            return bstr
+
         if pwa.padding:
             strpkt = self.utils.tobytes(pwa.pkt / pwa.padding)
         else:
@@ -433,7 +563,9 @@ class ScapyPacket(object):
         except Exception:
             crc = binascii.unhexlify('00' * 4)
         bstr = strpkt + self.utils.tobytes(crc)
-        self.sendp(Ether(bstr), bstr, iface, stream_name, left)
+        # scapy packet is needed only for tracing
+        pkt = Ether(bstr) if self.dbg > 2 else None
+        self.sendp(pkt, bstr, iface, stream_name, left, defer=True)
         return bstr
 
     def check(self, pkt):
@@ -914,21 +1046,35 @@ class ScapyPacket(object):
         pwa.frame_size_min = frame_size_min
         pwa.frame_size_max = frame_size_max
         pwa.frame_size_step = frame_size_step
+        pwa.template = self.build_template(pwa)
         self.add_padding(pwa, True)
 
         return pwa
 
+    def build_template(self, pwa):
+        if not self.use_template:
+            return None
+        max_pad = 0
+        if pwa.length_mode in ["random", "increment", "incr"]:
+            max_pad = max(0, pwa.frame_size_max - len(pwa.pkt) - 4)
+        try:
+            return StreamTemplate.compile(pwa, max_pad)
+        except Exception as exp:
+            self.logger.debug("stream {} is built by scapy: {}".format(pwa.stream.stream_id, exp))
+        return None
+
     def add_padding(self, pwa, first):
         pwa.padding = None
+        pwa.pad_len = 0
         if pwa.length_mode == "random":
-            pktLen = len(pwa.pkt)
+            pktLen = pwa.template.length if pwa.template else len(pwa.pkt)
             frame_size = random.randrange(pwa.frame_size_min, pwa.frame_size_max + 1)
             padLen = int(frame_size - pktLen - 4)
             if padLen > 0:
-                pwa.padding = Padding(binascii.unhexlify('00' * padLen))
+                pwa.pad_len = padLen
                 pwa.add_signature = True
         elif pwa.length_mode in ["increment", "incr"]:
-            pktLen = len(pwa.pkt)
+            pktLen = pwa.template.length if pwa.template else len(pwa.pkt)
             if first:
                 frame_size = pwa.frame_size_min
             else:
@@ -939,11 +1085,22 @@ class ScapyPacket(object):
                 pwa.frame_size_current = frame_size
             padLen = int(pwa.frame_size_current - pktLen - 4)
             if padLen > 0:
-                pwa.padding = Padding(binascii.unhexlify('00' * padLen))
+                pwa.pad_len = padLen
                 pwa.add_signature = True
+        if pwa.pad_len > 0 and not pwa.template:
+            pwa.padding = Padding(binascii.unhexlify('00' * pwa.pad_len))
 
     def build_next_dma(self, pwa):
 
+        # patch the serialized packet when possible
+        if pwa.template:
+            if pwa.template.next(pwa):
+                self.add_padding(pwa, False)
+                return pwa
+            # field value out of template range, continue with scapy packet
+            pwa.template.detach(pwa)
+            pwa.template = None
+
         # Change Ether SRC MAC
         mac_src_mode = pwa.stream.kws.get("mac_src_mode", "fixed").strip()
         mac_src_step = pwa.stream.kws.get("mac_src_step", "00:00:00:00:00:01")
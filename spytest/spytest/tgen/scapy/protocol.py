@@ -33,6 +33,10 @@ class PacketProtocol(object):
         pass
 
     def process(self, port, pkt):
+        self.process_rx(port, pkt)
+        self.process_periodic(port)
+
+    def process_rx(self, port, pkt):
 
         if IP in pkt and pkt.proto == 89:
             self.ospf_rx(port, pkt)
@@ -46,6 +50,7 @@ class PacketProtocol(object):
         if EAP in pkt:
             self.dot1x_rx(port, pkt)
 
+    def process_periodic(self, port):
         self.igmp_tx_query_periodic(port)
         self.dot1x_tx_periodic(port)
 
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+
+"""
+compare the packet rate of socket and TPACKET_V3 ring based RX/TX
+needs root privileges, a veth pair is created for the duration of the test
+usage: ring_bench.py [count] [frame-size]
+"""
+
+import os
+import sys
+import time
+import select
+import socket
+import threading
+
+from scapy.all import Ether, IP, UDP, Raw
+from scapy.arch.linux import L2Socket
+
+import afpacket
+
+TX_IFACE = "vbench0"
+RX_IFACE = "vbench1"
+
+
+def make_frames(count, size):
+    frames = []
+    for index in range(count):
+        pkt = Ether(src="00:00:00:00:00:01", dst="00:00:00:00:00:02")
+        pkt = pkt / IP(src="10.0.0.1", dst="10.0.0.2") / UDP(sport=1024 + index % 1000, dport=5000)
+        frames.append(bytes(pkt / Raw(b"\x00" * max(0, size - len(pkt)))))
+    return frames
+
+
+def open_rx():
+    sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(3))
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 64 << 20)
+    sock.bind((RX_IFACE, 3))
+    afpacket.enable_auxdata(sock)
+    return sock
+
+
+def rx_socket(sock, count, result):
+    received = 0
+    while received < count:
+        if not select.select([sock], [], [], 1.0)[0]:
+            break
+        data = afpacket.recv(sock, 12000)
+        if not data:
+            break
+        Ether(data)
+        received += 1
+    result.append(received)
+
+
+def rx_ring(sock, count, result):
+    ring = afpacket.RxRing(sock)
+    received = 0
+    while received < count:
+        frames = ring.recv()
+        if not frames:
+            break
+        received += len(frames)
+    ring.close()
+    result.append(received)
+
+
+def tx_socket(frames):
+    sock = L2Socket(iface=TX_IFACE)
+    for frame in frames:
+        sock.send(frame)
+    sock.close()
+
+
+def tx_ring(frames):
+    ring = afpacket.TxRing(TX_IFACE)
+    for frame in frames:
+        ring.queue(frame)
+    ring.flush()
+    ring.close()
+
+
+def run(name, frames, tx_func, rx_func):
+    sock = open_rx()
+    result = []
+    thread = threading.Thread(target=rx_func, args=(sock, len(frames), result))
+    thread.start()
+    time.sleep(0.2)
+    start = time.time()
+    tx_func(frames)
+    tx_time = time.time() - start
+    thread.join()
+    rx_time = time.time() - start
+    sock.close()
+    received = result[0] if result else 0
+    msg = "{:<14} tx {:>10.0f} pps  rx {:>10.0f} pps  received {}/{}"
+    print(msg.format(name, len(frames) / tx_time, received / rx_time, received, len(frames)))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 128
+    os.system("ip link add {} type veth peer name {}".format(TX_IFACE, RX_IFACE))
+    os.system("ip link set {} up; ip link set {} up".format(TX_IFACE, RX_IFACE))
+    try:
+        frames = make_frames(count, size)
+        run("socket", frames, tx_socket, rx_socket)
+        run("ring", frames, tx_ring, rx_ring)
+    finally:
+        os.system("ip link del {}".format(TX_IFACE))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+"""
+precompiled stream packets
+the first packet of a stream is serialized once and the next packets are
+made by patching the modified fields in place, the checksums covering the
+fields are updated incrementally (RFC 1624) instead of rebuilding the packet
+"""
+
+import zlib
+import socket
+import struct
+import binascii
+
+from scapy.packet import Padding, NoPayload
+from scapy.layers.l2 import Ether, Dot1Q, ARP
+from scapy.layers.inet import IP, UDP, TCP
+from scapy.layers.inet6 import IPv6, _ICMPv6
+
+from utils import Utils
+
+MAC = "mac"
+IPV4 = "ipv4"
+IPV6 = "ipv6"
+VLAN = "vlan"
+PORT = "port"
+
+# values out of range are left to build_next_dma, VLAN id is masked by scapy
+KIND_LIMIT = {MAC: 1 << 48, IPV4: 1 << 32, IPV6: 1 << 128, VLAN: None, PORT: 1 << 16}
+
+# fields modified by build_next_dma in the same order
+# (name, layer, field, offset in layer, kind, default step, reset key, reset default, base field)
+# the destination ports are incremented from the source port like in build_next_dma
+FIELD_SPECS = [
+    ("mac_src", Ether, "src", 6, MAC, "00:00:00:00:00:01", "mac_src", "00:00:01:00:00:01", None),
+    ("mac_dst", Ether, "dst", 0, MAC, "00:00:00:00:00:01", "mac_dst", "00:00:00:00:00:00", None),
+    ("arp_src_hw", ARP, "hwsrc", 8, MAC, "00:00:00:00:00:01", "arp_src_hw_addr", "00:00:01:00:00:02", None),
+    ("arp_dst_hw", ARP, "hwdst", 18, MAC, "00:00:00:00:00:01", "arp_dst_hw_addr", "00:00:00:00:00:00", None),
+    ("ip_src", IP, "src", 12, IPV4, "0.0.0.1", "ip_src_addr", "0.0.0.0", None),
+    ("ip_dst", IP, "dst", 16, IPV4, "0.0.0.1", "ip_dst_addr", "192.0.0.1", None),
+    ("ipv6_src", IPv6, "src", 8, IPV6, "::1", "ipv6_src_addr", "fe80:0:0:0:0:0:0:12", None),
+    ("ipv6_dst", IPv6, "dst", 24, IPV6, "::1", "ipv6_dst_addr", "fe80:0:0:0:0:0:0:22", None),
+    ("vlan_id", Dot1Q, "vlan", 0, VLAN, 1, "vlan_id", 0, None),
+    ("tcp_src_port", TCP, "sport", 0, PORT, 1, "tcp_src_port", 0, None),
+    ("tcp_dst_port", TCP, "dport", 2, PORT, 1, "tcp_dst_port", 0, "tcp_src_port"),
+    ("udp_src_port", UDP, "sport", 0, PORT, 1, "udp_src_port", 0, None),
+    ("udp_dst_port", UDP, "dport", 2, PORT, 1, "udp_dst_port", 0, "udp_src_port"),
+]
+
+# checksum offset in the layers having checksum over the pseudo header
+L4_CHECKSUM_OFFSET = {TCP: 16, UDP: 6, _ICMPv6: 2}
+
+
+class TemplateError(Exception):
+    pass
+
+
+def fold(value):
+    """
+    one's complement sum of the 16 bit words of the value
+    """
+    while value >> 16:
+        value = (value & 0xFFFF) + (value >> 16)
+    return value
+
+
+def update_checksum(checksum, old, new, zero_swap=False):
+    """
+    update the checksum for a field changed from old to new value
+    """
+    total = fold((~checksum & 0xFFFF) + (~fold(old) & 0xFFFF) + fold(new))
+    # the covered data is never all zero, so the sum is never +0
+    total = total or 0xFFFF
+    checksum = ~total & 0xFFFF
+    # UDP transmits zero checksum as all ones
+    if zero_swap and checksum == 0:
+        checksum = 0xFFFF
+    return checksum
+
+
+def parse_value(kind, value):
+    if kind == MAC:
+        value = value.replace(":", "").replace(".", "")
+        if len(value) != 12:
+            raise TemplateError("invalid MAC {}".format(value))
+        return int(value, 16)
+    if kind == IPV4:
+        return struct.unpack("!I", socket.inet_aton(value))[0]
+    if kind == IPV6:
+        return int(binascii.hexlify(socket.inet_pton(socket.AF_INET6, value)), 16)
+    return int(value)
+
+
+def parse_step(kind, value):
+    if kind == MAC:
+        return int(value.replace(':', '').replace(".", ''), 16)
+    if kind == IPV4:
+        return struct.unpack("!I", socket.inet_aton(value))[0]
+    if kind == IPV6:
+        return Utils.ipv6_ip2long(value)
+    return int(value)
+
+
+def format_value(kind, value):
+    # same format as the values set by build_next_dma
+    if kind == MAC:
+        return ':'.join(("%012X" % value)[i:i + 2] for i in range(0, 12, 2))
+    if kind == IPV4:
+        return socket.inet_ntoa(struct.pack("!I", value))
+    if kind == IPV6:
+        return Utils.ipv6_long2ip(value)
+    return value
+
+
+def read_value(kind, data, offset):
+    if kind == MAC:
+        high, low = struct.unpack_from("!HI", data, offset)
+        return (high << 32) | low
+    if kind == IPV4:
+        return struct.unpack_from("!I", data, offset)[0]
+    if kind == IPV6:
+        high, low = struct.unpack_from("!QQ", data, offset)
+        return (high << 64) | low
+    if kind == VLAN:
+        return struct.unpack_from("!H", data, offset)[0] & 0xFFF
+    return struct.unpack_from("!H", data, offset)[0]
+
+
+def write_value(kind, data, offset, value):
+    if kind == MAC:
+        struct.pack_into("!HI", data, offset, value >> 32, value & 0xFFFFFFFF)
+    elif kind == IPV4:
+        struct.pack_into("!I", data, offset, value)
+    elif kind == IPV6:
+        struct.pack_into("!QQ", data, offset, value >> 64, value & 0xFFFFFFFFFFFFFFFF)
+    elif kind == VLAN:
+        tci = struct.unpack_from("!H", data, offset)[0]
+        struct.pack_into("!H", data, offset, (tci & 0xF000) | (value & 0xFFF))
+    else:
+        struct.pack_into("!H", data, offset, value)
+
+
+def layer_offsets(pkt):
+    """
+    offsets of the layers in the serialized packet
+    """
+    offsets, offset, layer = [], 0, pkt
+    while not isinstance(layer, (Padding, NoPayload)):
+        offsets.append((layer, offset))
+        offset = offset + len(layer) - len(layer.payload)
+        layer = layer.payload
+    return offsets
+
+
+class TemplateField(object):
+    def __init__(self, spec, kws, offset, checksums):
+        self.name, self.layer, self.field, _, self.kind = spec[:5]
+        step, reset_key, reset_default, self.base = spec[5:]
+        self.offset = offset
+        self.checksums = checksums
+        self.limit = KIND_LIMIT[self.kind]
+        self.counter = "{}_count".format(self.name)
+        self.mode = kws.get("{}_mode".format(self.name), "fixed").strip()
+        self.step = parse_step(self.kind, kws.get("{}_step".format(self.name), step))
+        self.count = Utils.intval(kws, self.counter, 0)
+        reset = kws.get(reset_key, reset_default)
+        self.values = [parse_value(self.kind, value) for value in (reset if isinstance(reset, list) else [reset])]
+        self.reset = self.values[0]
+        self.value = None
+
+
+class StreamTemplate(object):
+    """
+    serialized stream packet with the offsets of the modified fields
+    """
+
+    def __init__(self, data, fields, sid, max_pad):
+        self.data = bytearray(data)
+        self.length = len(data)
+        self.fields = fields
+        self.sid = sid
+        self.zeros = memoryview(bytearray(max_pad))
+        self.frame = bytearray(self.length + max_pad + 4)
+        self.view = memoryview(self.frame)
+
+    @staticmethod
+    def compile(pwa, max_pad=0):
+        """
+        create template for the stream packet
+        raises TemplateError when the stream needs to be built by scapy
+        """
+        pkt, kws = pwa.pkt, pwa.stream.kws
+        data = bytes(pkt)
+        offsets = layer_offsets(pkt)
+
+        def find(layer):
+            if layer not in pkt:
+                return None, None
+            target = pkt[layer]
+            for obj, offset in offsets:
+                if obj is target:
+                    return obj, offset
+            raise TemplateError("{} not found".format(layer.__name__))
+
+        # checksums covering the addresses and ports
+        ip_checksums, l4_checksums = [], []
+        for l3 in [IP, IPv6]:
+            layer, l3_offset = find(l3)
+            if not layer:
+                continue
+            if l3 == IP:
+                if layer.chksum is not None:
+                    raise TemplateError("fixed IP checksum")
+                ip_checksums.append((l3_offset + 10, False))
+            payload = layer.payload
+            for l4, checksum_offset in L4_CHECKSUM_OFFSET.items():
+                if not isinstance(payload, l4) or (l3 == IP and l4 == _ICMPv6):
+                    continue
+                if getattr(payload, "chksum" if l4 != _ICMPv6 else "cksum") is not None:
+                    raise TemplateError("fixed {} checksum".format(l4.__name__))
+                l4_offset = [offset for obj, offset in offsets if obj is payload][0]
+                l4_checksums.append((l4_offset + checksum_offset, l4 == UDP))
+
+        fields, pending = [], {}
+        for spec in FIELD_SPECS:
+            name, layer_type, field_name, field_offset, kind = spec[:5]
+            layer, layer_offset = find(layer_type)
+            if not layer:
+                continue
+            field = TemplateField(spec, kws, layer_offset + field_offset, [])
+            field.value = read_value(kind, data, field.offset)
+            current = getattr(layer, field_name)
+            expected = current if kind in [VLAN, PORT] else parse_value(kind, current)
+            if kind == VLAN:
+                expected = expected & 0xFFF
+            if field.value != expected:
+                raise TemplateError("{} mismatch {} != {}".format(name, field.value, expected))
+            # keep the value as in scapy packet, VLAN id is not masked
+            field.value = current if kind == VLAN else field.value
+            pending[name] = field
+            if field.mode == "fixed":
+                continue
+            increment = ["increment", "incr"] if kind == PORT else ["increment"]
+            decrement = ["decrement", "decr"] if kind == PORT else ["decrement"]
+            modes = increment + decrement + (["list"] if name in ["mac_src", "mac_dst"] else [])
+            if field.mode not in modes:
+                raise TemplateError("unhandled {}_mode {}".format(name, field.mode))
+            if field.mode in decrement:
+                field.step = -field.step
+            if layer_type in [IP, IPv6]:
+                field.checksums = ip_checksums + l4_checksums
+            elif layer_type in [TCP, UDP]:
+                field.checksums = l4_checksums
+            fields.append(field)
+
+        # base field of the destination ports
+        for field in fields:
+            if field.base:
+                field.base = pending[field.base]
+
+        sid = binascii.unhexlify(pwa.stream.get_sid() or "DeadBeef")
+        return StreamTemplate(data, fields, sid, max_pad)
+
+    def next(self, pwa):
+        """
+        apply the modifiers for the next packet
+        returns False if the packet can't be made from template, pwa is not changed then
+        """
+        changes, values = [], {}
+        for field in self.fields:
+            count = pwa[field.counter] + 1
+            if field.mode == "list":
+                if count >= len(field.values):
+                    value, count = field.values[0], 0
+                else:
+                    value = field.values[count]
+            else:
+                base = field.base or field
+                value = values.get(base.name, base.value) + field.step
+                if field.count > 0 and count >= field.count:
+                    value, count = field.reset, 0
+            if field.limit and not 0 <= value < field.limit:
+                return False
+            changes.append((field, value, count))
+            values[field.name] = value
+
+        data = self.data
+        for field, value, count in changes:
+            pwa[field.counter] = count
+            if value == field.value:
+                continue
+            for offset, zero_swap in field.checksums:
+                checksum = struct.unpack_from("!H", data, offset)[0]
+                checksum = update_checksum(checksum, field.value, value, zero_swap)
+                struct.pack_into("!H", data, offset, checksum)
+            write_value(field.kind, data, field.offset, value)
+            field.value = value
+        return True
+
+    def detach(self, pwa):
+        """
+        copy the current field values into scapy packet to continue with build_next_dma
+        """
+        for field in self.fields:
+            setattr(pwa.pkt[field.layer], field.field, format_value(field.kind, field.value))
+
+    def build(self, pad_len=0, add_signature=False):
+        """
+        make the frame with padding, stream signature and CRC
+        the returned buffer is reused by the next call
+        """
+        frame, length = self.frame, self.length
+        frame[:length] = self.data
+        total = length + pad_len
+        if pad_len > 0:
+            frame[length:total] = self.zeros[:pad_len]
+        if add_signature and self.sid:
+            frame[total - len(self.sid):total] = self.sid
+        crc = zlib.crc32(self.view[:total]) & 0xFFFFFFFF
+        struct.pack_into("!I", frame, total, socket.htonl(crc))
+        return self.view[:total + 4]
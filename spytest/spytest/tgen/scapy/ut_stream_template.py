@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+
+"""
+golden test of the precompiled stream templates
+the packets of ut_streams are built with and without template and compared
+usage: ut_stream_template.py [packet-count]
+"""
+
+import sys
+import time
+import random
+
+from packet import ScapyPacket
+from port import ScapyStream
+from ut_streams import ut_stream_get
+
+# extra streams covering the modifiers not used in ut_streams
+EXTRA_STREAMS = [
+    (11, dict(tcp_src_port_mode="increment", tcp_src_port_count=7, tcp_dst_port_mode="decr")),
+    (12, dict(udp_src_port_mode="decrement", udp_src_port_step=3, udp_dst_port_mode="incr",
+              ipv6_src_mode="increment", ipv6_src_step="::1:0", ipv6_src_count=5)),
+    (6, dict(l4_protocol="udp", udp_src_port=65530, udp_src_port_mode="increment", udp_src_port_count=0)),
+    (6, dict(l4_protocol="tcp", length_mode="random", frame_size_min=64, frame_size_max=1500,
+             ip_dst_addr="0.0.0.3", ip_dst_count=0)),
+    (7, dict(vlan_id=4090, vlan_id_count=0, length_mode="increment", frame_size_step=100, frame_size_max=600)),
+    (5, dict(mac_src_mode="list", mac_src="00:00:00:00:00:01 00:00:00:00:00:02 00:00:00:00:00:03")),
+    (3, dict(mac_dst="ff:ff:ff:ff:ff:fe", mac_dst_count=0)),
+]
+
+
+def build_packets(packet, kws, count):
+    stream = ScapyStream(1, 1, "stream-1", None, **kws)
+    random.seed(1)
+    frames = []
+    try:
+        pwa = packet.build_first(stream)
+        while pwa and len(frames) < count:
+            frames.append(bytes(packet.send_packet(pwa, "", "stream-1", pwa.left)))
+            pwa = packet.build_next(pwa)
+    except Exception as exp:
+        # field values out of range fail in both the ways
+        frames.append(type(exp).__name__)
+    return frames
+
+
+def compare(templated, scapy, kws, count):
+    start = time.time()
+    expected = build_packets(scapy, kws, count)
+    scapy_time = time.time() - start
+    start = time.time()
+    actual = build_packets(templated, kws, count)
+    template_time = time.time() - start
+    for index, (frame1, frame2) in enumerate(zip(expected, actual)):
+        if frame1 != frame2:
+            print("MISMATCH packet {}\n  {}\n  {}".format(index, frame1, frame2))
+            return False
+    if len(expected) != len(actual):
+        print("MISMATCH count {} {}".format(len(expected), len(actual)))
+        return False
+    print("  {} packets scapy {:.1f}us template {:.1f}us per packet".format(
+        len(expected), scapy_time * 1e6 / max(len(expected), 1), template_time * 1e6 / max(len(actual), 1)))
+    return True
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    templated = ScapyPacket("", dry=True)
+    scapy = ScapyPacket("", dry=True)
+    scapy.use_template = False
+    streams = []
+    for index in range(100):
+        kws = ut_stream_get(index)
+        if not kws:
+            break
+        streams.append((index, kws))
+    streams.extend([(index, ut_stream_get(index, **kws)) for index, kws in EXTRA_STREAMS])
+    failed = 0
+    for index, kws in streams:
+        print("stream {} {}".format(index, {k: v for k, v in kws.items() if k.endswith("_mode")}))
+        if not compare(templated, scapy, kws, count):
+            failed = failed + 1
+    print("{} streams {} failed".format(len(streams), failed))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,13 @@
 import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from curses.ascii import isupper
+import gzip
 import json
+import os
 
 from os import listdir
 from os.path import isfile, join, basename
-from typing import Dict, List, Tuple
-from report_data_storage import KustoConnector
+from typing import Dict, List, TextIO, Tuple
 import yaml
 
 
@@ -240,74 +242,199 @@ def process_bulk(line: str) -> Tuple:
     return obj, obj_keys, obj_key_attrs
 
 
+def open_log_file(log_file: str) -> TextIO:
+    '''open a rotated log file, gzipped ones are decompressed while read
+    Args:
+        log_file: log file path
+    Return:
+        text file object
+    '''
+    if log_file.endswith('.gz'):
+        return gzip.open(log_file, 'rt', encoding='utf-8')
+    return open(log_file, 'r', encoding='utf-8')
+
+
+def get_json_file_from_log_file(config: Dict, log_file: str, info: Dict) -> str:
+    '''json file of a log file, named after the uncompressed log file
+    Args:
+        config: swss config
+        log_file: log file path
+        info: info of the one device log config
+    Return:
+        json file path
+    '''
+    log_name = basename(log_file)
+    if log_name.endswith('.gz'):
+        log_name = log_name[:-len('.gz')]
+    return config['json_log_path'] + "/" + \
+        log_name + "." + info['device'] + ".json"
+
+
+class SwssLogItemWriter:
+    '''write the swss items of log lines as newline delimited json
+
+    Each line is one json object, the same as the __dict__ of a Swss_log_item
+    dumped with sorted keys. Lines of the log are split once, and the json of
+    the values repeated in many items (device info, object types, features,
+    attribute names) is encoded once and kept in caches, so the items are
+    never built as objects.
+    '''
+
+    def __init__(self, config: Dict, info: Dict, log_file: str,
+                 features: List, sai_feature_file_map: Dict,
+                 sai_obj_feature_map: Dict, out: TextIO):
+        self.operation_map = config['operation_map']
+        self.features = features
+        self.sai_feature_file_map = sai_feature_file_map
+        self.sai_obj_feature_map = sai_obj_feature_map
+        self.out = out
+        self.lines = 0
+        self.items = 0
+        # Keys in sorted order, the json of constant values is encoded once
+        self.head = ('{"deployment_subtype": ' + json.dumps(info['deployment_subtype']) +
+                     ', "deployment_type": ' + json.dumps(info['deployment_type']) +
+                     ', "device": ' + json.dumps(info['device']) +
+                     ', "header_file": ')
+        self.log_file_json = ', "log_file": ' + json.dumps(log_file) + ', "log_time": '
+        self.device_tail = (', "ngsdevice_type": ' + json.dumps(config['ngsdevice_type']) +
+                            ', "os_version": ' + json.dumps(info['os_version']) +
+                            ', "sai_api": ')
+        # (sai_obj, op) -> (header_file json, json from sai_api to sai_obj_attr_key) or None
+        self.obj_cache = {}
+        # attribute name -> json
+        self.attr_key_cache = {}
+        # op -> json from sai_op to the end
+        self.op_tail_cache = {}
+
+    def _obj_json(self, sai_obj: str, op: str):
+        key = (sai_obj, op)
+        if key in self.obj_cache:
+            return self.obj_cache[key]
+        sai_feature = get_sai_feature_from_sai_obj(
+            sai_obj, self.features, self.sai_obj_feature_map)
+        header_file = get_sai_header_file_from_sai_obj(
+            sai_feature, self.sai_feature_file_map)
+        obj_json = None
+        if sai_feature and header_file:
+            obj_json = (json.dumps(header_file),
+                        json.dumps(get_sai_api(op, sai_obj)) +
+                        ', "sai_feature": ' + json.dumps(sai_feature) +
+                        ', "sai_obj": ' + json.dumps(sai_obj) +
+                        ', "sai_obj_attr_key": ')
+        self.obj_cache[key] = obj_json
+        return obj_json
+
+    def _attr_json(self, attribute: List) -> str:
+        attr_key = attribute[0]
+        attr_key_json = self.attr_key_cache.get(attr_key)
+        if attr_key_json is None:
+            attr_key_json = json.dumps(attr_key) + ', "sai_obj_attr_value": '
+            self.attr_key_cache[attr_key] = attr_key_json
+        return attr_key_json + json.dumps(attribute[1] if len(attribute) > 1 else None)
+
+    def add_line(self, line: str) -> None:
+        '''write the items of a log line
+        Args:
+            line: log entry
+        '''
+        self.lines += 1
+        if 'SAI_OBJECT_TYPE' not in line:
+            return
+        line = line.rstrip()
+        items = line.split('|')
+        if len(items) < 3:
+            return
+        op = self.operation_map.get(items[1])
+        if not op:
+            return
+        if len(items[1]) == 1 and items[1].isupper():
+            # timestamp|action|objecttype||objectid|attrid=value|...||objectid|attrid=value|...
+            sai_obj = items[2]
+            objects = []
+            new_object = False
+            for item in items[3:]:
+                if item == '':
+                    new_object = True
+                elif new_object:
+                    objects.append((item, []))
+                    new_object = False
+                elif objects:
+                    objects[-1][1].append(item.split('='))
+        else:
+            sai_obj = None
+            for item in items:
+                if item.startswith('SAI_OBJECT_TYPE'):
+                    sai_obj, sep, obj_key = item.partition(':')
+                    objects = [(obj_key if sep else None, [i.split('=') for i in items if '=' in i])]
+                    break
+        if sai_obj is None:
+            return
+        obj_json = self._obj_json(sai_obj, op)
+        if obj_json is None:
+            return
+        header_json, obj_attr_json = obj_json
+        line_json = (self.head + header_json + ', "log": ' + json.dumps(line) + self.log_file_json +
+                     json.dumps(items[0]) + self.device_tail + obj_attr_json)
+        op_tail = self.op_tail_cache.get(op)
+        if op_tail is None:
+            op_tail = ', "sai_op": ' + json.dumps(op) + '}\n'
+            self.op_tail_cache[op] = op_tail
+        records = []
+        for obj_key, attributes in objects:
+            tail = ', "sai_object_key": ' + json.dumps(obj_key) + op_tail
+            if not attributes:
+                records.append(line_json + 'null, "sai_obj_attr_value": null' + tail)
+            for attribute in attributes:
+                records.append(line_json + self._attr_json(attribute) + tail)
+        self.items += len(records)
+        self.out.writelines(records)
+
+
 def convert_log_item(config: Dict,
                      log_file: str,
                      features: List,
                      sai_feature_file_map: Dict,
                      sai_obj_feature_map: Dict,
-                     info: Dict) -> None:
-    '''convert log to swss item
+                     info: Dict) -> Tuple:
+    '''convert log to swss items, streamed line by line to a newline
+    delimited json file
     Args:
         config: swss config
-        log_file: log file path
+        log_file: log file path, may be gzipped
         features: sai features list
         sai_feature_file_map: sai feature maps to header file
         sai_obj_feature_map: sai obgject maps to feature
         info: info of the one device log config
+    Return:
+        json_file, number of log lines, number of swss items
     '''
-    f = open(log_file, 'r', encoding='utf-8')
-    log_name = basename(log_file)
-    Lines = f.readlines()
-    items = []
-    for line in Lines:
-        line = line.rstrip()
-        if 'SAI_OBJECT_TYPE' in line:
-            is_bulk, op = get_sai_op(line, config['operation_map'])
-            if op:
-                if is_bulk:  # bulk op
-                    sai_obj, sai_object_key, obj_key_attrs = process_bulk(line)
-                else:
-                    sai_obj, sai_object_key = get_object_type_from_log(
-                        line)
-                    obj_key_attrs = get_sai_obj_type(line)
-                for obj_key, attributes in zip(sai_object_key, obj_key_attrs):
-                    if len(attributes) == 0:
-                        log_item = Swss_log_item(config,
-                                                 info,
-                                                 sai_obj,
-                                                 obj_key,
-                                                 log_file,
-                                                 line,
-                                                 features,
-                                                 sai_feature_file_map,
-                                                 sai_obj_feature_map)
-                        if log_item.sai_feature and log_item.header_file:
-                            items.append(log_item)
-                    else:
-                        for attribute in attributes:
-                            log_item = Swss_log_item(config,
-                                                     info,
-                                                     sai_obj,
-                                                     obj_key,
-                                                     log_file,
-                                                     line,
-                                                     features,
-                                                     sai_feature_file_map,
-                                                     sai_obj_feature_map,
-                                                     attribute)
-                            if log_item.sai_feature and log_item.header_file:
-                                items.append(log_item)
-    json_file = config['json_log_path'] + "/" + \
-        log_name + "." + info['device'] + ".json"
+    json_file = get_json_file_from_log_file(config, log_file, info)
     print("write to file {}".format(json_file))
-    with open(json_file, 'w') as f:
-        json.dump([ob.__dict__ for ob in items], f, sort_keys=True, indent=4)
+    with open_log_file(log_file) as f, open(json_file, 'w') as out:
+        writer = SwssLogItemWriter(config, info, log_file, features,
+                                   sai_feature_file_map,
+                                   sai_obj_feature_map, out)
+        for line in f:
+            writer.add_line(line)
+    return json_file, writer.lines, writer.items
+
+
+def _convert_log_file(config: Dict, log_file: str, features: List,
+                      sai_feature_file_map: Dict,
+                      sai_obj_feature_map: Dict, info: Dict) -> Tuple:
+    '''convert_log_item in a worker process, the object to feature map
+    filled by the worker is returned with the result
+    '''
+    return convert_log_item(config, log_file, features, sai_feature_file_map,
+                            sai_obj_feature_map, info), sai_obj_feature_map
 
 
 def generate_json_logs(config: Dict,
                        info: Dict,
                        sai_obj_feature_map: Dict) -> None:
-    '''get all the files and convert log to item
+    '''get all the files and convert log to item, the rotated files are
+    converted in a process pool of config['workers'] processes (default: the
+    number of CPUs)
     Args:
         config: swss config
         info: info of the one device log config
@@ -318,15 +445,25 @@ def generate_json_logs(config: Dict,
         file_list)
     features = generate_sai_feature_from_header_files(file_list)
     files = get_files_from_path_and_name_pattern(
-        info['log_path'], "sairedis.rec", ".gz")
+        info['log_path'], "sairedis.rec", ".json")
     file_sum = len(files)
-    count = 0
-    for f in files:
-        count += 1
-        print("Generate json from file {}, {}/{}".format(f, count, file_sum))
-        convert_log_item(config, f,
-                         features, sai_feature_file_map,
-                         sai_obj_feature_map, info)
+    workers = min(config.get('workers') or os.cpu_count() or 1, file_sum)
+    if workers <= 1:
+        for count, f in enumerate(files, 1):
+            print("Generate json from file {}, {}/{}".format(f, count, file_sum))
+            convert_log_item(config, f,
+                             features, sai_feature_file_map,
+                             sai_obj_feature_map, info)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(_convert_log_file, config, f, features,
+                                   sai_feature_file_map, sai_obj_feature_map,
+                                   info): f for f in files}
+        for count, future in enumerate(as_completed(futures), 1):
+            (_, lines, items), worker_obj_feature_map = future.result()
+            sai_obj_feature_map.update(worker_obj_feature_map)
+            print("Generated json from file {}, {} lines, {} items, {}/{}".format(
+                futures[future], lines, items, count, file_sum))
 
 
 def ingest_json_logs(json_log_path: str) -> None:
@@ -334,6 +471,8 @@ def ingest_json_logs(json_log_path: str) -> None:
     Args:
         path:json path
     '''
+    # Only needed to ingest, the conversion runs without the kusto client
+    from report_data_storage import KustoConnector
     kusto_db = KustoConnector("SaiTestData")
     files = get_files_from_path_and_name_pattern(
         json_log_path, "sairedis.rec", ".gz")
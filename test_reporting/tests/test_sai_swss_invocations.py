@@ -0,0 +1,180 @@
+"""Tests for the sairedis.rec converter of SAI invocation reporting."""
+import gzip
+import json
+import os
+import random
+import time
+
+import pytest
+
+from test_reporting.sai_swss_invocations import (
+    Swss_log_item, convert_log_item, generate_json_logs, generate_sai_feature_file_map_from_header_files,
+    generate_sai_feature_from_header_files, get_object_type_from_log, get_sai_obj_type, get_sai_op, process_bulk
+)
+
+SAI_HEADERS = ["saiswitch.h", "saiport.h", "sairoute.h", "saineighbor.h", "sainexthop.h", "sairouterinterface.h",
+               "saitypes.h", "saivlan.h"]
+
+CONFIG = {
+    "ngsdevice_type": "ToRRouter",
+    "operation_map": {"r": "remove", "c": "create", "g": "get", "s": "set", "q": "query",
+                      "C": "bulk_create", "R": "bulk_reomve", "S": "bulk_set"},
+}
+
+INFO = {
+    "os_version": "20181130.101",
+    "deployment_type": "example_deployment_type",
+    "deployment_subtype": "example_deployment_subtype",
+    "device": "example_device_name",
+}
+
+
+def _synthetic_recording(num_lines, seed=0):
+    """Lines shaped like the sairedis.rec of a T0, with creates, sets, gets, bulk operations and notifications."""
+    rnd = random.Random(seed)
+    lines = ["2024-01-01.00:00:00.000000|#|recording on: /var/log/swss/sairedis.rec\n",
+             "2024-01-01.00:00:00.000001|a|INIT_VIEW\n"]
+    while len(lines) < num_lines:
+        ts = "2024-01-01.00:%02d:%02d.%06d" % (len(lines) // 60000 % 60, len(lines) // 1000 % 60, len(lines) % 10 ** 6)
+        kind = rnd.randrange(8)
+        if kind == 0:
+            lines.append('%s|c|SAI_OBJECT_TYPE_ROUTE_ENTRY:{"dest":"10.%d.%d.0/24","switch_id":"oid:0x21000000000000",'
+                         '"vr":"oid:0x3000000000004"}|SAI_ROUTE_ENTRY_ATTR_NEXT_HOP_ID=oid:0x40000000006%02x\n'
+                         % (ts, rnd.randrange(256), rnd.randrange(256), rnd.randrange(256)))
+        elif kind == 1:
+            lines.append("%s|s|SAI_OBJECT_TYPE_PORT:oid:0x10000000000%02x|SAI_PORT_ATTR_ADMIN_STATE=true\n"
+                         % (ts, rnd.randrange(64)))
+        elif kind == 2:
+            lines.append("%s|c|SAI_OBJECT_TYPE_NEIGHBOR_ENTRY:{\"ip\":\"10.0.0.%d\",\"rif\":\"oid:0x6000000000%03x\","
+                         "\"switch_id\":\"oid:0x21000000000000\"}|SAI_NEIGHBOR_ENTRY_ATTR_DST_MAC_ADDRESS="
+                         "52:54:00:%02X:00:01|SAI_NEIGHBOR_ENTRY_ATTR_NO_HOST_ROUTE=false\n"
+                         % (ts, rnd.randrange(256), rnd.randrange(4096), rnd.randrange(256)))
+        elif kind == 3:
+            objs = "||".join("oid:0x2d0000000%04x|SAI_NEXT_HOP_GROUP_MEMBER_ATTR_NEXT_HOP_GROUP_ID=oid:0x50000000006"
+                             "|SAI_NEXT_HOP_GROUP_MEMBER_ATTR_NEXT_HOP_ID=oid:0x40000000006%02x" % (i, i)
+                             for i in range(rnd.randrange(1, 5)))
+            lines.append("%s|C|SAI_OBJECT_TYPE_NEXT_HOP_GROUP_MEMBER||%s\n" % (ts, objs))
+        elif kind == 4:
+            lines.append("%s|g|SAI_OBJECT_TYPE_SWITCH:oid:0x21000000000000|SAI_SWITCH_ATTR_PORT_NUMBER=0\n" % ts)
+        elif kind == 5:
+            lines.append("%s|G|SAI_STATUS_SUCCESS|SAI_SWITCH_ATTR_PORT_NUMBER=32\n" % ts)
+        elif kind == 6:
+            lines.append("%s|r|SAI_OBJECT_TYPE_ROUTE_ENTRY:{\"dest\":\"10.%d.0.0/24\",\"switch_id\":"
+                         "\"oid:0x21000000000000\",\"vr\":\"oid:0x3000000000004\"}\n" % (ts, rnd.randrange(256)))
+        else:
+            lines.append("%s|n|port_state_change|[{\"port_id\":\"oid:0x100000000%04x\",\"port_state\":"
+                         "\"SAI_PORT_OPER_STATUS_UP\"}]|\n" % (ts, rnd.randrange(64)))
+    return lines
+
+
+def _legacy_items(config, info, log_file, lines, features, sai_feature_file_map, sai_obj_feature_map):
+    """Items of the log lines built the way the converter built them before streaming."""
+    items = []
+    for line in lines:
+        line = line.rstrip()
+        if 'SAI_OBJECT_TYPE' in line:
+            is_bulk, op = get_sai_op(line, config['operation_map'])
+            if op:
+                if is_bulk:
+                    sai_obj, sai_object_key, obj_key_attrs = process_bulk(line)
+                else:
+                    sai_obj, sai_object_key = get_object_type_from_log(line)
+                    obj_key_attrs = get_sai_obj_type(line)
+                for obj_key, attributes in zip(sai_object_key, obj_key_attrs):
+                    for attribute in attributes or [None]:
+                        log_item = Swss_log_item(config, info, sai_obj, obj_key, log_file, line, features,
+                                                 sai_feature_file_map, sai_obj_feature_map, attribute)
+                        if log_item.sai_feature and log_item.header_file:
+                            items.append(log_item)
+    return items
+
+
+@pytest.fixture
+def config(tmp_path):
+    sai_path = tmp_path / "sai"
+    sai_path.mkdir()
+    for header in SAI_HEADERS:
+        (sai_path / header).write_text("")
+    json_log_path = tmp_path / "json"
+    json_log_path.mkdir()
+    return dict(CONFIG, sai_path=str(sai_path), json_log_path=str(json_log_path))
+
+
+def _features():
+    return generate_sai_feature_from_header_files(SAI_HEADERS), \
+        generate_sai_feature_file_map_from_header_files(SAI_HEADERS)
+
+
+def _write_log(path, lines):
+    opener = gzip.open if str(path).endswith(".gz") else open
+    with opener(str(path), "wt", encoding="utf-8") as f:
+        f.writelines(lines)
+
+
+def test_convert_log_item_streams_same_items(config, tmp_path):
+    lines = _synthetic_recording(3000)
+    log_file = str(tmp_path / "sairedis.rec")
+    _write_log(log_file, lines)
+    features, sai_feature_file_map = _features()
+
+    json_file, num_lines, num_items = convert_log_item(config, log_file, features, sai_feature_file_map, {}, INFO)
+
+    expected = _legacy_items(config, INFO, log_file, lines, features, sai_feature_file_map, {})
+    with open(json_file) as f:
+        written = f.read().splitlines()
+    assert json_file == os.path.join(config["json_log_path"], "sairedis.rec.example_device_name.json")
+    assert num_lines == len(lines)
+    assert num_items == len(expected) == len(written)
+    assert written == [json.dumps(item.__dict__, sort_keys=True) for item in expected]
+    ops = {json.loads(line)["sai_op"] for line in written}
+    assert ops == {"create", "set", "get", "remove", "bulk_create"}
+
+
+def test_generate_json_logs_of_rotated_files(config, tmp_path):
+    log_path = tmp_path / "logs"
+    log_path.mkdir()
+    rotated = {"sairedis.rec": 0, "sairedis.rec.1": 1, "sairedis.rec.2.gz": 2, "sairedis.rec.3.gz": 3}
+    for name, seed in rotated.items():
+        _write_log(log_path / name, _synthetic_recording(500, seed=seed))
+    (log_path / "swss.rec").write_text("")
+    features, sai_feature_file_map = _features()
+    info = dict(INFO, log_path=str(log_path))
+    sai_obj_feature_map = {}
+
+    generate_json_logs(dict(config, workers=2), info, sai_obj_feature_map)
+
+    assert sorted(os.listdir(config["json_log_path"])) == sorted(
+        name.replace(".gz", "") + ".example_device_name.json" for name in rotated)
+    for name, seed in rotated.items():
+        expected = _legacy_items(config, info, str(log_path / name), _synthetic_recording(500, seed=seed), features,
+                                 sai_feature_file_map, {})
+        with open(os.path.join(config["json_log_path"], name.replace(".gz", "") + ".example_device_name.json")) as f:
+            assert [json.loads(line) for line in f] == [item.__dict__ for item in expected]
+    assert sai_obj_feature_map["SAI_OBJECT_TYPE_NEXT_HOP_GROUP_MEMBER"] == "nexthop"
+    assert sai_obj_feature_map["SAI_OBJECT_TYPE_NEIGHBOR_ENTRY"] == "neighbor"
+
+
+def test_convert_throughput(config, tmp_path, capsys):
+    """Lines/sec of the streaming converter and of building and dumping the items like before, on a large
+    synthetic recording. The rates are only reported, they depend on the load of the host."""
+    num_lines = 100000
+    lines = _synthetic_recording(num_lines)
+    log_file = str(tmp_path / "sairedis.rec")
+    _write_log(log_file, lines)
+    features, sai_feature_file_map = _features()
+
+    start = time.perf_counter()
+    with capsys.disabled():
+        with open(log_file, encoding="utf-8") as f:
+            items = _legacy_items(config, INFO, log_file, f.readlines(), features, sai_feature_file_map, {})
+        with open(str(tmp_path / "legacy.json"), "w") as f:
+            json.dump([item.__dict__ for item in items], f, sort_keys=True, indent=4)
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    _, _, num_items = convert_log_item(config, log_file, features, sai_feature_file_map, {}, INFO)
+    streaming_time = time.perf_counter() - start
+
+    print("{} lines, {} items: before {:.0f} lines/sec, streaming {:.0f} lines/sec".format(
+        num_lines, num_items, num_lines / legacy_time, num_lines / streaming_time))
+    assert num_items == len(items)
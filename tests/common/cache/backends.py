@@ -0,0 +1,362 @@
+"""Persistent storage backends used by FactsCache."""
+
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+from contextlib import contextmanager
+
+
+logger = logging.getLogger(__name__)
+
+# Returned by backends when there is no cached facts for the zone and key
+NOTEXIST = object()
+
+
+class FileCacheBackend(object):
+    """Store each cached facts in pickle file '<cache_location>/<zone>/<key>.pickle'.
+
+    A pickle file is written to a temporary file first and then atomically renamed, so readers never see a
+    partially written file. Disk usage of the cache folder is tracked incrementally in a small index file together
+    with a digest of each pickle file, so writing the same facts again doesn't touch the disk. The modification
+    time of a pickle file is updated when the file is loaded, and the least recently used files are evicted when the
+    usage exceeds the limits. All the processes sharing the cache folder, e.g. pytest-xdist workers, update the
+    index under a file lock.
+    """
+
+    INDEX_FILE = '.index.json'
+    LOCK_FILE = '.lock'
+
+    def __init__(self, cache_location, size_limit, entry_limit):
+        self._cache_location = cache_location
+        self._size_limit = size_limit
+        self._entry_limit = entry_limit
+
+    def _facts_file(self, zone, key):
+        return os.path.join(self._cache_location, zone, '{}.pickle'.format(key))
+
+    def _rebuild_index(self):
+        """Build the index from the pickle files found in the cache folder."""
+        entries = {}
+        for zone in os.listdir(self._cache_location):
+            zone_dir = os.path.join(self._cache_location, zone)
+            if not os.path.isdir(zone_dir):
+                continue
+            for filename in os.listdir(zone_dir):
+                if filename.endswith('.pickle') and not filename.startswith('.'):
+                    entries['{}/{}'.format(zone, filename[:-len('.pickle')])] = {
+                        'size': os.path.getsize(os.path.join(zone_dir, filename)),
+                        'digest': None
+                    }
+        logger.info('[Cache] Rebuilt cache index for {} files under {}'.format(len(entries), self._cache_location))
+        return {'total_size': sum(entry['size'] for entry in entries.values()), 'entries': entries}
+
+    def _load_index(self):
+        try:
+            with open(os.path.join(self._cache_location, self.INDEX_FILE)) as f:
+                index = json.load(f)
+            if 'total_size' in index and 'entries' in index:
+                return index
+        except (IOError, ValueError):
+            pass
+        return self._rebuild_index()
+
+    def _save_index(self, index):
+        fd, tmp_file = tempfile.mkstemp(dir=self._cache_location, prefix=self.INDEX_FILE, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp_file, os.path.join(self._cache_location, self.INDEX_FILE))
+
+    @contextmanager
+    def _locked_index(self):
+        """Lock the index for all the processes sharing the cache folder and save it when done."""
+        os.makedirs(self._cache_location, exist_ok=True)
+        with open(os.path.join(self._cache_location, self.LOCK_FILE), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                index = self._load_index()
+                yield index
+                self._save_index(index)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _evict(self, index, keep):
+        """Remove the least recently used pickle files until the usage is within the limits."""
+        entries = index['entries']
+        if index['total_size'] <= self._size_limit and len(entries) <= self._entry_limit:
+            return
+
+        def last_used(name):
+            try:
+                return os.path.getmtime(self._facts_file(*name.split('/', 1)))
+            except OSError:
+                return 0
+
+        for name in sorted((name for name in entries if name != keep), key=last_used):
+            if index['total_size'] <= self._size_limit and len(entries) <= self._entry_limit:
+                break
+            try:
+                os.remove(self._facts_file(*name.split('/', 1)))
+            except OSError:
+                pass
+            index['total_size'] -= entries.pop(name)['size']
+            logger.info('[Cache] Evicted "{}" from cache, total_size={}, entries={}'
+                        .format(name, index['total_size'], len(entries)))
+
+    def load(self, zone, key):
+        """Load cached facts from pickle file.
+
+        Returns:
+            obj: Cached facts or NOTEXIST.
+        """
+        facts_file = self._facts_file(zone, key)
+        try:
+            with open(facts_file, 'rb') as f:
+                value = pickle.load(f)
+        except (IOError, ValueError) as e:
+            logger.info('[Cache] Load cache file "{}" failed with IOError or ValueError: {}'
+                        .format(facts_file, repr(e)))
+            return NOTEXIST
+        except Exception as e:
+            logger.info('[Cache] Load cache file "{}" failed with unknown exception: {}'
+                        .format(facts_file, repr(e)))
+            return NOTEXIST
+
+        try:
+            # Modification time of the pickle file is used as its last access time for eviction
+            os.utime(facts_file)
+        except OSError:
+            pass
+        logger.debug('[Cache] Loaded cached facts "{}.{}" from {}'.format(zone, key, facts_file))
+        return value
+
+    def store(self, zone, key, value):
+        """Store facts to pickle file.
+
+        Returns:
+            boolean: Storing facts is successful or not.
+        """
+        facts_file = self._facts_file(zone, key)
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if len(data) > self._size_limit:
+            logger.error('[Cache] Facts "{}.{}" size {} exceeds cache SIZE_LIMIT={}'
+                         .format(zone, key, len(data), self._size_limit))
+            return False
+        digest = hashlib.sha1(data).hexdigest()
+        name = '{}/{}'.format(zone, key)
+
+        tmp_file = None
+        try:
+            with self._locked_index() as index:
+                entry = index['entries'].get(name)
+                if entry and entry['digest'] == digest and os.path.exists(facts_file):
+                    os.utime(facts_file)
+                    logger.debug('[Cache] Facts "{}.{}" are not changed in {}'.format(zone, key, facts_file))
+                    return True
+
+                cache_subfolder = os.path.dirname(facts_file)
+                if not os.path.exists(cache_subfolder):
+                    logger.info('[Cache] Create cache dir {}'.format(cache_subfolder))
+                    os.makedirs(cache_subfolder, exist_ok=True)
+                fd, tmp_file = tempfile.mkstemp(dir=cache_subfolder, prefix='.{}.'.format(key), suffix='.tmp')
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_file, facts_file)
+                tmp_file = None
+
+                index['total_size'] += len(data) - (entry['size'] if entry else 0)
+                index['entries'][name] = {'size': len(data), 'digest': digest}
+                self._evict(index, keep=name)
+            logger.info('[Cache] Cached facts "{}.{}" to {}'.format(zone, key, facts_file))
+            return True
+        except (IOError, ValueError) as e:
+            logger.error('[Cache] Dump cache file "{}" failed with exception: {}'.format(facts_file, repr(e)))
+            return False
+        finally:
+            if tmp_file:
+                try:
+                    os.remove(tmp_file)
+                except OSError:
+                    pass
+
+    def remove(self, zone=None, key=None):
+        """Remove cached pickle files of a key, of a zone or all of them."""
+        if not zone:
+            try:
+                shutil.rmtree(self._cache_location)
+                logger.debug('[Cache] Removed all cache files under "{}"'.format(self._cache_location))
+            except OSError as e:
+                logger.error('[Cache] Remove cache folder "{}" failed with exception: {}'
+                             .format(self._cache_location, repr(e)))
+            return
+
+        with self._locked_index() as index:
+            entries = index['entries']
+            if key:
+                names = ['{}/{}'.format(zone, key)]
+            else:
+                names = [name for name in entries if name.split('/', 1)[0] == zone]
+            for name in names:
+                if name in entries:
+                    index['total_size'] -= entries.pop(name)['size']
+
+            if key:
+                try:
+                    cache_file = self._facts_file(zone, key)
+                    os.remove(cache_file)
+                    logger.debug('[Cache] Removed cache file "{}"'.format(cache_file))
+                except OSError as e:
+                    logger.error('[Cache] Cleanup cache {}.{}.pickle failed with exception: {}'
+                                 .format(zone, key, repr(e)))
+            else:
+                try:
+                    cache_subfolder = os.path.join(self._cache_location, zone)
+                    shutil.rmtree(cache_subfolder)
+                    logger.debug('[Cache] Removed cache subfolder "{}"'.format(cache_subfolder))
+                except OSError as e:
+                    logger.error('[Cache] Remove cache subfolder "{}" failed with exception: {}'.format(zone, repr(e)))
+
+
+class SqliteCacheBackend(object):
+    """Store all the cached facts in a single SQLite database '<cache_location>/facts_cache.db'.
+
+    The database is opened in WAL mode, so the processes sharing it, e.g. pytest-xdist workers, can read cached facts
+    concurrently while another process is writing. Each process opens its own connection to the database. Last access
+    time of the facts is kept in the database and the least recently used facts are evicted when the usage exceeds
+    the limits.
+    """
+
+    DB_FILE = 'facts_cache.db'
+
+    def __init__(self, cache_location, size_limit, entry_limit):
+        self._cache_location = cache_location
+        self._db_file = os.path.join(cache_location, self.DB_FILE)
+        self._size_limit = size_limit
+        self._entry_limit = entry_limit
+        self._conn = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        # SQLite connection can't be used by the forked child processes, they need to open their own
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(self._cache_location, exist_ok=True)
+            conn = sqlite3.connect(self._db_file, timeout=60, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS facts ('
+                         'zone TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, size INTEGER NOT NULL, '
+                         'digest TEXT NOT NULL, last_used REAL NOT NULL, PRIMARY KEY (zone, key))')
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def _evict(self, conn, zone, key):
+        """Remove the least recently used facts until the usage is within the limits."""
+        total_size, total_entries = conn.execute('SELECT COALESCE(SUM(size), 0), COUNT(*) FROM facts').fetchone()
+        if total_size <= self._size_limit and total_entries <= self._entry_limit:
+            return
+        rows = conn.execute('SELECT zone, key, size FROM facts WHERE NOT (zone = ? AND key = ?) ORDER BY last_used',
+                            (zone, key))
+        evicted = []
+        for row in rows:
+            if total_size <= self._size_limit and total_entries <= self._entry_limit:
+                break
+            evicted.append(row[:2])
+            total_size -= row[2]
+            total_entries -= 1
+        conn.executemany('DELETE FROM facts WHERE zone = ? AND key = ?', evicted)
+        for name in evicted:
+            logger.info('[Cache] Evicted "{}.{}" from cache, total_size={}, entries={}'
+                        .format(name[0], name[1], total_size, total_entries))
+
+    def load(self, zone, key):
+        """Load cached facts from database.
+
+        Returns:
+            obj: Cached facts or NOTEXIST.
+        """
+        try:
+            with self._lock:
+                conn = self._connect()
+                row = conn.execute('SELECT value FROM facts WHERE zone = ? AND key = ?', (zone, key)).fetchone()
+                if row is None:
+                    logger.info('[Cache] Facts "{}.{}" not found in {}'.format(zone, key, self._db_file))
+                    return NOTEXIST
+                conn.execute('UPDATE facts SET last_used = ? WHERE zone = ? AND key = ?', (time.time(), zone, key))
+            value = pickle.loads(row[0])
+        except Exception as e:
+            logger.info('[Cache] Load facts "{}.{}" from {} failed with exception: {}'
+                        .format(zone, key, self._db_file, repr(e)))
+            return NOTEXIST
+        logger.debug('[Cache] Loaded cached facts "{}.{}" from {}'.format(zone, key, self._db_file))
+        return value
+
+    def store(self, zone, key, value):
+        """Store facts to database.
+
+        Returns:
+            boolean: Storing facts is successful or not.
+        """
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if len(data) > self._size_limit:
+            logger.error('[Cache] Facts "{}.{}" size {} exceeds cache SIZE_LIMIT={}'
+                         .format(zone, key, len(data), self._size_limit))
+            return False
+        digest = hashlib.sha1(data).hexdigest()
+
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.execute('BEGIN IMMEDIATE')
+                try:
+                    row = conn.execute('SELECT digest FROM facts WHERE zone = ? AND key = ?', (zone, key)).fetchone()
+                    if row and row[0] == digest:
+                        conn.execute('UPDATE facts SET last_used = ? WHERE zone = ? AND key = ?',
+                                     (time.time(), zone, key))
+                    else:
+                        conn.execute('INSERT OR REPLACE INTO facts VALUES (?, ?, ?, ?, ?, ?)',
+                                     (zone, key, sqlite3.Binary(data), len(data), digest, time.time()))
+                        self._evict(conn, zone, key)
+                    conn.execute('COMMIT')
+                except BaseException:
+                    conn.execute('ROLLBACK')
+                    raise
+            logger.info('[Cache] Cached facts "{}.{}" to {}'.format(zone, key, self._db_file))
+            return True
+        except sqlite3.Error as e:
+            logger.error('[Cache] Store facts "{}.{}" to {} failed with exception: {}'
+                         .format(zone, key, self._db_file, repr(e)))
+            return False
+
+    def remove(self, zone=None, key=None):
+        """Remove cached facts of a key, of a zone or all of them."""
+        if not os.path.exists(self._db_file):
+            return
+        if not zone:
+            query, params = 'DELETE FROM facts', ()
+        elif not key:
+            query, params = 'DELETE FROM facts WHERE zone = ?', (zone,)
+        else:
+            query, params = 'DELETE FROM facts WHERE zone = ? AND key = ?', (zone, key)
+        try:
+            with self._lock:
+                removed = self._connect().execute(query, params).rowcount
+            logger.debug('[Cache] Removed {} cached facts from {}'.format(removed, self._db_file))
+        except sqlite3.Error as e:
+            logger.error('[Cache] Remove cached facts from {} failed with exception: {}'
+                         .format(self._db_file, repr(e)))
+
+
+BACKENDS = {
+    'file': FileCacheBackend,
+    'sqlite': SqliteCacheBackend,
+}
@@ -3,17 +3,19 @@
 import inspect
 import logging
 import os
-import pickle
-import random
-import shutil
 import sys
 import time
 
 from collections import defaultdict
-from pickle import UnpicklingError
 from threading import Lock
 from six import with_metaclass
 
+try:
+    from .backends import NOTEXIST, BACKENDS
+except ImportError:
+    # Executed as a script to cleanup the cache
+    from backends import NOTEXIST, BACKENDS
+
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +25,7 @@ CACHE_LOCATION = os.path.join(CURRENT_PATH, '../../../_cache')
 SIZE_LIMIT = 1000000000  # 1G bytes, max disk usage allowed by cache
 ENTRY_LIMIT = 1000000    # Max number of pickle files allowed in cache.
 DISABLE_CACHE_PARAM = "disable_cache"
+DEFAULT_BACKEND = 'file'
 
 
 class Singleton(type):
@@ -47,34 +50,53 @@ class FactsCache(with_metaclass(Singleton, object)):
         with_metaclass ([function]): Python 2&3 compatible function from the six library for adding metaclass.
     """
 
-    NOTEXIST = object()
+    NOTEXIST = NOTEXIST
 
-    def __init__(self, cache_location=CACHE_LOCATION):
+    def __init__(self, cache_location=CACHE_LOCATION, backend=DEFAULT_BACKEND):
         self._cache_location = os.path.abspath(cache_location)
         self._cache = defaultdict(dict)
         self._write_lock = Lock()
+        self._stats = defaultdict(lambda: {'hits': 0, 'loads': 0, 'misses': 0, 'load_time': 0.0})
+        self.set_backend(backend)
+
+    def set_backend(self, backend):
+        """Select the backend used for storing cached facts.
 
-    def _check_usage(self):
-        """Check cache usage, raise exception if usage exceeds the limitations.
+        Facts already held in memory are dropped, so that they are read from the new backend.
+
+        Args:
+            backend (str): Name of the backend, 'file' for pickle files or 'sqlite' for a database shared
+                by all the processes.
         """
-        total_size = 0
-        total_entries = 0
-        for root, _, files in os.walk(self._cache_location):
-            for f in files:
-                fp = os.path.join(root, f)
-                total_size += os.path.getsize(fp)
-                total_entries += 1
-
-        if total_size > SIZE_LIMIT or total_entries > ENTRY_LIMIT:
-            msg = 'Cache usage exceeds limitations. total_size={}, SIZE_LIMIT={}, total_entries={}, ENTRY_LIMIT={}' \
-                .format(total_size, SIZE_LIMIT, total_entries, ENTRY_LIMIT)
-            raise Exception(msg)
-
-    def _read_facts_file(self, facts_file, z, k):
-        with open(facts_file, 'rb') as f:
-            self._cache[z][k] = pickle.load(f)
-            logger.debug('[Cache] Loaded cached facts "{}.{}" from {}'.format(z, k, facts_file))
-            return self._cache[z][k]
+        if backend not in BACKENDS:
+            raise ValueError('Unknown facts cache backend "{}", supported backends: {}'
+                             .format(backend, ', '.join(sorted(BACKENDS))))
+        with self._write_lock:
+            self._backend_name = backend
+            self._backend = BACKENDS[backend](self._cache_location, SIZE_LIMIT, ENTRY_LIMIT)
+            self._cache = defaultdict(dict)
+        logger.debug('[Cache] Use {} backend for facts cache'.format(backend))
+
+    def get_stats(self):
+        """Get statistics of reading cached facts in current process.
+
+        Returns:
+            dict: Statistics by name of cached facts. 'hits' is number of reads served from memory, 'loads' and
+                'misses' are numbers of reads which loaded the facts from the backend or didn't find them there,
+                'load_time' is total time in seconds spent on the backend.
+        """
+        return {key: dict(stats) for key, stats in self._stats.items()}
+
+    def log_stats(self):
+        """Log statistics of reading cached facts, the facts taking the most time to load go first."""
+        stats = self.get_stats()
+        if not stats:
+            return
+        logger.info('[Cache] Facts cache statistics of {} backend:'.format(self._backend_name))
+        for key, key_stats in sorted(stats.items(), key=lambda item: item[1]['load_time'], reverse=True):
+            logger.info('[Cache]   {}: hits={}, loads={}, misses={}, load_time={:.3f}s'
+                        .format(key, key_stats['hits'], key_stats['loads'], key_stats['misses'],
+                                key_stats['load_time']))
 
     def read(self, zone, key):
         """Read cached facts.
@@ -87,46 +109,28 @@ class FactsCache(with_metaclass(Singleton, object)):
         Returns:
             obj: Cached object, usually a dictionary.
         """
+        stats = self._stats[key]
         # Lazy load
         if zone in self._cache and key in self._cache[zone]:
             logger.debug('[Cache] Read cached facts "{}.{}"'.format(zone, key))
+            stats['hits'] += 1
             return self._cache[zone][key]
+
+        start = time.time()
+        value = self._backend.load(zone, key)
+        stats['load_time'] += time.time() - start
+        if value is self.NOTEXIST:
+            stats['misses'] += 1
         else:
-            facts_file = os.path.join(self._cache_location, '{}/{}.pickle'.format(zone, key))
-            try:
-                return self._read_facts_file(facts_file, zone, key)
-            except (IOError, ValueError) as e:
-                logger.info('[Cache] Load cache file "{}" failed with IOError or ValueError: {}'
-                            .format(os.path.abspath(facts_file), repr(e)))
-                return self.NOTEXIST
-            except (EOFError, UnpicklingError) as e:
-                # When parallel run is enabled, multiple processes may try to read/write the same cache file,
-                # so there will be a chance that
-                #   - a file is being written by process1 while process2 is reading it, causing EOFError in process2
-                #   - a file is being read by multiple processes at the same time, causing UnpicklingError in some of
-                #     the processes
-                # In these cases, we will retry to read the file after a short random sleep. If we still get the same
-                # error after retrying, we will return NOTEXIST to overwrite the file.
-                retry_attempts = 3
-                for attempt in range(retry_attempts):
-                    time.sleep(random.randint(3, 6))
-                    try:
-                        return self._read_facts_file(facts_file, zone, key)
-                    except (EOFError, UnpicklingError):
-                        logger.warning('[Cache] Retry {}/{} failed for file "{}"'
-                                       .format(attempt + 1, retry_attempts, facts_file))
-
-                logger.error('[Cache] Load cache file "{}" failed with EOFError or UnpicklingError: {}'
-                             .format(facts_file, repr(e)))
-                return self.NOTEXIST
-            except Exception as e:
-                logger.info('[Cache] Load cache file "{}" failed with unknown exception: {}'
-                            .format(os.path.abspath(facts_file), repr(e)))
-                return self.NOTEXIST
+            stats['loads'] += 1
+            self._cache[zone][key] = value
+        return value
 
     def write(self, zone, key, value):
         """Store facts to cache.
 
+        When the cache usage exceeds SIZE_LIMIT or ENTRY_LIMIT, the least recently used facts are evicted.
+
         Args:
             zone (str): Cached facts are organized by zones. This argument is to specify the zone name.
                 The zone name could be hostname.
@@ -137,22 +141,10 @@ class FactsCache(with_metaclass(Singleton, object)):
             boolean: Caching facts is successful or not.
         """
         with self._write_lock:
-            self._check_usage()
-            facts_file = os.path.join(self._cache_location, '{}/{}.pickle'.format(zone, key))
-            try:
-                cache_subfolder = os.path.join(self._cache_location, zone)
-                if not os.path.exists(cache_subfolder):
-                    logger.info('[Cache] Create cache dir {}'.format(cache_subfolder))
-                    os.makedirs(cache_subfolder)
-
-                with open(facts_file, 'wb') as f:
-                    pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
-                    self._cache[zone][key] = value
-                    logger.info('[Cache] Cached facts "{}.{}" to {}'.format(zone, key, facts_file))
-                    return True
-            except (IOError, ValueError) as e:
-                logger.error('[Cache] Dump cache file "{}" failed with exception: {}'.format(facts_file, repr(e)))
+            if not self._backend.store(zone, key, value):
                 return False
+            self._cache[zone][key] = value
+            return True
 
     def cleanup(self, zone=None, key=None):
         """Cleanup cached files.
@@ -168,31 +160,12 @@ class FactsCache(with_metaclass(Singleton, object)):
                 if zone in self._cache and key in self._cache[zone]:
                     del self._cache[zone][key]
                     logger.debug('[Cache] Removed "{}.{}" from cache.'.format(zone, key))
-                try:
-                    cache_file = os.path.join(self._cache_location, zone, '{}.pickle'.format(key))
-                    os.remove(cache_file)
-                    logger.debug('[Cache] Removed cache file "{}.pickle"'.format(cache_file))
-                except OSError as e:
-                    logger.error('[Cache] Cleanup cache {}.{}.pickle failed with exception: {}'
-                                 .format(zone, key, repr(e)))
-            else:
-                if zone in self._cache:
-                    del self._cache[zone]
-                    logger.debug('[Cache] Removed zone "{}" from cache'.format(zone))
-                try:
-                    cache_subfolder = os.path.join(self._cache_location, zone)
-                    shutil.rmtree(cache_subfolder)
-                    logger.debug('[Cache] Removed cache subfolder "{}"'.format(cache_subfolder))
-                except OSError as e:
-                    logger.error('[Cache] Remove cache subfolder "{}" failed with exception: {}'.format(zone, repr(e)))
+            elif zone in self._cache:
+                del self._cache[zone]
+                logger.debug('[Cache] Removed zone "{}" from cache'.format(zone))
         else:
             self._cache = defaultdict(dict)
-            try:
-                shutil.rmtree(self._cache_location)
-                logger.debug('[Cache] Removed all cache files under "{}"'.format(self._cache_location))
-            except OSError as e:
-                logger.error('[Cache] Remove cache folder "{}" failed with exception: {}'
-                             .format(self._cache_location, repr(e)))
+        self._backend.remove(zone, key)
 
 
 def _get_default_zone(function, func_args, func_kargs):
@@ -298,4 +271,7 @@ if __name__ == '__main__':
         zone = sys.argv[1]
     else:
         zone = None
-    cache.cleanup(zone)
+    # Cleanup facts cached by all the backends
+    for backend in BACKENDS:
+        cache.set_backend(backend)
+        cache.cleanup(zone)
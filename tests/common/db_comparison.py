@@ -18,7 +18,7 @@ import logging
 import os
 import re
 import copy
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, List, Tuple
 from collections import Counter
 from dataclasses import dataclass
 
@@ -26,6 +26,10 @@ from tests.common.helpers.custom_msg_utils import add_custom_msg
 
 logger = logging.getLogger(__name__)
 
+# Directory of the redis dumps of the snapshots taken with digest_only on the DUT. It is kept across reboots.
+DUT_SNAPSHOT_DIR = "/var/tmp/db_comparison"
+DIGEST_FILE_SUFFIX = ".digest.json"
+
 
 def match_key(key, kset):
     """
@@ -322,6 +326,55 @@ class SnapshotDiff:
         # Now that diff has been built, get metrics on the diff components
         self._metrics.populate_diff_metrics_from_diff(self._diff, label_a=self._label_a, label_b=self._label_b)
 
+    @classmethod
+    def from_digest_trees(cls, db_type: DBType, digest_tree_a: dict, digest_tree_b: dict,
+                          query_a: Callable[..., dict], query_b: Callable[..., dict],
+                          label_a: str = "a", label_b: str = "b") -> "SnapshotDiff":
+        """Build the diff of two snapshots taken with digest_only, fetching only the entries that differ.
+
+        The table digests of the snapshots tell which tables differ, the key digests of these tables tell which
+        keys differ and only the entries of these keys are fetched and diffed. The diff and the metrics are the
+        same as the ones of the full snapshots.
+
+        Args:
+            db_type (DBType): Type of the snapshotted database
+            digest_tree_a (dict): 'digest_tree' of snapshot a returned by the redis_dump_digest module
+            digest_tree_b (dict): 'digest_tree' of snapshot b returned by the redis_dump_digest module
+            query_a (Callable): Runs redis_dump_digest on the dump of snapshot a with the given 'tables' or 'keys'
+                and returns the module result
+            query_b (Callable): Same as query_a for snapshot b
+            label_a (str): Label for the first snapshot (default: "a")
+            label_b (str): Label for the second snapshot (default: "b")
+        """
+        tables_a = digest_tree_a["tables"]
+        tables_b = digest_tree_b["tables"]
+        diff_tables = {t for t in set(tables_a) | set(tables_b) if tables_a.get(t) != tables_b.get(t)}
+        # PROCESS_STATS entries are paired by CMD and not by key, so the whole table is needed
+        full_tables = {"PROCESS_STATS"} if db_type == DBType.STATE else set()
+        query_tables = sorted(diff_tables | (full_tables & (set(tables_a) | set(tables_b))))
+
+        snapshots = []
+        key_digests_a = query_a(tables=query_tables)["key_digests"] if query_tables else {}
+        key_digests_b = query_b(tables=query_tables)["key_digests"] if query_tables else {}
+        for query, key_digests, other_key_digests in [(query_a, key_digests_a, key_digests_b),
+                                                      (query_b, key_digests_b, key_digests_a)]:
+            keys = sorted(key for key, digest in key_digests.items()
+                          if digest != other_key_digests.get(key) or key.startswith("PROCESS_STATS|"))
+            snapshots.append(query(keys=keys)["entries"] if keys else {})
+        logger.info(f"{db_type.name} DB: {len(diff_tables)} of {len(set(tables_a) | set(tables_b))} tables "
+                    f"differ, fetched {len(snapshots[0])} + {len(snapshots[1])} of "
+                    f"{digest_tree_a['total_keys']} + {digest_tree_b['total_keys']} entries")
+
+        snapshot_diff = cls(db_type, snapshots[0], snapshots[1], label_a=label_a, label_b=label_b)
+        metrics = snapshot_diff._metrics
+        metrics.total_a_keys = digest_tree_a["total_keys"]
+        metrics.total_a_values_incl_volatile = digest_tree_a["total_values_incl_volatile"]
+        metrics.total_a_values_excl_volatile = digest_tree_a["total_values_excl_volatile"]
+        metrics.total_b_keys = digest_tree_b["total_keys"]
+        metrics.total_b_values_incl_volatile = digest_tree_b["total_values_incl_volatile"]
+        metrics.total_b_values_excl_volatile = digest_tree_b["total_values_excl_volatile"]
+        return snapshot_diff
+
     @property
     def diff(self) -> dict:
         return self._diff
@@ -543,26 +596,32 @@ class SonicRedisDBSnapshotter:
     on SONiC devices and compare them to identify differences. It manages
     snapshot storage and provides methods for diff analysis.
 
+    Snapshots taken with digest_only keep the dumps on the DUT and only fetch their digest trees. Comparing
+    them fetches the entries of the tables and keys whose digests differ, instead of the whole databases.
+
     Attributes:
         _duthost: The device under test host object
         _snapshot_base_dir (str): Base directory for storing snapshots
+        _dut_snapshot_dir (str): Directory of the dumps of digest_only snapshots on the DUT
         _snapshots (List[str]): List of snapshot names taken
     """
 
-    def __init__(self, duthost, snapshot_base_dir):
+    def __init__(self, duthost, snapshot_base_dir, dut_snapshot_dir=DUT_SNAPSHOT_DIR):
         """
         Initialize the snapshotter with a DUT host and storage directory.
 
         Args:
             duthost: The device under test host object
             snapshot_base_dir (str): Base directory path where snapshots will be stored
+            dut_snapshot_dir (str): Directory path on the DUT where the dumps of digest_only snapshots are kept
         """
         self._duthost = duthost
         self._snapshot_base_dir = snapshot_base_dir
+        self._dut_snapshot_dir = dut_snapshot_dir
         os.makedirs(self._snapshot_base_dir, exist_ok=True)
         self._snapshots: List[str] = []
 
-    def take_snapshot(self, snapshot_name: str, snapshot_dbs: List[DBType]):
+    def take_snapshot(self, snapshot_name: str, snapshot_dbs: List[DBType], digest_only: bool = False):
         """
         Take a snapshot of specified Redis databases on the DUT.
 
@@ -572,12 +631,27 @@ class SonicRedisDBSnapshotter:
         Args:
             snapshot_name (str): Name identifier for this snapshot
             snapshot_dbs (List[DBType]): List of database types to snapshot
+            digest_only (bool): Keep the dumps on the DUT and only store their digest trees in the snapshot
+                directory
         """
         logger.info(f"Taking snapshot: {snapshot_name} for {self._duthost.hostname}")
         # NOTE: Need trailing slash below to avoid additional dir nesting
         snapshot_dir = f"{self._snapshot_base_dir}/{snapshot_name}/"
         os.makedirs(snapshot_dir, exist_ok=True)
+        if digest_only:
+            dut_dir = f"{self._dut_snapshot_dir}/{snapshot_name}"
+            ret = self._duthost.shell(f"mkdir -p {dut_dir}")
+            assert ret["rc"] == 0, f"Failed to create {dut_dir}"
         for db in snapshot_dbs:
+            if digest_only:
+                dump_file = f"{dut_dir}/{db.name}.json"
+                cmd = f"redis-dump -d {db.value} -o {dump_file}"
+                ret = self._duthost.shell(cmd)
+                assert ret["rc"] == 0, "Failed to run cmd:{}".format(cmd)
+                digest_tree = self._query_dut_dump(db, dump_file)["digest_tree"]
+                with open(f"{snapshot_dir}/{db.name}{DIGEST_FILE_SUFFIX}", "w") as f:
+                    f.write(json.dumps({"dut_dump_file": dump_file, "digest_tree": digest_tree}, indent=4))
+                continue
             cmd = f"redis-dump -d {db.value} --pretty"
             dump = dut_dump(cmd, self._duthost, snapshot_dir, db.name)
             with open(f"{snapshot_dir}/{db.name}.json", "w") as f:
@@ -585,6 +659,19 @@ class SonicRedisDBSnapshotter:
 
         logger.info(f"Snapshot {snapshot_name} taken for {self._duthost.hostname} at {snapshot_dir}")
 
+    def _query_dut_dump(self, db_type: DBType, dump_file: str, **kwargs) -> dict:
+        """Run the redis_dump_digest module on a dump kept on the DUT."""
+        return self._duthost.redis_dump_digest(path=dump_file,
+                                               ignore_fields=sorted(VOLATILE_VALUES.get(db_type, [])),
+                                               **kwargs)
+
+    def _list_snapshot_dbs(self, snapshot_dir: str) -> Tuple[List[str], List[str]]:
+        """Names of the databases of a snapshot, taken with full dumps and with digest_only."""
+        files = os.listdir(snapshot_dir)
+        digest_dbs = [f[:-len(DIGEST_FILE_SUFFIX)] for f in files if f.endswith(DIGEST_FILE_SUFFIX)]
+        full_dbs = [f[:-len(".json")] for f in files if f.endswith(".json") and not f.endswith(DIGEST_FILE_SUFFIX)]
+        return full_dbs, digest_dbs
+
     def diff_snapshots(self, snapshot_a: str, snapshot_b: str) -> Dict[DBType, SnapshotDiff]:
         """
         Compare two snapshots and return detailed differences for each database.
@@ -605,25 +692,47 @@ class SonicRedisDBSnapshotter:
             AssertionError: If the snapshots don't contain the same database types
         """
         snapshot_a_dir = f"{self._snapshot_base_dir}/{snapshot_a}"
-        snapshot_a_dbs = [f for f in os.listdir(snapshot_a_dir) if f.endswith(".json")]
+        snapshot_a_full_dbs, snapshot_a_digest_dbs = self._list_snapshot_dbs(snapshot_a_dir)
 
         snapshot_b_dir = f"{self._snapshot_base_dir}/{snapshot_b}"
-        snapshot_b_dbs = [f for f in os.listdir(snapshot_b_dir) if f.endswith(".json")]
+        snapshot_b_full_dbs, snapshot_b_digest_dbs = self._list_snapshot_dbs(snapshot_b_dir)
 
-        assert set(snapshot_a_dbs) == set(snapshot_b_dbs), "Snapshotted dbs do not match. Cannot compare"
+        assert set(snapshot_a_full_dbs) == set(snapshot_b_full_dbs) and \
+            set(snapshot_a_digest_dbs) == set(snapshot_b_digest_dbs), "Snapshotted dbs do not match. Cannot compare"
 
         result = {}
 
-        for db_file in snapshot_a_dbs:
-            db_name = db_file.replace(".json", "")
+        for db_name in snapshot_a_full_dbs:
             db_type = DBType[db_name]
             if db_type == DBType.ASIC:
                 # NOTE: ASIC DB diffing not currently supported
                 continue
-            db_dump_a = json.load(open(os.path.join(snapshot_a_dir, db_file), 'r'))
-            db_dump_b = json.load(open(os.path.join(snapshot_b_dir, db_file), 'r'))
+            db_dump_a = json.load(open(os.path.join(snapshot_a_dir, db_name + ".json"), 'r'))
+            db_dump_b = json.load(open(os.path.join(snapshot_b_dir, db_name + ".json"), 'r'))
             snapshot_diff = SnapshotDiff(db_type, db_dump_a, db_dump_b, label_a=snapshot_a, label_b=snapshot_b)
 
             result[db_type] = snapshot_diff
 
+        for db_name in snapshot_a_digest_dbs:
+            db_type = DBType[db_name]
+            if db_type == DBType.ASIC:
+                # NOTE: ASIC DB diffing not currently supported
+                continue
+            digest_a = json.load(open(os.path.join(snapshot_a_dir, db_name + DIGEST_FILE_SUFFIX), 'r'))
+            digest_b = json.load(open(os.path.join(snapshot_b_dir, db_name + DIGEST_FILE_SUFFIX), 'r'))
+
+            def _query(dump_file, db_type=db_type):
+                return lambda **kwargs: self._query_dut_dump(db_type, dump_file, **kwargs)
+
+            snapshot_diff = SnapshotDiff.from_digest_trees(db_type, digest_a["digest_tree"], digest_b["digest_tree"],
+                                                           _query(digest_a["dut_dump_file"]),
+                                                           _query(digest_b["dut_dump_file"]),
+                                                           label_a=snapshot_a, label_b=snapshot_b)
+
+            result[db_type] = snapshot_diff
+
         return result
+
+    def remove_dut_snapshots(self):
+        """Remove the dumps of the digest_only snapshots from the DUT."""
+        self._duthost.shell(f"rm -rf {self._dut_snapshot_dir}", module_ignore_errors=True)
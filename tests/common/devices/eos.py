@@ -5,6 +5,7 @@ import re
 import os
 
 from tests.common.devices.base import AnsibleHostBase
+from tests.common.devices.eos_eapi import get_session_pool
 from tests.common.errors import RunAnsibleModuleFail
 from retry import retry
 
@@ -354,18 +355,43 @@ class EosHost(AnsibleHostBase):
 
         On stock topologies the call is passed through unchanged.
         """
-        if self.intf_map and 'commands' in kwargs:
-            kwargs['commands'] = _apply_intf_map(kwargs['commands'], self.intf_map)
-        if self.bgp_vrf and 'commands' in kwargs:
-            kwargs['commands'] = _vrf_scope_bash_commands(
-                kwargs['commands'], self.bgp_vrf)
-            kwargs['commands'] = _vrf_scope_eos_reads(
-                kwargs['commands'], self.bgp_vrf)
-            kwargs['commands'] = _vrf_scope_eos_config(
-                kwargs['commands'], self.bgp_vrf, self.bgp_prime_asn)
+        if 'commands' in kwargs:
+            kwargs['commands'] = self.scope_commands(kwargs['commands'])
         ansible_eos_command = self.__getattr__('eos_command')
         return ansible_eos_command(*args, **kwargs)
 
+    def scope_commands(self, commands):
+        """Apply the converged-peer rewrites of ``eos_command()`` to ``commands``.
+
+        Returns ``commands`` unchanged on stock topologies.
+        """
+        if self.intf_map:
+            commands = _apply_intf_map(commands, self.intf_map)
+        if self.bgp_vrf:
+            commands = _vrf_scope_bash_commands(commands, self.bgp_vrf)
+            commands = _vrf_scope_eos_reads(commands, self.bgp_vrf)
+            commands = _vrf_scope_eos_config(commands, self.bgp_vrf, self.bgp_prime_asn)
+        return commands
+
+    def eapi_command(self, commands, fmt='json', enable=True):
+        """Run commands through a persistent eAPI session instead of the ansible ``network_cli`` connection.
+
+        Commands are rewritten like ``eos_command()`` does. Use ``eos_eapi.run_on_all()`` to run commands on many
+        neighbors concurrently.
+
+        Args:
+            commands (list): EOS CLI commands.
+            fmt (str): 'json' for structured results, 'text' for {'output': <CLI output>} results.
+            enable (bool): Prepend 'enable' to the commands, needed by configuration commands.
+
+        Returns:
+            list: Result of each command.
+
+        Raises:
+            EapiError: A command or the request failed.
+        """
+        return get_session_pool().run(self, commands, fmt=fmt, enable=enable)
+
     @retry(RunAnsibleModuleFail, tries=3, delay=5)
     def shutdown(self, interface_name):
         out = self.eos_config(
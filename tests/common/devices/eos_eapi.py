@@ -0,0 +1,304 @@
+"""Persistent eAPI sessions to EOS neighbors and a fan-out command API.
+
+``EosHost.eos_command()`` / ``eos_config()`` go through the ansible ``network_cli`` connection, which sets up the
+ansible task machinery on every call. Tests touching every neighbor of a large topology issue hundreds of such
+sequential round trips. This module keeps one kept-alive HTTP(S) connection per neighbor to the EOS command API
+(``management api http-commands``, enabled by the EOS templates of ``ansible/roles/eos``) and runs commands on many
+neighbors concurrently:
+
+    results = run_on_all(nbrhosts, ["show interfaces status"])
+    for name, res in results.items():
+        if res["ok"]:
+            statuses = res["result"][0]["interfaceStatuses"]
+
+Only the JSON-RPC protocol of eAPI is used, so it has no dependency besides the standard library.
+"""
+import base64
+import http.client
+import itertools
+import json
+import logging
+import socket
+import ssl
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+EAPI_PATH = "/command-api"
+DEFAULT_TIMEOUT = 60
+# Neighbors sent commands at the same time by run_on_all()
+DEFAULT_MAX_WORKERS = 16
+
+
+class EapiError(Exception):
+    """Error returned by eAPI or failure to talk to it.
+
+    Attributes:
+        code: JSON-RPC error code, None if eAPI was not reached.
+        data: Per command results returned with the error, the failed command has an 'errors' entry.
+    """
+
+    def __init__(self, msg, code=None, data=None):
+        super(EapiError, self).__init__(msg)
+        self.code = code
+        self.data = data
+
+
+class EapiSession(object):
+    """Kept-alive connection to the eAPI of one EOS device.
+
+    Requests of a session are serialized, a connection closed by the device while idle is reopened transparently.
+    """
+
+    def __init__(self, host, username, password, protocol="http", port=None, timeout=DEFAULT_TIMEOUT):
+        """
+        Args:
+            host (str): Management IP or name of the device.
+            username (str): eAPI user.
+            password (str): Password of the user.
+            protocol (str): 'http' (default of the EOS templates) or 'https', the certificate isn't verified.
+            port (int): Port of eAPI, defaults to the port of the protocol.
+            timeout (int): Timeout of a request in seconds.
+        """
+        if protocol not in ("http", "https"):
+            raise ValueError("Unsupported eAPI protocol {}".format(protocol))
+        self.host = host
+        self.protocol = protocol
+        self.port = port
+        self.timeout = timeout
+        credentials = "{}:{}".format(username, password).encode("utf-8")
+        self._headers = {
+            "Content-Type": "application/json",
+            "Authorization": "Basic {}".format(base64.b64encode(credentials).decode("ascii")),
+        }
+        self._conn = None
+        self._conn_used = False
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.request_count = 0
+        self.connect_count = 0
+
+    def __repr__(self):
+        return "<EapiSession {}://{}>".format(self.protocol, self.host)
+
+    def _connect(self):
+        host = self.host
+        if ":" in host and not host.startswith("["):
+            host = "[{}]".format(host)
+        if self.protocol == "https":
+            conn = http.client.HTTPSConnection(host, self.port, timeout=self.timeout,
+                                               context=ssl._create_unverified_context())
+        else:
+            conn = http.client.HTTPConnection(host, self.port, timeout=self.timeout)
+        conn.connect()
+        conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.connect_count += 1
+        return conn
+
+    def _post(self, body):
+        if self._conn is None:
+            self._conn = self._connect()
+            self._conn_used = False
+        try:
+            self._conn.request("POST", EAPI_PATH, body, self._headers)
+            response = self._conn.getresponse()
+            data = response.read()
+        except Exception:
+            self.close()
+            raise
+        if response.will_close:
+            self.close()
+        else:
+            self._conn_used = True
+        if response.status != 200:
+            raise EapiError("eAPI of {} returned HTTP {} {}".format(self.host, response.status, response.reason))
+        return data
+
+    def close(self):
+        """Close the connection, the next request opens a new one."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def run_cmds(self, commands, fmt="json", enable=True):
+        """Run commands in one eAPI request.
+
+        Args:
+            commands (list): CLI commands, either strings or dicts {'cmd': <command>, 'input': <input>}.
+            fmt (str): 'json' for structured results or 'text' for {'output': <CLI output>} results.
+            enable (bool): Prepend 'enable' to the commands, needed by configuration commands.
+
+        Returns:
+            list: Result of each command, in the order of the commands.
+
+        Raises:
+            EapiError: A command failed or the request failed.
+        """
+        if isinstance(commands, str):
+            commands = [commands]
+        cmds = (["enable"] if enable else []) + list(commands)
+        with self._lock:
+            request = {
+                "jsonrpc": "2.0",
+                "method": "runCmds",
+                "params": {"version": 1, "cmds": cmds, "format": fmt},
+                "id": next(self._ids),
+            }
+            body = json.dumps(request).encode("utf-8")
+            self.request_count += 1
+            reused = self._conn is not None and self._conn_used
+            try:
+                try:
+                    data = self._post(body)
+                except (ConnectionResetError, BrokenPipeError):
+                    # The device closed an idle kept-alive connection before reading the request, resend it once
+                    if not reused:
+                        raise
+                    logger.debug("eAPI connection to %s was closed, reconnecting", self.host)
+                    data = self._post(body)
+            except (OSError, http.client.HTTPException) as e:
+                raise EapiError("eAPI request to {} failed: {}".format(self.host, repr(e)))
+        try:
+            reply = json.loads(data.decode("utf-8"))
+            error = reply.get("error")
+            if error is None:
+                results = reply["result"]
+                return results[1:] if enable else results
+            message, code, results = error.get("message"), error.get("code"), error.get("data")
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            # Not a JSON-RPC reply, like the error page of a proxy or a truncated reply
+            raise EapiError("Invalid eAPI reply from {}: {} {!r}".format(self.host, repr(e), data[:200]))
+        if enable and results:
+            results = results[1:]
+        raise EapiError("eAPI of {} failed: {}".format(self.host, message), code=code, data=results)
+
+
+def _neighbor_hosts(neighbors):
+    """(name, EosHost) tuples of neighbors.
+
+    neighbors may be the dict of the nbrhosts fixture ({name: {'host': EosHost, ...}}), a dict {name: EosHost} or
+    a list of EosHost.
+    """
+    if isinstance(neighbors, dict):
+        items = neighbors.items()
+    else:
+        items = ((host.hostname, host) for host in neighbors)
+    hosts = []
+    for name, nbr in items:
+        if isinstance(nbr, dict) and "host" in nbr:
+            nbr = nbr["host"]
+        hosts.append((name, nbr))
+    return hosts
+
+
+class EapiSessionPool(object):
+    """One EapiSession per EOS neighbor, shared by the commands sent to it."""
+
+    def __init__(self, protocol="http", port=None, timeout=DEFAULT_TIMEOUT):
+        self.protocol = protocol
+        self.port = port
+        self.timeout = timeout
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def session(self, host):
+        """Get the session to a neighbor.
+
+        Args:
+            host: EosHost, or any object with mgmt_ip, eos_user and eos_passwd attributes.
+
+        Returns:
+            EapiSession: Session to the management IP of the neighbor.
+        """
+        key = (host.mgmt_ip, host.eos_user)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = EapiSession(host.mgmt_ip, host.eos_user, host.eos_passwd, protocol=self.protocol,
+                                      port=self.port, timeout=self.timeout)
+                self._sessions[key] = session
+        return session
+
+    def run(self, host, commands, fmt="json", enable=True):
+        """Run commands on a neighbor, see EapiSession.run_cmds().
+
+        Commands are rewritten by host.scope_commands() if the host has it, like EosHost.eos_command() does for
+        converged neighbors.
+        """
+        scope_commands = getattr(host, "scope_commands", None)
+        if scope_commands is not None:
+            commands = scope_commands(commands)
+        return self.session(host).run_cmds(commands, fmt=fmt, enable=enable)
+
+    def run_on_all(self, neighbors, commands, fmt="json", enable=True, max_workers=DEFAULT_MAX_WORKERS):
+        """Run commands on many neighbors concurrently.
+
+        Args:
+            neighbors: Dict of the nbrhosts fixture, dict {name: EosHost} or list of EosHost.
+            commands: Commands run on every neighbor, or dict {name: commands} for per neighbor commands.
+                Neighbors not in the dict are skipped.
+            fmt (str): 'json' or 'text', see EapiSession.run_cmds().
+            enable (bool): Prepend 'enable' to the commands.
+            max_workers (int): Max number of neighbors sent commands at the same time.
+
+        Returns:
+            OrderedDict: {name: result} in the order of neighbors. A result is a dict with 'host' (management IP),
+                'ok', 'result' (list of command results, None on failure), 'error' (None on success, else a dict
+                with 'message', 'code' and 'data' of the EapiError) and 'elapsed' (seconds).
+        """
+        hosts = _neighbor_hosts(neighbors)
+        if isinstance(commands, dict):
+            hosts = [(name, host) for name, host in hosts if name in commands]
+
+        def _run(name, host):
+            cmds = commands[name] if isinstance(commands, dict) else commands
+            start = time.monotonic()
+            outcome = {"host": host.mgmt_ip, "ok": True, "result": None, "error": None}
+            try:
+                outcome["result"] = self.run(host, cmds, fmt=fmt, enable=enable)
+            except EapiError as e:
+                outcome["ok"] = False
+                outcome["error"] = {"message": str(e), "code": e.code, "data": e.data}
+            outcome["elapsed"] = time.monotonic() - start
+            return outcome
+
+        results = OrderedDict()
+        if not hosts:
+            return results
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(hosts))),
+                                thread_name_prefix="eapi") as executor:
+            futures = [(name, executor.submit(_run, name, host)) for name, host in hosts]
+            for name, future in futures:
+                results[name] = future.result()
+        failed = [name for name, res in results.items() if not res["ok"]]
+        if failed:
+            logger.warning("eAPI commands failed on {} of {} neighbors: {}".format(
+                len(failed), len(results), ", ".join(failed)))
+        return results
+
+    def close(self):
+        """Close the sessions of every neighbor."""
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+
+
+_default_pool = EapiSessionPool()
+
+
+def get_session_pool():
+    """Session pool shared by the EosHost objects of the process."""
+    return _default_pool
+
+
+def run_on_all(neighbors, commands, fmt="json", enable=True, max_workers=DEFAULT_MAX_WORKERS):
+    """Run commands on many neighbors concurrently through the shared session pool.
+
+    See EapiSessionPool.run_on_all().
+    """
+    return _default_pool.run_on_all(neighbors, commands, fmt=fmt, enable=enable, max_workers=max_workers)
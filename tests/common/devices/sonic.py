@@ -20,6 +20,7 @@ from tests.common.utilities import get_host_visible_vars, wait_until
 from tests.common.cache import cached
 from tests.common.helpers.constants import DEFAULT_ASIC_ID, DEFAULT_NAMESPACE
 from tests.common.helpers.platform_api.chassis import is_inband_port
+from tests.common.helpers.show_table import ShowTable, parse_column_positions, parse_show_table
 from tests.common.errors import RunAnsibleModuleFail
 from tests.common import constants
 from typing import Dict, Optional, TypedDict
@@ -1638,63 +1639,12 @@ Totals               6450                 6449
             Returns a list. Each item is a tuple with two elements. The first element is start position of a column.
             The second element is the end position of the column.
         """
-        prev = ' ',
-        positions = []
-        for pos, char in enumerate(sep_line + ' '):
-            if char == sep_char:
-                if char != prev:
-                    left = pos
-            else:
-                if char != prev:
-                    right = pos
-                    positions.append((left, right))
-            prev = char
-        return positions
+        return parse_column_positions(sep_line, sep_char)
 
     def _parse_show(self, output_lines, header_len=1):
+        return parse_show_table(output_lines, header_len)
 
-        result = []
-
-        sep_line_pattern = re.compile(r"^( *-+ *)+$")
-        sep_line_found = False
-        for idx, line in enumerate(output_lines):
-            if sep_line_pattern.match(line):
-                sep_line_found = True
-                header_lines = output_lines[idx - header_len:idx]
-                sep_line = output_lines[idx]
-                content_lines = output_lines[idx + 1:]
-                break
-
-        if not sep_line_found:
-            logging.error('Failed to find separation line in the show command output')
-            return result
-
-        try:
-            positions = self._parse_column_positions(sep_line)
-        except Exception as e:
-            logging.error('Possibly bad command output, exception: {}'.format(repr(e)))
-            return result
-
-        headers = []
-        for (left, right) in positions:
-            header = " ".join([header_line[left:right].strip().lower() for header_line in header_lines]).strip()
-            headers.append(header)
-
-        for content_line in content_lines:
-            # When an empty line is encountered while parsing the tabulate content, it is highly possible that the
-            # tabulate content has been drained. The empty line and rest of the lines should not be parsed.
-            if len(content_line) == 0:
-                break
-            item = {}
-            for idx, (left, right) in enumerate(positions):
-                k = headers[idx]
-                v = content_line[left:right].strip()
-                item[k] = v
-            result.append(item)
-
-        return result
-
-    def show_and_parse(self, show_cmd, header_len=1, **kwargs):
+    def show_and_parse(self, show_cmd, header_len=1, output_format="dicts", **kwargs):
         """Run a show command and parse the output using a generic pattern.
 
         This method can adapt to the column changes as long as the output format follows the pattern of
@@ -1758,6 +1708,10 @@ Totals               6450                 6449
 
         Args:
             show_cmd: The show command that will be executed.
+            header_len: Number of header lines above the separation line.
+            output_format: Format of the parsed output, "dicts" by default. For large outputs, like 'show mac' with
+                lots of FDB entries, "columns" returns a dictionary of lists keyed by the column headers, and "table"
+                returns a ShowTable object for iterating rows lazily by its rows() or dicts() methods.
 
         Returns:
             Return the parsed output of the show command in a list of dictionary. Each list item is a dictionary,
@@ -1771,7 +1725,14 @@ Totals               6450                 6449
             output = output[start_line_index:]
         else:
             output = output[start_line_index:end_line_index]
-        return self._parse_show(output, header_len)
+        if output_format == "dicts":
+            return self._parse_show(output, header_len)
+        table = ShowTable(output, header_len)
+        if output_format == "columns":
+            return table.columns()
+        if output_format == "table":
+            return table
+        raise ValueError("Unsupported output format '{}' of show_and_parse".format(output_format))
 
     @cached(name='mg_facts')
     def get_extended_minigraph_facts(self, tbinfo, namespace=DEFAULT_NAMESPACE):
@@ -185,6 +185,22 @@ class SonicAsic(object):
         cmd = "{} {}".format(self.sonic_db_cli, sonic_db_cmd)
         return self.sonichost.command(cmd, verbose=False)
 
+    def sonic_db_batch(self, *module_args, **complex_args):
+        """ Wrapper method for sonic_db_batch ansible module.
+        If number of asics in SonicHost are more than 1, then add 'namespace' param for this Asic
+
+        Args:
+            module_args: other ansible module args passed from the caller
+            complex_args: other ansible keyword args
+
+        Returns:
+            if SonicHost has only 1 asic, then return the results of the operations on the global namespace,
+            else the results of the operations on the namespace of my asic_index.
+        """
+        if self.sonichost.is_multi_asic:
+            complex_args['namespace'] = self.namespace
+        return self.sonichost.sonic_db_batch(*module_args, **complex_args)
+
     def run_redis_cli_cmd(self, redis_cmd):
         if self.namespace != DEFAULT_NAMESPACE:
             redis_cli = "/usr/bin/redis-cli"
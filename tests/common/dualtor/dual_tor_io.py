@@ -1,4 +1,6 @@
 import datetime
+import importlib.util
+import sys
 import time
 import socket
 import random
@@ -14,10 +16,11 @@ import ptf.testutils as testutils
 from itertools import groupby
 
 from tests.common.dualtor.dual_tor_common import CableType
+from tests.common.dualtor.paced_sender import PacedSender
 from tests.common.helpers.constants import ARP_RESPONDER_DEFAULT_CONFIG
 from tests.common.utilities import wait_until, convert_scapy_packet_to_bytes
 from natsort import natsorted
-from collections import defaultdict
+from collections import Counter, defaultdict
 
 TCP_DST_PORT = 5000
 SOCKET_RECV_BUFFER_SIZE = 10 * 1024 * 1024
@@ -30,16 +33,42 @@ TEMPLATES_DIR = "templates/"
 SUPERVISOR_CONFIG_DIR = "/etc/supervisor/conf.d/"
 DUAL_TOR_SNIFFER_CONF_TEMPL = "dual_tor_sniffer.conf.j2"
 DUAL_TOR_SNIFFER_CONF = "dual_tor_sniffer.conf"
+FLOW_ANALYZER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                  "../../../ansible/roles/test/files/ptftests/py3/flow_analyzer.py")
+SERVER_ADDRESS_FIELDS = {
+    "t1_to_server": "dst_ip",
+    "server_to_t1": "src_ip",
+    "t1_to_soc": "dst_ip",
+    "soc_to_t1": "src_ip",
+    "server_to_server": "src_ip",
+}
 
 logger = logging.getLogger(__name__)
 
 
+def _load_flow_analyzer():
+    """Load the flow analyzer shared with the advanced-reboot PTF test.
+
+    The module is registered in sys.modules, so that its functions can be run in a process pool.
+    """
+    if "flow_analyzer" in sys.modules:
+        return sys.modules["flow_analyzer"]
+    spec = importlib.util.spec_from_file_location("flow_analyzer", FLOW_ANALYZER_PATH)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+flow_analyzer = _load_flow_analyzer()
+
+
 class DualTorIO:
     """Class to conduct IO over ports in `active-standby` mode."""
 
     def __init__(self, activehost, standbyhost, ptfhost, ptfadapter, vmhost, tbinfo,
                  io_ready, tor_vlan_port=None, send_interval=0.01, cable_type=CableType.active_standby,
-                 random_dst=None):
+                 random_dst=None, send_batch_size=1):
         self.tor_pc_intf = None
         self.tor_vlan_intf = tor_vlan_port
         self.duthost = activehost
@@ -122,6 +151,8 @@ class DualTorIO:
             self.send_interval = send_interval
         # How many packets to be sent by sender thread
         logger.info("Using send interval {}".format(self.send_interval))
+        self.send_batch_size = send_batch_size
+        self.sender_stats = {}
         self.packets_to_send = min(int(self.time_to_listen / (self.send_interval * 2)), 45000)
         self.packets_sent_per_server = dict()
 
@@ -294,6 +325,8 @@ class DualTorIO:
         logger.info("-"*50)
 
         self.packets_list = []
+        # Server address of each packet, see get_server_address()
+        self.packet_server_addrs = []
 
         # Create packet #1 for each server/soc and append to the list,
         # then packet #2 for each server/soc, etc.
@@ -328,6 +361,7 @@ class DualTorIO:
                 packet[scapyall.TCP].chksum = None
                 packet[scapyall.IP].chksum = None
                 self.packets_list.append((ptf_t1_src_intf, convert_scapy_packet_to_bytes(packet)))
+                self.packet_server_addrs.append(server_ip)
 
         self.sent_pkt_dst_mac = self.dut_mac
         self.received_pkt_src_mac = [self.vlan_mac]
@@ -371,6 +405,8 @@ class DualTorIO:
         logger.info("-"*50)
 
         self.packets_list = []
+        # Server address of each packet, see get_server_address()
+        self.packet_server_addrs = []
 
         # Create packet #1 for each server/soc and append to the list,
         # then packet #2 for each server/soc, etc.
@@ -405,6 +441,7 @@ class DualTorIO:
                 packet[scapyall.TCP].chksum = None
                 packet[scapyall.IP].chksum = None
                 self.packets_list.append((ptf_src_intf, convert_scapy_packet_to_bytes(packet)))
+                self.packet_server_addrs.append(server_ip)
         self.sent_pkt_dst_mac = self.vlan_mac
         self.received_pkt_src_mac = [self.active_mac, self.standby_mac]
 
@@ -494,6 +531,8 @@ class DualTorIO:
         logger.info("-"*50)
 
         self.packets_list = []
+        # Server address of each packet, see get_server_address()
+        self.packet_server_addrs = []
         tcp_tx_packet_orig = testutils.simple_tcp_packet(
             eth_dst=self.vlan_mac,
             tcp_dport=TCP_DST_PORT,
@@ -513,6 +552,7 @@ class DualTorIO:
             packet[scapyall.TCP].chksum = None
             packet[scapyall.IP].chksum = None
             self.packets_list.append((src_ptf_port, convert_scapy_packet_to_bytes(packet)))
+            self.packet_server_addrs.append(src_ip)
 
         self.sent_pkt_dst_mac = self.vlan_mac
         self.received_pkt_src_mac = [self.vlan_mac]
@@ -623,6 +663,10 @@ class DualTorIO:
         """Fetch the captured packet file generated by the ptf sniffer."""
         logger.info('Fetching pcap file from ptf')
         self.ptfhost.fetch(src=self.capture_pcap, dest='/tmp/', flat=True, fail_on_missing=False)
+        if flow_analyzer.HAS_NUMPY:
+            # The capture is parsed by flow_analyzer in examine_flow(), without loading scapy packets
+            self.all_packets = None
+            return
         self.all_packets = scapyall.rdpcap(self.capture_pcap)
         logger.info("Number of all packets captured: {}".format(len(self.all_packets)))
 
@@ -630,24 +674,20 @@ class DualTorIO:
         """Send packets generated."""
         logger.info("Sender waiting to send {} packets".format(len(self.packets_list)))
 
+        sender = PacedSender(self.dataplane, self.send_interval, batch_size=self.send_batch_size)
+
         sender_start = datetime.datetime.now()
         logger.info("Sender started at {}".format(str(sender_start)))
 
         # Signal data_plane_utils that sender and sniffer threads have begun
         self.io_ready_event.set()
 
-        sent_packets_count = 0
-        for entry in self.packets_list:
-            _, packet = entry
-            server_addr = self.get_server_address(scapyall.Ether(convert_scapy_packet_to_bytes(packet)))
-            time.sleep(self.send_interval)
-            # the stop_early flag can be set to True by data_plane_utils to stop prematurely
-            if self.stop_early:
-                break
-            testutils.send_packet(self.ptfadapter, *entry)
-            self.packets_sent_per_server[server_addr] =\
-                self.packets_sent_per_server.get(server_addr, 0) + 1
-            sent_packets_count = sent_packets_count + 1
+        # the stop_early flag can be set to True by data_plane_utils to stop prematurely
+        sent_packets_count = sender.send(self.packets_list, should_stop=lambda: self.stop_early)
+        for server_addr, count in Counter(self.packet_server_addrs[:sent_packets_count]).items():
+            self.packets_sent_per_server[server_addr] = self.packets_sent_per_server.get(server_addr, 0) + count
+        sender.log_stats()
+        self.sender_stats = sender.stats
 
         # wait 10s so all packets could be forwarded
         time.sleep(10)
@@ -688,6 +728,16 @@ class DualTorIO:
         examine_start = datetime.datetime.now()
         logger.info("Packet flow examine started {}".format(str(examine_start)))
 
+        if self.all_packets is None:
+            try:
+                self.examine_captured_flow()
+                logger.info("Packet flow examine finished after {}".format(datetime.datetime.now() - examine_start))
+                return
+            except flow_analyzer.UnsupportedCapture as e:
+                logger.info("Failed to parse the capture by flow_analyzer: {}, loading it by scapy".format(e))
+                self.all_packets = scapyall.rdpcap(self.capture_pcap)
+                logger.info("Number of all packets captured: {}".format(len(self.all_packets)))
+
         if not self.all_packets:
             logger.error("self.all_packets not defined.")
             return None
@@ -742,6 +792,42 @@ class DualTorIO:
                         .format(server_ip, json.dumps(result, indent=4)))
             self.test_results[server_ip] = result
 
+    def examine_captured_flow(self):
+        """
+        @summary: Examine the capture file by flow_analyzer, the results are the same as examine_each_packet() gives
+            for the filtered scapy packets of each server.
+        @raise flow_analyzer.UnsupportedCapture: If the capture can't be parsed without scapy.
+        """
+        capture = flow_analyzer.read_flow_capture(self.capture_pcap, [self.sent_pkt_dst_mac],
+                                                  self.received_pkt_src_mac, sport=self.tcp_sport,
+                                                  dport=TCP_DST_PORT, payload_filler='X')
+        logger.info("Number of all packets captured: {}".format(capture.total))
+        logger.info("Number of filtered packets captured: {}".format(len(capture.payload_id)))
+        if len(capture.payload_id) == 0:
+            logger.error("Sniffer failed to capture any traffic")
+
+        logger.info("Measuring traffic disruptions...")
+        results, groups = flow_analyzer.analyze_server_flows(
+            capture, SERVER_ADDRESS_FIELDS[self.traffic_direction], self.packets_sent_per_server)
+        for server_ip, indexes in groups.items():
+            filename = '/tmp/capture_filtered_{}.pcap'.format(server_ip)
+            flow_analyzer.write_pcap(capture, filename, indexes)
+            logger.info("Filtered pcap dumped to {}".format(filename))
+
+        self.test_results = {}
+        for server_ip in natsorted(list(results.keys())):
+            result = results[server_ip]
+            logger.info("Server {} results:\n{}"
+                        .format(server_ip, json.dumps(result, indent=4)))
+            if result['received_packets'] == 0:
+                logger.error("Sniffer failed to filter any traffic from DUT")
+            if result['sent_packets'] < self.packets_sent_per_server.get(server_ip, 0):
+                logger.error('Not all sent packets were captured. '
+                             'Something went wrong!')
+                logger.error('Dumping server {} results and continuing:\n{}'
+                             .format(server_ip, json.dumps(result, indent=4)))
+            self.test_results[server_ip] = result
+
     def examine_each_packet(self, server_ip, packets):
         num_sent_packets = 0
         received_packet_list = list()
@@ -0,0 +1,126 @@
+"""Rate paced sender of pre-serialized packets through the PTF dataplane.
+
+Sleeping for the send interval between packets makes the rate drift: the time spent in sending and the oversleeping
+of time.sleep() add up to every interval. PacedSender sends each batch of packets at a deadline computed from the
+start time on the monotonic clock instead, so the delays are not accumulated and a late batch is followed by batches
+catching up with the schedule.
+"""
+import logging
+import math
+import time
+
+logger = logging.getLogger(__name__)
+
+# time.sleep() may wake up late, the sender sleeps until this long before the deadline and spins for the rest
+DEFAULT_SPIN_TIME = 0.0002
+
+
+class PacedSender(object):
+    """Send packets at a constant rate, in batches of packets sent back to back.
+
+    Attributes:
+        stats: Dictionary of the statistics of the last send(), see get_stats().
+    """
+
+    def __init__(self, dataplane, interval, batch_size=1, spin_time=DEFAULT_SPIN_TIME, clock=time.monotonic,
+                 sleep=time.sleep):
+        """
+        Args:
+            dataplane: PTF dataplane, usually ptfadapter.dataplane.
+            interval (float): Target interval between two packets in seconds.
+            batch_size (int): Number of packets sent at each deadline, the batches are sent every
+                interval * batch_size seconds.
+            spin_time (float): Time before the deadline spent in busy waiting instead of sleeping.
+            clock (function): Monotonic clock returning the time in seconds.
+            sleep (function): Sleep for a number of seconds.
+        """
+        if interval <= 0 or batch_size < 1:
+            raise ValueError("Invalid interval {} or batch size {}".format(interval, batch_size))
+        self.dataplane = dataplane
+        self.interval = interval
+        self.batch_size = batch_size
+        self.spin_time = spin_time
+        self.clock = clock
+        self.sleep = sleep
+        self.stats = {}
+
+    def send(self, packets, should_stop=None):
+        """Send the packets according to the schedule.
+
+        Args:
+            packets (list): List of (ptf_port, packet_bytes) tuples, packets must be serialized before.
+            should_stop (function): Called before each batch, sending stops if it returns True.
+
+        Returns:
+            int: Number of packets sent.
+        """
+        send = self.dataplane.send
+        clock = self.clock
+        batch_interval = self.interval * self.batch_size
+        spin_time = self.spin_time
+        send_times = []
+        sent_count = 0
+
+        start = clock()
+        for batch_start in range(0, len(packets), self.batch_size):
+            deadline = start + len(send_times) * batch_interval
+            remaining = deadline - clock()
+            if remaining > spin_time:
+                self.sleep(remaining - spin_time)
+            while clock() < deadline:
+                pass
+            if should_stop and should_stop():
+                break
+            send_times.append(clock())
+            for port, packet in packets[batch_start:batch_start + self.batch_size]:
+                send(0, port, packet)
+                sent_count += 1
+
+        self.stats = self.get_stats(start, send_times, sent_count)
+        return sent_count
+
+    def get_stats(self, start, send_times, sent_count):
+        """Compute statistics of the sending.
+
+        Args:
+            start (float): Start time of the schedule.
+            send_times (list): Times when the sending of each batch started.
+            sent_count (int): Number of packets sent.
+
+        Returns:
+            dict: 'target_pps' and 'achieved_pps' are the configured and the measured rate of packets, the rate is
+                measured from the first to the last batch. 'jitter_mean' and 'jitter_max' are the mean and max
+                deviation of the intervals between batches from the target interval, 'lateness_max' is the max
+                delay of a batch after its deadline, all in seconds.
+        """
+        batch_interval = self.interval * self.batch_size
+        stats = {
+            'sent_packets': sent_count,
+            'target_pps': 1.0 / self.interval,
+            'achieved_pps': None,
+            'jitter_mean': 0.0,
+            'jitter_max': 0.0,
+            'lateness_max': max([t - (start + i * batch_interval) for i, t in enumerate(send_times)], default=0.0),
+        }
+        if len(send_times) > 1:
+            span = send_times[-1] - send_times[0]
+            # Packets of the last batch are sent at the end of the span
+            last_batch_count = sent_count - (len(send_times) - 1) * self.batch_size
+            stats['achieved_pps'] = (sent_count - last_batch_count) / span if span > 0 else math.inf
+            jitters = [abs(curr - prev - batch_interval) for prev, curr in zip(send_times, send_times[1:])]
+            stats['jitter_mean'] = sum(jitters) / len(jitters)
+            stats['jitter_max'] = max(jitters)
+        return stats
+
+    def log_stats(self):
+        """Log statistics of the last send()."""
+        stats = self.stats
+        if not stats:
+            return
+        achieved_pps = stats['achieved_pps']
+        logger.info("Sent {} packets, target rate {:.1f} pps, achieved rate {} pps, jitter mean {:.1f}us "
+                    "max {:.1f}us, max lateness {:.1f}us".format(
+                        stats['sent_packets'], stats['target_pps'],
+                        "{:.1f}".format(achieved_pps) if achieved_pps is not None else "N/A",
+                        stats['jitter_mean'] * 10 ** 6, stats['jitter_max'] * 10 ** 6,
+                        stats['lateness_max'] * 10 ** 6))
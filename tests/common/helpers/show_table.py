@@ -0,0 +1,120 @@
+"""Parser for fixed-width tables printed by SONiC show commands.
+
+For example, part of the output of command 'show interface status':
+
+          Interface            Lanes    Speed    MTU    FEC    Alias             Vlan    Oper    Admin
+    ---------------  ---------------  -------  -----  -----  -------  ---------------  ------  -------
+          Ethernet0          0,1,2,3      40G   9100    N/A     etp1  PortChannel0002      up       up
+
+The table has header lines, then a separation line with '-' under each column header. Both header and column
+content are within the width of '-' chars for that column. Column positions are computed once from the separation
+line and reused for all the content lines.
+"""
+import collections
+import logging
+import re
+from operator import itemgetter
+
+logger = logging.getLogger(__name__)
+
+SEP_LINE_PATTERN = re.compile(r"^( *-+ *)+$")
+
+
+def parse_column_positions(sep_line, sep_char='-'):
+    """Parse the position of each columns in the command output
+
+    Args:
+        sep_line: The output line separating actual data and column headers
+        sep_char: The character used in separation line. Defaults to '-'.
+
+    Returns:
+        Returns a list. Each item is a tuple with two elements. The first element is start position of a column.
+        The second element is the end position of the column.
+    """
+    return [match.span() for match in re.finditer("{}+".format(re.escape(sep_char)), sep_line)]
+
+
+class ShowTable(object):
+    """Table found in the output lines of a show command.
+
+    The output lines can be any iterable, like a generator reading lines from a file. Lines are consumed until the
+    separation line is found. Content lines are consumed lazily by rows(), dicts() or columns(), so only one of them
+    can be used for a table. Parsing stops at the first empty line after the separation line, when an empty line is
+    encountered it is highly possible that the tabulate content has been drained.
+
+    Attributes:
+        headers: List of column headers in lowercase. Multiple header lines of a column are joined by space.
+        positions: List of (start, end) positions of the columns.
+        found: Whether the separation line was found.
+    """
+
+    def __init__(self, output_lines, header_len=1):
+        self.headers = []
+        self.positions = []
+        self.found = False
+        self._lines = iter(output_lines)
+        self._cut = None
+
+        header_lines = collections.deque(maxlen=header_len)
+        for line in self._lines:
+            if SEP_LINE_PATTERN.match(line):
+                self.found = True
+                break
+            header_lines.append(line)
+        if not self.found:
+            logger.error('Failed to find separation line in the show command output')
+            return
+
+        self.positions = parse_column_positions(line)
+        self.headers = [" ".join([header_line[left:right].strip().lower() for header_line in header_lines]).strip()
+                        for left, right in self.positions]
+        # itemgetter with slices cuts a line into a tuple of all the column values in one call
+        slices = [slice(left, right) for left, right in self.positions]
+        if len(slices) == 1:
+            self._cut = lambda line: (line[slices[0]],)
+        else:
+            self._cut = itemgetter(*slices)
+
+    def _content_lines(self):
+        if not self.found:
+            return
+        for line in self._lines:
+            if len(line) == 0:
+                break
+            yield line
+
+    def rows(self):
+        """Yield each content line as a tuple of column values, in the order of headers."""
+        cut = self._cut
+        for line in self._content_lines():
+            yield tuple(map(str.strip, cut(line)))
+
+    def dicts(self):
+        """Yield each content line as a dictionary. Keys of the dictionary are the column headers."""
+        headers = self.headers
+        for row in self.rows():
+            yield dict(zip(headers, row))
+
+    def columns(self):
+        """Get the content as a dictionary of lists. Keys of the dictionary are the column headers.
+
+        A list holds the values of a column, in the order of content lines. If column headers are duplicated, the
+        last column of them is kept, same as in the dictionaries yielded by dicts().
+        """
+        content_lines = list(self._content_lines())
+        return {header: [line[left:right].strip() for line in content_lines]
+                for header, (left, right) in zip(self.headers, self.positions)}
+
+
+def parse_show_table(output_lines, header_len=1):
+    """Parse the table in show command output into a list of dictionaries.
+
+    Args:
+        output_lines: Lines of the show command output.
+        header_len: Number of header lines above the separation line.
+
+    Returns:
+        List of dictionaries, one for each content line. Keys of the dictionaries are the column headers in lowercase.
+        Empty list if the separation line is not found.
+    """
+    return list(ShowTable(output_lines, header_len).dicts())
@@ -173,6 +173,85 @@ class SonicDbCli(object):
             else:
                 return result['stdout'].splitlines()
 
+    def batch(self, operations):
+        """
+        Runs a batch of read operations with the sonic_db_batch module, in one round trip to the host.
+
+        All the HGETALL and HGET of the batch are sent in one redis pipeline per database and keys are looked up
+        with SCAN instead of KEYS.
+
+        Args:
+            operations: List of operations, see ansible/library/sonic_db_batch.py. 'db' defaults to the database
+                of this object.
+
+        Returns:
+            List of the results of the operations.
+
+        """
+        operations = [dict(operation) for operation in operations]
+        for operation in operations:
+            operation.setdefault('db', self.database)
+        logger.debug("SONIC-DB-BATCH: %d operations", len(operations))
+        return self.host.sonic_db_batch(operations=operations)['results']
+
+    def hget_all_many(self, keys):
+        """
+        Gets the hashes of many keys in one batch.
+
+        Args:
+            keys: full names of the keys to get.
+
+        Returns:
+            Dictionary of the hash of every key, the hash is empty if the key is not present.
+
+        """
+        keys = list(keys)
+        if not keys:
+            return {}
+        return self.batch([{'op': 'hgetall', 'keys': keys}])[0]
+
+    def hget_key_values(self, items):
+        """
+        Gets the values of many fields in one batch.
+
+        Args:
+            items: list of (key, field) tuples.
+
+        Returns:
+            List of the values in the order of items, None if the key or field is not present.
+
+        """
+        items = [list(item) for item in items]
+        if not items:
+            return []
+        return self.batch([{'op': 'hget', 'items': items}])[0]
+
+    def scan_keys(self, pattern):
+        """
+        Gets the keys matching a pattern with SCAN, which doesn't block redis like KEYS.
+
+        Args:
+            pattern: redis glob-style pattern.
+
+        Returns:
+            Sorted list of the keys.
+
+        """
+        return self.batch([{'op': 'scan', 'pattern': pattern}])[0]
+
+    def scan_hget_all(self, pattern):
+        """
+        Gets the hashes of the keys matching a pattern in one batch.
+
+        Args:
+            pattern: redis glob-style pattern.
+
+        Returns:
+            Dictionary of the hash of every matching key.
+
+        """
+        return self.batch([{'op': 'scan', 'pattern': pattern, 'hgetall': True}])[0]
+
     def dump(self, table):
         """
         Dumps and entire table with sonic-db-dump.
@@ -274,6 +353,32 @@ def redis_del(duthost, db, *keys):
         )
 
 
+def redis_batch(duthost, operations, **kwargs):
+    """Run read operations with the sonic_db_batch module in one round trip.
+
+    See ansible/library/sonic_db_batch.py for the operations, kwargs (e.g.
+    asic_index) are passed to the module call. Returns the result list, or
+    a list of result lists (one per asic) with asic_index="all".
+    """
+    res = duthost.sonic_db_batch(operations=operations, **kwargs)
+    if isinstance(res, list):
+        return [r['results'] for r in res]
+    return res['results']
+
+
+def redis_hgetall_many(duthost, db, keys):
+    """HGETALL of many keys in one pipeline → {key: dict}; empty dict on miss."""
+    keys = list(keys)
+    if not keys:
+        return {}
+    return redis_batch(duthost, [{'op': 'hgetall', 'db': db, 'keys': keys}])[0]
+
+
+def redis_scan(duthost, db, pattern):
+    """SCAN pattern → sorted list of key names, without blocking redis like KEYS."""
+    return redis_batch(duthost, [{'op': 'scan', 'db': db, 'pattern': pattern}])[0]
+
+
 def redis_keys(duthost, db, pattern):
     """KEYS pattern → list of key names."""
     r = duthost.shell(
@@ -401,6 +506,21 @@ class AsicDbCli(SonicDbCli):
         result = self.host.sonichost.shell(cmd)
         return result['stdout']
 
+    def get_neighbor_values(self, neighbor_keys, field):
+        """
+        Returns a value of a field for many entries of the neighbor table, in one batch.
+
+        Args:
+            neighbor_keys: The full keys of the neighbor table.
+            field: The field to get in the neighbor hash table.
+
+        Returns:
+            Dictionary of the value of every key, None if the field is not present.
+        """
+        neighbor_keys = list(neighbor_keys)
+        values = self.hget_key_values([(key, field) for key in neighbor_keys])
+        return dict(zip(neighbor_keys, values))
+
     def get_hostif_table(self, refresh=False):
         """
         Returns a fresh hostif table if refresh is true, else returns the entry from cache.  Initializes instance
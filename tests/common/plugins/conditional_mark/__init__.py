@@ -8,6 +8,7 @@ import logging
 import os
 import re
 import subprocess
+import time
 import yaml
 import glob
 import pytest
@@ -21,6 +22,8 @@ logger = logging.getLogger(__name__)
 DEFAULT_CONDITIONS_FILE = 'common/plugins/conditional_mark/tests_mark_conditions*.yaml'
 ASIC_NAME_PATH = '/../../../../ansible/group_vars/sonic/variables'
 ANSIBLE_LIBRARY_PATH = os.path.realpath(os.path.join(os.path.dirname(__file__), '../../../../ansible/library'))
+ISSUE_URL_PATTERN = re.compile('https?://[^ )]+')
+DEFAULT_ISSUE_STATUS_TTL = 3600
 MARK_CONDITIONS_CONSTANTS = {
     "QOS_SAI_TOPO": ['t0', 't0-64', 't0-116', 't0-118', 't0-35', 't0-56', 't0-80',
                      't0-standalone-32', 't0-standalone-64', 't0-standalone-128', 't0-standalone-256',
@@ -69,6 +72,15 @@ def pytest_addoption(parser):
         help="Dynamically update the skip reason based on the conditions, "
              "by default it will not use the static reason specified in the mark conditions file")
 
+    parser.addoption(
+        '--issue_status_ttl',
+        action='store',
+        dest='issue_status_ttl',
+        type=int,
+        default=DEFAULT_ISSUE_STATUS_TTL,
+        help="Time in seconds for reusing the cached state of issues referenced in the mark conditions files. "
+             "0 means always checking the issue state again.")
+
 
 def load_conditions(session):
     """Load the content from mark conditions file
@@ -450,12 +462,61 @@ def load_basic_facts(dut_name, session):
     return results
 
 
-def find_all_matches(nodeid, conditions, session, dynamic_update_skip_reason, basic_facts):
+class ConditionsIndex(object):
+    """Index of the mark conditions for finding the entries matching a test case name.
+
+    Literal entries are stored in a prefix trie, so the entries which are prefixes of a test case name are found by
+    walking the trie along the name once, instead of checking all the entries. Regular expression entries are
+    compiled once.
+    """
+
+    def __init__(self, conditions):
+        self.conditions = conditions
+        # Each trie node is a dict, key None of a node holds indexes of the entries ending at the node
+        self._trie = {}
+        self._regex_entries = []
+
+        for index, condition in enumerate(conditions):
+            # condition is a dict which has only one item, so we use condition.keys()[0] to get its key.
+            condition_entry = list(condition.keys())[0]
+            condition_items = condition[condition_entry]
+            if "regex" in condition_items.keys():
+                assert isinstance(condition_items["regex"], bool), \
+                    "The value of 'regex' in the mark conditions yaml should be bool type."
+                if condition_items["regex"] is True:
+                    self._regex_entries.append((index, re.compile(condition_entry)))
+                continue
+
+            if "use_longest" in condition_items.keys():
+                assert isinstance(condition_items["use_longest"], bool), \
+                    "The value of 'use_longest' in the mark conditions yaml should be bool type."
+            node = self._trie
+            for char in condition_entry:
+                node = node.setdefault(char, {})
+            node.setdefault(None, []).append(index)
+
+    def find_matched_indexes(self, nodeid):
+        """Get indexes of the entries matching the test case name, in the order of the conditions list."""
+        indexes = []
+        node = self._trie
+        indexes.extend(node.get(None, []))
+        for char in nodeid:
+            node = node.get(char)
+            if node is None:
+                break
+            indexes.extend(node.get(None, []))
+        indexes.extend(index for index, pattern in self._regex_entries if pattern.search(nodeid))
+        return sorted(indexes)
+
+
+def find_all_matches(nodeid, conditions, session, dynamic_update_skip_reason, basic_facts, conditions_index=None):
     """Find all matches of the given test case name in the conditions list.
 
     Args:
         nodeid (str): Full test case name
         conditions (list): List of conditions
+        conditions_index (ConditionsIndex, optional): Index of the conditions list. It should be built once and
+            reused for all the test cases. Defaults to None, then the index is built for this call.
 
     Returns:
         list: All match test case name or None if not found
@@ -465,30 +526,15 @@ def find_all_matches(nodeid, conditions, session, dynamic_update_skip_reason, ba
     conditional_marks = {}
     matches = []
 
-    for condition in conditions:
-        # condition is a dict which has only one item, so we use condition.keys()[0] to get its key.
+    if conditions_index is None:
+        conditions_index = ConditionsIndex(conditions)
+    for index in conditions_index.find_matched_indexes(nodeid):
+        condition = conditions[index]
         condition_entry = list(condition.keys())[0]
         condition_items = condition[condition_entry]
-        if "regex" in condition_items.keys():
-            assert isinstance(condition_items["regex"], bool), \
-                "The value of 'regex' in the mark conditions yaml should be bool type."
-            if condition_items["regex"] is True:
-                match = re.search(condition_entry, nodeid)
-            else:
-                match = None
-
-        elif "use_longest" in condition_items.keys():
-            assert isinstance(condition_items["use_longest"], bool), \
-                "The value of 'use_longest' in the mark conditions yaml should be bool type."
-            if nodeid.startswith(condition_entry) and condition_items["use_longest"] is True:
-                all_matches = []
-
-            match = nodeid.startswith(condition_entry)
-        else:
-            match = nodeid.startswith(condition_entry)
-
-        if match:
-            all_matches.append(condition)
+        if "regex" not in condition_items.keys() and condition_items.get("use_longest") is True:
+            all_matches = []
+        all_matches.append(condition)
 
     for match in all_matches:
         case_starting_substring = list(match.keys())[0]
@@ -529,6 +575,89 @@ def find_all_matches(nodeid, conditions, session, dynamic_update_skip_reason, ba
     return matches
 
 
+# Compiled code of condition strings
+_compiled_conditions = {}
+# Evaluation results of raw condition strings, valid for the basic facts and session they were evaluated with
+_condition_results = {"basic_facts": None, "session": None, "results": {}}
+# Issue states resolved in current session, to avoid reading pytest cache for every condition
+_resolved_issues = {"session": None, "status": {}}
+
+
+def collect_issue_urls(conditions):
+    """Collect URLs of all the issues referenced by the conditions.
+
+    Args:
+        conditions (list): List of conditions loaded from the mark conditions files.
+
+    Returns:
+        set: Issue URLs.
+    """
+    issue_urls = set()
+    for condition in conditions:
+        for mark_details in list(condition.values())[0].values():
+            if not isinstance(mark_details, dict):
+                continue
+            mark_conditions = mark_details.get('conditions')
+            if not isinstance(mark_conditions, list):
+                mark_conditions = [mark_conditions]
+            for mark_condition in mark_conditions:
+                if isinstance(mark_condition, str):
+                    issue_urls.update(ISSUE_URL_PATTERN.findall(mark_condition))
+    return issue_urls
+
+
+def resolve_issues(issue_urls, session):
+    """Get state of the issues, check the issues which are not cached or cached longer than the TTL.
+
+    The issue states are cached in pytest cache as 'ISSUE_STATUS', value of each issue URL is a list of the issue
+    state and the time when it was checked.
+
+    Args:
+        issue_urls (iterable): Issue URLs.
+        session (obj): Pytest session object, for getting cached data.
+
+    Returns:
+        dict: Key is issue URL, value is True or False based on the issue state. Issues failed to be checked are
+            considered as active.
+    """
+    issue_urls = set(issue_urls)
+    if _resolved_issues["session"] is not session:
+        _resolved_issues["session"] = session
+        _resolved_issues["status"] = {}
+    elif issue_urls.issubset(_resolved_issues["status"]):
+        return _resolved_issues["status"]
+
+    ttl = getattr(session.config.option, 'issue_status_ttl', DEFAULT_ISSUE_STATUS_TTL)
+    if not isinstance(ttl, int):
+        ttl = DEFAULT_ISSUE_STATUS_TTL
+    cached = session.config.cache.get('ISSUE_STATUS', {})
+    if not isinstance(cached, dict):
+        cached = {}
+
+    now = time.time()
+    issue_status_cache = {url: value for url, value in cached.items()
+                          if isinstance(value, list) and len(value) == 2 and now - value[1] < ttl}
+    unknown_issues = sorted(url for url in issue_urls if url not in issue_status_cache)
+    if unknown_issues:
+        start = time.time()
+        proxies = session.config.cache.get('PROXIES', {})
+        results = check_issues(unknown_issues, proxies=proxies)
+        checked = {url: state for url, state in results.items() if state is not None}
+        logger.info('Resolved state of {}/{} issues in {:.2f} seconds'
+                    .format(len(checked), len(unknown_issues), time.time() - start))
+        # Issues failed to be checked, for example because of rate limiting, are not cached and checked again by
+        # next session
+        checked_time = time.time()
+        issue_status_cache.update({url: [state, checked_time] for url, state in checked.items()})
+        session.config.cache.set('ISSUE_STATUS', issue_status_cache)
+
+    status = {url: value[0] for url, value in issue_status_cache.items()}
+    # Issues failed to be checked are considered as resolved to active, they are not checked again in this session
+    status.update({url: True for url in issue_urls if url not in status})
+    _resolved_issues["status"] = status
+    return status
+
+
 def update_issue_status(condition_str, session):
     """Replace issue URL with 'True' or 'False' based on its active state.
 
@@ -544,19 +673,12 @@ def update_issue_status(condition_str, session):
     Returns:
         str: New condition string with issue URLs already replaced with 'True' or 'False'.
     """
-    issues = re.findall('https?://[^ )]+', condition_str)
+    issues = ISSUE_URL_PATTERN.findall(condition_str)
     if not issues:
         logger.debug('No issue specified in condition')
         return condition_str
 
-    issue_status_cache = session.config.cache.get('ISSUE_STATUS', {})
-    proxies = session.config.cache.get('PROXIES', {})
-
-    unknown_issues = [issue_url for issue_url in issues if issue_url not in issue_status_cache]
-    if unknown_issues:
-        results = check_issues(unknown_issues, proxies=proxies)
-        issue_status_cache.update(results)
-        session.config.cache.set('ISSUE_STATUS', issue_status_cache)
+    issue_status_cache = resolve_issues(issues, session)
 
     for issue_url in issues:
         if issue_url in issue_status_cache:
@@ -588,6 +710,20 @@ def evaluate_condition(dynamic_update_skip_reason, mark_details, condition, basi
     if condition is None or condition.strip() == '':
         return True    # Empty condition item will be evaluated as True. Equivalent to be ignored.
 
+    # Same condition is shared by lots of test cases, it is evaluated only once for the basic facts of a session
+    if _condition_results["basic_facts"] is not basic_facts or _condition_results["session"] is not session:
+        _condition_results.update({"basic_facts": basic_facts, "session": session, "results": {}})
+    condition_result = _condition_results["results"].get(condition)
+    if condition_result is None:
+        condition_result = _evaluate_condition_str(condition, basic_facts, session)
+        _condition_results["results"][condition] = condition_result
+
+    if condition_result and dynamic_update_skip_reason:
+        mark_details['reason'].append(condition)
+    return condition_result
+
+
+def _evaluate_condition_str(condition, basic_facts, session):
     condition_str = update_issue_status(condition, session)
     try:
         safe_facts = {k: v for k, v in basic_facts.items()}
@@ -599,11 +735,10 @@ def evaluate_condition(dynamic_update_skip_reason, mark_details, condition, basi
                 logger.warning("Variable %s not found in basic_facts, defaulting to None", var)
                 safe_globals[var] = None
 
-        condition_result = bool(eval(condition_str, safe_globals))
-
-        if condition_result and dynamic_update_skip_reason:
-            mark_details['reason'].append(condition)
-        return condition_result
+        code = _compiled_conditions.get(condition_str)
+        if code is None:
+            code = _compiled_conditions[condition_str] = compile(condition_str, '<condition>', 'eval')
+        return bool(eval(code, safe_globals))
     except Exception:
         raise RuntimeError('Failed to evaluate condition, raw_condition={}, condition_str={}'.format(
             condition,
@@ -700,6 +835,8 @@ def pytest_collection_modifyitems(session, config, items):
 
     # Lazily load DUT facts now that we know they are actually needed.
     get_basic_facts(session)
+    # Check all the issues referenced by the conditions at once, instead of checking them one condition by another
+    resolve_issues(collect_issue_urls(conditions), session)
 
     dut_name = get_dut_name(session)
     cached_facts_name = f'BASIC_FACTS_{dut_name}'
@@ -713,11 +850,13 @@ def pytest_collection_modifyitems(session, config, items):
     basic_facts['constants'] = MARK_CONDITIONS_CONSTANTS
     # Normalize nodeids: strip root directory prefix if present (pytest 9.0+ includes it)
     root_prefix = os.path.basename(str(session.config.rootpath)) + "/"
+    conditions_index = ConditionsIndex(conditions)
     for item in items:
         nodeid = item.nodeid
         if nodeid.startswith(root_prefix):
             nodeid = nodeid[len(root_prefix):]
-        all_matches = find_all_matches(nodeid, conditions, session, dynamic_update_skip_reason, basic_facts)
+        all_matches = find_all_matches(nodeid, conditions, session, dynamic_update_skip_reason, basic_facts,
+                                       conditions_index=conditions_index)
 
         if all_matches:
             logger.debug('Found match "{}" for test case "{}"'.format(all_matches, item.nodeid))
@@ -1,17 +1,26 @@
 """For checking issue state based on supplied issue URL.
 """
 import logging
-import multiprocessing
 import os
 import re
+import threading
+import time
 from abc import ABCMeta, abstractmethod
-from urllib.parse import urlencode
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlencode, urlparse
 
 import requests
 import six
 
 logger = logging.getLogger(__name__)
 
+# Max number of issues checked at the same time
+MAX_CONCURRENT_CHECKS = 8
+# Min interval in seconds between starting checks of issues on the same host
+MIN_CHECK_INTERVAL = 0.1
+# Max time in seconds for checking all the issues
+CHECK_TIMEOUT = 60
+
 
 class IssueCheckerBase(six.with_metaclass(ABCMeta, object)):
     """Base class for issue checker
@@ -23,7 +32,7 @@ class IssueCheckerBase(six.with_metaclass(ABCMeta, object)):
     @abstractmethod
     def is_active(self):
         """
-        Check if the issue is still active
+        Check if the issue is still active, None if the issue state can't be retrieved
         """
         return True
 
@@ -43,10 +52,10 @@ class GitHubIssueChecker(IssueCheckerBase):
         """Check if the GitHub issue is still active.
 
         Attempt to fetch issue details via proxy if configured. If proxy fails, retry with direct GitHub API URL.
-        If unable to retrieve issue state, assume the issue is active (safe default).
 
         Returns:
-            bool: False if the issue is closed else True.
+            bool: False if the issue is closed else True. None if unable to retrieve issue state, for example when
+                rate limited by GitHub, the caller decides how to handle it.
         """
 
         def fetch_issue(url):
@@ -78,8 +87,7 @@ class GitHubIssueChecker(IssueCheckerBase):
                 issue_data = fetch_issue(direct_url)
             except Exception as direct_err:
                 logger.error(f"Access GitHub API directly failed for {direct_url}: {direct_err}")
-                logger.debug(f"Issue {direct_url} is considered active due to API access failure.")
-                return True
+                return None
 
         # Check issue state
         if issue_data.get('state') == 'closed':
@@ -115,35 +123,82 @@ def issue_checker_factory(url, proxies):
     return None
 
 
-def check_issues(issues, proxies=None):
+class HostRateLimiter(object):
+    """Space out the starts of requests sent to the same host.
+    """
+
+    def __init__(self, min_interval=MIN_CHECK_INTERVAL):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_start = {}
+
+    def wait(self, host):
+        """Block until a request can be sent to the host.
+        """
+        with self._lock:
+            now = time.time()
+            start = max(now, self._next_start.get(host, 0))
+            self._next_start[host] = start + self.min_interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def check_issues(issues, proxies=None, max_workers=MAX_CONCURRENT_CHECKS, min_interval=MIN_CHECK_INTERVAL,
+                 timeout=CHECK_TIMEOUT):
     """Check state of the specified issues.
 
-    Because issue state checking may involve sending HTTP request. This function uses parallel run to speed up
-    issue status checking.
+    Because issue state checking may involve sending HTTP request. This function checks the issues concurrently by
+    a bounded pool of threads, and requests to the same host are rate limited.
 
     Args:
         issues (list of str): List of issue URLs.
+        proxies (dict): Proxies used for accessing the issue websites.
+        max_workers (int): Max number of issues checked at the same time.
+        min_interval (float): Min interval in seconds between starting checks of issues on the same host.
+        timeout (float): Max time in seconds for checking all the issues. Issues not checked in time are not
+            included in the result.
 
     Returns:
-        dict: Issue state check result. Key is issue URL, value is either True or False based on issue state.
+        dict: Issue state check result. Key is issue URL, value is either True or False based on issue state, or
+            None if checking the issue failed.
     """
     checkers = [c for c in [issue_checker_factory(issue, proxies) for issue in issues] if c is not None]
     if not checkers:
         logger.error('No checker created for issues: {}'.format(issues))
         return {}
 
-    check_results = multiprocessing.Manager().dict()
-    check_procs = []
-
-    def _check_issue(checker, results):
-        results[checker.url] = checker.is_active()
-
-    for checker in checkers:
-        check_procs.append(multiprocessing.Process(target=_check_issue, args=(checker, check_results,)))
-
-    for proc in check_procs:
-        proc.start()
-    for proc in check_procs:
-        proc.join(timeout=60)
-
-    return dict(check_results)
+    rate_limiter = HostRateLimiter(min_interval)
+    latencies = {}
+
+    def _check_issue(checker):
+        rate_limiter.wait(urlparse(checker.url).netloc.lower())
+        start = time.time()
+        try:
+            return checker.is_active()
+        finally:
+            latencies[checker.url] = time.time() - start
+
+    start = time.time()
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(checkers)))
+    futures = {executor.submit(_check_issue, checker): checker.url for checker in checkers}
+    done, not_done = wait(futures, timeout=timeout)
+    # Checks not started in time are cancelled instead of running in background
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    check_results = {}
+    for future in done:
+        try:
+            check_results[futures[future]] = future.result()
+        except Exception as e:
+            logger.error('Checking issue {} failed: {}'.format(futures[future], repr(e)))
+            check_results[futures[future]] = None
+    if not_done:
+        logger.error('Checking issues timed out: {}'.format(sorted(futures[future] for future in not_done)))
+
+    latencies = dict(latencies)
+    if latencies:
+        slowest = max(latencies, key=latencies.get)
+        logger.info('Checked {} issues in {:.2f} seconds, average latency {:.2f} seconds, slowest {} {:.2f} seconds'
+                    .format(len(check_results), time.time() - start, sum(latencies.values()) / len(latencies),
+                            slowest, latencies[slowest]))
+    return check_results
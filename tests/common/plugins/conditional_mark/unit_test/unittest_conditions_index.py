@@ -0,0 +1,97 @@
+import glob
+import os
+import re
+import unittest
+from unittest.mock import MagicMock, patch
+
+import tests.common.plugins.conditional_mark as conditional_mark
+from tests.common.plugins.conditional_mark import ConditionsIndex, evaluate_conditions, load_conditions
+
+TESTS_ROOT = os.path.realpath(os.path.join(os.path.dirname(__file__), '../../../..'))
+CONDITIONS_FILES = os.path.join(TESTS_ROOT, 'common/plugins/conditional_mark/tests_mark_conditions*.yaml')
+
+
+def load_repo_conditions():
+    session_mock = MagicMock()
+    session_mock.config.option.mark_conditions_files = [CONDITIONS_FILES]
+    return load_conditions(session_mock)
+
+
+def repo_nodeids():
+    """Test case names built from the test scripts in the repo and from the entries of the conditions files."""
+    nodeids = set()
+    for path in glob.glob(os.path.join(TESTS_ROOT, '**/test_*.py'), recursive=True):
+        nodeids.add(os.path.relpath(path, TESTS_ROOT) + '::test_case[param-1]')
+    for condition in load_repo_conditions():
+        entry = list(condition.keys())[0]
+        nodeids.add(entry + '[param-1]')
+        nodeids.add(entry[:-1])
+    return sorted(nodeids)
+
+
+def brute_force_matched_indexes(nodeid, conditions):
+    """Find the matching entries by checking all of them, like find_all_matches did before it used the index."""
+    indexes = []
+    for index, condition in enumerate(conditions):
+        condition_entry = list(condition.keys())[0]
+        if condition[condition_entry].get('regex') is True:
+            if re.search(condition_entry, nodeid):
+                indexes.append(index)
+        elif 'regex' not in condition[condition_entry] and nodeid.startswith(condition_entry):
+            indexes.append(index)
+    return indexes
+
+
+class TestConditionsIndex(unittest.TestCase):
+    """Test cases for the index of conditions."""
+
+    def test_same_matches_as_brute_force(self):
+        conditions = load_repo_conditions()
+        index = ConditionsIndex(conditions)
+        nodeids = repo_nodeids()
+        self.assertGreater(len(nodeids), 1000)
+        for nodeid in nodeids:
+            self.assertEqual(index.find_matched_indexes(nodeid), brute_force_matched_indexes(nodeid, conditions),
+                             nodeid)
+
+    def test_regex_and_literal_entries(self):
+        conditions = [
+            {"bgp/test_bgp_fact.py": {"skip": {"reason": "literal"}}},
+            {"bgp/test_bgp_.*.py::test_.*": {"regex": True, "skip": {"reason": "regex"}}},
+            {"bgp/test_bgp_fact.py::test_bgp": {"regex": False, "skip": {"reason": "regex disabled"}}},
+            {"bgp": {"use_longest": False, "skip": {"reason": "short"}}},
+            {"acl": {"skip": {"reason": "other"}}},
+        ]
+        index = ConditionsIndex(conditions)
+        self.assertEqual(index.find_matched_indexes("bgp/test_bgp_fact.py::test_bgp_facts"), [0, 1, 3])
+        self.assertEqual(index.find_matched_indexes("bgp/test_bgp_fact.py"), [0, 3])
+        self.assertEqual(index.find_matched_indexes("bgp/test_other.py"), [3])
+        self.assertEqual(index.find_matched_indexes("vlan/test_vlan.py"), [])
+
+    def test_invalid_regex_value(self):
+        with self.assertRaises(AssertionError):
+            ConditionsIndex([{"bgp": {"regex": "yes", "skip": {"reason": "invalid"}}}])
+
+
+class TestConditionEvaluationCache(unittest.TestCase):
+    """Test cases for evaluating each condition once."""
+
+    def test_condition_evaluated_once(self):
+        session = MagicMock()
+        basic_facts = {"asic_type": "vs", "topo_type": "t0"}
+        with patch.object(conditional_mark, "update_issue_status", side_effect=lambda c, s: c) as update_mock:
+            for _ in range(3):
+                mark_details = {"reason": "static reason"}
+                self.assertTrue(evaluate_conditions(True, mark_details, ["asic_type in ['vs']", "topo_type == 't0'"],
+                                                    basic_facts, "AND", session))
+                self.assertEqual(mark_details["reason"], ["asic_type in ['vs']", "topo_type == 't0'"])
+            self.assertEqual(update_mock.call_count, 2)
+
+            # Different basic facts are evaluated again
+            self.assertFalse(evaluate_conditions(False, {}, "asic_type in ['vs']", {"asic_type": "mellanox"},
+                                                 "AND", session))
+            self.assertEqual(update_mock.call_count, 3)
+
+    def test_failed_condition(self):
+        with self.assertRaises(RuntimeError):
+            evaluate_conditions(False, {}, "undefined_fact == 1", {"asic_type": "vs"}, "AND", MagicMock())
@@ -0,0 +1,209 @@
+import json
+import os
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock, patch
+from urllib.parse import parse_qs, urlparse
+
+import tests.common.plugins.conditional_mark as conditional_mark
+from tests.common.plugins.conditional_mark import collect_issue_urls, resolve_issues, update_issue_status
+from tests.common.plugins.conditional_mark.issue import GitHubIssueChecker, HostRateLimiter, check_issues
+
+NO_PROXIES = {"http": None, "https": None}
+REQUEST_DELAY = 0.2
+
+
+class IssueProxyHandler(BaseHTTPRequestHandler):
+    """Stub of the GitHub issues proxy, issues with even number are closed and the others are open."""
+
+    def do_GET(self):
+        issue_url = parse_qs(urlparse(self.path).query)["github_issue_url"][0]
+        server = self.server
+        with server.lock:
+            server.requested.append(issue_url)
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        time.sleep(REQUEST_DELAY)
+        with server.lock:
+            server.active -= 1
+        state = "closed" if int(issue_url.rsplit("/", 1)[-1]) % 2 == 0 else "open"
+        body = json.dumps({"state": state}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeCache(object):
+    """In memory replacement of pytest cache, values are copied through JSON like the real one."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key, default):
+        return json.loads(self.data[key]) if key in self.data else default
+
+    def set(self, key, value):
+        self.data[key] = json.dumps(value)
+
+
+def make_session(cache=None, ttl=3600):
+    session = MagicMock()
+    session.config.cache = cache or FakeCache()
+    session.config.cache.set("PROXIES", NO_PROXIES)
+    session.config.option.issue_status_ttl = ttl
+    return session
+
+
+def issue_url(number):
+    return "https://github.com/sonic-net/sonic-buildimage/issues/{}".format(number)
+
+
+class TestIssueResolver(unittest.TestCase):
+    """Test cases for checking state of the issues referenced by the mark conditions."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), IssueProxyHandler)
+        cls.server.lock = threading.Lock()
+        cls.server_thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.server_thread.start()
+        cls.env = patch.dict(os.environ, {
+            "SONIC_AUTOMATION_PROXY_GITHUB_ISSUES_URL": "http://127.0.0.1:{}".format(cls.server.server_port)})
+        cls.env.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.env.stop()
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.server.requested = []
+        self.server.active = 0
+        self.server.max_active = 0
+
+    def test_check_issues_concurrently(self):
+        issues = [issue_url(number) for number in range(1, 9)]
+        start = time.time()
+        results = check_issues(issues, proxies=NO_PROXIES, max_workers=8, min_interval=0)
+        elapsed = time.time() - start
+
+        self.assertEqual(results, {url: int(url.rsplit("/", 1)[-1]) % 2 == 1 for url in issues})
+        self.assertGreater(self.server.max_active, 1)
+        self.assertLess(elapsed, REQUEST_DELAY * len(issues) / 2)
+
+    def test_check_issues_bounded_workers(self):
+        issues = [issue_url(number) for number in range(1, 7)]
+        check_issues(issues, proxies=NO_PROXIES, max_workers=2, min_interval=0)
+        self.assertLessEqual(self.server.max_active, 2)
+        self.assertEqual(sorted(self.server.requested), sorted(url.replace("github.com", "api.github.com/repos")
+                                                               for url in issues))
+
+    def test_check_issues_timeout(self):
+        results = check_issues([issue_url(1), issue_url(2), issue_url(3)], proxies=NO_PROXIES, max_workers=1,
+                               min_interval=0, timeout=REQUEST_DELAY / 2)
+        self.assertEqual(results, {})
+        # Checks still queued when timed out are cancelled
+        time.sleep(REQUEST_DELAY * 3)
+        self.assertEqual(len(self.server.requested), 1)
+
+    def test_failed_check_not_cached(self):
+        cache = FakeCache()
+        issues = [issue_url(1), issue_url(2), issue_url(5)]
+        is_active = GitHubIssueChecker.is_active
+
+        def _rate_limited(checker):
+            # Like the requests of an unauthenticated client rate limited by GitHub
+            return None if checker.url == issue_url(5) else is_active(checker)
+
+        with patch.object(GitHubIssueChecker, "is_active", autospec=True, side_effect=_rate_limited):
+            self.assertEqual(check_issues(issues, proxies=NO_PROXIES, min_interval=0),
+                             {issue_url(1): True, issue_url(2): False, issue_url(5): None})
+            status = resolve_issues(issues, make_session(cache))
+        # The failed issue is considered as active in this session, but not cached
+        self.assertEqual(status, {issue_url(1): True, issue_url(2): False, issue_url(5): True})
+        self.assertEqual(sorted(json.loads(cache.data["ISSUE_STATUS"])), [issue_url(1), issue_url(2)])
+
+        # Next session checks the failed issue again
+        self.server.requested = []
+        self.assertEqual(resolve_issues(issues, make_session(cache)),
+                         {issue_url(1): True, issue_url(2): False, issue_url(5): True})
+        self.assertEqual(self.server.requested, [issue_url(5).replace("github.com", "api.github.com/repos")])
+        self.assertEqual(sorted(json.loads(cache.data["ISSUE_STATUS"])), sorted(issues))
+
+    def test_github_checker_access_failure(self):
+        checker = GitHubIssueChecker(issue_url(1), NO_PROXIES)
+        with patch("tests.common.plugins.conditional_mark.issue.requests.get",
+                   side_effect=IOError("403 rate limit exceeded")):
+            self.assertIsNone(checker.is_active())
+
+    def test_host_rate_limiter(self):
+        rate_limiter = HostRateLimiter(min_interval=0.05)
+        start = time.time()
+        for _ in range(5):
+            rate_limiter.wait("github.com")
+        rate_limiter.wait("example.com")
+        elapsed = time.time() - start
+        self.assertGreaterEqual(elapsed, 0.05 * 4 - 0.01)
+        self.assertLess(elapsed, 0.05 * 5)
+
+    def test_collect_issue_urls(self):
+        conditions = [
+            {"a/test_a.py": {"skip": {"reason": "a", "conditions": "{} and asic_type in ['vs']".format(issue_url(1))}}},
+            {"b/test_b.py": {"xfail": {"reason": "b",
+                                       "conditions": ["release in ['202012']", "https://github.com/x/y/issues/2"]}}},
+            {"c/test_c.py": {"skip": {"reason": "c"}, "regex": True}},
+        ]
+        self.assertEqual(collect_issue_urls(conditions), {issue_url(1), "https://github.com/x/y/issues/2"})
+
+    def test_resolve_issues_cached_with_ttl(self):
+        cache = FakeCache()
+        issues = [issue_url(1), issue_url(2)]
+        status = resolve_issues(issues, make_session(cache))
+        self.assertEqual(status, {issue_url(1): True, issue_url(2): False})
+        self.assertEqual(len(self.server.requested), 2)
+
+        # Fresh entries in pytest cache are reused by the next session
+        self.assertEqual(resolve_issues(issues, make_session(cache)), status)
+        self.assertEqual(len(self.server.requested), 2)
+
+        # Only the expired entries are checked again
+        entries = json.loads(cache.data["ISSUE_STATUS"])
+        entries[issue_url(2)][1] -= 7200
+        cache.data["ISSUE_STATUS"] = json.dumps(entries)
+        self.assertEqual(resolve_issues(issues, make_session(cache)), status)
+        self.assertEqual(len(self.server.requested), 3)
+
+        # Entries cached without time by older versions are expired
+        cache.data["ISSUE_STATUS"] = json.dumps({issue_url(1): True, issue_url(2): False})
+        self.assertEqual(resolve_issues(issues, make_session(cache)), status)
+        self.assertEqual(len(self.server.requested), 5)
+
+        # TTL 0 always checks the issues again
+        self.assertEqual(resolve_issues(issues, make_session(cache, ttl=0)), status)
+        self.assertEqual(len(self.server.requested), 7)
+
+    def test_update_issue_status_resolved_once_in_session(self):
+        session = make_session()
+        resolve_issues([issue_url(3), issue_url(4)], session)
+        self.assertEqual(len(self.server.requested), 2)
+
+        with patch.object(conditional_mark, "check_issues", wraps=conditional_mark.check_issues) as check_mock:
+            self.assertEqual(update_issue_status("{} and True".format(issue_url(3)), session), "True and True")
+            self.assertEqual(update_issue_status(issue_url(4), session), "False")
+            check_mock.assert_not_called()
+
+    def test_unresolved_issue_is_active(self):
+        session = make_session()
+        self.assertEqual(update_issue_status("https://unknown.example.com/issues/1", session), "True")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,12 @@
 import logging
+import os
 import pytest
+from concurrent.futures import ProcessPoolExecutor
 
-from .loganalyzer import LogAnalyzer, DisableLogrotateCronContext
+from .loganalyzer import LogAnalyzer, LogAnalyzerError, DisableLogrotateCronContext, parse_log_files
 from tests.common.errors import RunAnsibleModuleFail
-from tests.common.helpers.parallel import parallel_run, reset_ansible_local_tmp
+from tests.common.helpers.assertions import pytest_assert
+from tests.common.helpers.parallel import fix_logging_handler_fork_lock, parallel_run, reset_ansible_local_tmp
 from .bug_handler_helper import get_bughandler_instance
 
 
@@ -52,6 +55,9 @@ def pytest_addoption(parser):
     parser.addoption("--force_load_err_list", action="store_true", default=False,
                      help="Load the user defined err msgs which is not included in the common ignore file,"
                           "even when disable_loganalyzer is true")
+    parser.addoption("--loganalyzer_parallel_parse", action="store_true", default=False,
+                     help="extract and fetch logs from all the DUTs in parallel first, "
+                          "then parse the fetched log files in a process pool")
 
 
 @reset_ansible_local_tmp
@@ -84,6 +90,55 @@ def analyze_logs(analyzers, markers, node=None, results=None, fail_test=True, st
     results[node.hostname] = analyzer_summary
 
 
+@reset_ansible_local_tmp
+def fetch_logs(analyzers, markers, node=None, results=None):
+    logging.info("Extract and fetch logs from host {}".format(node.hostname))
+    results[node.hostname] = analyzers[node.hostname].fetch_logs(markers[node.hostname])
+
+
+def analyze_logs_in_process_pool(analyzers, markers, analyzer_hosts, fail_test=True, store_la_logs=False):
+    """
+    Extract and fetch logs from all the hosts in parallel, then parse every fetched file in a process pool.
+    The results are the same as running analyze_logs on every host with parallel_run.
+    """
+    fetched_logs = parallel_run(fetch_logs, [analyzers, markers], {}, analyzer_hosts, timeout=240)
+    # parallel_run reports processes killed by timeout with the process name as the key
+    fetched_logs = {hostname: file_list for hostname, file_list in fetched_logs.items()
+                    if hostname in analyzers and isinstance(file_list, list)}
+    tasks = [(hostname, log_file) for hostname, file_list in fetched_logs.items() for log_file in file_list]
+    if not tasks:
+        return {}
+
+    # The pool forks the pytest process, like parallel_run make the logging handlers safe to fork first
+    fix_logging_handler_fork_lock()
+    with ProcessPoolExecutor(max_workers=min(len(tasks), os.cpu_count() or 1)) as executor:
+        futures = []
+        for hostname, log_file in tasks:
+            analyzer = analyzers[hostname]
+            futures.append(executor.submit(parse_log_files, markers[hostname].replace(' ', '_'),
+                                           analyzer.start_marker, [log_file], analyzer.match_regex,
+                                           analyzer.ignore_regex, analyzer.expect_regex))
+        parse_results = {}
+        for (hostname, log_file), future in zip(tasks, futures):
+            parse_results.setdefault(hostname, {}).update(future.result())
+
+    la_results = {}
+    failures = {}
+    for hostname, file_list in fetched_logs.items():
+        analyzer = analyzers[hostname]
+        analyzer.remove_fetched_logs(file_list)
+        try:
+            la_results[hostname] = analyzer.summarize(parse_results[hostname], fail=fail_test,
+                                                      store_la_logs=store_la_logs)
+        except LogAnalyzerError as err:
+            failures[hostname] = err
+
+    if failures:
+        pytest_assert(False, "Got matched syslog on hosts {}:\n{}".format(
+            list(failures.keys()), "\n".join("{}: {}".format(hostname, err) for hostname, err in failures.items())))
+    return la_results
+
+
 @pytest.fixture(scope="module")
 def log_rotate_modular_chassis(duthosts, request):
     # The process of logrotate will take up to 2 minutes each test for modular chassis.
@@ -150,13 +205,17 @@ def loganalyzer(duthosts, request, log_rotate_modular_chassis):
     analyzer_hosts = [duthost for duthost in analyzer_hosts if duthost.hostname in analyzers]
 
     logging.info("Starting to analyse on all DUTs")
-    la_results = parallel_run(
-        analyze_logs,
-        [analyzers, markers],
-        {'fail_test': fail_test, 'store_la_logs': store_la_logs},
-        analyzer_hosts,
-        timeout=240
-    )
+    if request.config.getoption("--loganalyzer_parallel_parse"):
+        la_results = analyze_logs_in_process_pool(analyzers, markers, analyzer_hosts,
+                                                  fail_test=fail_test, store_la_logs=store_la_logs)
+    else:
+        la_results = parallel_run(
+            analyze_logs,
+            [analyzers, markers],
+            {'fail_test': fail_test, 'store_la_logs': store_la_logs},
+            analyzer_hosts,
+            timeout=240
+        )
 
     timed_out_duts = [dut for dut in duthosts if dut.hostname not in la_results]
     if timed_out_duts:
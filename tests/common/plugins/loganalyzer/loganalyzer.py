@@ -8,6 +8,7 @@ import shutil
 
 from . import system_msg_handler
 from .bug_handler_helper import get_bughandler_instance, BugHandler
+from .pattern_matcher import build_matcher
 
 from .system_msg_handler import AnsibleLogAnalyzer as ansible_loganalyzer
 from os.path import join, split
@@ -148,6 +149,22 @@ class DisableLogrotateAndWaitSyslogContext:
         return False
 
 
+def parse_log_files(run_id, start_marker, file_list, match_regex, ignore_regex, expect_regex,
+                    maximum_log_length=None):
+    """
+    @summary: Analyze log files based on the lists of regular expressions.
+              Module level function with picklable arguments, so it can be run in a worker process.
+
+    @param run_id: Marker obtained from "init" method, with spaces replaced.
+    @param start_marker: Existing syslog message used as start marker, or None.
+    @param file_list: List of paths to the log files.
+    @return: Map <file_name, [list_of_matching_strings, list_of_expected_strings]>
+    """
+    analyzer = ansible_loganalyzer(run_id, False, start_marker=start_marker)
+    return analyzer.analyze_file_list(file_list, build_matcher(match_regex), build_matcher(ignore_regex),
+                                      build_matcher(expect_regex), maximum_log_length=maximum_log_length)
+
+
 class LogAnalyzerError(Exception):
     """Raised when loganalyzer found matches during analysis phase."""
     def __repr__(self):
@@ -441,15 +458,18 @@ class LogAnalyzer:
                  if dictionary can't be parsed - return empty dictionary.
                  If "fail" is True and if found match messages - raise exception.
         """
-        fail = self.fail if fail is None else fail
-        store_la_logs = self.store_la_logs if store_la_logs is None else store_la_logs
         logging.debug("Loganalyzer analyze")
-        analyzer_summary = {"total": {"match": 0, "expected_match": 0, "expected_missing_match": 0},
-                            "match_files": {},
-                            "match_messages": {},
-                            "expect_messages": {},
-                            "unused_expected_regexp": []
-                            }
+        file_list = self.fetch_logs(marker)
+        analyzer_parse_result = self.parse_logs(marker, file_list, maximum_log_length=maximum_log_length)
+        return self.summarize(analyzer_parse_result, fail=fail, store_la_logs=store_la_logs)
+
+    def fetch_logs(self, marker):
+        """
+        @summary: Extract logs between the start/stop markers on the DUT and download them.
+
+        @param marker: Marker obtained from "init" method.
+        @return: List of paths to the downloaded log files.
+        """
         timestamp = time.strftime("%Y-%m-%d-%H:%M:%S", time.gmtime())
         tmp_folder = ".".join((SYSLOG_TMP_FOLDER, self.ansible_host.hostname, timestamp))
         marker = marker.replace(' ', '_')
@@ -488,25 +508,54 @@ class LogAnalyzer:
             self.save_extracted_file(dest=tmp_folder, src=extracted_file_name)
             file_list.append(tmp_folder)
 
-        match_messages_regex = re.compile('|'.join(self.match_regex)) if len(self.match_regex) else None
-        ignore_messages_regex = re.compile('|'.join(self.ignore_regex)) if len(self.ignore_regex) else None
-        expect_messages_regex = re.compile('|'.join(self.expect_regex)) if len(self.expect_regex) else None
+        return file_list
+
+    def parse_logs(self, marker, file_list, maximum_log_length=None):
+        """
+        @summary: Analyze downloaded log files based on defined regular expressions and remove them.
 
+        @param marker: Marker obtained from "init" method.
+        @param file_list: List of paths to the downloaded log files.
+        @param maximum_log_length: The long message (length > maximum_log_length) will be skipped.
+        @return: Map <file_name, [list_of_matching_strings, list_of_expected_strings]>
+        """
         logging.debug("Analyze files {}".format(file_list))
-        logging.debug('    match_regex="{}"'.format(match_messages_regex.pattern if match_messages_regex else ''))
-        logging.debug('    ignore_regex="{}"'.format(ignore_messages_regex.pattern if ignore_messages_regex else ''))
-        logging.debug('    expect_regex="{}"'.format(expect_messages_regex.pattern if expect_messages_regex else ''))
-        analyzer_parse_result = self.ansible_loganalyzer.analyze_file_list(
-            file_list, match_messages_regex, ignore_messages_regex, expect_messages_regex,
-            maximum_log_length=maximum_log_length)
-        # Print file content and remove the file
+        logging.debug('    match_regex="{}"'.format('|'.join(self.match_regex)))
+        logging.debug('    ignore_regex="{}"'.format('|'.join(self.ignore_regex)))
+        logging.debug('    expect_regex="{}"'.format('|'.join(self.expect_regex)))
+        analyzer_parse_result = parse_log_files(marker.replace(' ', '_'), self.start_marker, file_list,
+                                                self.match_regex, self.ignore_regex, self.expect_regex,
+                                                maximum_log_length=maximum_log_length)
+        self.remove_fetched_logs(file_list)
+        return analyzer_parse_result
+
+    def remove_fetched_logs(self, file_list):
+        """
+        @summary: Print content of the downloaded log files and remove them.
+        """
         for folder in file_list:
             with open(folder) as fo:
                 logging.debug("{} file content:\n\n{}".format(folder, fo.read()))
             os.remove(folder)
 
+    def summarize(self, analyzer_parse_result, fail=None, store_la_logs=None):
+        """
+        @summary: Compose analysis summary from the parsed log files.
+
+        @param analyzer_parse_result: Result returned by "parse_logs" method.
+        @param fail: Flag to enable/disable raising exception when loganalyzer find error messages.
+        @param store_la_logs: Flag to save the match lines
+        @return: Dictionary of parsed syslog summary, see "analyze" method.
+        """
+        fail = self.fail if fail is None else fail
+        store_la_logs = self.store_la_logs if store_la_logs is None else store_la_logs
+        analyzer_summary = {"total": {"match": 0, "expected_match": 0, "expected_missing_match": 0},
+                            "match_files": {},
+                            "match_messages": {},
+                            "expect_messages": {},
+                            "unused_expected_regexp": []
+                            }
         expected_lines_total = []
-        unused_regex_messages = []
 
         for key, value in list(analyzer_parse_result.items()):
             matching_lines, expecting_lines = value
@@ -519,12 +568,9 @@ class LogAnalyzer:
             expected_lines_total.extend(expecting_lines)
 
         # Find unused regex matches
-        for regex in self.expect_regex:
-            for line in expected_lines_total:
-                if re.search(regex, line):
-                    break
-            else:
-                unused_regex_messages.append(regex)
+        expect_messages_regex = build_matcher(self.expect_regex)
+        unused_regex_messages = expect_messages_regex.unused_patterns(expected_lines_total) \
+            if expect_messages_regex else []
         analyzer_summary["total"]["expected_missing_match"] = len(unused_regex_messages)
         analyzer_summary["unused_expected_regexp"] = unused_regex_messages
         logging.debug("Analyzer summary: {}".format(pprint.pformat(analyzer_summary)))
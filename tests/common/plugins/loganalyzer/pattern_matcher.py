@@ -0,0 +1,218 @@
+"""
+Multi-pattern matcher used by LogAnalyzer to check log lines against the match/ignore/expect regular expressions.
+
+Instead of evaluating one big '|'.join(...) alternation for every log line, each regular expression is compiled
+separately and a literal substring, which must be present in any line matched by the regular expression, is
+extracted from it. A line is first scanned for all the literals in one pass and only the regular expressions whose
+literal was found in the line (plus the ones without a usable literal) are evaluated. Small sets of regular
+expressions are still checked with the joined alternation, which is cheaper for them.
+"""
+import re
+
+try:
+    import re._parser as sre_parse
+except ImportError:
+    import sre_parse
+
+# Literals shorter than this are too common to filter out lines efficiently
+MIN_LITERAL_LENGTH = 3
+# For small sets of regular expressions the joined alternation is cheaper than the prefilter
+LITERAL_SCAN_THRESHOLD = 16
+
+
+def _best_literals(candidates):
+    """
+    @summary: Pick the most selective set of alternative literals.
+    @param candidates: List of sets of literals, the line must contain at least one literal of each set.
+    @return: Set of literals with the longest shortest literal, or None if there is no candidate.
+    """
+    best = None
+    for literals in candidates:
+        if best is None or min(len(lit) for lit in literals) > min(len(lit) for lit in best):
+            best = literals
+    return best
+
+
+def _required_literals(tokens):
+    """
+    @summary: Find literals required by a parsed regular expression.
+    @param tokens: Parsed sequence of regular expression tokens.
+    @return: Set of literals, at least one of them is contained in any string matched by
+             the regular expression. None if no such set can be found.
+    """
+    candidates = []
+    run = []
+
+    def flush_run():
+        if run:
+            candidates.append({"".join(run)})
+            del run[:]
+
+    for op, av in tokens:
+        if op is sre_parse.LITERAL:
+            run.append(chr(av))
+            continue
+        flush_run()
+        if op is sre_parse.SUBPATTERN:
+            add_flags = av[1]
+            if add_flags & re.IGNORECASE:
+                continue
+            literals = _required_literals(av[-1])
+        elif op is sre_parse.BRANCH:
+            literals = set()
+            for branch in av[1]:
+                branch_literals = _required_literals(branch)
+                if branch_literals is None:
+                    literals = None
+                    break
+                literals |= branch_literals
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and av[0] >= 1:
+            literals = _required_literals(av[2])
+        else:
+            literals = None
+        if literals:
+            candidates.append(literals)
+    flush_run()
+
+    return _best_literals(candidates)
+
+
+def extract_literals(regex):
+    """
+    @summary: Extract literals which can be used to prefilter lines for the regular expression.
+    @param regex: Regular expression string.
+    @return: Set of literals, any line matched by the regex contains at least one of them.
+             None if the regex can't be prefiltered.
+    """
+    try:
+        parsed = sre_parse.parse(regex)
+    except re.error:
+        return None
+    if parsed.state.flags & re.IGNORECASE:
+        return None
+    literals = _required_literals(list(parsed))
+    if not literals or min(len(lit) for lit in literals) < MIN_LITERAL_LENGTH:
+        return None
+    return literals
+
+
+class PatternMatcher:
+    """
+    Matcher for a list of regular expressions with literal prefiltering.
+
+    The matcher can be used instead of the compiled '|'.join(regexes) alternation: search() and match() return a
+    truthy match object if any of the regular expressions matches the line, None otherwise. Additionally,
+    matching_patterns() reports which individual regular expressions match the line.
+    """
+
+    def __init__(self, regexes):
+        """
+        @summary: Compile regular expressions and build the literal prefilter.
+        @param regexes: List of regular expression strings.
+        """
+        self.regexes = list(regexes)
+        self.pattern = "|".join(self.regexes)
+        self._compiled = [re.compile(regex) for regex in self.regexes]
+        # Indexes of regexes which need to be evaluated for every line
+        self._unfiltered = []
+        # literal -> indexes of regexes which require it
+        self._literal_to_indexes = {}
+
+        for index, regex in enumerate(self.regexes):
+            literals = extract_literals(regex)
+            if literals is None:
+                self._unfiltered.append(index)
+                continue
+            for literal in literals:
+                self._literal_to_indexes.setdefault(literal, []).append(index)
+
+        self._joined = None
+        if len(self.regexes) <= LITERAL_SCAN_THRESHOLD:
+            try:
+                self._joined = re.compile(self.pattern)
+            except re.error:
+                pass
+
+        self._literal_scan = None
+        self._literal_closure = {}
+        if self._literal_to_indexes:
+            # Longest literals go first, so the lookahead finds the longest literal starting at each position.
+            # Shorter literals starting at the same position are prefixes of it and are resolved from the closure.
+            literals = sorted(self._literal_to_indexes, key=len, reverse=True)
+            alternation = "|".join(re.escape(literal) for literal in literals)
+            self._literal_any = re.compile(alternation)
+            self._literal_scan = re.compile("(?=({}))".format(alternation))
+            for literal in literals:
+                indexes = set()
+                for prefix_len in range(MIN_LITERAL_LENGTH, len(literal) + 1):
+                    indexes.update(self._literal_to_indexes.get(literal[:prefix_len], ()))
+                self._literal_closure[literal] = indexes
+
+    def __repr__(self):
+        return "PatternMatcher({} regexes, {} unfiltered)".format(len(self.regexes), len(self._unfiltered))
+
+    def candidates(self, line):
+        """
+        @summary: Get indexes of regular expressions which may match the line, in the original order.
+        """
+        if self._literal_scan is None or not self._literal_any.search(line):
+            return self._unfiltered
+
+        indexes = set(self._unfiltered)
+        for literal in set(self._literal_scan.findall(line)):
+            indexes |= self._literal_closure[literal]
+        return sorted(indexes)
+
+    def search(self, line):
+        """
+        @summary: Scan through the line looking for the first regular expression which matches it.
+        @return: Match object or None.
+        """
+        if self._joined is not None:
+            return self._joined.search(line)
+        for index in self.candidates(line):
+            match = self._compiled[index].search(line)
+            if match:
+                return match
+        return None
+
+    def match(self, line):
+        """
+        @summary: Check if any regular expression matches at the beginning of the line.
+        @return: Match object or None.
+        """
+        if self._joined is not None:
+            return self._joined.match(line)
+        for index in self.candidates(line):
+            match = self._compiled[index].match(line)
+            if match:
+                return match
+        return None
+
+    def matching_patterns(self, line):
+        """
+        @summary: Get all regular expressions which match the line (re.search semantic).
+        @return: List of regular expression strings.
+        """
+        return [self.regexes[index] for index in self.candidates(line) if self._compiled[index].search(line)]
+
+    def unused_patterns(self, lines):
+        """
+        @summary: Get regular expressions which do not match any of the lines.
+        @return: List of regular expression strings, in the original order.
+        """
+        used = set()
+        for line in lines:
+            used.update(index for index in self.candidates(line)
+                        if index not in used and self._compiled[index].search(line))
+            if len(used) == len(self.regexes):
+                break
+        return [regex for index, regex in enumerate(self.regexes) if index not in used]
+
+
+def build_matcher(regexes):
+    """
+    @summary: Build PatternMatcher for the list of regular expressions.
+    @return: PatternMatcher instance, or None if the list is empty.
+    """
+    return PatternMatcher(regexes) if len(regexes) else None
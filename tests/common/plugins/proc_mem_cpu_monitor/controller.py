@@ -8,17 +8,25 @@ import json
 import logging
 import os
 import re
+import textwrap
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from collections import defaultdict
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional, Set, Tuple, Union
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple, Union
 
 import pytest
 
 from tests.common.plugins.proc_mem_cpu_monitor.constants import MEM_LEAK_EVENT
+from tests.common.plugins.proc_mem_cpu_monitor.sample_store import (
+    DEFAULT_SPILL_ROWS,
+    SampleStore,
+    SampleTimeline,
+    select_samples,
+)
 from tests.common.plugins.proc_mem_cpu_monitor.tcmalloc_parser import parse_tcmalloc_stats
 from tests.common.plugins.proc_mem_cpu_monitor.top_parser import (
     SYSTEM_CPU_IDLE_PROCESS,
@@ -38,6 +46,10 @@ _NUM_CORES_CMD = "sh -c 'cat /proc/cpuinfo | grep processor | wc -l'"
 
 _DEVICES_BASE_LOGGER = logging.getLogger("tests.common.devices.base")
 
+# Marker line echoed before the output of each command of a batched per-DUT shell invocation.
+_BATCH_MARKER = "===== mem_cpu_monitor target {} ====="
+_BATCH_MARKER_RE = re.compile(r"^===== mem_cpu_monitor target (\d+) =====$", re.MULTILINE)
+
 
 @contextmanager
 def _suppress_devices_base_debug():
@@ -150,9 +162,8 @@ def effective_adaptive_plot_processes(
     """
     host_s = [
         s
-        for s in samples
+        for s in select_samples(samples, include=("top",))
         if s.get("kind") == "sample"
-        and s.get("probe_transport") == "top"
         and s.get("scope") == "host"
     ]
     if not host_s:
@@ -181,12 +192,18 @@ def effective_adaptive_plot_processes(
     return sorted(interest_matched | set(top_jumpers))
 
 
-def _first_sample_ts_str(samples: List[Dict[str, Any]], compact: bool = False) -> str:
-    tw = samples[0]["t_wall"]
+def _sample_t_wall(s: Dict[str, Any]) -> datetime:
+    """``t_wall`` of a sample or event as an aware UTC datetime (also accepts ISO strings)."""
+    tw = s["t_wall"]
     if isinstance(tw, str):
         tw = datetime.fromisoformat(tw.replace("Z", "+00:00"))
     if tw.tzinfo is None:
         tw = tw.replace(tzinfo=timezone.utc)
+    return tw
+
+
+def _first_sample_ts_str(samples: Sequence[Dict[str, Any]], compact: bool = False) -> str:
+    tw = _sample_t_wall(samples[0])
     if compact:
         return tw.strftime("%Y%m%d_%H%M%S")
     return tw.strftime("%Y%m%dT%H%M%SZ")
@@ -233,6 +250,23 @@ def _normalize_duts(duts: Any) -> List[Any]:
     return list(duts)
 
 
+def _batch_cmd(cmds: List[str]) -> str:
+    """One shell script running every command in order, each output preceded by its marker line."""
+    return "; ".join("echo '{}'; {}".format(_BATCH_MARKER.format(i), cmd) for i, cmd in enumerate(cmds))
+
+
+def _split_batch_stdout(stdout: str, count: int) -> List[str]:
+    """Split stdout of ``_batch_cmd`` back into per-command outputs (``\"\"`` for a command without output)."""
+    outputs = [""] * count
+    matches = list(_BATCH_MARKER_RE.finditer(stdout or ""))
+    for i, match in enumerate(matches):
+        index = int(match.group(1))
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(stdout)
+        if index < count:
+            outputs[index] = stdout[match.end():end].strip("\n")
+    return outputs
+
+
 def _top_cmd_host() -> str:
     return "top -bn1"
 
@@ -255,9 +289,10 @@ def _tcmalloc_cmd_docker(duthost: Any, asic: Any, docker_service: str) -> str:
 
 @dataclass
 class MemCpuMonitorResult:
-    samples: List[Dict[str, Any]] = field(default_factory=list)
+    # ``SampleStore`` / ``SampleTimeline`` from ``stop()``: sequences of dicts, like plain lists
+    samples: Sequence[Dict[str, Any]] = field(default_factory=list)
     events: List[Dict[str, Any]] = field(default_factory=list)
-    timeline: List[Dict[str, Any]] = field(default_factory=list)
+    timeline: Sequence[Dict[str, Any]] = field(default_factory=list)
     top_raw_log_path: Optional[str] = None
     tcmalloc_raw_log_path: Optional[str] = None
 
@@ -285,12 +320,13 @@ class ProcMemCpuMonitor(object):
     def __init__(self, request):
         self.request = request
         self._lock = threading.RLock()
-        # Serialize duthost.command(): sampler thread vs snapshot(MEM_LEAK_EVENT) / same Ansible SSH.
-        self._dut_ssh_lock = threading.Lock()
+        # Serialize DUT commands per host: sampler thread vs snapshot(MEM_LEAK_EVENT) / same Ansible SSH.
+        # Different DUTs are sampled concurrently.
+        self._dut_ssh_locks: Dict[str, threading.Lock] = defaultdict(threading.Lock)
         self._stop_event = threading.Event()
         self._thread: Optional[threading.Thread] = None
         self._running = False
-        self._samples: List[Dict[str, Any]] = []
+        self._samples: SampleStore = SampleStore()
         self._events: List[Dict[str, Any]] = []
         self._seq = 0
         self._baseline_mem: Dict[Tuple[str, str, str], float] = {}
@@ -309,6 +345,13 @@ class ProcMemCpuMonitor(object):
         self._tcmalloc_raw_log_path: Optional[str] = None
         self._output_basename_style: str = "full"
         self._host_top_num_cores: Optional[int] = None
+        self._batch_commands: bool = True
+        self._last_tick_latency: Optional[float] = None
+        self._slow_tick_warned: bool = False
+
+    def _dut_ssh_lock(self, hostname: str) -> threading.Lock:
+        with self._lock:
+            return self._dut_ssh_locks[hostname]
 
     def _next_seq(self) -> int:
         self._seq += 1
@@ -366,7 +409,7 @@ class ProcMemCpuMonitor(object):
                 fh.write(block)
 
     def _dut_command_raw(self, duthost: Any, cmd: str, hostname: str, scope: str, kind: str) -> str:
-        with self._dut_ssh_lock:
+        with self._dut_ssh_lock(hostname):
             try:
                 with _suppress_devices_base_debug():
                     out = duthost.command(cmd, module_ignore_errors=True)
@@ -383,6 +426,54 @@ class ProcMemCpuMonitor(object):
             self._append_tcmalloc_raw_log(hostname, scope, kind, cmd, stdout)
             return stdout
 
+    def _dut_batch_raw(self, duthost: Any, hostname: str, targets: List[Tuple[Any, str, str, str]]) -> List[str]:
+        """Run all ``targets`` of one DUT in a single shell round trip; return stdout per target."""
+        script = _batch_cmd([cmd for _d, _scope, cmd, _kind in targets])
+        with self._dut_ssh_lock(hostname):
+            try:
+                with _suppress_devices_base_debug():
+                    out = duthost.shell(script, module_ignore_errors=True)
+                outputs = _split_batch_stdout((out or {}).get("stdout") or "", len(targets))
+            except Exception as ex:  # noqa: BLE001  DUT command failures should not kill sampler
+                logger.warning("mem_cpu_monitor batched command failed: %s", ex)
+                outputs = ["<exception: {}>\n".format(ex)] * len(targets)
+                for _d, scope, cmd, kind in targets:
+                    self._append_raw_log(hostname, scope, kind, cmd, outputs[0])
+                    self._append_top_raw_log(hostname, scope, kind, cmd, outputs[0])
+                    self._append_tcmalloc_raw_log(hostname, scope, kind, cmd, outputs[0])
+                return [""] * len(targets)
+        for (_d, scope, cmd, kind), stdout in zip(targets, outputs):
+            self._append_raw_log(hostname, scope, kind, cmd, stdout)
+            self._append_top_raw_log(hostname, scope, kind, cmd, stdout)
+            self._append_tcmalloc_raw_log(hostname, scope, kind, cmd, stdout)
+        return outputs
+
+    def _run_host_targets(
+        self, duthost: Any, targets: List[Tuple[Any, str, str, str]]
+    ) -> List[Tuple[str, float]]:
+        """Return ``(stdout, latency_s)`` per target; batched targets share the round-trip latency."""
+        hostname = duthost.hostname
+        if self._batch_commands and len(targets) > 1:
+            t0 = time.monotonic()
+            outputs = self._dut_batch_raw(duthost, hostname, targets)
+            latency = time.monotonic() - t0
+            return [(stdout, latency) for stdout in outputs]
+        results = []
+        for _d, scope, cmd, kind in targets:
+            t0 = time.monotonic()
+            stdout = self._dut_command_raw(duthost, cmd, hostname, scope, kind)
+            results.append((stdout, time.monotonic() - t0))
+        return results
+
+    def _targets_by_host(self) -> List[Tuple[Any, List[Tuple[Any, str, str, str]]]]:
+        """Group ``_targets`` per DUT, keeping the configured order."""
+        groups: Dict[str, Tuple[Any, List[Tuple[Any, str, str, str]]]] = {}
+        for target in self._targets:
+            duthost = target[0]
+            hn = getattr(duthost, "hostname", None) or str(duthost)
+            groups.setdefault(hn, (duthost, []))[1].append(target)
+        return list(groups.values())
+
     def _probe_host_num_cores_once(self) -> None:
         """Set ``_host_top_num_cores`` from ``/proc/cpuinfo`` on the first DUT (per ``_targets`` order)."""
         if self._host_top_num_cores is not None or not self._targets:
@@ -394,7 +485,7 @@ class ProcMemCpuMonitor(object):
                 continue
             seen.add(hn)
             try:
-                with self._dut_ssh_lock:
+                with self._dut_ssh_lock(hn):
                     with _suppress_devices_base_debug():
                         out = duthost.command(_NUM_CORES_CMD, module_ignore_errors=True)
             except Exception as ex:  # noqa: BLE001
@@ -414,126 +505,163 @@ class ProcMemCpuMonitor(object):
                     return
 
     def _poll_tick(self) -> None:
+        """Sample all targets: DUTs concurrently, all targets of one DUT in one batched round trip."""
+        t0 = time.monotonic()
+        groups = self._targets_by_host()
+        if len(groups) == 1:
+            self._poll_host(*groups[0])
+        else:
+            with ThreadPoolExecutor(max_workers=len(groups), thread_name_prefix="mem_cpu_monitor") as executor:
+                for future in [executor.submit(self._poll_host, duthost, targets) for duthost, targets in groups]:
+                    future.result()
+        latency = time.monotonic() - t0
+        self._last_tick_latency = latency
+        if latency > self._interval and not self._slow_tick_warned:
+            self._slow_tick_warned = True
+            logger.warning(
+                "mem_cpu_monitor: poll tick took %.2fs, longer than interval %.2fs", latency, self._interval
+            )
+
+    def _poll_host(self, duthost: Any, targets: List[Tuple[Any, str, str, str]]) -> None:
+        try:
+            results = self._run_host_targets(duthost, targets)
+        except Exception as ex:  # noqa: BLE001  one bad DUT must not stop the sampler
+            hn = getattr(duthost, "hostname", None) or str(duthost)
+            logger.warning(
+                "mem_cpu_monitor: poll_tick failed for hostname=%s; skipping this DUT for this interval: %s",
+                hn,
+                ex,
+                exc_info=True,
+            )
+            return
+        for (_d, scope, _cmd, kind), (stdout, latency) in zip(targets, results):
+            self._record_target(duthost, scope, kind, stdout, latency)
+
+    def _record_target(self, duthost: Any, scope: str, kind: str, stdout: str, latency: float) -> None:
+        """Parse one target's stdout into samples; ``latency`` is the DUT round trip that produced it."""
         proc_list = self._proc_list
-        for duthost, scope, cmd, kind in self._targets:
-            try:
-                hostname = duthost.hostname
-                stdout = self._dut_command_raw(duthost, cmd, hostname, scope, kind)
-                now = datetime.now(timezone.utc)
-                mono = time.monotonic()
-                if kind == "free":
-                    data = parse_free_m_used(stdout)
-                    if not data:
-                        continue
-                    with self._lock:
+        try:
+            hostname = duthost.hostname
+            now = datetime.now(timezone.utc)
+            mono = time.monotonic()
+            latency = round(latency, 3)
+            if kind == "free":
+                data = parse_free_m_used(stdout)
+                if not data:
+                    return
+                with self._lock:
+                    rec = {
+                        "kind": "sample",
+                        "dut": hostname,
+                        "scope": scope,
+                        "process": "free_used",
+                        "cpu_pct": None,
+                        "mem_pct": data["used_pct"],
+                        "mem_mib_used": data["used_mib"],
+                        "mem_total_mib": data.get("total_mib"),
+                        "mem_res_mib": round(data["used_mib"], 2),
+                        "mem_unit": "%",
+                        "probe_transport": "free",
+                        "t_wall": now,
+                        "t_mono": mono,
+                        "tick_latency_s": latency,
+                        "seq": self._next_seq(),
+                    }
+                    self._samples.append(rec)
+                    key = (hostname, scope, "free_used")
+                    if key not in self._baseline_mem:
+                        self._baseline_mem[key] = data["used_pct"]
+                return
+
+            if kind == "tcmalloc":
+                rows = parse_tcmalloc_stats(stdout)
+                with self._lock:
+                    for row in rows:
+                        heap_b = row["heap_size_bytes"]
+                        free_b = row["pageheap_free_bytes"]
                         rec = {
                             "kind": "sample",
                             "dut": hostname,
                             "scope": scope,
-                            "process": "free_used",
+                            "process": row["process"],
                             "cpu_pct": None,
-                            "mem_pct": data["used_pct"],
-                            "mem_mib_used": data["used_mib"],
-                            "mem_total_mib": data.get("total_mib"),
-                            "mem_res_mib": round(data["used_mib"], 2),
-                            "mem_unit": "%",
-                            "probe_transport": "free",
+                            "mem_pct": None,
+                            "mem_res_mib": round(heap_b / (1024.0 * 1024.0), 2),
+                            "mem_unit": "bytes",
+                            "probe_transport": "tcmalloc",
+                            "tcmalloc_heap_size_bytes": heap_b,
+                            "tcmalloc_pageheap_free_bytes": free_b,
                             "t_wall": now,
                             "t_mono": mono,
+                            "tick_latency_s": latency,
                             "seq": self._next_seq(),
                         }
                         self._samples.append(rec)
-                        key = (hostname, scope, "free_used")
-                        if key not in self._baseline_mem:
-                            self._baseline_mem[key] = data["used_pct"]
-                    continue
+                return
 
-                if kind == "tcmalloc":
-                    rows = parse_tcmalloc_stats(stdout)
+            if kind in ("top", "top_all") and scope == "host":
+                cpu_summary = parse_top_cpu_summary(stdout)
+                if cpu_summary:
                     with self._lock:
-                        for row in rows:
-                            heap_b = row["heap_size_bytes"]
-                            free_b = row["pageheap_free_bytes"]
-                            rec = {
-                                "kind": "sample",
-                                "dut": hostname,
-                                "scope": scope,
-                                "process": row["process"],
-                                "cpu_pct": None,
-                                "mem_pct": None,
-                                "mem_res_mib": round(heap_b / (1024.0 * 1024.0), 2),
-                                "mem_unit": "bytes",
-                                "probe_transport": "tcmalloc",
-                                "tcmalloc_heap_size_bytes": heap_b,
-                                "tcmalloc_pageheap_free_bytes": free_b,
-                                "t_wall": now,
-                                "t_mono": mono,
-                                "seq": self._next_seq(),
-                            }
-                            self._samples.append(rec)
-                    continue
-
-                if kind in ("top", "top_all") and scope == "host":
-                    cpu_summary = parse_top_cpu_summary(stdout)
-                    if cpu_summary:
-                        with self._lock:
-                            self._samples.append({
-                                "kind": "sample",
-                                "dut": hostname,
-                                "scope": scope,
-                                "process": SYSTEM_CPU_IDLE_PROCESS,
-                                "cpu_pct": cpu_summary["idle_pct"],
-                                "mem_pct": None,
-                                "mem_res_mib": None,
-                                "mem_unit": "%",
-                                "probe_transport": "top_summary",
-                                "system_cpu_idle_pct": cpu_summary["idle_pct"],
-                                "system_cpu_busy_pct": cpu_summary.get("busy_pct"),
-                                "system_cpu_us_pct": cpu_summary["us_pct"],
-                                "system_cpu_sy_pct": cpu_summary["sy_pct"],
-                                "t_wall": now,
-                                "t_mono": mono,
-                                "seq": self._next_seq(),
-                            })
-
-                if kind == "top_all":
-                    rows = parse_top_host_all(stdout)
-                    cap = _host_top_capture_names(rows, proc_list, self._jumper_top_n)
-                    rows = [r for r in rows if r["process"] in cap]
-                else:
-                    rows = parse_top(stdout, proc_list)
-                with self._lock:
-                    for row in rows:
-                        rec = {
+                        self._samples.append({
                             "kind": "sample",
                             "dut": hostname,
                             "scope": scope,
-                            "process": row["process"],
-                            "cpu_pct": row["cpu_pct"],
-                            "mem_pct": row["mem_pct"],
-                            "mem_res_mib": row.get("mem_res_mib"),
+                            "process": SYSTEM_CPU_IDLE_PROCESS,
+                            "cpu_pct": cpu_summary["idle_pct"],
+                            "mem_pct": None,
+                            "mem_res_mib": None,
                             "mem_unit": "%",
-                            "probe_transport": "top",
-                            "pid": row.get("pid"),
+                            "probe_transport": "top_summary",
+                            "system_cpu_idle_pct": cpu_summary["idle_pct"],
+                            "system_cpu_busy_pct": cpu_summary.get("busy_pct"),
+                            "system_cpu_us_pct": cpu_summary["us_pct"],
+                            "system_cpu_sy_pct": cpu_summary["sy_pct"],
                             "t_wall": now,
                             "t_mono": mono,
+                            "tick_latency_s": latency,
                             "seq": self._next_seq(),
-                        }
-                        self._samples.append(rec)
-                        key = (hostname, scope, row["process"])
-                        if key not in self._baseline_mem and self._should_set_mem_baseline(row["process"]):
-                            self._baseline_mem[key] = row["mem_pct"]
-            except Exception as ex:  # noqa: BLE001  one bad target must not stop the sampler
-                hn = getattr(duthost, "hostname", None) or str(duthost)
-                logger.warning(
-                    "mem_cpu_monitor: poll_tick failed for hostname=%s scope=%s kind=%s; "
-                    "skipping this target for this interval: %s",
-                    hn,
-                    scope,
-                    kind,
-                    ex,
-                    exc_info=True,
-                )
+                        })
+
+            if kind == "top_all":
+                rows = parse_top_host_all(stdout)
+                cap = _host_top_capture_names(rows, proc_list, self._jumper_top_n)
+                rows = [r for r in rows if r["process"] in cap]
+            else:
+                rows = parse_top(stdout, proc_list)
+            with self._lock:
+                for row in rows:
+                    rec = {
+                        "kind": "sample",
+                        "dut": hostname,
+                        "scope": scope,
+                        "process": row["process"],
+                        "cpu_pct": row["cpu_pct"],
+                        "mem_pct": row["mem_pct"],
+                        "mem_res_mib": row.get("mem_res_mib"),
+                        "mem_unit": "%",
+                        "probe_transport": "top",
+                        "pid": row.get("pid"),
+                        "t_wall": now,
+                        "t_mono": mono,
+                        "tick_latency_s": latency,
+                        "seq": self._next_seq(),
+                    }
+                    self._samples.append(rec)
+                    key = (hostname, scope, row["process"])
+                    if key not in self._baseline_mem and self._should_set_mem_baseline(row["process"]):
+                        self._baseline_mem[key] = row["mem_pct"]
+        except Exception as ex:  # noqa: BLE001  one bad target must not stop the sampler
+            hn = getattr(duthost, "hostname", None) or str(duthost)
+            logger.warning(
+                "mem_cpu_monitor: poll_tick failed for hostname=%s scope=%s kind=%s; "
+                "skipping this target for this interval: %s",
+                hn,
+                scope,
+                kind,
+                ex,
+                exc_info=True,
+            )
 
     def _loop(self) -> None:
         try:
@@ -565,6 +693,8 @@ class ProcMemCpuMonitor(object):
         include_tcmalloc_stats: bool = False,
         tcmalloc_raw_log_path: Optional[str] = None,
         output_basename_style: str = "full",
+        batch_commands: bool = True,
+        spill_rows: Optional[int] = DEFAULT_SPILL_ROWS,
     ) -> None:
         """
         Begin background sampling.
@@ -606,6 +736,12 @@ class ProcMemCpuMonitor(object):
                 ``<tmp_path>/mem_cpu_monitor_tcmalloc_raw.log`` when ``include_tcmalloc_stats`` is True.
             output_basename_style: how to build PNG/JSON/CSV basename  ``full`` (default, long
                 ``nodeid``), ``short_node`` (``node.name`` only), or ``dut_ts_hash`` (DUT + time + hash).
+            batch_commands: if True (default), all probes of a DUT run in **one** shell round trip per tick
+                (outputs split by marker lines); if False, one ``duthost.command()`` per probe. DUTs are
+                always sampled concurrently. Every sample records ``tick_latency_s``, the DUT round trip time.
+            spill_rows: samples are stored column by column (``SampleStore``); every ``spill_rows`` samples
+                are written to disk under ``<tmp_path>/mem_cpu_monitor_spill`` and read back when the result
+                is iterated. None or 0 keeps every sample in memory.
         """
         if output_basename_style not in OUTPUT_BASENAME_STYLES:
             raise ValueError(
@@ -641,6 +777,8 @@ class ProcMemCpuMonitor(object):
             self._capture_raw_stdout = bool(capture_raw_stdout)
             self._include_tcmalloc_stats = bool(include_tcmalloc_stats)
             self._output_basename_style = output_basename_style
+            self._batch_commands = bool(batch_commands)
+            self._slow_tick_warned = False
             self._raw_log_path = None
             if self._capture_raw_stdout:
                 log_dir = self._resolve_out_dir(None)
@@ -713,7 +851,10 @@ class ProcMemCpuMonitor(object):
             self._running = True
             self._stop_event.clear()
             self._thread_exc = None
-            self._samples.clear()
+            self._samples = SampleStore(
+                spill_dir=os.path.join(self._resolve_out_dir(None), "mem_cpu_monitor_spill"),
+                spill_rows=spill_rows,
+            )
             self._events.clear()
             self._seq = 0
             self._baseline_mem.clear()
@@ -733,6 +874,8 @@ class ProcMemCpuMonitor(object):
                     "include_tcmalloc_stats": self._include_tcmalloc_stats,
                     "tcmalloc_raw_log_path": self._tcmalloc_raw_log_path,
                     "output_basename_style": output_basename_style,
+                    "batch_commands": self._batch_commands,
+                    "spill_rows": spill_rows,
                     "num_cores": self._host_top_num_cores,
                 },
             )
@@ -772,8 +915,11 @@ class ProcMemCpuMonitor(object):
         rel = self._parse_threshold_relative(threshold)
         current: Dict[Tuple[str, str, str], float] = {}
         proc_list = self._proc_list
-        for duthost, scope, cmd, kind in self._targets:
-            stdout = self._dut_command_raw(duthost, cmd, duthost.hostname, scope, kind)
+        outputs = []
+        for duthost, targets in self._targets_by_host():
+            results = self._run_host_targets(duthost, targets)
+            outputs.extend((target, stdout) for target, (stdout, _latency) in zip(targets, results))
+        for (duthost, scope, _cmd, kind), stdout in outputs:
             hostname = duthost.hostname
             if kind == "free":
                 data = parse_free_m_used(stdout)
@@ -822,12 +968,11 @@ class ProcMemCpuMonitor(object):
         self._append_event("stop")
 
         with self._lock:
-            merged = list(self._samples) + list(self._events)
-            merged.sort(key=lambda r: (r["t_mono"], r["seq"]))
+            events = list(self._events)
             result = MemCpuMonitorResult(
-                samples=list(self._samples),
-                events=list(self._events),
-                timeline=merged,
+                samples=self._samples,
+                events=events,
+                timeline=SampleTimeline(self._samples, events),
                 top_raw_log_path=self._top_raw_log_path,
                 tcmalloc_raw_log_path=self._tcmalloc_raw_log_path,
             )
@@ -852,23 +997,27 @@ class ProcMemCpuMonitor(object):
         return out_dir
 
     @staticmethod
-    def _filter_samples_for_plot(res: MemCpuMonitorResult, proc_subset: Optional[List[str]]) -> List[Dict[str, Any]]:
-        samples = [
-            s for s in res.samples
-            if s.get("probe_transport") not in ("tcmalloc", "top_summary")
-        ]
-        if proc_subset:
-            samples = [s for s in samples if s["process"] in proc_subset]
-        return samples
+    def _filter_samples_for_plot(
+        res: MemCpuMonitorResult, proc_subset: Optional[List[str]]
+    ) -> Iterator[Dict[str, Any]]:
+        return select_samples(res.samples, exclude=("tcmalloc", "top_summary"), processes=proc_subset or None)
 
     @staticmethod
-    def _system_cpu_samples_for_plot(res: MemCpuMonitorResult) -> List[Dict[str, Any]]:
+    def _system_cpu_samples_for_plot(res: MemCpuMonitorResult) -> Iterator[Dict[str, Any]]:
         """Host ``%Cpu(s)`` idle %  always plotted; not subject to proc_subset."""
-        return [s for s in res.samples if s.get("probe_transport") == "top_summary"]
+        return select_samples(res.samples, include=("top_summary",))
 
     @staticmethod
-    def _tcmalloc_samples_for_plot(res: MemCpuMonitorResult) -> List[Dict[str, Any]]:
-        return [s for s in res.samples if s.get("probe_transport") == "tcmalloc"]
+    def _tcmalloc_samples_for_plot(res: MemCpuMonitorResult) -> Iterator[Dict[str, Any]]:
+        return select_samples(res.samples, include=("tcmalloc",))
+
+    def _export_samples_for_plot(
+        self, res: MemCpuMonitorResult, proc_subset: Optional[List[str]]
+    ) -> Iterator[Dict[str, Any]]:
+        """Process, system CPU and tcmalloc samples in ``export_samples()`` order, streamed from the store."""
+        yield from self._filter_samples_for_plot(res, proc_subset)
+        yield from self._system_cpu_samples_for_plot(res)
+        yield from self._tcmalloc_samples_for_plot(res)
 
     def _output_stem(self, out_dir: str, samples: List[Dict[str, Any]], basename_style: Optional[str] = None) -> str:
         style = basename_style or self._output_basename_style
@@ -893,10 +1042,11 @@ class ProcMemCpuMonitor(object):
         use_adaptive = self._host_top_all_procs if auto_host_jumper_subset is None else bool(auto_host_jumper_subset)
         if not use_adaptive:
             return None
+        has_free = next(select_samples(res.samples, processes=("free_used",)), None) is not None
         if self._host_top_all_procs:
             keys: Set[str] = set()
-            for s in res.samples:
-                if s.get("kind") != "sample" or s.get("probe_transport") != "top":
+            for s in select_samples(res.samples, include=("top",)):
+                if s.get("kind") != "sample":
                     continue
                 if s.get("scope") == "host":
                     keys.add(s["process"])
@@ -904,21 +1054,21 @@ class ProcMemCpuMonitor(object):
                     proc = s.get("process")
                     if proc and any(u in proc for u in self._proc_list):
                         keys.add(proc)
-            if any(s.get("process") == "free_used" for s in res.samples):
+            if has_free:
                 keys.add("free_used")
             return sorted(keys) if keys else None
         eff = effective_adaptive_plot_processes(res.samples, self._proc_list, self._jumper_top_n)
         keys = set(eff) if eff else set()
         if self._proc_list:
-            for s in res.samples:
-                if s.get("kind") != "sample" or s.get("probe_transport") != "top":
+            for s in select_samples(res.samples, include=("top",)):
+                if s.get("kind") != "sample":
                     continue
                 if s.get("scope") == "host":
                     continue
                 proc = s.get("process")
                 if proc and any(u in proc for u in self._proc_list):
                     keys.add(proc)
-        if any(s.get("process") == "free_used" for s in res.samples):
+        if has_free:
             keys.add("free_used")
         return sorted(keys) if keys else None
 
@@ -968,28 +1118,14 @@ class ProcMemCpuMonitor(object):
         resolved = self._resolve_plot_proc_subset(res, proc_subset, auto_host_jumper_subset)
         if resolved is not None:
             logger.info("mem_cpu_monitor.plot() proc subset: %s", resolved)
-        samples = self._filter_samples_for_plot(res, resolved)
-        system_cpu_samples = self._system_cpu_samples_for_plot(res)
-        tcmalloc_samples = self._tcmalloc_samples_for_plot(res)
-        if not samples and not tcmalloc_samples and not system_cpu_samples:
-            if self._top_raw_log_path:
-                logger.info("mem_cpu_monitor.plot() top raw stdout log: %s", self._top_raw_log_path)
-            if self._tcmalloc_raw_log_path:
-                logger.info("mem_cpu_monitor.plot() tcmalloc raw stdout log: %s", self._tcmalloc_raw_log_path)
-            return None
-
-        out_dir = self._resolve_out_dir(out_dir)
-        os.makedirs(out_dir, exist_ok=True)
-        plot_samples = samples or system_cpu_samples or tcmalloc_samples
-        path = self._output_stem(out_dir, plot_samples, basename_style) + ".png"
+        # Series are built in one streaming pass per sample group; only the first sample of each
+        # group is kept (file name and panel layout).
+        first_sample: Dict[str, Dict[str, Any]] = {}
 
         by_system_cpu_idle: Dict[str, List[Tuple[datetime, float]]] = defaultdict(list)
-        for s in system_cpu_samples:
-            tw = s["t_wall"]
-            if isinstance(tw, str):
-                tw = datetime.fromisoformat(tw.replace("Z", "+00:00"))
-            if tw.tzinfo is None:
-                tw = tw.replace(tzinfo=timezone.utc)
+        for s in self._system_cpu_samples_for_plot(res):
+            first_sample.setdefault("system_cpu", s)
+            tw = _sample_t_wall(s)
             idle = s.get("system_cpu_idle_pct")
             if idle is None and s.get("cpu_pct") is not None:
                 idle = s["cpu_pct"]
@@ -997,12 +1133,9 @@ class ProcMemCpuMonitor(object):
                 by_system_cpu_idle[s["dut"]].append((tw, float(idle)))
 
         by_proc: Dict[str, List[Tuple[datetime, float, float, Optional[float]]]] = defaultdict(list)
-        for s in samples:
-            tw = s["t_wall"]
-            if isinstance(tw, str):
-                tw = datetime.fromisoformat(tw.replace("Z", "+00:00"))
-            if tw.tzinfo is None:
-                tw = tw.replace(tzinfo=timezone.utc)
+        for s in self._filter_samples_for_plot(res, resolved):
+            first_sample.setdefault("proc", s)
+            tw = _sample_t_wall(s)
             cpu_val = float(s["cpu_pct"]) if s.get("cpu_pct") is not None else 0.0
             mib = s.get("mem_res_mib")
             if mib is None and s.get("mem_mib_used") is not None:
@@ -1011,12 +1144,9 @@ class ProcMemCpuMonitor(object):
 
         by_tcmalloc_heap: Dict[str, List[Tuple[datetime, float]]] = defaultdict(list)
         by_tcmalloc_free: Dict[str, List[Tuple[datetime, float]]] = defaultdict(list)
-        for s in tcmalloc_samples:
-            tw = s["t_wall"]
-            if isinstance(tw, str):
-                tw = datetime.fromisoformat(tw.replace("Z", "+00:00"))
-            if tw.tzinfo is None:
-                tw = tw.replace(tzinfo=timezone.utc)
+        for s in self._tcmalloc_samples_for_plot(res):
+            first_sample.setdefault("tcmalloc", s)
+            tw = _sample_t_wall(s)
             heap_b = s.get("tcmalloc_heap_size_bytes")
             free_b = s.get("tcmalloc_pageheap_free_bytes")
             proc = s["process"]
@@ -1025,13 +1155,26 @@ class ProcMemCpuMonitor(object):
             if free_b is not None:
                 by_tcmalloc_free[proc].append((tw, float(free_b) / (1024.0 * 1024.0)))
 
-        has_proc_panels = bool(samples or system_cpu_samples)
+        if not first_sample:
+            if self._top_raw_log_path:
+                logger.info("mem_cpu_monitor.plot() top raw stdout log: %s", self._top_raw_log_path)
+            if self._tcmalloc_raw_log_path:
+                logger.info("mem_cpu_monitor.plot() tcmalloc raw stdout log: %s", self._tcmalloc_raw_log_path)
+            return None
+
+        out_dir = self._resolve_out_dir(out_dir)
+        os.makedirs(out_dir, exist_ok=True)
+        plot_sample = first_sample.get("proc") or first_sample.get("system_cpu") or first_sample["tcmalloc"]
+        path = self._output_stem(out_dir, [plot_sample], basename_style) + ".png"
+
+        has_tcmalloc = "tcmalloc" in first_sample
+        has_proc_panels = "proc" in first_sample or "system_cpu" in first_sample
         if has_proc_panels:
             n_base = 4
-            n_rows = n_base + (2 if tcmalloc_samples else 0)
+            n_rows = n_base + (2 if has_tcmalloc else 0)
             fig, axes = plt.subplots(n_rows, 1, figsize=(11, 4 + 2.5 * n_rows), sharex=True)
             ax_sys_cpu, ax_proc_cpu, ax_mem_pct, ax_mem_mib = axes[:4]
-            if tcmalloc_samples:
+            if has_tcmalloc:
                 ax_tcm_heap, ax_tcm_free = axes[4], axes[5]
             else:
                 ax_tcm_heap = ax_tcm_free = None
@@ -1072,11 +1215,7 @@ class ProcMemCpuMonitor(object):
         for ev in res.events:
             if ev.get("kind") != "event":
                 continue
-            tw = ev["t_wall"]
-            if isinstance(tw, str):
-                tw = datetime.fromisoformat(tw.replace("Z", "+00:00"))
-            if tw.tzinfo is None:
-                tw = tw.replace(tzinfo=timezone.utc)
+            tw = _sample_t_wall(ev)
             label = ev.get("event", "event")
             for ax in plot_axes:
                 ax.axvline(tw, color="red", linestyle="--", alpha=0.35)
@@ -1105,7 +1244,7 @@ class ProcMemCpuMonitor(object):
 
         if ax_mem_mib is not None:
             ax_mem_mib.set_ylabel("MiB (top RES / free used)")
-        if has_proc_panels and not tcmalloc_samples:
+        if has_proc_panels and not has_tcmalloc:
             ax_mem_mib.set_xlabel("Time (UTC)")
         elif ax_tcm_heap is not None:
             ax_tcm_heap.set_ylabel("tcmalloc heap (MiB)")
@@ -1175,11 +1314,8 @@ class ProcMemCpuMonitor(object):
             return {}
 
         resolved = self._resolve_plot_proc_subset(res, proc_subset, auto_host_jumper_subset)
-        samples = self._filter_samples_for_plot(res, resolved)
-        system_cpu_samples = self._system_cpu_samples_for_plot(res)
-        tcmalloc_samples = self._tcmalloc_samples_for_plot(res)
-        export_samples = samples + system_cpu_samples + tcmalloc_samples
-        if not export_samples:
+        first_sample = next(self._export_samples_for_plot(res, resolved), None)
+        if first_sample is None:
             if self._top_raw_log_path:
                 logger.info("mem_cpu_monitor.export_samples() top raw stdout log: %s", self._top_raw_log_path)
             if self._tcmalloc_raw_log_path:
@@ -1191,7 +1327,7 @@ class ProcMemCpuMonitor(object):
 
         out_dir = self._resolve_out_dir(out_dir)
         os.makedirs(out_dir, exist_ok=True)
-        stem = self._output_stem(out_dir, export_samples, basename_style)
+        stem = self._output_stem(out_dir, [first_sample], basename_style)
         style_used = basename_style or self._output_basename_style
         fmt_set = {str(f).lower() for f in formats}
         written: Dict[str, str] = {}
@@ -1208,25 +1344,27 @@ class ProcMemCpuMonitor(object):
                 "raw_command_log": self._raw_log_path,
                 "top_raw_log": self._top_raw_log_path,
                 "tcmalloc_raw_log": self._tcmalloc_raw_log_path,
-                "samples": [_build_export_sample_row(s) for s in export_samples],
+                "samples": None,
                 "events": [_serialize_event(e) for e in res.events],
             }
+            rows = (_build_export_sample_row(s) for s in self._export_samples_for_plot(res, resolved))
             with open(path, "w", encoding="utf-8") as fh:
-                json.dump(payload, fh, indent=2)
+                _dump_json_streaming(payload, "samples", rows, fh)
             written["json"] = path
             logger.info("mem_cpu_monitor.export_samples() wrote %s", path)
 
         if "csv" in fmt_set:
             path = stem + ".csv"
-            rows = [_build_export_sample_row(s) for s in export_samples]
+            # Two streaming passes: the columns first, then the rows.
             fieldnames_set = set()
-            for row in rows:
-                fieldnames_set.update(row.keys())
+            for s in self._export_samples_for_plot(res, resolved):
+                fieldnames_set.update(_build_export_sample_row(s).keys())
             fieldnames = sorted(fieldnames_set)
             with open(path, "w", newline="", encoding="utf-8") as fh:
                 w = csv.DictWriter(fh, fieldnames=fieldnames, extrasaction="ignore")
                 w.writeheader()
-                w.writerows(rows)
+                for s in self._export_samples_for_plot(res, resolved):
+                    w.writerow(_build_export_sample_row(s))
             written["csv"] = path
             logger.info("mem_cpu_monitor.export_samples() wrote %s", path)
 
@@ -1265,6 +1403,19 @@ def _serialize_event(ev: Dict[str, Any]) -> Dict[str, Any]:
     return out
 
 
+def _dump_json_streaming(payload: Dict[str, Any], key: str, rows: Iterable[Dict[str, Any]], fh: Any) -> None:
+    """Same output as ``json.dump(payload, fh, indent=2)`` with ``payload[key]`` written row by row from ``rows``."""
+    marker = "__mem_cpu_monitor_{}__".format(key)
+    head, tail = json.dumps(dict(payload, **{key: marker}), indent=2).split(json.dumps(marker), 1)
+    fh.write(head + "[")
+    sep = "\n"
+    for row in rows:
+        fh.write(sep + textwrap.indent(json.dumps(row, indent=2), "    "))
+        sep = ",\n"
+    fh.write("\n  ]" if sep != "\n" else "]")
+    fh.write(tail)
+
+
 def _build_export_sample_row(s: Dict[str, Any]) -> Dict[str, Any]:
     """Same numeric fields used for matplotlib panels (CPU, %MEM, MiB, tcmalloc, system CPU)."""
     mib = s.get("mem_res_mib")
@@ -1298,6 +1449,7 @@ def _build_export_sample_row(s: Dict[str, Any]) -> Dict[str, Any]:
         "system_cpu_sy_pct": s.get("system_cpu_sy_pct"),
         "tcmalloc_heap_size_bytes": heap_b,
         "tcmalloc_pageheap_free_bytes": free_b,
+        "tick_latency_s": s.get("tick_latency_s"),
     }
     if s.get("probe_transport") == "top_summary":
         idle = s.get("system_cpu_idle_pct")
@@ -0,0 +1,350 @@
+# -*- coding: utf-8 -*-
+"""
+Column-oriented storage of ``mem_cpu_monitor`` samples.
+
+A sample dict is split into one typed column per key: names (DUT, scope, process, ...) are interned and
+stored as integer codes, numbers in ``array`` columns (``None`` as NaN or a sentinel) and ``t_wall`` as
+UTC microseconds. Once ``spill_rows`` rows are buffered, they are written to disk as a chunk of binary
+column files, so a long run keeps a bounded number of rows in memory. Rows are rebuilt on access as
+dicts with the same keys, key order and values as the appended ones.
+"""
+from __future__ import annotations
+
+import os
+import tempfile
+from array import array
+from collections.abc import Sequence
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Rows buffered in memory before a chunk is spilled to disk.
+DEFAULT_SPILL_ROWS = 100000
+
+_STR = "str"
+_FLOAT = "float"
+_INT = "int"
+_TIME = "time"
+
+# Every key written by ``ProcMemCpuMonitor._record_target()``; other keys and values of unexpected types
+# are kept as-is in a per-row dict.
+SAMPLE_COLUMNS: Tuple[Tuple[str, str], ...] = (
+    ("kind", _STR),
+    ("dut", _STR),
+    ("scope", _STR),
+    ("process", _STR),
+    ("mem_unit", _STR),
+    ("probe_transport", _STR),
+    ("cpu_pct", _FLOAT),
+    ("mem_pct", _FLOAT),
+    ("mem_res_mib", _FLOAT),
+    ("mem_mib_used", _FLOAT),
+    ("mem_total_mib", _FLOAT),
+    ("system_cpu_idle_pct", _FLOAT),
+    ("system_cpu_busy_pct", _FLOAT),
+    ("system_cpu_us_pct", _FLOAT),
+    ("system_cpu_sy_pct", _FLOAT),
+    ("t_mono", _FLOAT),
+    ("tick_latency_s", _FLOAT),
+    ("t_wall", _TIME),
+    ("seq", _INT),
+    ("pid", _INT),
+    ("tcmalloc_heap_size_bytes", _INT),
+    ("tcmalloc_pageheap_free_bytes", _INT),
+)
+
+_TYPECODES = {_STR: "I", _FLOAT: "d", _INT: "q", _TIME: "q"}
+_LAYOUT = "_layout"
+_COLUMN_TYPECODES: Tuple[Tuple[str, str], ...] = tuple(
+    (name, _TYPECODES[kind]) for name, kind in SAMPLE_COLUMNS
+) + ((_LAYOUT, "I"),)
+
+_INT_NONE = -(2 ** 63)
+_INT_MAX = 2 ** 63 - 1
+_NAN = float("nan")
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+_COLUMN_KINDS: Dict[str, str] = dict(SAMPLE_COLUMNS)
+# Stored for None (and for values kept in the per-row dict)
+_EMPTY = {_STR: 0, _FLOAT: _NAN, _INT: _INT_NONE, _TIME: _INT_NONE}
+
+
+def _new_columns() -> Dict[str, array]:
+    return {name: array(typecode) for name, typecode in _COLUMN_TYPECODES}
+
+
+def sample_matches(
+    sample: Dict[str, Any],
+    include: Optional[Iterable[str]] = None,
+    exclude: Optional[Iterable[str]] = None,
+    processes: Optional[Iterable[str]] = None,
+) -> bool:
+    """True if ``probe_transport`` is in ``include`` (any if None) and not in ``exclude``, and ``process``
+    is in ``processes`` (any if None)."""
+    transport = sample.get("probe_transport")
+    if include is not None and transport not in include:
+        return False
+    if exclude is not None and transport in exclude:
+        return False
+    return processes is None or sample.get("process") in processes
+
+
+def select_samples(
+    samples: Iterable[Dict[str, Any]],
+    include: Optional[Iterable[str]] = None,
+    exclude: Optional[Iterable[str]] = None,
+    processes: Optional[Iterable[str]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Iterate the samples matching ``sample_matches()``; filters on the codes of a ``SampleStore``."""
+    if isinstance(samples, SampleStore):
+        return samples.select(include, exclude, processes)
+    return (s for s in samples if sample_matches(s, include, exclude, processes))
+
+
+class _Chunk(object):
+    """Consecutive rows of a ``SampleStore``; ``columns`` is None once the chunk is spilled to ``path``."""
+
+    __slots__ = ("columns", "extra", "size", "path")
+
+    def __init__(self) -> None:
+        self.columns: Optional[Dict[str, array]] = _new_columns()
+        # row index in the chunk -> {key: value} for values not representable in the columns
+        self.extra: Dict[int, Dict[str, Any]] = {}
+        self.size = 0
+        self.path: Optional[str] = None
+
+    def spill(self, path: str) -> None:
+        with open(path, "wb") as fh:
+            for name, _typecode in _COLUMN_TYPECODES:
+                self.columns[name].tofile(fh)
+        self.path = path
+        self.columns = None
+
+    def load(self) -> Dict[str, array]:
+        if self.columns is not None:
+            return self.columns
+        columns = {}
+        with open(self.path, "rb") as fh:
+            for name, typecode in _COLUMN_TYPECODES:
+                column = array(typecode)
+                column.fromfile(fh, self.size)
+                columns[name] = column
+        return columns
+
+
+class SampleStore(Sequence):
+    """
+    Append-only sequence of sample dicts stored column by column.
+
+    Supports ``append()``, ``len()``, iteration and indexing like the list it replaces; iteration and
+    ``select()`` stream through the spilled chunks one at a time.
+    """
+
+    def __init__(self, spill_dir: Optional[str] = None, spill_rows: Optional[int] = DEFAULT_SPILL_ROWS) -> None:
+        """
+        Args:
+            spill_dir: directory for the spilled chunks (a fresh ``mem_cpu_monitor_spill_*`` directory is created
+                in it on the first spill). None keeps every row in memory.
+            spill_rows: rows buffered in memory before they are spilled; None or 0 never spills.
+        """
+        self._spill_dir = spill_dir
+        self._spill_rows = int(spill_rows or 0) if spill_dir else 0
+        self._chunk_dir: Optional[str] = None
+        self._strings: List[Optional[str]] = [None]
+        self._string_codes: Dict[str, int] = {}
+        self._layouts: List[Tuple[str, ...]] = []
+        self._layout_codes: Dict[Tuple[str, ...], int] = {}
+        self._chunks: List[_Chunk] = []
+        self._tail = _Chunk()
+        self._size = 0
+        self._loaded: Optional[Tuple[int, Dict[str, array]]] = None
+
+    @property
+    def spilled_chunks(self) -> List[str]:
+        """Paths of the chunks written to disk."""
+        return [chunk.path for chunk in self._chunks]
+
+    def _intern(self, value: str) -> int:
+        code = self._string_codes.get(value)
+        if code is None:
+            code = len(self._strings)
+            self._strings.append(value)
+            self._string_codes[value] = code
+        return code
+
+    def _layout_code(self, keys: Tuple[str, ...]) -> int:
+        code = self._layout_codes.get(keys)
+        if code is None:
+            code = len(self._layouts)
+            self._layouts.append(keys)
+            self._layout_codes[keys] = code
+        return code
+
+    def append(self, sample: Dict[str, Any]) -> None:
+        chunk = self._tail
+        columns = chunk.columns
+        extra: Dict[str, Any] = {}
+        for name, kind in SAMPLE_COLUMNS:
+            value = sample.get(name)
+            column = columns[name]
+            if value is None:
+                column.append(_EMPTY[kind])
+            elif kind == _STR and type(value) is str:
+                column.append(self._intern(value))
+            elif kind == _FLOAT and type(value) is float and value == value:
+                column.append(value)
+            elif kind == _INT and type(value) is int and _INT_NONE < value <= _INT_MAX:
+                column.append(value)
+            elif kind == _TIME and isinstance(value, datetime) and value.tzinfo is timezone.utc:
+                column.append((value - _EPOCH) // _MICROSECOND)
+            else:
+                column.append(_EMPTY[kind])
+                extra[name] = value
+        for name, value in sample.items():
+            if name not in _COLUMN_KINDS:
+                extra[name] = value
+        columns[_LAYOUT].append(self._layout_code(tuple(sample)))
+        if extra:
+            chunk.extra[chunk.size] = extra
+        chunk.size += 1
+        self._size += 1
+        if self._spill_rows and chunk.size >= self._spill_rows:
+            self._spill()
+
+    def _spill(self) -> None:
+        if self._chunk_dir is None:
+            os.makedirs(self._spill_dir, exist_ok=True)
+            self._chunk_dir = tempfile.mkdtemp(prefix="mem_cpu_monitor_spill_", dir=self._spill_dir)
+        path = os.path.join(self._chunk_dir, "samples_{:06d}.bin".format(len(self._chunks)))
+        self._tail.spill(path)
+        self._chunks.append(self._tail)
+        self._tail = _Chunk()
+
+    def _row(self, columns: Dict[str, array], extra: Dict[int, Dict[str, Any]], i: int) -> Dict[str, Any]:
+        row_extra = extra.get(i)
+        strings = self._strings
+        row: Dict[str, Any] = {}
+        for name in self._layouts[columns[_LAYOUT][i]]:
+            if row_extra is not None and name in row_extra:
+                row[name] = row_extra[name]
+                continue
+            value = columns[name][i]
+            kind = _COLUMN_KINDS[name]
+            if kind == _STR:
+                row[name] = strings[value]
+            elif kind == _FLOAT:
+                row[name] = None if value != value else value
+            elif value == _INT_NONE:
+                row[name] = None
+            elif kind == _INT:
+                row[name] = value
+            else:
+                row[name] = _EPOCH + value * _MICROSECOND
+        return row
+
+    def _iter_chunks(self) -> Iterator[Tuple[Dict[str, array], _Chunk]]:
+        for chunk in self._chunks + [self._tail]:
+            if chunk.size:
+                yield chunk.load(), chunk
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for columns, chunk in self._iter_chunks():
+            for i in range(chunk.size):
+                yield self._row(columns, chunk.extra, i)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._size))]
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("sample index out of range")
+        for chunk_index, chunk in enumerate(self._chunks + [self._tail]):
+            if index < chunk.size:
+                break
+            index -= chunk.size
+        if chunk.columns is not None:
+            columns = chunk.columns
+        elif self._loaded is not None and self._loaded[0] == chunk_index:
+            columns = self._loaded[1]
+        else:
+            columns = chunk.load()
+            self._loaded = (chunk_index, columns)
+        return self._row(columns, chunk.extra, index)
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, (list, SampleStore)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return "SampleStore({} samples, {} spilled chunks)".format(self._size, len(self._chunks))
+
+    def _codes(self, values: Optional[Iterable[str]]) -> Optional[set]:
+        if values is None:
+            return None
+        return {self._string_codes[v] for v in values if v in self._string_codes}
+
+    def select(
+        self,
+        include: Optional[Iterable[str]] = None,
+        exclude: Optional[Iterable[str]] = None,
+        processes: Optional[Iterable[str]] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Iterate the samples matching ``sample_matches()``, comparing codes before rebuilding a row."""
+        include_codes = self._codes(include)
+        exclude_codes = self._codes(exclude)
+        process_codes = self._codes(processes)
+        for columns, chunk in self._iter_chunks():
+            transports = columns["probe_transport"]
+            procs = columns["process"]
+            extra = chunk.extra
+            for i in range(chunk.size):
+                if i in extra:
+                    row = self._row(columns, extra, i)
+                    if sample_matches(row, include, exclude, processes):
+                        yield row
+                    continue
+                if include_codes is not None and transports[i] not in include_codes:
+                    continue
+                if exclude_codes is not None and transports[i] in exclude_codes:
+                    continue
+                if process_codes is not None and procs[i] not in process_codes:
+                    continue
+                yield self._row(columns, extra, i)
+
+
+class SampleTimeline(Sequence):
+    """Samples and events sorted by ``(t_mono, seq)``; the merged list is only built on first access."""
+
+    def __init__(self, samples: Iterable[Dict[str, Any]], events: List[Dict[str, Any]]) -> None:
+        self._samples = samples
+        self._events = events
+        self._merged: Optional[List[Dict[str, Any]]] = None
+
+    def _items(self) -> List[Dict[str, Any]]:
+        if self._merged is None:
+            merged = list(self._samples) + list(self._events)
+            merged.sort(key=lambda r: (r["t_mono"], r["seq"]))
+            self._merged = merged
+        return self._merged
+
+    def __len__(self) -> int:
+        return len(self._items())
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self._items())
+
+    def __getitem__(self, index):
+        return self._items()[index]
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, (list, SampleTimeline)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    __hash__ = None
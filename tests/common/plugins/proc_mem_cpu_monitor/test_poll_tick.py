@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+import subprocess
+import time
+from unittest.mock import MagicMock
+
+import pytest
+from tests.common.plugins.proc_mem_cpu_monitor.controller import (
+    ProcMemCpuMonitor,
+    _batch_cmd,
+    _split_batch_stdout,
+)
+from tests.common.plugins.proc_mem_cpu_monitor.test_top_parser import FREE_M_OUT, PROCPS_TOP
+
+pytestmark = [
+    pytest.mark.topology('t0', 't1', 'any')
+]
+
+ROUND_TRIP = 0.3
+
+
+class FakeDut(object):
+    """Runs DUT commands with the local shell after a fixed round-trip delay."""
+
+    def __init__(self, hostname):
+        self.hostname = hostname
+        self.calls = []
+
+    def _run(self, module, cmd):
+        self.calls.append((module, cmd))
+        time.sleep(ROUND_TRIP)
+        out = subprocess.run(cmd, shell=True, stdout=subprocess.PIPE, universal_newlines=True)
+        return {"stdout": out.stdout.rstrip("\n")}
+
+    def shell(self, cmd, module_ignore_errors=False):
+        return self._run("shell", cmd)
+
+    def command(self, cmd, module_ignore_errors=False):
+        return self._run("command", cmd)
+
+
+@pytest.fixture
+def outputs(tmp_path):
+    top = tmp_path / "top.txt"
+    top.write_text(PROCPS_TOP)
+    free = tmp_path / "free.txt"
+    free.write_text(FREE_M_OUT)
+    return "cat {}".format(top), "cat {}".format(free)
+
+
+def _monitor(duts, outputs, batch_commands=True):
+    top_cmd, free_cmd = outputs
+    monitor = ProcMemCpuMonitor(MagicMock())
+    monitor._proc_list = ["bgpd", "zebra"]
+    monitor._batch_commands = batch_commands
+    for dut in duts:
+        monitor._targets.append((dut, "host", top_cmd, "top"))
+        monitor._targets.append((dut, "docker:bgp:0", top_cmd, "top"))
+        monitor._targets.append((dut, "host:free", free_cmd, "free"))
+    return monitor
+
+
+def test_split_batch_stdout_round_trip():
+    cmds = ["echo one; echo two", "true", "printf 'three\\n'"]
+    stdout = subprocess.run(_batch_cmd(cmds), shell=True, stdout=subprocess.PIPE, universal_newlines=True).stdout
+    assert _split_batch_stdout(stdout, len(cmds)) == ["one\ntwo", "", "three"]
+
+
+def test_split_batch_stdout_missing_markers():
+    assert _split_batch_stdout("", 2) == ["", ""]
+
+
+def test_poll_tick_one_round_trip_per_dut(outputs):
+    duts = [FakeDut("dut1"), FakeDut("dut2"), FakeDut("dut3")]
+    monitor = _monitor(duts, outputs)
+
+    t0 = time.monotonic()
+    monitor._poll_tick()
+    elapsed = time.monotonic() - t0
+
+    # DUTs are sampled concurrently, each with a single batched shell call
+    assert elapsed < ROUND_TRIP * 2
+    for dut in duts:
+        assert [module for module, _cmd in dut.calls] == ["shell"]
+    samples = monitor._samples
+    for dut in duts:
+        rows = {(s["scope"], s["process"]) for s in samples if s["dut"] == dut.hostname}
+        assert rows == {("host", "bgpd"), ("host", "zebra"), ("host", "system_cpu_idle"),
+                        ("docker:bgp:0", "bgpd"), ("docker:bgp:0", "zebra"), ("host:free", "free_used")}
+    assert all(s["tick_latency_s"] >= ROUND_TRIP for s in samples)
+    assert len({s["seq"] for s in samples}) == len(samples)
+    assert monitor._last_tick_latency == pytest.approx(elapsed, abs=0.05)
+
+
+def test_poll_tick_without_batching(outputs):
+    dut = FakeDut("dut1")
+    monitor = _monitor([dut], outputs, batch_commands=False)
+    monitor._poll_tick()
+    assert [module for module, _cmd in dut.calls] == ["command"] * 3
+    assert {s["process"] for s in monitor._samples} == {"bgpd", "zebra", "system_cpu_idle", "free_used"}
+
+
+def test_mem_leak_compare_uses_batched_targets(outputs):
+    dut = FakeDut("dut1")
+    monitor = _monitor([dut], outputs)
+    monitor._poll_tick()
+    failures, skipped = monitor._run_mem_leak_compare("10%")
+    assert failures == [] and not skipped
+    assert [module for module, _cmd in dut.calls] == ["shell", "shell"]
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+import csv
+import json
+import os
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+
+import pytest
+from tests.common.plugins.proc_mem_cpu_monitor.controller import (
+    MemCpuMonitorResult,
+    ProcMemCpuMonitor,
+    _build_export_sample_row,
+    _serialize_event,
+)
+from tests.common.plugins.proc_mem_cpu_monitor.sample_store import SampleStore, SampleTimeline, select_samples
+
+pytestmark = [
+    pytest.mark.topology('t0', 't1', 'any')
+]
+
+
+def _samples(ticks):
+    """Samples shaped like the ones of ``_record_target()`` for every probe kind."""
+    out = []
+    seq = 0
+    for tick in range(ticks):
+        now = datetime(2024, 5, 1, 12, 0, tick % 60, 123457 + tick, tzinfo=timezone.utc)
+        common = {"t_wall": now, "t_mono": 1000.5 + tick, "tick_latency_s": 0.25}
+        for proc, pid in (("bgpd", 101), ("zebra", 102)):
+            seq += 1
+            out.append(dict({
+                "kind": "sample", "dut": "dut1", "scope": "host", "process": proc,
+                "cpu_pct": 1.5 * tick, "mem_pct": 0.5, "mem_res_mib": 12.25, "mem_unit": "%",
+                "probe_transport": "top", "pid": pid,
+            }, **common, seq=seq))
+        seq += 1
+        out.append(dict({
+            "kind": "sample", "dut": "dut1", "scope": "host", "process": "system_cpu_idle",
+            "cpu_pct": 90.0, "mem_pct": None, "mem_res_mib": None, "mem_unit": "%",
+            "probe_transport": "top_summary", "system_cpu_idle_pct": 90.0, "system_cpu_busy_pct": None,
+            "system_cpu_us_pct": 6.0, "system_cpu_sy_pct": 4.0,
+        }, **common, seq=seq))
+        seq += 1
+        out.append(dict({
+            "kind": "sample", "dut": "dut1", "scope": "host:free", "process": "free_used", "cpu_pct": None,
+            "mem_pct": 31.5, "mem_mib_used": 2500.0, "mem_total_mib": 7936.0, "mem_res_mib": 2500.0,
+            "mem_unit": "%", "probe_transport": "free",
+        }, **common, seq=seq))
+        seq += 1
+        out.append(dict({
+            "kind": "sample", "dut": "dut1", "scope": "docker:bgp:0", "process": "bgpd", "cpu_pct": None,
+            "mem_pct": None, "mem_res_mib": 64.0, "mem_unit": "bytes", "probe_transport": "tcmalloc",
+            "tcmalloc_heap_size_bytes": 67108864, "tcmalloc_pageheap_free_bytes": 1048576,
+        }, **common, seq=seq))
+    return out
+
+
+def _store(samples, **kwargs):
+    store = SampleStore(**kwargs)
+    for s in samples:
+        store.append(s)
+    return store
+
+
+def test_round_trip_keeps_keys_types_and_order():
+    samples = _samples(3)
+    # Values of other types than the column and keys outside the schema are kept as they are
+    samples[0]["cpu_pct"] = 7
+    samples[1]["note"] = {"a": 1}
+    samples[2]["t_wall"] = "2024-05-01T12:00:00Z"
+    store = _store(samples)
+    assert len(store) == len(samples)
+    assert list(store) == samples
+    for got, expected in zip(store, samples):
+        assert list(got) == list(expected)
+        assert [type(v) for v in got.values()] == [type(v) for v in expected.values()]
+    assert store[-1] == samples[-1]
+    assert store[1:3] == samples[1:3]
+    assert store == samples
+
+
+def test_spill_chunks_to_disk(tmp_path):
+    samples = _samples(20)
+    store = _store(samples, spill_dir=str(tmp_path), spill_rows=7)
+    assert len(store.spilled_chunks) == len(samples) // 7
+    assert all(os.path.isfile(path) for path in store.spilled_chunks)
+    assert store._tail.size == len(samples) % 7
+    assert list(store) == samples
+    assert [store[i] for i in range(len(samples))] == samples
+    assert store[-1] == samples[-1]
+
+
+def test_no_spill_without_dir():
+    store = _store(_samples(20), spill_rows=7)
+    assert store.spilled_chunks == []
+
+
+def test_select_matches_list_filter(tmp_path):
+    samples = _samples(10)
+    samples[3]["process"] = None
+    store = _store(samples, spill_dir=str(tmp_path), spill_rows=9)
+    for kwargs in (
+        {"include": ("top",)},
+        {"exclude": ("tcmalloc", "top_summary")},
+        {"exclude": ("tcmalloc", "top_summary"), "processes": ["bgpd", "free_used"]},
+        {"include": ("tcmalloc",), "processes": ["zebra"]},
+        {"processes": ["unknown"]},
+    ):
+        assert list(select_samples(store, **kwargs)) == list(select_samples(samples, **kwargs))
+
+
+def test_timeline_sorted_lazily():
+    samples = _samples(2)
+    events = [{"kind": "event", "event": "start", "t_wall": samples[0]["t_wall"], "t_mono": 1000.0, "seq": 0}]
+    timeline = SampleTimeline(_store(samples), events)
+    assert timeline._merged is None
+    assert timeline == sorted(samples + events, key=lambda r: (r["t_mono"], r["seq"]))
+    assert timeline[0] is events[0]
+
+
+def test_export_streams_from_store(tmp_path):
+    samples = _samples(12)
+    events = [{"kind": "event", "event": "start", "t_wall": samples[0]["t_wall"], "t_mono": 1000.0, "seq": 0}]
+    request = MagicMock()
+    request.node.nodeid = "test_example.py::test_case"
+    request.node.name = "test_case"
+    monitor = ProcMemCpuMonitor(request)
+    store = _store(samples, spill_dir=str(tmp_path), spill_rows=10)
+    result = MemCpuMonitorResult(samples=store, events=events, timeline=SampleTimeline(store, events))
+
+    written = monitor.export_samples(result, proc_subset=["bgpd", "free_used"], out_dir=str(tmp_path))
+
+    expected_samples = [s for s in samples if s["probe_transport"] in ("top", "free") and
+                        s["process"] in ("bgpd", "free_used")]
+    expected_samples += [s for s in samples if s["probe_transport"] == "top_summary"]
+    expected_samples += [s for s in samples if s["probe_transport"] == "tcmalloc"]
+    expected_rows = [_build_export_sample_row(s) for s in expected_samples]
+    with open(written["json"], encoding="utf-8") as fh:
+        text = fh.read()
+    payload = json.loads(text)
+    assert payload["samples"] == expected_rows
+    assert payload["events"] == json.loads(json.dumps([_serialize_event(e) for e in events]))
+    # Byte for byte the json.dump(indent=2) output
+    assert text == json.dumps(payload, indent=2)
+    with open(written["csv"], newline="", encoding="utf-8") as fh:
+        rows = list(csv.DictReader(fh))
+    assert [r["seq"] for r in rows] == [str(r["seq"]) for r in expected_rows]
+    assert "plot_system_cpu_idle_pct" in rows[0] and "plot_tcmalloc_heap_mib" in rows[0]
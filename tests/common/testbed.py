@@ -7,15 +7,145 @@ import csv
 import ipaddr as ipaddress
 import json
 import os
+import pickle
 import re
+import tempfile
+import threading
 import yaml
 import logging
 
 from collections import defaultdict
 from collections import OrderedDict
+from collections.abc import ItemsView, ValuesView
+
+try:
+    from yaml import CSafeLoader as YamlSafeLoader
+except ImportError:
+    from yaml import SafeLoader as YamlSafeLoader
 
 logger = logging.getLogger(__name__)
 
+# topology file path -> ((mtime_ns, size), pickled topology)
+_topo_file_cache = {}
+_topo_file_cache_lock = threading.Lock()
+
+
+def _read_topo_cache_file(cache_file, key):
+    try:
+        with open(cache_file, "rb") as fh:
+            cached_key, data = pickle.load(fh)
+    except (OSError, EOFError, ValueError, TypeError, pickle.UnpicklingError):
+        return None
+    return data if tuple(cached_key) == key else None
+
+
+def _write_topo_cache_file(cache_file, key, data):
+    cache_dir = os.path.dirname(cache_file)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_file = tempfile.mkstemp(dir=cache_dir, prefix=".tmp_")
+        with os.fdopen(fd, "wb") as fh:
+            pickle.dump((key, data), fh, pickle.HIGHEST_PROTOCOL)
+        # pytest-xdist workers may write the same file, the rename is atomic
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        logger.debug("Failed to cache topology file to {}: {}".format(cache_file, repr(e)))
+
+
+def load_topo_file(topo_file, cache_dir=None):
+    """Load a topology yaml file.
+
+    Parsed files are cached in memory and, if cache_dir is set, in files of cache_dir. Cached topologies are
+    reused until the modification time or the size of the topology file changes.
+
+    Args:
+        topo_file (str): Path of the topology file.
+        cache_dir (str): Folder of the cache files, None to not cache on disk.
+
+    Returns:
+        The topology, a new copy on each call.
+    """
+    stat = os.stat(topo_file)
+    key = (stat.st_mtime_ns, stat.st_size)
+    with _topo_file_cache_lock:
+        cached = _topo_file_cache.get(topo_file)
+    if cached is None or cached[0] != key:
+        cache_file = os.path.join(cache_dir, os.path.basename(topo_file) + ".cache") if cache_dir else None
+        data = _read_topo_cache_file(cache_file, key) if cache_file else None
+        if data is None:
+            with open(topo_file, 'r') as fh:
+                data = pickle.dumps(yaml.load(fh, Loader=YamlSafeLoader), pickle.HIGHEST_PROTOCOL)
+            if cache_file:
+                _write_topo_cache_file(cache_file, key, data)
+        cached = (key, data)
+        with _topo_file_cache_lock:
+            _topo_file_cache[topo_file] = cached
+    return pickle.loads(cached[1])
+
+
+class LazyTestbedTopo(OrderedDict):
+    """Testbed name to testbed info, the topology of a testbed is parsed on first access of its info.
+
+    Testbed info read from the testbed file has the topology name in "topo", parse_func replaces it with the
+    parsed topology in place. Accessing the values in any way (indexing, get(), items(), values(), ...) returns
+    parsed testbed info.
+    """
+
+    def __init__(self, testbeds, parse_func):
+        super(LazyTestbedTopo, self).__init__(testbeds)
+        self._parse_func = parse_func
+        self._lock = threading.RLock()
+
+    def _parsed(self, tb):
+        if isinstance(tb, dict) and isinstance(tb.get("topo"), str):
+            with self._lock:
+                if isinstance(tb.get("topo"), str):
+                    self._parse_func(tb)
+        return tb
+
+    def __getitem__(self, key):
+        return self._parsed(super(LazyTestbedTopo, self).__getitem__(key))
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def items(self):
+        return ItemsView(self)
+
+    def values(self):
+        return ValuesView(self)
+
+    def pop(self, key, *args):
+        if key in self:
+            self[key]
+        return super(LazyTestbedTopo, self).pop(key, *args)
+
+    def popitem(self, last=True):
+        if self:
+            self[next(reversed(self)) if last else next(iter(self))]
+        return super(LazyTestbedTopo, self).popitem(last)
+
+    def setdefault(self, key, default=None):
+        if key in self:
+            return self[key]
+        return super(LazyTestbedTopo, self).setdefault(key, default)
+
+    def copy(self):
+        return LazyTestbedTopo(OrderedDict.items(self), self._parse_func)
+
+    def __eq__(self, other):
+        return OrderedDict(self.items()) == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "{}({!r})".format(self.__class__.__name__, list(self.items()))
+
+    def __reduce__(self):
+        # Pickled and deep copied as a plain OrderedDict of parsed testbed info
+        return OrderedDict, (list(self.items()),)
+
 
 class TestbedInfo(object):
     """Parse the testbed file used to describe whole testbed info."""
@@ -27,6 +157,8 @@ class TestbedInfo(object):
                                   'inv_name', 'auto_recover', 'is_smartswitch', 'comment')
     TOPOLOGY_FILEPATH = "../../ansible/vars/"
     NUT_TOPOLOGY_FILEPATH = "../../ansible/vars/nut_topos"
+    # Parsed topology files, next to the facts cache. Set to None to not cache them on disk.
+    TOPOLOGY_CACHE_FILEPATH = "../_cache/topo_files"
 
     def __init__(self, testbed_file):
         if testbed_file.endswith(".csv"):
@@ -51,6 +183,7 @@ class TestbedInfo(object):
             raise ValueError("Unsupported testbed file type")
 
         # use OrderedDict here to ensure yaml file has same order as csv.
+        # replaced by a LazyTestbedTopo once the testbed file is read, see parse_topo().
         self.testbed_topo = OrderedDict()
         # use to convert from netmask to cidr
         self._address_cache = {}
@@ -60,8 +193,9 @@ class TestbedInfo(object):
             self._read_testbed_topo_from_csv()
             # create yaml testbed file
             self.dump_testbeds_to_yaml()
-        self.parse_topo()
-        self._normalize_topo_names()
+        # Topology files are large and most testbeds of the file are never used by a run, the topology of a
+        # testbed is parsed when its info is accessed.
+        self.testbed_topo = LazyTestbedTopo(self.testbed_topo, self._parse_testbed_topo)
 
     def _cidr_to_ip_mask(self, network):
         addr = ipaddress.IPNetwork(network)
@@ -107,7 +241,7 @@ class TestbedInfo(object):
     def _read_testbed_topo_from_yaml(self):
         """Read yaml testbed info file."""
         with open(self.testbed_filename) as f:
-            tb_info = yaml.safe_load(f)
+            tb_info = yaml.load(f, Loader=YamlSafeLoader)
 
             if tb_info is None or len(tb_info) == 0:
                 raise ValueError("Testbed file {} is empty".format(self.testbed_filename))
@@ -378,32 +512,41 @@ class TestbedInfo(object):
         return map
 
     def parse_topo(self):
-        for tb_name, tb in list(self.testbed_topo.items()):
-            topo = tb.pop("topo")
-            tb["topo"] = defaultdict()
-            tb["topo"]["name"] = topo
-            tb["topo"]["type"] = self.get_testbed_type(topo)
-
-            if topo.startswith("nut-"):
-                topo_dir = os.path.join(os.path.dirname(__file__), self.NUT_TOPOLOGY_FILEPATH)
-                topo_file = os.path.join(topo_dir, "{}.yml".format(topo))
-                with open(topo_file, 'r') as fh:
-                    tb['topo']['properties'] = yaml.safe_load(fh)
-            else:
-                topo_dir = os.path.join(os.path.dirname(__file__), self.TOPOLOGY_FILEPATH)
-                topo_file = os.path.join(topo_dir, "topo_{}.yml".format(topo))
-                with open(topo_file, 'r') as fh:
-                    tb['topo']['properties'] = yaml.safe_load(fh)
-                tb['topo']['ptf_map'] = self.calculate_ptf_index_map(tb)
-                tb['topo']['ptf_map_disabled'] = self.calculate_ptf_index_map_disabled(tb)
-                tb['topo']['ptf_dut_intf_map'] = self.calculate_ptf_dut_intf_map(tb)
-
-    def _normalize_topo_names(self):
-        """Normalize topology names by removing the '-vpp' suffix if present."""
-        for tb_name, tb in list(self.testbed_topo.items()):
-            topo_name = tb["topo"]["name"]
-            if topo_name.endswith("-vpp"):
-                tb["topo"]["name"] = topo_name[:-4]  # Remove the last 4 characters ("-vpp")
+        """Parse the topology of every testbed now instead of on first access."""
+        for tb_name in self.testbed_topo:
+            self.testbed_topo[tb_name]
+
+    def _parse_testbed_topo(self, tb):
+        """Replace the topology name in tb["topo"] with the parsed topology.
+
+        The topology is built aside and stored only once fully parsed, so a testbed failing to parse keeps its
+        topology name and fails again on next access.
+        """
+        topo = tb["topo"]
+        parsed = defaultdict()
+        parsed["name"] = topo
+        parsed["type"] = self.get_testbed_type(topo)
+        parsed_tb = dict(tb, topo=parsed)
+
+        cache_dir = None
+        if self.TOPOLOGY_CACHE_FILEPATH:
+            cache_dir = os.path.join(os.path.dirname(__file__), self.TOPOLOGY_CACHE_FILEPATH)
+        if topo.startswith("nut-"):
+            topo_dir = os.path.join(os.path.dirname(__file__), self.NUT_TOPOLOGY_FILEPATH)
+            topo_file = os.path.join(topo_dir, "{}.yml".format(topo))
+            parsed['properties'] = load_topo_file(topo_file, cache_dir)
+        else:
+            topo_dir = os.path.join(os.path.dirname(__file__), self.TOPOLOGY_FILEPATH)
+            topo_file = os.path.join(topo_dir, "topo_{}.yml".format(topo))
+            parsed['properties'] = load_topo_file(topo_file, cache_dir)
+            parsed['ptf_map'] = self.calculate_ptf_index_map(parsed_tb)
+            parsed['ptf_map_disabled'] = self.calculate_ptf_index_map_disabled(parsed_tb)
+            parsed['ptf_dut_intf_map'] = self.calculate_ptf_dut_intf_map(parsed_tb)
+
+        # Normalize topology names by removing the '-vpp' suffix if present.
+        if topo.endswith("-vpp"):
+            parsed["name"] = topo[:-4]  # Remove the last 4 characters ("-vpp")
+        tb["topo"] = parsed
 
 
 if __name__ == "__main__":
@@ -0,0 +1,164 @@
+"""Unit tests for route posting of ``ansible/library/announce_routes.py``.
+
+A local stub of exabgp http api is used as the target of the posted routes.
+"""
+import importlib.util
+import logging
+import sys
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs
+
+import pytest
+
+
+ANSIBLE_PATH = Path(__file__).resolve().parents[4] / "ansible"
+MODULE_PATH = ANSIBLE_PATH / "library/announce_routes.py"
+
+
+def _load_module_util(name):
+    full_name = "ansible.module_utils." + name
+    if full_name not in sys.modules:
+        spec = importlib.util.spec_from_file_location(full_name, ANSIBLE_PATH / "module_utils" / (name + ".py"))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        sys.modules[full_name] = module
+
+
+def _load_target_module():
+    """Load the target module, stub AnsibleModule when ansible is not installed."""
+    try:
+        import ansible.module_utils.basic  # noqa: F401
+    except ImportError:
+        basic_stub = types.ModuleType("ansible.module_utils.basic")
+        basic_stub.AnsibleModule = object
+        sys.modules.setdefault("ansible", types.ModuleType("ansible"))
+        sys.modules.setdefault("ansible.module_utils", types.ModuleType("ansible.module_utils"))
+        sys.modules["ansible.module_utils.basic"] = basic_stub
+    _load_module_util("debug_utils")
+    _load_module_util("multi_servers_utils")
+
+    spec = importlib.util.spec_from_file_location("unit_target_announce_routes", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="module")
+def announce_routes():
+    """Load and return the announce_routes target module."""
+    return _load_target_module()
+
+
+@pytest.fixture(autouse=True)
+def _bypass_repo_log_format(monkeypatch):
+    """``tests/pytest.ini`` log format needs ``%(funcNamewithModule)s`` field injected by the
+    ``log_section_start`` plugin, which isn't loaded under ``--noconftest``. Use plain format instead."""
+    import _pytest.logging as _pylog
+    plain = logging.Formatter("%(message)s")
+    monkeypatch.setattr(_pylog.PercentStyleMultiline, "format", lambda self, record: plain.format(record))
+
+
+class StubExabgpServer(ThreadingHTTPServer):
+    """Stub of exabgp http api, records the posted commands and the client connections."""
+
+    daemon_threads = True
+
+    def __init__(self, delay=0, status=200):
+        self.commands = []
+        self.connections = set()
+        self.requests = 0
+        self.delay = delay
+        self.status = status
+        self.lock = threading.Lock()
+        super(StubExabgpServer, self).__init__(("127.0.0.1", 0), StubExabgpHandler)
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+
+class StubExabgpHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"])).decode()
+        commands = parse_qs(body)["commands"][0].split(";")
+        time.sleep(self.server.delay)
+        with self.server.lock:
+            self.server.commands.extend(commands)
+            self.server.connections.add(self.client_address)
+            self.server.requests += 1
+        self.send_response(self.server.status)
+        self.send_header("Content-Length", "3")
+        self.end_headers()
+        self.wfile.write(b"OK\n")
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    servers = []
+
+    def start(**kwargs):
+        server = StubExabgpServer(**kwargs)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def _routes(count):
+    return [("10.{}.{}.0/24".format(i // 256, i % 256), "10.10.246.254", "6666 6667" if i % 2 else "")
+            for i in range(count)]
+
+
+def test_change_routes_posts_all_routes(announce_routes, stub_server):
+    server = stub_server()
+    routes = _routes(5000)
+    rate = announce_routes.change_routes("announce", "127.0.0.1", server.port, routes)
+
+    assert rate > 0
+    assert sorted(server.commands) == sorted(announce_routes.generate_route_messages("announce", routes))
+    assert "announce route 10.0.1.0/24 next-hop 10.10.246.254 as-path [ 6666 6667 ]" in server.commands
+    assert "announce route 10.0.0.0/24 next-hop 10.10.246.254" in server.commands
+    # Batches are posted over keep-alive sessions, not one connection per batch
+    assert server.requests > announce_routes.MAX_INFLIGHT_BATCHES
+    assert len(server.connections) <= announce_routes.MAX_INFLIGHT_BATCHES
+
+
+def test_change_routes_no_routes(announce_routes, stub_server):
+    server = stub_server()
+    announce_routes.change_routes("withdraw", "127.0.0.1", server.port, [])
+    assert server.requests == 0
+
+
+def test_change_routes_failure(announce_routes, stub_server):
+    server = stub_server(status=500)
+    with pytest.raises(Exception, match="Change routes failed"):
+        announce_routes.change_routes("announce", "127.0.0.1", server.port, _routes(10))
+
+
+def test_batch_size_adapts_to_latency(announce_routes):
+    sizer = announce_routes.BatchSizer(200, min_size=50, max_size=800, target_latency=1.0)
+    sizer.update(200, 0.1)
+    assert sizer.size == 400
+    sizer.update(100, 0.1)
+    assert sizer.size == 400, "partial batch must not grow the batch size"
+    sizer.update(400, 0.1)
+    sizer.update(800, 0.1)
+    assert sizer.size == 800
+    sizer.update(800, 0.7)
+    assert sizer.size == 800
+    for _ in range(5):
+        sizer.update(800, 2.0)
+    assert sizer.size == 50
@@ -0,0 +1,144 @@
+"""Unit tests for the graph group index and graph facts cache of ``ansible/library/conn_graph_facts.py``."""
+import importlib.util
+import logging
+import shutil
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+
+ANSIBLE_PATH = Path(__file__).resolve().parents[4] / "ansible"
+MODULE_PATH = ANSIBLE_PATH / "library/conn_graph_facts.py"
+
+
+def _load_target_module():
+    """Load the target module, stub AnsibleModule when ansible is not installed."""
+    try:
+        import ansible.module_utils.basic  # noqa: F401
+    except ImportError:
+        basic_stub = types.ModuleType("ansible.module_utils.basic")
+        basic_stub.AnsibleModule = object
+        sys.modules.setdefault("ansible", types.ModuleType("ansible"))
+        sys.modules.setdefault("ansible.module_utils", types.ModuleType("ansible.module_utils"))
+        sys.modules["ansible.module_utils.basic"] = basic_stub
+    if str(ANSIBLE_PATH) not in sys.path:
+        sys.path.append(str(ANSIBLE_PATH))
+
+    spec = importlib.util.spec_from_file_location("unit_target_conn_graph_facts", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="module")
+def conn_graph_facts():
+    """Load and return the conn_graph_facts target module."""
+    return _load_target_module()
+
+
+@pytest.fixture(autouse=True)
+def _bypass_repo_log_format(monkeypatch):
+    """``tests/pytest.ini`` log format needs ``%(funcNamewithModule)s`` field injected by the
+    ``log_section_start`` plugin, which isn't loaded under ``--noconftest``. Use plain format instead."""
+    import _pytest.logging as _pylog
+    plain = logging.Formatter("%(message)s")
+    monkeypatch.setattr(_pylog.PercentStyleMultiline, "format", lambda self, record: plain.format(record))
+
+
+@pytest.fixture
+def graph_env(conn_graph_facts, tmp_path, monkeypatch):
+    """Copy the graph files of the repo to a temporary folder and use a temporary cache folder."""
+    graph_path = tmp_path / "files"
+    shutil.copytree(str(ANSIBLE_PATH / "files"), str(graph_path))
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setattr(conn_graph_facts, "LAB_GRAPHFILE_PATH", str(graph_path) + "/")
+    monkeypatch.setattr(conn_graph_facts, "LAB_GRAPH_CACHE_DIR", str(cache_dir))
+    return graph_path, cache_dir
+
+
+def _fail_reading_csv(*args, **kwargs):
+    raise AssertionError("csv files must not be read")
+
+
+def test_find_graph_same_as_without_cache(conn_graph_facts, graph_env):
+    graph_path, cache_dir = graph_env
+    for hostnames, group in [(["str-msn2700-01"], "lab"), (["sonic-s6100-dut1"], "snappi-sonic")]:
+        lab_graph = conn_graph_facts.find_graph(hostnames)
+        assert lab_graph.group == group
+        expected = conn_graph_facts.LabGraph(str(graph_path) + "/", group)
+        assert lab_graph.graph_facts == expected.graph_facts
+        assert lab_graph.build_results(hostnames) == expected.build_results(hostnames)
+
+    assert conn_graph_facts.find_graph(["no-such-host"]) is None
+    assert sorted(path.name.split("_")[0] for path in cache_dir.glob("*.pickle")) == ["lab", "snappi-sonic"]
+
+
+def test_find_graph_uses_cache(conn_graph_facts, graph_env, monkeypatch):
+    expected = conn_graph_facts.find_graph(["sonic-s6100-dut1"]).graph_facts
+
+    monkeypatch.setattr(conn_graph_facts.LabGraph, "read_hostnames", _fail_reading_csv)
+    monkeypatch.setattr(conn_graph_facts.LabGraph, "read_csv_files", _fail_reading_csv)
+    assert conn_graph_facts.find_graph(["sonic-s6100-dut1"]).graph_facts == expected
+
+
+def test_changed_csv_invalidates_cache(conn_graph_facts, graph_env):
+    graph_path, _ = graph_env
+    assert conn_graph_facts.find_graph(["str-msn2700-01"]).group == "lab"
+    assert conn_graph_facts.find_graph(["new-dut"]) is None
+
+    devices_csv = graph_path / "sonic_snappi-sonic_devices.csv"
+    with devices_csv.open("a") as f:
+        f.write("new-dut,10.251.0.235/32,Arista-7060CX-32S-C32,DevSonic\n")
+    lab_graph = conn_graph_facts.find_graph(["new-dut"])
+    assert lab_graph.group == "snappi-sonic"
+    assert lab_graph.graph_facts["devices"]["new-dut"]["HwSku"] == "Arista-7060CX-32S-C32"
+
+
+def test_cache_keyed_by_forced_mgmt_routes(conn_graph_facts, graph_env):
+    plain = conn_graph_facts.find_graph(["str-msn2700-01"])
+    routed = conn_graph_facts.find_graph(["str-msn2700-01"], forced_mgmt_routes=["10.0.0.0/8", "fc00::/7"])
+    assert plain.graph_facts["devices"]["str-msn2700-01"]["ManagementRoutes"] == []
+    assert routed.graph_facts["devices"]["str-msn2700-01"]["ManagementRoutes"] == ["10.0.0.0/8"]
+    assert routed.graph_facts["devices"]["str-msn2700-01"]["ManagementRoutesV6"] == ["fc00::/7"]
+
+
+def test_cache_disabled(conn_graph_facts, graph_env, monkeypatch):
+    _, cache_dir = graph_env
+    monkeypatch.setattr(conn_graph_facts, "LAB_GRAPH_CACHE_DIR", "")
+    assert conn_graph_facts.find_graph(["str-msn2700-01"]).group == "lab"
+    assert not cache_dir.exists()
+
+
+def test_corrupted_cache(conn_graph_facts, graph_env):
+    _, cache_dir = graph_env
+    expected = conn_graph_facts.find_graph(["str-msn2700-01"]).graph_facts
+    for path in cache_dir.iterdir():
+        path.write_bytes(b"corrupted")
+    assert conn_graph_facts.find_graph(["str-msn2700-01"]).graph_facts == expected
+
+
+def test_cache_files_of_other_users_ignored(conn_graph_facts, graph_env, monkeypatch):
+    _, cache_dir = graph_env
+    expected = conn_graph_facts.find_graph(["str-msn2700-01"]).graph_facts
+    assert cache_dir.stat().st_mode & 0o777 == 0o700
+
+    # Files writable by others, or owned by another user, may have been planted and are not loaded
+    for path in cache_dir.iterdir():
+        path.chmod(0o666)
+    with monkeypatch.context() as m:
+        m.setattr(conn_graph_facts.LabGraph, "read_hostnames", _fail_reading_csv)
+        m.setattr(conn_graph_facts.LabGraph, "read_csv_files", _fail_reading_csv)
+        with pytest.raises(AssertionError, match="csv files must not be read"):
+            conn_graph_facts.find_graph(["str-msn2700-01"])
+
+    for path in cache_dir.iterdir():
+        path.chmod(0o600)
+    uid = conn_graph_facts.os.getuid()
+    with monkeypatch.context() as m:
+        m.setattr(conn_graph_facts.os, "getuid", lambda: uid + 1)
+        m.setattr(conn_graph_facts.LabGraph, "read_csv_files", _fail_reading_csv)
+        with pytest.raises(AssertionError, match="csv files must not be read"):
+            conn_graph_facts.find_graph(["str-msn2700-01"])
+    assert conn_graph_facts.find_graph(["str-msn2700-01"]).graph_facts == expected
@@ -0,0 +1,250 @@
+"""Unit tests for ``ansible/library/extract_log.py``.
+
+The tests cover the start marker index and the races with logrotate renaming,
+compressing or truncating log files between and during extract_log runs.
+"""
+import datetime
+import gzip
+import importlib.util
+import logging
+import os
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+
+MODULE_PATH = Path(__file__).resolve().parents[4] / "ansible/library/extract_log.py"
+MARKER = "start-LogAnalyzer-test_case.2024-01-01-00:00:00"
+
+
+def _load_target_module():
+    """Load the target module, stub AnsibleModule when ansible is not installed."""
+    try:
+        import ansible.module_utils.basic  # noqa: F401
+    except ImportError:
+        basic_stub = types.ModuleType("ansible.module_utils.basic")
+        basic_stub.AnsibleModule = object
+        sys.modules.setdefault("ansible", types.ModuleType("ansible"))
+        sys.modules.setdefault("ansible.module_utils", types.ModuleType("ansible.module_utils"))
+        sys.modules["ansible.module_utils.basic"] = basic_stub
+
+    spec = importlib.util.spec_from_file_location("unit_target_extract_log", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="module")
+def extract_log_module():
+    """Load and return the extract_log target module."""
+    return _load_target_module()
+
+
+@pytest.fixture(autouse=True)
+def _bypass_repo_log_format(monkeypatch):
+    """``tests/pytest.ini`` log format needs ``%(funcNamewithModule)s`` field injected by the
+    ``log_section_start`` plugin, which isn't loaded under ``--noconftest``. Use plain format instead."""
+    import _pytest.logging as _pylog
+    plain = logging.Formatter("%(message)s")
+    monkeypatch.setattr(_pylog.PercentStyleMultiline, "format", lambda self, record: plain.format(record))
+
+
+def _lines(tag, count, hour=0):
+    return ["Jan  1 {:02d}:00:{:02d}.000000 sonic INFO {} line {}\n".format(hour, i % 60, tag, i)
+            for i in range(count)]
+
+
+def _marker_line(marker, hour):
+    return "Jan  1 {:02d}:30:00.000000 sonic INFO {}\n".format(hour, marker)
+
+
+def _write(path, lines):
+    data = "".join(lines).encode()
+    if str(path).endswith(".gz"):
+        with gzip.open(path, "wb") as fp:
+            fp.write(data)
+    else:
+        with open(path, "wb") as fp:
+            fp.write(data)
+
+
+def _rotate(directory):
+    """Rotate syslog files the way logrotate does with delaycompress."""
+    names = sorted((name for name in os.listdir(directory) if name.startswith("syslog.") and name.endswith(".gz")),
+                   key=lambda name: int(name.split(".")[1]), reverse=True)
+    for name in names:
+        number = int(name.split(".")[1])
+        os.rename(os.path.join(directory, name), os.path.join(directory, "syslog.{}.gz".format(number + 1)))
+    if os.path.exists(os.path.join(directory, "syslog.1")):
+        with open(os.path.join(directory, "syslog.1"), "rb") as src, \
+                gzip.open(os.path.join(directory, "syslog.2.gz"), "wb") as dst:
+            dst.write(src.read())
+        os.remove(os.path.join(directory, "syslog.1"))
+    os.rename(os.path.join(directory, "syslog"), os.path.join(directory, "syslog.1"))
+    _write(os.path.join(directory, "syslog"), [])
+
+
+@pytest.fixture
+def log_dir(tmp_path):
+    """Log directory with rotated files, the start marker is in syslog.2.gz."""
+    directory = tmp_path / "log"
+    directory.mkdir()
+    _write(directory / "syslog.3.gz", _lines("oldest", 100, hour=1))
+    _write(directory / "syslog.2.gz", _lines("older", 50, hour=2) + [_marker_line(MARKER, 2)] +
+           _lines("after marker", 50, hour=2))
+    _write(directory / "syslog.1", _lines("old", 100, hour=3))
+    _write(directory / "syslog", _lines("current", 100, hour=4))
+    return directory
+
+
+def _expected(directory, names, marker=MARKER):
+    """Content of the files from the oldest to the newest one, starting from the first marker line."""
+    content = ""
+    for name in names:
+        path = os.path.join(directory, name)
+        opener = gzip.open if name.endswith(".gz") else open
+        with opener(path, "rt") as fp:
+            content += fp.read()
+    start = content.rfind("\n", 0, content.index(marker)) + 1
+    return content[start:]
+
+
+def _run(module, directory, tmp_path, marker=MARKER):
+    target = tmp_path / "extracted"
+    module.extract_log(str(directory), "syslog", marker, str(target), str(tmp_path / "index"))
+    return target.read_text()
+
+
+def _count_scans(module, monkeypatch):
+    scanned = []
+    original = module.open_log
+
+    def counting_open_log(path, expected_stat=None):
+        scanned.append(os.path.basename(path))
+        return original(path, expected_stat)
+
+    monkeypatch.setattr(module, "open_log", counting_open_log)
+    return scanned
+
+
+def test_extract_log_from_rotated_files(extract_log_module, log_dir, tmp_path):
+    result = _run(extract_log_module, log_dir, tmp_path)
+
+    assert result == _expected(log_dir, ["syslog.2.gz", "syslog.1", "syslog"])
+    assert result.startswith(_marker_line(MARKER, 2))
+
+
+def test_extract_log_uses_latest_marker(extract_log_module, log_dir, tmp_path):
+    with open(log_dir / "syslog", "a") as fp:
+        fp.write(_marker_line(MARKER, 4))
+        fp.writelines(_lines("new", 5, hour=4))
+
+    result = _run(extract_log_module, log_dir, tmp_path)
+
+    assert result == _marker_line(MARKER, 4) + "".join(_lines("new", 5, hour=4))
+
+
+def test_index_reused_for_rotated_files(extract_log_module, log_dir, tmp_path, monkeypatch):
+    _run(extract_log_module, log_dir, tmp_path)
+    scanned = _count_scans(extract_log_module, monkeypatch)
+
+    marker = MARKER.replace("test_case", "next_case")
+    with open(log_dir / "syslog", "a") as fp:
+        fp.writelines(_lines("more", 10, hour=4))
+    result = _run(extract_log_module, log_dir, tmp_path, marker=MARKER)
+
+    # Only the appended part of syslog is scanned, then the files are copied once
+    assert scanned == ["syslog", "syslog.2.gz", "syslog.1", "syslog"]
+    assert result == _expected(log_dir, ["syslog.2.gz", "syslog.1", "syslog"])
+    assert marker not in result
+
+
+def test_logrotate_between_runs(extract_log_module, log_dir, tmp_path, monkeypatch):
+    _run(extract_log_module, log_dir, tmp_path)
+    _rotate(str(log_dir))
+    _write(log_dir / "syslog", _lines("after rotate", 10, hour=5))
+    scanned = _count_scans(extract_log_module, monkeypatch)
+
+    result = _run(extract_log_module, log_dir, tmp_path)
+
+    # syslog.1 and syslog.3.gz keep their inodes after rename and are not scanned again,
+    # syslog.2.gz is a new file created by compression
+    assert scanned == ["syslog", "syslog.2.gz", "syslog.3.gz", "syslog.2.gz", "syslog.1", "syslog"]
+    assert result == _expected(log_dir, ["syslog.3.gz", "syslog.2.gz", "syslog.1", "syslog"])
+
+
+def test_logrotate_copytruncate(extract_log_module, log_dir, tmp_path):
+    with open(log_dir / "syslog", "a") as fp:
+        fp.write(_marker_line(MARKER, 4))
+    _run(extract_log_module, log_dir, tmp_path)
+
+    # copytruncate keeps the inode, but the content starts from scratch
+    _write(log_dir / "syslog", _lines("truncated", 200, hour=6))
+    result = _run(extract_log_module, log_dir, tmp_path)
+
+    assert result == _expected(log_dir, ["syslog.2.gz", "syslog.1", "syslog"])
+
+
+def test_logrotate_during_extract(extract_log_module, log_dir, tmp_path, monkeypatch):
+    original = extract_log_module.calculate_files_to_copy
+    calls = []
+
+    def rotating_calculate_files_to_copy(filenames, file_with_latest_line):
+        calls.append(list(filenames))
+        if len(calls) == 1:
+            _rotate(str(log_dir))
+        return original(filenames, file_with_latest_line)
+
+    monkeypatch.setattr(extract_log_module, "calculate_files_to_copy", rotating_calculate_files_to_copy)
+
+    result = _run(extract_log_module, log_dir, tmp_path)
+
+    assert len(calls) == 2
+    assert calls[1] == ["syslog", "syslog.1", "syslog.2.gz", "syslog.3.gz", "syslog.4.gz"]
+    assert result == _expected(log_dir, ["syslog.3.gz", "syslog.2.gz", "syslog.1", "syslog"])
+
+
+def test_partial_last_line_is_not_indexed(extract_log_module, log_dir, tmp_path):
+    with open(log_dir / "syslog", "a") as fp:
+        fp.write("Jan  1 04:30:00.000000 sonic INFO {}".format(MARKER))
+
+    result = _run(extract_log_module, log_dir, tmp_path)
+    assert result == "Jan  1 04:30:00.000000 sonic INFO {}".format(MARKER)
+
+    with open(log_dir / "syslog", "a") as fp:
+        fp.write(" continued\n")
+    result = _run(extract_log_module, log_dir, tmp_path)
+    assert result == "Jan  1 04:30:00.000000 sonic INFO {} continued\n".format(MARKER)
+
+
+def test_corrupted_index_is_rebuilt(extract_log_module, log_dir, tmp_path):
+    (tmp_path / "index").write_text("{not json")
+
+    result = _run(extract_log_module, log_dir, tmp_path)
+
+    assert result == _expected(log_dir, ["syslog.2.gz", "syslog.1", "syslog"])
+
+
+def test_missing_start_string(extract_log_module, log_dir, tmp_path):
+    with pytest.raises(Exception, match="was not found"):
+        _run(extract_log_module, log_dir, tmp_path, marker="start-LogAnalyzer-missing")
+
+
+@pytest.mark.parametrize(
+    "line, expected",
+    [
+        ("Jan  1 00:00:01.123456 sonic INFO x", datetime.datetime(2024, 1, 1, 0, 0, 1, 123456)),
+        ("Feb 12 13:14:15 sonic INFO x", datetime.datetime(2024, 2, 12, 13, 14, 15)),
+        ("2023 Mar  3 01:02:03.5 sonic INFO x", datetime.datetime(2023, 3, 3, 1, 2, 3, 500000)),
+        ("2024-05-06T07:08:09.123456 x", datetime.datetime(2024, 5, 6, 7, 8, 9, 123456)),
+        ("2024-05-06.07:08:09.123456 x", datetime.datetime(2024, 5, 6, 7, 8, 9, 123456)),
+        # Log message from the end of the previous year in a file created in January
+        ("Dec 31 23:59:59.999999 sonic INFO x", datetime.datetime(2023, 12, 31, 23, 59, 59, 999999)),
+        ("garbage", datetime.datetime.min),
+    ],
+)
+def test_convert_date(extract_log_module, line, expected):
+    file_create_time = datetime.datetime(2024, 1, 2) if line.startswith("Dec") else datetime.datetime(2024, 6, 1)
+    assert extract_log_module.convert_date(file_create_time, line) == expected
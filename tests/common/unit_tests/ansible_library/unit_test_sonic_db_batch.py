@@ -0,0 +1,236 @@
+"""Unit tests for ``ansible/library/sonic_db_batch.py``.
+
+An in-memory stub of the redis databases counts the round trips of the batches.
+"""
+import fnmatch
+import importlib.util
+import logging
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+
+ANSIBLE_PATH = Path(__file__).resolve().parents[4] / "ansible"
+MODULE_PATH = ANSIBLE_PATH / "library/sonic_db_batch.py"
+ROUTE_PREFIX = "ASIC_STATE:SAI_OBJECT_TYPE_ROUTE_ENTRY:"
+NEIGH_PREFIX = "ASIC_STATE:SAI_OBJECT_TYPE_NEIGHBOR_ENTRY:"
+
+
+def _load_module_util(name):
+    full_name = "ansible.module_utils." + name
+    if full_name not in sys.modules:
+        spec = importlib.util.spec_from_file_location(full_name, ANSIBLE_PATH / "module_utils" / (name + ".py"))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        sys.modules[full_name] = module
+
+
+def _load_target_module():
+    """Load the target module, stub AnsibleModule when ansible is not installed."""
+    try:
+        import ansible.module_utils.basic  # noqa: F401
+    except ImportError:
+        basic_stub = types.ModuleType("ansible.module_utils.basic")
+        basic_stub.AnsibleModule = object
+        sys.modules.setdefault("ansible", types.ModuleType("ansible"))
+        sys.modules.setdefault("ansible.module_utils", types.ModuleType("ansible.module_utils"))
+        sys.modules["ansible.module_utils.basic"] = basic_stub
+    _load_module_util("multi_asic_utils")
+
+    spec = importlib.util.spec_from_file_location("unit_target_sonic_db_batch", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="module")
+def sonic_db_batch():
+    """Load and return the sonic_db_batch target module."""
+    return _load_target_module()
+
+
+@pytest.fixture(autouse=True)
+def _bypass_repo_log_format(monkeypatch):
+    """``tests/pytest.ini`` log format needs ``%(funcNamewithModule)s`` field injected by the
+    ``log_section_start`` plugin, which isn't loaded under ``--noconftest``. Use plain format instead."""
+    import _pytest.logging as _pylog
+    plain = logging.Formatter("%(message)s")
+    monkeypatch.setattr(_pylog.PercentStyleMultiline, "format", lambda self, record: plain.format(record))
+
+
+def _databases(routes=500, neighbors=50):
+    """Content of the databases of every namespace: {namespace: {db: {key: {field: value}}}}."""
+    databases = {}
+    for namespace in ("", "asic1"):
+        asic_db = {}
+        for i in range(routes):
+            asic_db[ROUTE_PREFIX + '{"dest":"10.%d.%d.0/24","vr":"oid:0x3000000000022"}' % (i // 256, i % 256)] = {
+                "SAI_ROUTE_ENTRY_ATTR_NEXT_HOP_ID": "oid:0x4000000000%03x" % (i % 32),
+            }
+        for i in range(neighbors):
+            asic_db[NEIGH_PREFIX + '{"ip":"10.0.0.%d","rif":"oid:0x6000000000%03x"}' % (i, i)] = {
+                "SAI_NEIGHBOR_ENTRY_ATTR_DST_MAC_ADDRESS": "52:54:00:%02X:00:%s" % (i, namespace[-1:] or "0"),
+            }
+        appl_db = {"PORT_TABLE:Ethernet%d" % (i * 4): {"admin_status": "up", "mtu": "9100"} for i in range(32)}
+        databases[namespace] = {"ASIC_DB": asic_db, "APPL_DB": appl_db}
+    return databases
+
+
+class FakeRedis(object):
+    """Subset of the redis client used by the module, counts the round trips to redis."""
+
+    def __init__(self, data, stats):
+        self.data = data
+        self.stats = stats
+
+    def scan_iter(self, match, count):
+        keys = sorted(self.data)
+        for start in range(0, len(keys), count):
+            self.stats["round_trips"] += 1
+            for key in keys[start:start + count]:
+                if fnmatch.fnmatchcase(key, match):
+                    yield key
+        # SCAN may return a key more than once
+        for key in keys[:1]:
+            if fnmatch.fnmatchcase(key, match):
+                yield key
+
+    def pipeline(self, transaction=True):
+        assert transaction is False
+        return FakePipeline(self)
+
+
+class FakePipeline(object):
+
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def hgetall(self, key):
+        self.commands.append(lambda: dict(self.client.data.get(key, {})))
+
+    def hget(self, key, field):
+        self.commands.append(lambda: self.client.data.get(key, {}).get(field))
+
+    def execute(self):
+        self.client.stats["round_trips"] += 1
+        return [command() for command in self.commands]
+
+
+@pytest.fixture
+def databases():
+    return _databases()
+
+
+@pytest.fixture
+def stats():
+    return {"round_trips": 0, "clients": []}
+
+
+@pytest.fixture
+def get_client(databases, stats):
+    def _get_client(db, namespace):
+        stats["clients"].append((db, namespace))
+        return FakeRedis(databases[namespace or ""][db], stats)
+    return _get_client
+
+
+def test_operations(sonic_db_batch, databases, stats, get_client):
+    asic_db = databases["asic1"]["ASIC_DB"]
+    neigh_keys = sorted(key for key in asic_db if key.startswith(NEIGH_PREFIX))
+    operations = [
+        {"op": "scan", "db": "ASIC_DB", "pattern": NEIGH_PREFIX + "*"},
+        {"op": "scan", "db": "ASIC_DB", "pattern": ROUTE_PREFIX + "*", "hgetall": True},
+        {"op": "hgetall", "db": "APPL_DB", "keys": ["PORT_TABLE:Ethernet0", "PORT_TABLE:Ethernet1"]},
+        {"op": "hget", "db": "ASIC_DB", "items": [[key, "SAI_NEIGHBOR_ENTRY_ATTR_DST_MAC_ADDRESS"]
+                                                  for key in neigh_keys[:3]] + [[neigh_keys[0], "unknown"]]},
+        {"op": "scan", "db": "APPL_DB", "pattern": "NO_SUCH_TABLE:*", "hgetall": True},
+    ]
+
+    results = sonic_db_batch.run_operations(get_client, operations, namespace="asic1", scan_count=100)
+
+    assert results[0] == neigh_keys
+    assert results[1] == {key: value for key, value in asic_db.items() if key.startswith(ROUTE_PREFIX)}
+    assert results[2] == {"PORT_TABLE:Ethernet0": {"admin_status": "up", "mtu": "9100"}, "PORT_TABLE:Ethernet1": {}}
+    assert results[3] == [asic_db[key]["SAI_NEIGHBOR_ENTRY_ATTR_DST_MAC_ADDRESS"] for key in neigh_keys[:3]] + [None]
+    assert results[3][0] == "52:54:00:00:00:1"
+    assert results[4] == {}
+    # One client and one pipeline per database, plus the SCAN round trips
+    assert sorted(stats["clients"]) == [("APPL_DB", "asic1"), ("ASIC_DB", "asic1")]
+    scan_round_trips = 2 * ((len(asic_db) + 99) // 100) + 1
+    assert stats["round_trips"] == scan_round_trips + 2
+
+
+def test_connector_client(sonic_db_batch, databases, get_client, monkeypatch):
+    """SonicV2Connector is used when the redis client isn't installed, with the same results."""
+
+    class FakeConnector(object):
+        def __init__(self, use_unix_socket_path, namespace):
+            assert use_unix_socket_path
+            self.data = databases[namespace]
+
+        def connect(self, db):
+            assert db in self.data
+
+        def scan(self, db, cursor, match, count):
+            keys = sorted(self.data[db])[cursor:cursor + count]
+            cursor = 0 if cursor + count >= len(self.data[db]) else cursor + count
+            return cursor, [key for key in keys if fnmatch.fnmatchcase(key, match)]
+
+        def get_all(self, db, key):
+            return dict(self.data[db].get(key, {}))
+
+        def get(self, db, key, field):
+            return self.data[db].get(key, {}).get(field)
+
+    monkeypatch.setattr(sonic_db_batch, "SonicV2Connector", FakeConnector)
+    monkeypatch.setattr(sonic_db_batch, "redis", None)
+    operations = [
+        {"op": "scan", "db": "ASIC_DB", "pattern": NEIGH_PREFIX + "*", "hgetall": True},
+        {"op": "hgetall", "db": "APPL_DB", "keys": ["PORT_TABLE:Ethernet4"]},
+        {"op": "hget", "db": "APPL_DB", "items": [["PORT_TABLE:Ethernet4", "mtu"], ["PORT_TABLE:Ethernet5", "mtu"]]},
+    ]
+    for namespace in (None, "asic1"):
+        expected = sonic_db_batch.run_operations(get_client, operations, namespace=namespace, scan_count=64)
+        assert sonic_db_batch.run_operations(sonic_db_batch.get_client, operations, namespace=namespace,
+                                             scan_count=64) == expected
+
+
+def test_validate_operations(sonic_db_batch):
+    assert sonic_db_batch.validate_operations([
+        {"op": "hgetall", "db": "APPL_DB", "keys": ["PORT_TABLE:Ethernet0"]},
+        {"op": "scan", "db": "ASIC_DB", "pattern": "*"},
+    ]) is None
+    assert "unsupported op keys" in sonic_db_batch.validate_operations([{"op": "keys", "db": "APPL_DB"}])
+    assert "misses argument db" in sonic_db_batch.validate_operations([{"op": "scan", "pattern": "*"}])
+    assert "misses argument items" in sonic_db_batch.validate_operations([{"op": "hget", "db": "APPL_DB"}])
+    assert "is not a list" in sonic_db_batch.validate_operations([{"op": "hgetall", "db": "APPL_DB", "keys": "k"}])
+    assert "empty argument pattern" in sonic_db_batch.validate_operations(
+        [{"op": "scan", "db": "APPL_DB", "pattern": ""}])
+    assert "empty argument db" in sonic_db_batch.validate_operations([{"op": "hget", "db": "", "items": []}])
+    assert "is not a dict" in sonic_db_batch.validate_operations(["HGETALL PORT_TABLE:Ethernet0"])
+
+
+def test_empty_keys(sonic_db_batch, stats, get_client):
+    operations = [
+        {"op": "hgetall", "db": "APPL_DB", "keys": []},
+        {"op": "hget", "db": "ASIC_DB", "items": []},
+    ]
+    assert sonic_db_batch.validate_operations(operations) is None
+    assert sonic_db_batch.run_operations(get_client, operations) == [{}, []]
+    assert stats["round_trips"] == 0 and stats["clients"] == []
+
+
+def test_round_trips_of_bulk_read(sonic_db_batch, databases, stats, get_client):
+    """Reading every route entry costs a few round trips instead of one per entry."""
+    asic_db = databases[""]["ASIC_DB"]
+    route_keys = [key for key in asic_db if key.startswith(ROUTE_PREFIX)]
+    results = sonic_db_batch.run_operations(get_client, [
+        {"op": "hgetall", "db": "ASIC_DB", "keys": route_keys},
+    ])
+    assert len(results[0]) == len(route_keys)
+    logging.info("HGETALL of %d route entries: %d redis round trip(s), instead of %d sonic-db-cli calls",
+                 len(route_keys), stats["round_trips"], len(route_keys))
+    assert stats["round_trips"] == 1
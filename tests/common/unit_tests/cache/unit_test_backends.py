@@ -0,0 +1,236 @@
+"""Unit tests for ``tests/common/cache/backends.py``."""
+import importlib.util
+import logging
+import os
+import pickle
+import time
+from pathlib import Path
+
+import pytest
+
+
+MODULE_PATH = Path(__file__).resolve().parents[3] / "common/cache/backends.py"
+
+
+def _load_target_module():
+    spec = importlib.util.spec_from_file_location("unit_target_cache_backends", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="module")
+def backends():
+    return _load_target_module()
+
+
+@pytest.fixture(autouse=True)
+def _bypass_repo_log_format(monkeypatch):
+    """``tests/pytest.ini`` log format needs ``%(funcNamewithModule)s`` field injected by the
+    ``log_section_start`` plugin, which isn't loaded under ``--noconftest``. Use plain format instead."""
+    import _pytest.logging as _pylog
+    plain = logging.Formatter("%(message)s")
+    monkeypatch.setattr(_pylog.PercentStyleMultiline, "format", lambda self, record: plain.format(record))
+
+
+def _read_index(backend):
+    return backend._load_index()
+
+
+def _set_last_used(cache_location, name, timestamp):
+    os.utime(os.path.join(str(cache_location), "{}.pickle".format(name)), (timestamp, timestamp))
+
+
+def test_store_and_load(backends, tmp_path):
+    backend = backends.FileCacheBackend(str(tmp_path), 10 ** 6, 100)
+
+    assert backend.load("dut1", "basic_facts") is backends.NOTEXIST
+    assert backend.store("dut1", "basic_facts", {"hwsku": "Force10-S6000"})
+    assert backend.load("dut1", "basic_facts") == {"hwsku": "Force10-S6000"}
+
+    files = sorted(os.listdir(str(tmp_path / "dut1")))
+    assert files == ["basic_facts.pickle"], "temporary files must not be left behind"
+    index = _read_index(backend)
+    assert index["total_size"] == os.path.getsize(str(tmp_path / "dut1" / "basic_facts.pickle"))
+    assert list(index["entries"]) == ["dut1/basic_facts"]
+
+
+def test_unchanged_facts_not_rewritten(backends, tmp_path):
+    backend = backends.FileCacheBackend(str(tmp_path), 10 ** 6, 100)
+    facts_file = str(tmp_path / "dut1" / "basic_facts.pickle")
+
+    assert backend.store("dut1", "basic_facts", {"a": 1})
+    inode = os.stat(facts_file).st_ino
+    assert backend.store("dut1", "basic_facts", {"a": 1})
+    assert os.stat(facts_file).st_ino == inode
+
+    assert backend.store("dut1", "basic_facts", {"a": 2})
+    assert os.stat(facts_file).st_ino != inode
+    assert backend.load("dut1", "basic_facts") == {"a": 2}
+    assert len(_read_index(backend)["entries"]) == 1
+
+
+def test_evict_least_recently_used_by_entries(backends, tmp_path):
+    backend = backends.FileCacheBackend(str(tmp_path), 10 ** 6, 3)
+    now = time.time()
+    for i, key in enumerate(["k0", "k1", "k2"]):
+        backend.store("dut1", key, key)
+        _set_last_used(tmp_path / "dut1", key, now - 100 + i)
+
+    # k0 is the oldest one, but it is loaded and becomes the most recently used
+    assert backend.load("dut1", "k0") == "k0"
+    backend.store("dut1", "k3", "k3")
+
+    assert backend.load("dut1", "k1") is backends.NOTEXIST
+    for key in ["k0", "k2", "k3"]:
+        assert backend.load("dut1", key) == key
+    index = _read_index(backend)
+    assert sorted(index["entries"]) == ["dut1/k0", "dut1/k2", "dut1/k3"]
+
+
+def test_evict_least_recently_used_by_size(backends, tmp_path):
+    entry_size = len(pickle.dumps("x" * 1000, pickle.HIGHEST_PROTOCOL))
+    backend = backends.FileCacheBackend(str(tmp_path), entry_size * 2, 100)
+    now = time.time()
+    backend.store("dut1", "old", "x" * 1000)
+    _set_last_used(tmp_path / "dut1", "old", now - 100)
+    backend.store("dut2", "new", "y" * 1000)
+    backend.store("dut2", "newest", "z" * 1000)
+
+    assert backend.load("dut1", "old") is backends.NOTEXIST
+    index = _read_index(backend)
+    assert index["total_size"] == entry_size * 2
+    assert sorted(index["entries"]) == ["dut2/new", "dut2/newest"]
+
+
+def test_store_too_large_facts(backends, tmp_path):
+    backend = backends.FileCacheBackend(str(tmp_path), 100, 100)
+    assert not backend.store("dut1", "big", "x" * 1000)
+    assert backend.load("dut1", "big") is backends.NOTEXIST
+
+
+def test_rebuild_missing_or_corrupted_index(backends, tmp_path):
+    backend = backends.FileCacheBackend(str(tmp_path), 10 ** 6, 100)
+    backend.store("dut1", "k1", "v1")
+    backend.store("dut2", "k2", "v2")
+
+    index_file = tmp_path / backends.FileCacheBackend.INDEX_FILE
+    index_file.write_text("{not json")
+    index = _read_index(backend)
+    assert sorted(index["entries"]) == ["dut1/k1", "dut2/k2"]
+
+    index_file.unlink()
+    backend.store("dut1", "k1", "v1")
+    index = _read_index(backend)
+    assert sorted(index["entries"]) == ["dut1/k1", "dut2/k2"]
+    assert index["total_size"] == sum(os.path.getsize(str(tmp_path / name) + ".pickle")
+                                      for name in ["dut1/k1", "dut2/k2"])
+
+
+def test_load_corrupted_pickle(backends, tmp_path):
+    backend = backends.FileCacheBackend(str(tmp_path), 10 ** 6, 100)
+    (tmp_path / "dut1").mkdir()
+    (tmp_path / "dut1" / "broken.pickle").write_bytes(b"\x80\x04truncated")
+    assert backend.load("dut1", "broken") is backends.NOTEXIST
+
+
+def test_remove(backends, tmp_path):
+    backend = backends.FileCacheBackend(str(tmp_path), 10 ** 6, 100)
+    for zone in ["dut1", "dut2"]:
+        for key in ["k1", "k2"]:
+            backend.store(zone, key, zone + key)
+
+    backend.remove("dut1", "k1")
+    assert backend.load("dut1", "k1") is backends.NOTEXIST
+    assert sorted(_read_index(backend)["entries"]) == ["dut1/k2", "dut2/k1", "dut2/k2"]
+
+    backend.remove("dut2")
+    assert not (tmp_path / "dut2").exists()
+    index = _read_index(backend)
+    assert sorted(index["entries"]) == ["dut1/k2"]
+    assert index["total_size"] == os.path.getsize(str(tmp_path / "dut1" / "k2.pickle"))
+
+    backend.remove()
+    assert not tmp_path.exists()
+
+
+def test_sqlite_store_and_load(backends, tmp_path):
+    backend = backends.SqliteCacheBackend(str(tmp_path), 10 ** 6, 100)
+
+    assert backend.load("dut1", "basic_facts") is backends.NOTEXIST
+    assert backend.store("dut1", "basic_facts", {"hwsku": "Force10-S6000"})
+    assert backend.store("dut1", "basic_facts", {"hwsku": "Force10-S6000"})
+    assert backend.load("dut1", "basic_facts") == {"hwsku": "Force10-S6000"}
+    assert backend.store("dut1", "basic_facts", {"hwsku": "Arista-7060CX-32S-C32"})
+    assert backend.load("dut1", "basic_facts") == {"hwsku": "Arista-7060CX-32S-C32"}
+
+    # A new connection, like the one of another process, sees the same facts
+    other = backends.SqliteCacheBackend(str(tmp_path), 10 ** 6, 100)
+    assert other.load("dut1", "basic_facts") == {"hwsku": "Arista-7060CX-32S-C32"}
+    assert backends.SqliteCacheBackend.DB_FILE in os.listdir(str(tmp_path))
+
+
+def test_sqlite_evict_least_recently_used(backends, tmp_path):
+    backend = backends.SqliteCacheBackend(str(tmp_path), 10 ** 6, 3)
+    for key in ["k0", "k1", "k2"]:
+        backend.store("dut1", key, key)
+        time.sleep(0.01)
+    assert backend.load("dut1", "k0") == "k0"
+    backend.store("dut1", "k3", "k3")
+
+    assert backend.load("dut1", "k1") is backends.NOTEXIST
+    for key in ["k0", "k2", "k3"]:
+        assert backend.load("dut1", key) == key
+
+    assert not backend.store("dut1", "big", "x" * (10 ** 6))
+    assert backend.load("dut1", "big") is backends.NOTEXIST
+
+
+def test_sqlite_remove(backends, tmp_path):
+    backend = backends.SqliteCacheBackend(str(tmp_path / "cache"), 10 ** 6, 100)
+    backend.remove("dut1")
+    assert not (tmp_path / "cache").exists(), "removing facts must not create the database"
+
+    for zone in ["dut1", "dut2"]:
+        for key in ["k1", "k2"]:
+            backend.store(zone, key, zone + key)
+    backend.remove("dut1", "k1")
+    assert backend.load("dut1", "k1") is backends.NOTEXIST
+    assert backend.load("dut1", "k2") == "dut1k2"
+    backend.remove("dut2")
+    assert backend.load("dut2", "k1") is backends.NOTEXIST
+    assert backend.load("dut1", "k2") == "dut1k2"
+    backend.remove()
+    assert backend.load("dut1", "k2") is backends.NOTEXIST
+
+
+def _concurrent_worker(backend, worker_id, rounds, queue):
+    try:
+        for i in range(rounds):
+            value = {"worker": worker_id, "round": i, "payload": "x" * 10000}
+            assert backend.store("dut1", "facts", value)
+            loaded = backend.load("dut1", "facts")
+            assert loaded is not None and loaded["payload"] == "x" * 10000
+        queue.put(None)
+    except Exception as e:
+        queue.put(repr(e))
+
+
+@pytest.mark.parametrize("backend_class", ["FileCacheBackend", "SqliteCacheBackend"])
+def test_concurrent_processes(backends, tmp_path, backend_class):
+    """Workers sharing the cache never read partially written facts."""
+    import multiprocessing
+
+    context = multiprocessing.get_context("fork")
+    backend = getattr(backends, backend_class)(str(tmp_path), 10 ** 6, 100)
+    # Open the database in the parent process, the workers must not reuse its connection
+    backend.load("dut1", "facts")
+    queue = context.Queue()
+    workers = [context.Process(target=_concurrent_worker, args=(backend, i, 20, queue)) for i in range(4)]
+    for worker in workers:
+        worker.start()
+    errors = [queue.get(timeout=60) for _ in workers]
+    for worker in workers:
+        worker.join()
+    assert errors == [None] * len(workers)
+    assert backend.load("dut1", "facts")["payload"] == "x" * 10000
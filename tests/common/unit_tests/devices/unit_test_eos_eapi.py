@@ -0,0 +1,269 @@
+"""Unit tests and benchmark of ``tests/common/devices/eos_eapi.py`` against a local fake eAPI server."""
+import base64
+import importlib.util
+import json
+import logging
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+MODULE_PATH = Path(__file__).resolve().parents[2] / "devices/eos_eapi.py"
+
+logger = logging.getLogger(__name__)
+
+USER = "admin"
+PASSWORD = "password"
+# Time of a command on the fake device, and of setting up a connection to it
+REQUEST_TIME = 0.01
+CONNECT_TIME = 0.02
+
+
+@pytest.fixture(scope="module")
+def eos_eapi():
+    spec = importlib.util.spec_from_file_location("unit_target_eos_eapi", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(autouse=True)
+def _bypass_repo_log_format(monkeypatch):
+    """``tests/pytest.ini`` log format needs ``%(funcNamewithModule)s`` field injected by the
+    ``log_section_start`` plugin, which isn't loaded under ``--noconftest``. Use plain format instead."""
+    import _pytest.logging as _pylog
+    plain = logging.Formatter("%(message)s")
+    monkeypatch.setattr(_pylog.PercentStyleMultiline, "format", lambda self, record: plain.format(record))
+
+
+class FakeEapiHandler(BaseHTTPRequestHandler):
+    """JSON-RPC runCmds of EOS, every device is a 127.0.0.x address of the same server."""
+
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super(FakeEapiHandler, self).setup()
+        time.sleep(CONNECT_TIME)
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body):
+        data = body if isinstance(body, bytes) else json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        server = self.server
+        with server.lock:
+            server.requests.append(request)
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            time.sleep(REQUEST_TIME)
+            credentials = base64.b64encode("{}:{}".format(USER, PASSWORD).encode()).decode()
+            if self.path != "/command-api" or self.headers["Authorization"] != "Basic " + credentials:
+                self._reply(401, {})
+                return
+            device = self.connection.getsockname()[0]
+            if device in server.bad_replies:
+                self._reply(200, server.bad_replies[device])
+                return
+            results = []
+            for cmd in request["params"]["cmds"]:
+                if cmd == "bad command" or device in server.failing_devices:
+                    results.append({"errors": ["Invalid input"]})
+                    self._reply(200, {"jsonrpc": "2.0", "id": request["id"], "error": {
+                        "code": 1002, "message": "CLI command {} of {} '{}' failed: invalid command".format(
+                            len(results), len(request["params"]["cmds"]), cmd),
+                        "data": results}})
+                    return
+                if request["params"]["format"] == "text":
+                    results.append({"output": "{} output of {}\n".format(device, cmd)})
+                else:
+                    results.append({} if cmd == "enable" else {"device": device, "command": cmd})
+            self._reply(200, {"jsonrpc": "2.0", "id": request["id"], "result": results})
+            if server.drop_connections:
+                # Closed without telling the client, like an idle kept-alive connection timed out by the device
+                self.close_connection = True
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("0.0.0.0", 0), FakeEapiHandler)
+    httpd.daemon_threads = True
+    httpd.lock = threading.Lock()
+    httpd.requests = []
+    httpd.connections = 0
+    httpd.in_flight = 0
+    httpd.max_in_flight = 0
+    httpd.failing_devices = set()
+    httpd.bad_replies = {}
+    httpd.drop_connections = False
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+class FakeEosHost(object):
+    """Attributes of EosHost used by the session pool."""
+
+    def __init__(self, index, password=PASSWORD):
+        self.hostname = "ARISTA{:02d}T1".format(index)
+        self.mgmt_ip = "127.0.0.{}".format(index + 1)
+        self.eos_user = USER
+        self.eos_passwd = password
+
+
+@pytest.fixture
+def pool(eos_eapi, server):
+    pool = eos_eapi.EapiSessionPool(port=server.server_address[1])
+    yield pool
+    pool.close()
+
+
+def test_run_cmds(eos_eapi, server):
+    session = eos_eapi.EapiSession("127.0.0.1", USER, PASSWORD, port=server.server_address[1])
+    assert session.run_cmds(["show version", "show hostname"]) == [
+        {"device": "127.0.0.1", "command": "show version"},
+        {"device": "127.0.0.1", "command": "show hostname"},
+    ]
+    assert server.requests[0]["method"] == "runCmds"
+    assert server.requests[0]["params"] == {"version": 1, "cmds": ["enable", "show version", "show hostname"],
+                                            "format": "json"}
+    assert session.run_cmds("show version", fmt="text", enable=False) == [
+        {"output": "127.0.0.1 output of show version\n"}]
+    assert server.requests[1]["params"]["cmds"] == ["show version"]
+    # Both requests are sent on the same kept-alive connection
+    assert session.connect_count == 1 and server.connections == 1
+    session.close()
+
+
+def test_run_cmds_errors(eos_eapi, server):
+    session = eos_eapi.EapiSession("127.0.0.1", USER, PASSWORD, port=server.server_address[1])
+    with pytest.raises(eos_eapi.EapiError) as excinfo:
+        session.run_cmds(["show version", "bad command"])
+    assert excinfo.value.code == 1002
+    assert excinfo.value.data == [{"device": "127.0.0.1", "command": "show version"}, {"errors": ["Invalid input"]}]
+
+    session = eos_eapi.EapiSession("127.0.0.1", USER, "wrong", port=server.server_address[1])
+    with pytest.raises(eos_eapi.EapiError, match="HTTP 401"):
+        session.run_cmds(["show version"])
+
+    # Port of a closed socket, nothing listens on it
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        closed_port = sock.getsockname()[1]
+    session = eos_eapi.EapiSession("127.0.0.1", USER, PASSWORD, port=closed_port, timeout=2)
+    with pytest.raises(eos_eapi.EapiError, match="failed"):
+        session.run_cmds(["show version"])
+
+
+def test_reconnect_when_kept_alive_connection_closed(eos_eapi, server):
+    server.drop_connections = True
+    session = eos_eapi.EapiSession("127.0.0.1", USER, PASSWORD, port=server.server_address[1])
+    for _ in range(3):
+        assert session.run_cmds(["show version"]) == [{"device": "127.0.0.1", "command": "show version"}]
+        time.sleep(0.05)
+    assert session.connect_count == 3
+    session.close()
+
+
+def test_run_on_all(eos_eapi, server, pool):
+    hosts = [FakeEosHost(i) for i in range(12)]
+    server.failing_devices.add(hosts[3].mgmt_ip)
+    nbrhosts = {host.hostname: {"host": host, "conf": {}} for host in hosts}
+
+    results = pool.run_on_all(nbrhosts, ["show interfaces status"], max_workers=4)
+
+    assert list(results) == [host.hostname for host in hosts]
+    for host in hosts:
+        res = results[host.hostname]
+        assert res["host"] == host.mgmt_ip and res["elapsed"] > 0
+        if host is hosts[3]:
+            assert not res["ok"] and res["result"] is None
+            assert res["error"]["code"] == 1002 and res["error"]["data"] == []
+        else:
+            assert res["ok"] and res["error"] is None
+            assert res["result"] == [{"device": host.mgmt_ip, "command": "show interfaces status"}]
+    assert server.max_in_flight <= 4
+    json.dumps(results)
+
+    # Per neighbor commands, sessions are reused
+    commands = {hosts[0].hostname: ["show version"], hosts[1].hostname: ["show hostname"]}
+    results = pool.run_on_all(hosts, commands)
+    assert list(results) == [hosts[0].hostname, hosts[1].hostname]
+    assert results[hosts[1].hostname]["result"] == [{"device": hosts[1].mgmt_ip, "command": "show hostname"}]
+    assert server.connections == len(hosts)
+
+
+def test_run_on_all_invalid_replies(eos_eapi, server, pool):
+    """Replies which are not JSON-RPC replies fail their neighbor only."""
+    hosts = [FakeEosHost(i) for i in range(5)]
+    bad_replies = [b"<html><body>502 Bad Gateway</body></html>", b'{"jsonrpc": "2.0", "id": 1, "res',
+                   b'{"jsonrpc": "2.0", "id": 1}', b'["not", "a", "reply"]']
+    for host, reply in zip(hosts, bad_replies):
+        server.bad_replies[host.mgmt_ip] = reply
+
+    results = pool.run_on_all(hosts, ["show version"])
+
+    for host in hosts[:4]:
+        res = results[host.hostname]
+        assert not res["ok"] and res["result"] is None
+        assert res["error"]["message"].startswith("Invalid eAPI reply from {}".format(host.mgmt_ip))
+    assert results[hosts[4].hostname]["result"] == [{"device": hosts[4].mgmt_ip, "command": "show version"}]
+    with pytest.raises(eos_eapi.EapiError, match="Bad Gateway"):
+        pool.run(hosts[0], ["show version"])
+
+
+def test_run_uses_host_command_scoping(eos_eapi, server, pool):
+    host = FakeEosHost(0)
+    host.scope_commands = lambda commands: [cmd + " vrf Vrf1" for cmd in commands]
+    assert pool.run(host, ["show ip bgp summary"]) == [
+        {"device": host.mgmt_ip, "command": "show ip bgp summary vrf Vrf1"}]
+
+
+def test_benchmark_fan_out(eos_eapi, server, pool):
+    """Persistent sessions and fan-out vs one connection per command call, one neighbor after the other."""
+    hosts = [FakeEosHost(i) for i in range(16)]
+    rounds = 3
+    port = server.server_address[1]
+
+    start = time.monotonic()
+    for _ in range(rounds):
+        for host in hosts:
+            session = eos_eapi.EapiSession(host.mgmt_ip, USER, PASSWORD, port=port)
+            session.run_cmds(["show interfaces status"])
+            session.close()
+    sequential_time = time.monotonic() - start
+    sequential_connections = server.connections
+    server.max_in_flight = 0
+
+    start = time.monotonic()
+    for _ in range(rounds):
+        results = pool.run_on_all(hosts, ["show interfaces status"])
+        assert all(res["ok"] for res in results.values())
+    fan_out_time = time.monotonic() - start
+
+    logger.info("{} neighbors x {} rounds: sequential {:.3f}s, fan-out {:.3f}s".format(
+        len(hosts), rounds, sequential_time, fan_out_time))
+    assert sequential_time >= len(hosts) * rounds * (REQUEST_TIME + CONNECT_TIME)
+    # Timings vary with the load of the host, check the sessions are reused and the neighbors run concurrently
+    assert sequential_connections == len(hosts) * rounds
+    assert server.connections - sequential_connections == len(hosts)
+    assert server.max_in_flight > 1
+    assert fan_out_time < sequential_time
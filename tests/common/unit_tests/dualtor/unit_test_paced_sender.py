@@ -0,0 +1,188 @@
+"""Unit tests for ``tests/common/dualtor/paced_sender.py``."""
+import importlib.util
+import logging
+from pathlib import Path
+
+import pytest
+
+MODULE_PATH = Path(__file__).resolve().parents[2] / "dualtor/paced_sender.py"
+
+logger = logging.getLogger(__name__)
+
+SEND_TIME = 0.0003
+# Time of reading the fake clock
+TICK = 0.000001
+# Readings of the clock between reaching the deadline and sending a batch
+DELAY_MAX = 3 * TICK
+
+
+@pytest.fixture(scope="module")
+def paced_sender():
+    spec = importlib.util.spec_from_file_location("unit_target_paced_sender", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(autouse=True)
+def _bypass_repo_log_format(monkeypatch):
+    """``tests/pytest.ini`` log format needs ``%(funcNamewithModule)s`` field injected by the
+    ``log_section_start`` plugin, which isn't loaded under ``--noconftest``. Use plain format instead."""
+    import _pytest.logging as _pylog
+    plain = logging.Formatter("%(message)s")
+    monkeypatch.setattr(_pylog.PercentStyleMultiline, "format", lambda self, record: plain.format(record))
+
+
+class FakeClock(object):
+    """Simulated monotonic clock, each reading takes TICK and each sleep wakes up oversleep late."""
+
+    def __init__(self, oversleep=0.0):
+        self.now = 100.0
+        self.oversleep = oversleep
+        self.sleeps = []
+
+    def monotonic(self):
+        self.now += TICK
+        return self.now
+
+    def sleep(self, seconds):
+        assert seconds > 0
+        self.sleeps.append(seconds)
+        self.now += seconds + self.oversleep
+
+
+class FakeDataplane(object):
+    """Record the sent packets, each send takes send_time on the clock like a loaded PTF dataplane."""
+
+    def __init__(self, clock, send_time=SEND_TIME):
+        self.clock = clock
+        self.send_time = send_time
+        self.sent = []
+
+    def send(self, device_number, port_number, packet):
+        self.sent.append((self.clock.now, device_number, port_number, packet))
+        self.clock.now += self.send_time
+        return len(packet)
+
+
+def make_packets(count, ports=(1, 2, 3)):
+    return [(ports[index % len(ports)], str(index).encode() + b"X" * 60) for index in range(count)]
+
+
+def make_sender(paced_sender, dataplane, interval, **kwargs):
+    return paced_sender.PacedSender(dataplane, interval, clock=dataplane.clock.monotonic,
+                                    sleep=dataplane.clock.sleep, **kwargs)
+
+
+def legacy_send(dataplane, packets, interval):
+    """Pace by sleeping between packets, like DualTorIO.send_packets() did."""
+    for port, packet in packets:
+        dataplane.clock.sleep(interval)
+        dataplane.send(0, port, packet)
+
+
+def test_rate_does_not_drift(paced_sender):
+    interval = 0.002
+    oversleep = 0.0001
+    packets = make_packets(200)
+
+    dataplane = FakeDataplane(FakeClock(oversleep))
+    start = dataplane.clock.now + TICK
+    sender = make_sender(paced_sender, dataplane, interval)
+    assert sender.send(packets) == len(packets)
+    stats = sender.stats
+    assert [entry[2:] for entry in dataplane.sent] == packets
+    assert all(entry[1] == 0 for entry in dataplane.sent)
+
+    # Every packet is sent on its deadline, the time of sending and the late wake ups are not accumulated
+    for index, entry in enumerate(dataplane.sent):
+        assert start + index * interval <= entry[0] <= start + index * interval + DELAY_MAX
+    assert len(dataplane.clock.sleeps) == len(packets) - 1
+    assert stats["sent_packets"] == len(packets)
+    assert stats["target_pps"] == pytest.approx(1 / interval)
+    assert stats["achieved_pps"] == pytest.approx(1 / interval, rel=1e-4)
+    assert stats["lateness_max"] <= DELAY_MAX
+    assert stats["jitter_max"] <= DELAY_MAX
+
+    legacy_dataplane = FakeDataplane(FakeClock(oversleep))
+    legacy_send(legacy_dataplane, packets, interval)
+    legacy_pps = (len(packets) - 1) / (legacy_dataplane.sent[-1][0] - legacy_dataplane.sent[0][0])
+    logger.info("Target {:.1f} pps, paced {:.1f} pps, sleep paced {:.1f} pps".format(
+        stats["target_pps"], stats["achieved_pps"], legacy_pps))
+    sender.log_stats()
+    assert legacy_pps == pytest.approx(1 / (interval + oversleep + SEND_TIME))
+
+
+def test_late_batches_catch_up(paced_sender):
+    """Batches delayed by a slow send are sent right away until the schedule is caught up."""
+    interval = 0.001
+    dataplane = FakeDataplane(FakeClock(), send_time=0)
+    slow_send = dataplane.send
+
+    def send(device_number, port_number, packet):
+        slow_send(device_number, port_number, packet)
+        if len(dataplane.sent) == 3:
+            dataplane.clock.now += 2.5 * interval
+
+    dataplane.send = send
+    start = dataplane.clock.now + TICK
+    sender = make_sender(paced_sender, dataplane, interval)
+    assert sender.send(make_packets(10)) == 10
+
+    times = [entry[0] for entry in dataplane.sent]
+    deadlines = [start + index * interval for index in range(10)]
+    late = [time_sent - deadline for time_sent, deadline in zip(times, deadlines)]
+    assert all(0 <= delay <= DELAY_MAX for delay in late[:3] + late[6:])
+    # Each late batch adds its readings of the clock to the delay
+    assert late[3] == pytest.approx(1.5 * interval, abs=2 * DELAY_MAX)
+    assert late[4] == pytest.approx(0.5 * interval, abs=3 * DELAY_MAX)
+    assert sender.stats["lateness_max"] == late[3]
+
+
+def test_batched_send(paced_sender):
+    interval = 0.001
+    batch_size = 4
+    packets = make_packets(42)
+
+    dataplane = FakeDataplane(FakeClock(oversleep=0.00005), send_time=0)
+    start = dataplane.clock.now + TICK
+    sender = make_sender(paced_sender, dataplane, interval, batch_size=batch_size)
+    assert sender.send(packets) == len(packets)
+    assert [entry[2:] for entry in dataplane.sent] == packets
+
+    times = [entry[0] for entry in dataplane.sent]
+    for batch_start in range(0, len(times), batch_size):
+        batch = times[batch_start:batch_start + batch_size]
+        # Packets of a batch are sent back to back on the deadline of the batch
+        assert batch == [batch[0]] * len(batch)
+        deadline = start + batch_start * interval
+        assert deadline <= batch[0] <= deadline + DELAY_MAX
+    assert len(dataplane.clock.sleeps) == (len(packets) - 1) // batch_size
+    assert sender.stats["achieved_pps"] == pytest.approx(1 / interval, rel=1e-4)
+
+
+def test_stop_early(paced_sender):
+    dataplane = FakeDataplane(FakeClock(), send_time=0)
+    sender = make_sender(paced_sender, dataplane, 0.0005, batch_size=2)
+    assert sender.send(make_packets(100), should_stop=lambda: len(dataplane.sent) >= 10) == 10
+    assert sender.stats["sent_packets"] == 10
+
+
+def test_get_stats(paced_sender):
+    sender = paced_sender.PacedSender(FakeDataplane(FakeClock()), 0.01, batch_size=2)
+    stats = sender.get_stats(100.0, [100.0, 100.021, 100.04, 100.0605], 7)
+    assert stats["target_pps"] == pytest.approx(100)
+    assert stats["achieved_pps"] == pytest.approx(6 / 0.0605)
+    assert stats["jitter_mean"] == pytest.approx((0.001 + 0.001 + 0.0005) / 3)
+    assert stats["jitter_max"] == pytest.approx(0.001)
+    assert stats["lateness_max"] == pytest.approx(0.001)
+
+    empty = sender.get_stats(100.0, [], 0)
+    assert empty["achieved_pps"] is None
+    assert empty["lateness_max"] == 0.0
+
+
+@pytest.mark.parametrize("interval, batch_size", [(0, 1), (-0.1, 1), (0.01, 0)])
+def test_invalid_arguments(paced_sender, interval, batch_size):
+    with pytest.raises(ValueError):
+        paced_sender.PacedSender(FakeDataplane(FakeClock()), interval, batch_size=batch_size)
@@ -0,0 +1,184 @@
+"""Unit tests for ``tests/common/helpers/show_table.py``.
+
+The parser is compared with the former SonicHost._parse_show implementation on captured show command outputs.
+"""
+import importlib.util
+import logging
+from pathlib import Path
+
+import pytest
+
+
+MODULE_PATH = Path(__file__).resolve().parents[3] / "common/helpers/show_table.py"
+
+SHOW_INTERFACE_STATUS = """\
+      Interface            Lanes    Speed    MTU    FEC    Alias             Vlan    Oper    Admin             Type    Asym PFC
+---------------  ---------------  -------  -----  -----  -------  ---------------  ------  -------  ---------------  ----------
+      Ethernet0          0,1,2,3      40G   9100    N/A     etp1  PortChannel0002      up       up   QSFP+ or later         off
+      Ethernet4          4,5,6,7      40G   9100    N/A     etp2  PortChannel0002      up       up   QSFP+ or later         off
+      Ethernet8        8,9,10,11      40G   9100    N/A     etp3  PortChannel0005      up       up   QSFP+ or later         off
+     Ethernet12      12,13,14,15      40G   9100    N/A     etp4           routed    down       up              N/A         off
+"""  # noqa: E501
+
+SHOW_INTERFACE_COUNTERS = """\
+      IFACE    STATE    RX_OK     RX_BPS    RX_UTIL    RX_ERR    RX_DRP    RX_OVR    TX_OK     TX_BPS    TX_UTIL    TX_ERR    TX_DRP    TX_OVR
+-----------  -------  -------  ---------  ---------  --------  --------  --------  -------  ---------  ---------  --------  --------  --------
+  Ethernet0        U   12,345  1.23 KB/s      0.00%         0     1,024         0   54,321  2.34 KB/s      0.00%         0         0         0
+  Ethernet4        D        0   0.00 B/s      0.00%         0         0         0        0   0.00 B/s      0.00%         0         0         0
+Ethernet100        X      N/A        N/A        N/A       N/A       N/A       N/A      N/A        N/A        N/A       N/A       N/A       N/A
+
+"""  # noqa: E501
+
+SHOW_CRM_RESOURCES = """\
+
+Resource Name           Used Count    Available Count
+--------------------  ------------  -----------------
+ipv4_route                    6410              25662
+ipv6_route                    6411              16386
+
+Stage    Bind Point    Resource Name      Used Count    Available Count
+-------  ------------  ---------------  ------------  -----------------
+INGRESS  PORT          acl_group                  32                 0
+"""
+
+SHOW_TWO_HEADER_LINES = """\
+                   Total    Total
+Name               Usage     Free
+---------------  -------  -------
+buffer_pool_0        100     2000
+buffer_pool_1         25     2075
+"""
+
+
+def _load_target_module():
+    spec = importlib.util.spec_from_file_location("unit_target_show_table", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="module")
+def show_table():
+    return _load_target_module()
+
+
+@pytest.fixture(autouse=True)
+def _bypass_repo_log_format(monkeypatch):
+    """``tests/pytest.ini`` log format needs ``%(funcNamewithModule)s`` field injected by the
+    ``log_section_start`` plugin, which isn't loaded under ``--noconftest``. Use plain format instead."""
+    import _pytest.logging as _pylog
+    plain = logging.Formatter("%(message)s")
+    monkeypatch.setattr(_pylog.PercentStyleMultiline, "format", lambda self, record: plain.format(record))
+
+
+def _legacy_parse_column_positions(sep_line, sep_char='-'):
+    prev = ' ',
+    positions = []
+    for pos, char in enumerate(sep_line + ' '):
+        if char == sep_char:
+            if char != prev:
+                left = pos
+        else:
+            if char != prev:
+                right = pos
+                positions.append((left, right))
+        prev = char
+    return positions
+
+
+def _legacy_parse_show(output_lines, header_len=1):
+    """Former SonicHost._parse_show, used as reference."""
+    import re
+    result = []
+    sep_line_pattern = re.compile(r"^( *-+ *)+$")
+    for idx, line in enumerate(output_lines):
+        if sep_line_pattern.match(line):
+            header_lines = output_lines[idx - header_len:idx]
+            sep_line = output_lines[idx]
+            content_lines = output_lines[idx + 1:]
+            break
+    else:
+        return result
+    positions = _legacy_parse_column_positions(sep_line)
+    headers = [" ".join([header_line[left:right].strip().lower() for header_line in header_lines]).strip()
+               for left, right in positions]
+    for content_line in content_lines:
+        if len(content_line) == 0:
+            break
+        result.append({headers[idx]: content_line[left:right].strip() for idx, (left, right) in enumerate(positions)})
+    return result
+
+
+@pytest.mark.parametrize("output,header_len", [
+    (SHOW_INTERFACE_STATUS, 1),
+    (SHOW_INTERFACE_COUNTERS, 1),
+    (SHOW_CRM_RESOURCES, 1),
+    (SHOW_TWO_HEADER_LINES, 2),
+])
+def test_same_as_legacy_parser(show_table, output, header_len):
+    lines = output.splitlines()
+    expected = _legacy_parse_show(lines, header_len)
+    assert expected, "captured output must contain a table"
+    assert show_table.parse_show_table(lines, header_len) == expected
+    assert show_table.ShowTable(lines, header_len).columns() == \
+        {header: [row[header] for row in expected] for header in expected[0]}
+
+
+def test_parse_interface_status(show_table):
+    result = show_table.parse_show_table(SHOW_INTERFACE_STATUS.splitlines())
+    assert len(result) == 4
+    assert result[0] == {
+        "interface": "Ethernet0", "lanes": "0,1,2,3", "speed": "40G", "mtu": "9100", "fec": "N/A", "alias": "etp1",
+        "vlan": "PortChannel0002", "oper": "up", "admin": "up", "type": "QSFP+ or later", "asym pfc": "off"
+    }
+
+
+def test_two_header_lines(show_table):
+    table = show_table.ShowTable(SHOW_TWO_HEADER_LINES.splitlines(), header_len=2)
+    assert table.headers == ["name", "total usage", "total free"]
+    assert list(table.rows()) == [("buffer_pool_0", "100", "2000"), ("buffer_pool_1", "25", "2075")]
+
+
+def test_rows_are_lazy(show_table):
+    consumed = []
+
+    def lines():
+        for line in SHOW_INTERFACE_STATUS.splitlines():
+            consumed.append(line)
+            yield line
+
+    table = show_table.ShowTable(lines())
+    assert len(consumed) == 2, "only header and separation lines are consumed before iterating rows"
+    rows = table.rows()
+    assert next(rows)[0] == "Ethernet0"
+    assert len(consumed) == 3
+    assert [row[0] for row in rows] == ["Ethernet4", "Ethernet8", "Ethernet12"]
+
+
+def test_columns(show_table):
+    columns = show_table.ShowTable(SHOW_INTERFACE_COUNTERS.splitlines()).columns()
+    assert list(columns) == ["iface", "state", "rx_ok", "rx_bps", "rx_util", "rx_err", "rx_drp", "rx_ovr",
+                             "tx_ok", "tx_bps", "tx_util", "tx_err", "tx_drp", "tx_ovr"]
+    assert columns["iface"] == ["Ethernet0", "Ethernet4", "Ethernet100"]
+    assert columns["rx_bps"] == ["1.23 KB/s", "0.00 B/s", "N/A"]
+
+    empty = show_table.ShowTable(SHOW_INTERFACE_STATUS.splitlines()[:2]).columns()
+    assert empty == {header: [] for header in empty} and len(empty) == 11
+
+
+def test_single_column(show_table):
+    lines = ["Name", "----------", "alpha", "beta gamma", "", "ignored"]
+    assert show_table.parse_show_table(lines) == [{"name": "alpha"}, {"name": "beta gamma"}]
+
+
+def test_indented_separation_line(show_table):
+    lines = ["  Name  Value", "  ----  -----", "  a         1"]
+    assert show_table.parse_show_table(lines) == [{"name": "a", "value": "1"}]
+
+
+def test_no_separation_line(show_table):
+    table = show_table.ShowTable(["No data available"])
+    assert not table.found
+    assert list(table.rows()) == []
+    assert table.columns() == {}
+    assert show_table.parse_show_table(["No data available"]) == []
@@ -0,0 +1,127 @@
+"""Unit tests for ``analyze_logs_in_process_pool`` of the loganalyzer plugin.
+
+The logs are fetched from stub hosts and parsed in the process pool, the summaries are checked against the
+summaries of ``LogAnalyzer.analyze()``.
+"""
+import logging
+import shutil
+
+import pytest
+
+import tests.common.plugins.loganalyzer as loganalyzer_plugin
+from tests.common.plugins.loganalyzer.loganalyzer import LogAnalyzer, LogAnalyzerError
+
+MARKER = "test_parallel_parse_2024-01-01-00:00:00"
+
+LOGS = {
+    "vlab-01": {
+        "syslog": ["ERR swss#orchagent: :- doTask: Failed to create route",
+                   "ERR syncd#syncd: ignored: known error",
+                   "INFO bgpd: neighbor up"],
+        "sairedis.rec": ["ERR syncd#syncd: SAI_STATUS_FAILURE"],
+    },
+    "vlab-02": {
+        "syslog": ["ERR kernel: Oops"],
+    },
+    "vlab-03": {
+        "syslog": ["INFO bgpd: neighbor up", "ERR syncd#syncd: ignored: known error"],
+    },
+}
+
+
+@pytest.fixture(autouse=True)
+def _bypass_repo_log_format(monkeypatch):
+    """``tests/pytest.ini`` log format needs ``%(funcNamewithModule)s`` field injected by the
+    ``log_section_start`` plugin, which isn't loaded under ``--noconftest``. Use plain format instead."""
+    import _pytest.logging as _pylog
+    plain = logging.Formatter("%(message)s")
+    monkeypatch.setattr(_pylog.PercentStyleMultiline, "format", lambda self, record: plain.format(record))
+
+
+class StubHost(object):
+
+    def __init__(self, hostname):
+        self.hostname = hostname
+
+
+def _serial_run(target, args, kwargs, nodes, timeout=None, **_kwargs):
+    """Run the target on every node in this process, like parallel_run does in child processes."""
+    results = {}
+    for node in nodes:
+        target(*args, node=node, results=results, **kwargs)
+    return results
+
+
+def _write_log(path, lines):
+    with open(str(path), "w") as f:
+        f.write("Jan  1 00:00:00.000000 vlab INFO start-LogAnalyzer-{}\n".format(MARKER))
+        for index, line in enumerate(lines):
+            f.write("Jan  1 00:00:{:02d}.000000 vlab {}\n".format(index + 1, line))
+        f.write("Jan  1 00:01:00.000000 vlab INFO end-LogAnalyzer-{}\n".format(MARKER))
+
+
+@pytest.fixture
+def analyzers(tmp_path):
+    """LogAnalyzer of every stub host, fetching logs writes the logs of the host to local files."""
+    analyzers = {}
+    for hostname, logs in LOGS.items():
+        analyzer = LogAnalyzer(ansible_host=StubHost(hostname), marker_prefix="test_parallel_parse")
+        analyzer.match_regex = [r".* ERR .*"]
+        analyzer.ignore_regex = [r".*ignored: known error.*"]
+        analyzer.expect_regex = []
+        fetched_dir = tmp_path / hostname
+        fetched_dir.mkdir()
+
+        def _fetch_logs(marker, logs=logs, fetched_dir=fetched_dir):
+            assert marker == MARKER
+            file_list = []
+            for name, lines in logs.items():
+                _write_log(fetched_dir / name, lines)
+                file_list.append(str(fetched_dir / name))
+            return file_list
+
+        analyzer.fetch_logs = _fetch_logs
+        analyzers[hostname] = analyzer
+    yield analyzers
+    for hostname in LOGS:
+        shutil.rmtree("/tmp/loganalyzer/{}".format(hostname), ignore_errors=True)
+
+
+@pytest.fixture
+def fork_lock_calls(monkeypatch):
+    """Fetch the logs in this process, return the calls making the logging handlers safe to fork."""
+    calls = []
+    monkeypatch.setattr(loganalyzer_plugin, "parallel_run", _serial_run)
+    monkeypatch.setattr(loganalyzer_plugin, "fix_logging_handler_fork_lock", lambda: calls.append(True))
+    return calls
+
+
+def test_same_summary_as_analyze(analyzers, fork_lock_calls, tmp_path):
+    markers = {hostname: MARKER for hostname in analyzers}
+    hosts = [analyzer.ansible_host for analyzer in analyzers.values()]
+
+    la_results = loganalyzer_plugin.analyze_logs_in_process_pool(analyzers, markers, hosts, fail_test=False)
+
+    assert fork_lock_calls
+    # Fetched logs are removed once parsed
+    assert not list(tmp_path.glob("vlab-*/*"))
+    expected = {hostname: analyzer.analyze(MARKER, fail=False) for hostname, analyzer in analyzers.items()}
+    assert la_results == expected
+    assert {hostname: summary["total"]["match"] for hostname, summary in la_results.items()} == \
+        {"vlab-01": 2, "vlab-02": 1, "vlab-03": 0}
+    assert len(la_results["vlab-01"]["match_files"]) == 2
+
+
+def test_failures_of_hosts_combined(analyzers, fork_lock_calls, tmp_path):
+    markers = {hostname: MARKER for hostname in analyzers}
+    hosts = [analyzer.ansible_host for analyzer in analyzers.values()]
+    with pytest.raises(LogAnalyzerError):
+        analyzers["vlab-02"].analyze(MARKER, fail=True)
+
+    with pytest.raises(pytest.fail.Exception) as excinfo:
+        loganalyzer_plugin.analyze_logs_in_process_pool(analyzers, markers, hosts, fail_test=True)
+
+    message = str(excinfo.value)
+    assert "Got matched syslog on hosts ['vlab-01', 'vlab-02']" in message
+    assert "Failed to create route" in message and "SAI_STATUS_FAILURE" in message and "Oops" in message
+    assert not list(tmp_path.glob("vlab-*/*"))
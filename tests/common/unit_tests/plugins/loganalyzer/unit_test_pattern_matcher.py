@@ -0,0 +1,102 @@
+import importlib.util
+import random
+import re
+from pathlib import Path
+
+import pytest
+
+
+LOGANALYZER_DIR = Path(__file__).resolve().parents[4] / "common/plugins/loganalyzer"
+
+REGEXES = [
+    r".* ERR syncd\d*#syncd: brcm_sai_get_port_stats:.* port stats get failed with error.*",
+    r".* ERR (snmp|swss)#.*subagent.*",
+    r".*ERR monit\[\d+\]: 'routeCheck' status failed.*",
+    r".* ERR ntpd.*bind.*AF_INET6.*",
+    r".* ERR ntpd.*bind.*AF_INET.*",
+    r"kernel:.*Oops",
+    r"kernel.*oom\s",
+    r"\d+",
+    r"",
+]
+
+
+def _load_target_module(name):
+    """Load the target module without importing the loganalyzer plugin package."""
+    spec = importlib.util.spec_from_file_location(
+        "unit_target_{}".format(name), LOGANALYZER_DIR / "{}.py".format(name))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="module")
+def matcher_module():
+    """Load and return the pattern_matcher target module."""
+    return _load_target_module("pattern_matcher")
+
+
+@pytest.mark.parametrize(
+    "regex, expected",
+    [
+        (r".* ERR ntpd.*bind.*AF_INET6.*", {" ERR ntpd"}),
+        (r"\.ERR", {".ERR"}),
+        (r".*(snmp|swss)#.*", {"nmp", "wss"}),
+        (r"(abcd)+def", {"abcd"}),
+        (r"(?i).*ERR.*", None),
+        (r"a(?i:bcdef)", None),
+        (r"ab|cd", None),
+        (r"[a-z]+", None),
+    ],
+)
+def test_extract_literals(matcher_module, regex, expected):
+    assert matcher_module.extract_literals(regex) == expected
+
+
+def _random_lines(count):
+    rnd = random.Random(0)
+    words = ["ERR", "INFO", "kernel:", "kernel", "Oops", "oom ", "syncd#syncd:", "brcm_sai_get_port_stats:",
+             "port", "stats", "get", "failed", "with", "error", "snmp#", "swss#", "subagent", "monit[12]:",
+             "'routeCheck'", "status", "ntpd", "bind", "AF_INET", "AF_INET6", "x"]
+    return ["Jan  1 00:00:00 sonic " + " ".join(rnd.choice(words) for _ in range(rnd.randint(1, 10))) + "\n"
+            for _ in range(count)]
+
+
+@pytest.mark.parametrize("regexes", [REGEXES[:-2], REGEXES[:5], REGEXES[:-2] * 3, REGEXES])
+def test_matcher_agrees_with_joined_alternation(matcher_module, regexes):
+    joined = re.compile("|".join(regexes))
+    matcher = matcher_module.PatternMatcher(regexes)
+
+    for line in _random_lines(2000):
+        assert bool(matcher.search(line)) == bool(joined.search(line))
+        assert bool(matcher.match(line)) == bool(joined.match(line))
+        assert matcher.matching_patterns(line) == [regex for regex in regexes if re.search(regex, line)]
+
+
+def test_unused_patterns(matcher_module):
+    regexes = REGEXES[:-2] * 3
+    lines = _random_lines(50)
+    matcher = matcher_module.PatternMatcher(regexes)
+
+    expected = []
+    for regex in regexes:
+        if not any(re.search(regex, line) for line in lines):
+            expected.append(regex)
+    assert matcher.unused_patterns(lines) == expected
+    assert matcher.unused_patterns([]) == regexes
+
+
+def test_build_matcher_for_empty_list(matcher_module):
+    assert matcher_module.build_matcher([]) is None
+    assert matcher_module.build_matcher(REGEXES).pattern == "|".join(REGEXES)
+
+
+def test_matcher_with_common_ignore_file(matcher_module):
+    analyzer = _load_target_module("system_msg_handler").AnsibleLogAnalyzer("unit_test", False)
+    regexes = analyzer.create_msg_regex([str(LOGANALYZER_DIR / "loganalyzer_common_ignore.txt")])[1]
+    joined = re.compile("|".join(regexes))
+    matcher = matcher_module.PatternMatcher(regexes)
+    lines = [".* ERR ntpd[1]: bind(23) AF_INET6 x\n", "Jan 1 INFO systemd[1]: Started\n", "random ERR line\n"]
+
+    for line in lines:
+        assert bool(matcher.search(line)) == bool(joined.search(line))
@@ -0,0 +1,145 @@
+import importlib.util
+import random
+import re
+import sys
+from pathlib import Path
+
+import pytest
+
+
+MODULE_PATH = (Path(__file__).resolve().parents[4] /
+               "common/plugins/loganalyzer/system_msg_handler.py")
+
+RUN_ID = "test_case.2024-01-01-00:00:00"
+MATCH_REGEX = re.compile(r"ERR|crash")
+IGNORE_REGEX = re.compile(r"ERR ignored")
+EXPECT_REGEX = re.compile(r"expected \d+")
+
+
+def _load_target_module():
+    """Load the target module without importing the loganalyzer plugin package."""
+    spec = importlib.util.spec_from_file_location(
+        "unit_target_system_msg_handler", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="module")
+def handler_module():
+    """Load and return the system_msg_handler target module."""
+    return _load_target_module()
+
+
+def _legacy_analyze_file(analyzer, log_file_path, maximum_log_length=1000):
+    """Reference implementation: walk the whole file backwards, line by line."""
+    check_marker = analyzer.require_marker_check(log_file_path)
+    in_analysis_range = not check_marker
+    matching_lines = []
+    expected_lines = []
+    start_marker = analyzer.create_start_marker()
+    end_marker = analyzer.create_end_marker()
+    ignore_marker_run_ids = []
+    with open(log_file_path) as log_file:
+        lines = log_file.readlines()
+    for rev_line in reversed(lines):
+        if end_marker in rev_line:
+            in_analysis_range = True
+            continue
+        elif analyzer.end_ignore_marker_prefix in rev_line:
+            ignore_marker_run_ids.append(rev_line.split(analyzer.end_ignore_marker_prefix)[1])
+            in_analysis_range = False
+            continue
+        elif analyzer.start_ignore_marker_prefix in rev_line:
+            ignore_marker_run_ids.pop()
+            in_analysis_range = True
+            continue
+        if rev_line.find(start_marker) != -1 and 'extract_log' not in rev_line:
+            break
+        if in_analysis_range:
+            if not check_marker and len(rev_line) > maximum_log_length:
+                continue
+            if EXPECT_REGEX.search(rev_line):
+                expected_lines.append(rev_line)
+            elif MATCH_REGEX.search(rev_line) and not IGNORE_REGEX.search(rev_line):
+                matching_lines.append(rev_line)
+    return matching_lines, expected_lines
+
+
+def _random_payload(rnd):
+    return rnd.choice(["INFO all good", "ERR something", "ERR ignored thing", "expected 42",
+                       "crash in extract_log", "NOTICE start-LogAnalyzer-other"])
+
+
+def _write_log(path, rnd, with_markers=True, ignore_blocks=1):
+    lines = ["Jan  1 00:00:00 dut noise before {}\n".format(_random_payload(rnd)) for _ in range(20)]
+    if with_markers:
+        lines.append("Jan  1 00:00:00 dut start-LogAnalyzer-{}\n".format(RUN_ID))
+    for block in range(ignore_blocks + 1):
+        lines.extend("Jan  1 00:00:01 dut {} {}\n".format(_random_payload(rnd), i) for i in range(50))
+        if block < ignore_blocks:
+            ignore_id = "{}.ignore{}".format(RUN_ID, block)
+            lines.append("Jan  1 00:00:02 dut start-ignore-LogAnalyzer-{}\n".format(ignore_id))
+            lines.extend("Jan  1 00:00:02 dut ignored {}\n".format(_random_payload(rnd)) for _ in range(10))
+            lines.append("Jan  1 00:00:03 dut end-ignore-LogAnalyzer-{}\n".format(ignore_id))
+    if with_markers:
+        lines.append("Jan  1 00:00:04 dut end-LogAnalyzer-{}\n".format(RUN_ID))
+    lines.extend("Jan  1 00:00:05 dut after {}\n".format(_random_payload(rnd)) for _ in range(20))
+    path.write_text("".join(lines))
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("ignore_blocks", [0, 1, 3])
+def test_analyze_file_matches_legacy_reverse_scan(handler_module, tmp_path, seed, ignore_blocks):
+    rnd = random.Random(seed)
+    log_path = tmp_path / "syslog"
+    _write_log(log_path, rnd, ignore_blocks=ignore_blocks)
+    analyzer = handler_module.AnsibleLogAnalyzer(RUN_ID, False)
+
+    result = analyzer.analyze_file(str(log_path), MATCH_REGEX, IGNORE_REGEX, EXPECT_REGEX)
+
+    assert result == _legacy_analyze_file(analyzer, str(log_path))
+
+
+def test_analyze_file_list_keeps_file_order(handler_module, tmp_path):
+    log_path = tmp_path / "syslog"
+    _write_log(log_path, random.Random(1))
+    analyzer = handler_module.AnsibleLogAnalyzer(RUN_ID, False)
+
+    result = analyzer.analyze_file_list([str(log_path)], MATCH_REGEX, IGNORE_REGEX, EXPECT_REGEX)
+
+    matching_lines, expected_lines = _legacy_analyze_file(analyzer, str(log_path))
+    assert result[str(log_path)] == [matching_lines[::-1], expected_lines[::-1]]
+
+
+def test_analyze_file_without_markers_for_sairedis(handler_module, tmp_path):
+    log_path = tmp_path / "sairedis.rec"
+    _write_log(log_path, random.Random(2), with_markers=False, ignore_blocks=0)
+    with open(log_path, "a") as log_file:
+        log_file.write("Jan  1 00:00:06 dut ERR {}\n".format("x" * 2000))
+    analyzer = handler_module.AnsibleLogAnalyzer(RUN_ID, False)
+
+    result = analyzer.analyze_file(str(log_path), MATCH_REGEX, IGNORE_REGEX, EXPECT_REGEX)
+
+    assert result == _legacy_analyze_file(analyzer, str(log_path))
+    assert all(len(line) <= 1000 for line in result[0])
+
+
+def test_analyze_file_missing_end_marker(handler_module, tmp_path):
+    log_path = tmp_path / "syslog"
+    log_path.write_text("Jan  1 00:00:00 dut start-LogAnalyzer-{}\nJan  1 00:00:01 dut ERR\n".format(RUN_ID))
+    analyzer = handler_module.AnsibleLogAnalyzer(RUN_ID, False)
+
+    with pytest.raises(SystemExit) as err:
+        analyzer.analyze_file(str(log_path), MATCH_REGEX, IGNORE_REGEX, EXPECT_REGEX)
+    assert err.value.code == handler_module.err_no_end_marker
+
+
+def test_analyze_file_from_stdin(handler_module, monkeypatch):
+    lines = ["ERR one\n", "expected 1\n", "ERR ignored\n", "end-LogAnalyzer-{}\n".format(RUN_ID)]
+    monkeypatch.setattr(sys, "stdin", iter(lines))
+    analyzer = handler_module.AnsibleLogAnalyzer(RUN_ID, False)
+
+    result = analyzer.analyze_file("-", MATCH_REGEX, IGNORE_REGEX, EXPECT_REGEX)
+
+    assert result == (["ERR one\n"], ["expected 1\n"])
@@ -0,0 +1,390 @@
+"""Unit tests for ``ansible/roles/test/files/ptftests/py3/flow_analyzer.py``.
+
+Synthetic captures of the advanced-reboot and the DualTorIO flows are examined by the NumPy analyzer and by the
+scapy one, both must find the same disruptions. The benchmark reporting their run time is skipped by default,
+set ``FLOW_ANALYZER_BENCHMARK_PACKETS`` to the number of sent packets to run it.
+"""
+import importlib.util
+import logging
+import os
+import random
+import struct
+import sys
+import time
+from itertools import groupby
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+scapyall = pytest.importorskip("scapy.all")
+
+MODULE_PATH = Path(__file__).resolve().parents[4] / "ansible/roles/test/files/ptftests/py3/flow_analyzer.py"
+
+logger = logging.getLogger(__name__)
+
+DUT_MAC = "4c:76:25:f5:48:80"
+VLAN_MAC = "4c:76:25:f5:48:81"
+T1_MAC = "02:00:00:00:00:01"
+SERVER_MAC = "02:00:00:00:01:01"
+START_TIME = 1700000000.0
+SEND_INTERVAL = 0.001
+
+
+@pytest.fixture(scope="module")
+def flow_analyzer():
+    spec = importlib.util.spec_from_file_location("unit_target_flow_analyzer", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    # Functions run in the process pool are pickled by module name
+    sys.modules[spec.name] = module
+    yield module
+    del sys.modules[spec.name]
+
+
+@pytest.fixture(autouse=True)
+def _bypass_repo_log_format(monkeypatch):
+    """``tests/pytest.ini`` log format needs ``%(funcNamewithModule)s`` field injected by the
+    ``log_section_start`` plugin, which isn't loaded under ``--noconftest``. Use plain format instead."""
+    import _pytest.logging as _pylog
+    plain = logging.Formatter("%(message)s")
+    monkeypatch.setattr(_pylog.PercentStyleMultiline, "format", lambda self, record: plain.format(record))
+
+
+class FrameBuilder(object):
+    """Build frames of the flow from cached headers, as building each of them by scapy is slow."""
+
+    def __init__(self):
+        self._headers = {}
+
+    def build(self, src, dst, payload, vlan=None, sport=1234, dport=5000, ip_src="10.0.0.1", ip_dst="192.168.0.2"):
+        key = (src, dst, len(payload), vlan, sport, dport, ip_src, ip_dst)
+        if key not in self._headers:
+            packet = scapyall.Ether(src=src, dst=dst)
+            if vlan is not None:
+                packet = packet / scapyall.Dot1Q(vlan=vlan)
+            packet = packet / scapyall.IP(src=ip_src, dst=ip_dst) / \
+                scapyall.TCP(sport=sport, dport=dport) / scapyall.Raw(load=payload)
+            self._headers[key] = bytes(packet)[:-len(payload)]
+        return self._headers[key] + payload
+
+
+def generate_flow(count, seed=1):
+    """Generate (timestamp, frame) records of the flow, with disruptions, floods and noise."""
+    rng = random.Random(seed)
+    builder = FrameBuilder()
+    records = []
+    disruptions = [(count // 4, count // 4 + count // 50), (count // 2, count // 2 + 7), (count - 30, count - 20)]
+    for packet_id in range(count):
+        payload = ("0" * 60 + str(packet_id)).encode()
+        sent_time = START_TIME + packet_id * SEND_INTERVAL
+        from_vlan = packet_id % 5 == 0
+        dut_mac = VLAN_MAC if from_vlan else DUT_MAC
+        sent_dropped = packet_id % 997 == 13
+        recv_dropped = any(start <= packet_id < stop for start, stop in disruptions) or packet_id % 1009 == 17
+        if sent_dropped and packet_id % 2:
+            # Neither sent nor received packet is captured
+            recv_dropped = True
+        if not sent_dropped:
+            records.append((sent_time, builder.build(SERVER_MAC if from_vlan else T1_MAC, dut_mac, payload)))
+            if packet_id % 499 == 3:
+                # Sent twice
+                records.append((sent_time + 0.00001, builder.build(T1_MAC, dut_mac, payload)))
+        if not recv_dropped:
+            recv_time = sent_time + 0.0002 + rng.random() * 0.0001
+            frame = builder.build(dut_mac, T1_MAC if from_vlan else SERVER_MAC, payload,
+                                  vlan=100 if packet_id % 7 == 0 else None)
+            records.append((recv_time, frame))
+            if packet_id % 211 == 5:
+                # Flooded by DUT
+                records.append((recv_time + 0.00001, builder.build(dut_mac, "ff:ff:ff:ff:ff:ff", payload)))
+        if packet_id % 101 == 0:
+            records.append((sent_time, bytes(scapyall.Ether(src=T1_MAC, dst=DUT_MAC) / scapyall.ARP())))
+            records.append((sent_time, builder.build(T1_MAC, DUT_MAC, b"12", sport=1235)))
+            records.append((sent_time, builder.build(DUT_MAC, SERVER_MAC, b"abc")))
+    records.sort(key=lambda record: record[0])
+    # Delayed packets are captured out of order
+    for index in range(10, len(records) - 1, 389):
+        records[index], records[index + 1] = records[index + 1], records[index]
+    return records
+
+
+def write_raw_pcap(filename, records, nsec=False):
+    with open(filename, "wb") as f:
+        f.write(struct.pack("<IHHiIII", 0xa1b23c4d if nsec else 0xa1b2c3d4, 2, 4, 0, 0, 65535, 1))
+        for timestamp, frame in records:
+            sec = int(timestamp)
+            frac = int(round((timestamp - sec) * (10 ** 9 if nsec else 10 ** 6)))
+            f.write(struct.pack("<IIII", sec, frac, len(frame), len(frame)))
+            f.write(frame)
+
+
+def write_pcapng(filename, records):
+    with scapyall.PcapNgWriter(filename) as writer:
+        for timestamp, frame in records:
+            packet = scapyall.Ether(frame)
+            packet.time = timestamp
+            writer.write(packet)
+
+
+def scapy_flow(flow_analyzer, filename):
+    """Examine the capture like advanced-reboot does without flow_analyzer.read_flow_capture()."""
+    unique_id = set()
+    filtered_packets = []
+    for packet in scapyall.rdpcap(filename):
+        if scapyall.TCP not in packet or scapyall.ICMP in packet or packet[scapyall.TCP].sport != 1234 or \
+                packet[scapyall.TCP].dport != 5000:
+            continue
+        try:
+            payload_id = int(bytes(packet[scapyall.TCP].payload))
+        except ValueError:
+            continue
+        if payload_id not in unique_id and packet[scapyall.Ether].src in (DUT_MAC, VLAN_MAC):
+            unique_id.add(payload_id)
+            filtered_packets.append(packet)
+        elif packet[scapyall.Ether].dst in (DUT_MAC, VLAN_MAC):
+            filtered_packets.append(packet)
+    return flow_analyzer.analyze_scapy_packets(filtered_packets, [DUT_MAC, VLAN_MAC])
+
+
+def assert_same_flow(fast, expected):
+    assert sorted(fast) == sorted(expected)
+    for key in expected:
+        if key == "lost_packets":
+            assert list(fast[key]) == list(expected[key])
+            for start_id, value in expected[key].items():
+                assert fast[key][start_id][0] == value[0]
+                assert fast[key][start_id][1:] == pytest.approx(value[1:], abs=1e-6)
+        elif key in ("disruption_start", "disruption_stop") and expected[key] is not None:
+            assert fast[key] == pytest.approx(expected[key], abs=1e-6)
+        else:
+            assert fast[key] == expected[key], key
+
+
+@pytest.mark.parametrize("file_format", ["pcap", "pcap_nsec", "pcapng"])
+def test_same_result_as_scapy(flow_analyzer, tmp_path, file_format):
+    records = generate_flow(3000)
+    filename = str(tmp_path / "capture.{}".format(file_format))
+    if file_format == "pcapng":
+        write_pcapng(filename, records)
+    else:
+        write_raw_pcap(filename, records, nsec=file_format == "pcap_nsec")
+
+    fast = flow_analyzer.analyze_flow_capture(filename, [DUT_MAC, VLAN_MAC])
+    expected = scapy_flow(flow_analyzer, filename)
+    assert_same_flow(fast, expected)
+    assert len(fast["lost_packets"]) >= 3
+    assert fast["flooded_pkts"]
+    assert fast["missing_sequences"]
+
+
+def test_ignored_and_reset_packets(flow_analyzer, tmp_path):
+    builder = FrameBuilder()
+    records = []
+    # ID 0 is received without being sent, 5 and 6 are received but not sent, 9..11 are lost
+    for packet_id in list(range(0, 20)):
+        payload = str(packet_id).encode()
+        sent_time = START_TIME + packet_id * SEND_INTERVAL
+        if packet_id not in (0, 5, 6):
+            records.append((sent_time, builder.build(T1_MAC, DUT_MAC, payload)))
+        if packet_id not in (9, 10, 11, 3, 4):
+            records.append((sent_time + 0.0002, builder.build(DUT_MAC, SERVER_MAC, payload)))
+    filename = str(tmp_path / "capture.pcap")
+    write_raw_pcap(filename, records)
+
+    fast = flow_analyzer.analyze_flow_capture(filename, [DUT_MAC, VLAN_MAC])
+    expected = scapy_flow(flow_analyzer, filename)
+    assert_same_flow(fast, expected)
+    assert list(fast["lost_packets"]) == [2, 8]
+    assert fast["prev_payload"] == 19
+
+
+def test_no_received_packets(flow_analyzer, tmp_path):
+    builder = FrameBuilder()
+    filename = str(tmp_path / "capture.pcap")
+    write_raw_pcap(filename, [(START_TIME + i, builder.build(T1_MAC, DUT_MAC, str(i).encode())) for i in range(5)])
+
+    fast = flow_analyzer.analyze_flow_capture(filename, [DUT_MAC])
+    assert_same_flow(fast, scapy_flow(flow_analyzer, filename))
+    assert fast["received_counter"] == 0
+
+
+def test_filtered_capture(flow_analyzer, tmp_path):
+    filename = str(tmp_path / "capture.pcap")
+    filtered_filename = str(tmp_path / "filtered.pcap")
+    write_raw_pcap(filename, generate_flow(500))
+
+    messages = []
+    result = flow_analyzer.analyze_flow_capture(filename, [DUT_MAC, VLAN_MAC], log=messages.append,
+                                                filtered_filename=filtered_filename)
+    packets = scapyall.rdpcap(filtered_filename)
+    assert len(packets) == result["packet_count"]
+    keys = [(int(bytes(packet[scapyall.TCP].payload)), float(packet.time)) for packet in packets]
+    assert keys == sorted(keys)
+    assert "Filtered pcap dumped to {}".format(filtered_filename) in messages
+
+    # Nothing is dumped or logged without flow packets
+    os.remove(filtered_filename)
+    write_raw_pcap(filename, [])
+    messages = []
+    flow_analyzer.analyze_flow_capture(filename, [DUT_MAC, VLAN_MAC], log=messages.append,
+                                       filtered_filename=filtered_filename)
+    assert not os.path.exists(filtered_filename)
+    assert not [message for message in messages if "Filtered pcap" in message]
+
+
+def test_unsupported_capture(flow_analyzer, tmp_path):
+    filename = str(tmp_path / "capture.txt")
+    with open(filename, "w") as f:
+        f.write("not a capture file at all")
+    with pytest.raises(flow_analyzer.UnsupportedCapture):
+        flow_analyzer.read_flow_capture(filename, [DUT_MAC], [DUT_MAC])
+
+
+@pytest.mark.skipif("FLOW_ANALYZER_BENCHMARK_PACKETS" not in os.environ,
+                    reason="Set FLOW_ANALYZER_BENCHMARK_PACKETS to run the benchmark")
+def test_benchmark(flow_analyzer, tmp_path):
+    count = int(os.environ["FLOW_ANALYZER_BENCHMARK_PACKETS"])
+    filename = str(tmp_path / "capture.pcap")
+    write_raw_pcap(filename, generate_flow(count))
+
+    start = time.time()
+    fast = flow_analyzer.analyze_flow_capture(filename, [DUT_MAC, VLAN_MAC])
+    fast_time = time.time() - start
+    start = time.time()
+    expected = scapy_flow(flow_analyzer, filename)
+    scapy_time = time.time() - start
+
+    logger.info("Examined {} packets: flow_analyzer {:.3f}s, scapy {:.3f}s, speedup {:.1f}x".format(
+        fast["packet_count"], fast_time, scapy_time, scapy_time / fast_time))
+    assert_same_flow(fast, expected)
+
+
+def generate_dualtor_flow(servers, count, seed=2):
+    """Generate (timestamp, frame) records of DualTorIO t1_to_server flow, sent packets are spread over servers."""
+    rng = random.Random(seed)
+    builder = FrameBuilder()
+    records = []
+    for packet_id in range(count):
+        payload = (str(packet_id) + "X" * 60).encode()
+        sent_time = START_TIME + packet_id * SEND_INTERVAL
+        for server_index, server in enumerate(servers):
+            if packet_id % (53 + server_index) == 7:
+                continue
+            records.append((sent_time, builder.build(T1_MAC, DUT_MAC, payload, ip_dst=server)))
+            lost = count // 3 <= packet_id < count // 3 + 20 * (server_index + 1) or packet_id % 331 == server_index
+            lost = lost or (server_index == 0 and (packet_id < 3 or packet_id >= count - 2))
+            if lost:
+                continue
+            repeat = 3 if packet_id % 97 == server_index else 1
+            for index in range(repeat):
+                recv_time = sent_time + 0.0002 + rng.random() * 0.0001 + index * 0.00001
+                records.append((recv_time, builder.build(VLAN_MAC, SERVER_MAC, payload, ip_dst=server)))
+        if packet_id % 101 == 0:
+            records.append((sent_time, builder.build(T1_MAC, DUT_MAC, b"12XX", sport=1235, ip_dst=servers[0])))
+            records.append((sent_time, builder.build(VLAN_MAC, SERVER_MAC, b"aXbc", ip_dst=servers[0])))
+    records.sort(key=lambda record: record[0])
+    return records
+
+
+def scapy_dualtor_flow(filename, sent_mac, received_macs, sent_counts):
+    """Examine the capture like DualTorIO.examine_flow() does with scapy packets of t1_to_server flow."""
+    def payload_id(packet):
+        return int(bytes(packet[scapyall.TCP].payload).decode().replace("X", ""))
+
+    servers = {}
+    for packet in scapyall.rdpcap(filename):
+        if scapyall.TCP not in packet or packet[scapyall.TCP].sport != 1234 or packet[scapyall.TCP].dport != 5000:
+            continue
+        try:
+            payload_id(packet)
+        except ValueError:
+            continue
+        if packet[scapyall.Ether].dst == sent_mac or packet[scapyall.Ether].src in received_macs:
+            servers.setdefault(packet[scapyall.IP].dst, []).append(packet)
+
+    results = {}
+    for server, packets in servers.items():
+        packets.sort(key=lambda packet: (payload_id(packet), packet.time))
+        sent = 0
+        received = []
+        duplicates = []
+        disruptions = []
+        for packet in packets:
+            if packet[scapyall.Ether].dst == sent_mac:
+                sent += 1
+                continue
+            curr = (payload_id(packet), float(packet.time))
+            if received and received[-1][0] == curr[0]:
+                duplicates.append(curr)
+            if received and received[-1][0] + 1 < curr[0]:
+                disruptions.append({"start_time": received[-1][1], "end_time": curr[1],
+                                    "start_id": received[-1][0], "end_id": curr[0]})
+            received.append(curr)
+        duplications = []
+        for _, grouper in groupby(duplicates, lambda d: d[0]):
+            group = list(grouper)
+            duplications.append({"start_time": group[0][1], "end_time": group[-1][1], "start_id": group[0][0],
+                                 "end_id": group[-1][0], "duplication_count": len(group)})
+        results[server] = {
+            "sent_packets": sent,
+            "received_packets": len(received),
+            "disruption_before_traffic": received[0][0] if received and received[0][0] != 0 else False,
+            "disruption_after_traffic":
+                received[-1][0] if received and received[-1][0] != sent_counts[server] - 1 else False,
+            "duplications": duplications,
+            "disruptions": disruptions,
+        }
+    return results
+
+
+def assert_same_server_results(fast, expected):
+    assert sorted(fast) == sorted(expected)
+    for server, result in expected.items():
+        for key, value in result.items():
+            if key in ("duplications", "disruptions"):
+                assert len(fast[server][key]) == len(value), key
+                for fast_range, expected_range in zip(fast[server][key], value):
+                    assert fast_range == pytest.approx(expected_range, abs=1e-6)
+            else:
+                assert fast[server][key] == value, key
+                assert type(fast[server][key]) is type(value), key
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_dualtor_same_result_as_scapy(flow_analyzer, tmp_path, processes):
+    servers = ["192.168.0.{}".format(index) for index in range(2, 6)]
+    count = 1500
+    filename = str(tmp_path / "capture.pcap")
+    write_raw_pcap(filename, generate_dualtor_flow(servers, count))
+    sent_counts = {server: count for server in servers}
+
+    capture = flow_analyzer.read_flow_capture(filename, [DUT_MAC], [VLAN_MAC], payload_filler="X")
+    fast, groups = flow_analyzer.analyze_server_flows(capture, "dst_ip", sent_counts, processes=processes)
+    expected = scapy_dualtor_flow(filename, DUT_MAC, [VLAN_MAC], sent_counts)
+    assert_same_server_results(fast, expected)
+    assert fast[servers[0]]["disruption_before_traffic"] == 3
+    assert fast[servers[0]]["disruption_after_traffic"] == count - 3
+    assert all(fast[server]["duplications"] and fast[server]["disruptions"] for server in servers)
+
+    # Per-server capture is sorted by payload ID and timestamp, like the one dumped by DualTorIO
+    filtered_filename = str(tmp_path / "filtered.pcap")
+    flow_analyzer.write_pcap(capture, filtered_filename, groups[servers[1]])
+    packets = scapyall.rdpcap(filtered_filename)
+    assert len(packets) == fast[servers[1]]["sent_packets"] + fast[servers[1]]["received_packets"]
+    keys = [(int(bytes(packet[scapyall.TCP].payload).replace(b"X", b"")), float(packet.time)) for packet in packets]
+    assert keys == sorted(keys)
+    assert all(packet[scapyall.IP].dst == servers[1] for packet in packets)
+
+
+def test_dualtor_no_received_packets(flow_analyzer, tmp_path):
+    builder = FrameBuilder()
+    filename = str(tmp_path / "capture.pcap")
+    write_raw_pcap(filename, [(START_TIME + i, builder.build(T1_MAC, DUT_MAC, (str(i) + "XX").encode()))
+                              for i in range(5)])
+
+    capture = flow_analyzer.read_flow_capture(filename, [DUT_MAC], [VLAN_MAC], payload_filler="X")
+    results, _ = flow_analyzer.analyze_server_flows(capture, "dst_ip", {"192.168.0.2": 5})
+    assert results == {"192.168.0.2": {
+        "sent_packets": 5, "received_packets": 0, "disruption_before_traffic": False,
+        "disruption_after_traffic": False, "duplications": [], "disruptions": []}}
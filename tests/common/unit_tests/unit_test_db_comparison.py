@@ -0,0 +1,208 @@
+"""Unit tests for the digest_only snapshots of ``tests/common/db_comparison.py``.
+
+A stub DUT runs redis-dump and the ``redis_dump_digest`` module on databases held in memory, the diffs of
+digest_only snapshots are checked against the diffs of full snapshots.
+"""
+import copy
+import importlib.util
+import json
+import logging
+import os
+import re
+import shutil
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+
+REPO_PATH = Path(__file__).resolve().parents[3]
+MODULE_PATH = REPO_PATH / "tests/common/db_comparison.py"
+DIGEST_MODULE_PATH = REPO_PATH / "ansible/library/redis_dump_digest.py"
+
+
+def _load(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="module")
+def db_comparison():
+    return _load("unit_target_db_comparison", MODULE_PATH)
+
+
+@pytest.fixture(scope="module")
+def redis_dump_digest():
+    """Load the redis_dump_digest module, stub AnsibleModule when ansible is not installed."""
+    try:
+        import ansible.module_utils.basic  # noqa: F401
+    except ImportError:
+        basic_stub = types.ModuleType("ansible.module_utils.basic")
+        basic_stub.AnsibleModule = object
+        sys.modules.setdefault("ansible", types.ModuleType("ansible"))
+        sys.modules.setdefault("ansible.module_utils", types.ModuleType("ansible.module_utils"))
+        sys.modules["ansible.module_utils.basic"] = basic_stub
+    return _load("unit_target_redis_dump_digest", DIGEST_MODULE_PATH)
+
+
+@pytest.fixture(autouse=True)
+def _bypass_repo_log_format(monkeypatch):
+    """``tests/pytest.ini`` log format needs ``%(funcNamewithModule)s`` field injected by the
+    ``log_section_start`` plugin, which isn't loaded under ``--noconftest``. Use plain format instead."""
+    import _pytest.logging as _pylog
+    plain = logging.Formatter("%(message)s")
+    monkeypatch.setattr(_pylog.PercentStyleMultiline, "format", lambda self, record: plain.format(record))
+
+
+def _hash(fields, ttl=-1):
+    return {"expireat": 1700000000.5, "ttl": ttl, "type": "hash", "value": dict(fields)}
+
+
+def _databases(scale=200):
+    """Content of the databases after warm boot, keyed by database number."""
+    appl = {}
+    for i in range(scale):
+        appl["ROUTE_TABLE:10.%d.%d.0/24" % (i // 256, i % 256)] = _hash({"nexthop": "10.0.0.1",
+                                                                         "ifname": "PortChannel1"})
+    for i in range(32):
+        appl["PORT_TABLE:Ethernet%d" % (i * 4)] = _hash({"admin_status": "up", "oper_status": "up", "mtu": "9100"})
+    appl["LLDP_ENTRY_TABLE:Ethernet0"] = _hash({"lldp_rem_sys_name": "ARISTA01T1", "lldp_rem_time_mark": "1234"})
+    config = {"PORT|Ethernet%d" % (i * 4): _hash({"admin_status": "up", "speed": "100000"}) for i in range(32)}
+    config["DEVICE_METADATA|localhost"] = _hash({"hostname": "vlab-01", "hwsku": "Force10-S6000"})
+    state = {"PROCESS_STATS|%d" % (100 + i): _hash({"CMD": "/usr/bin/proc%d" % (i % 5), "CPU": "0.1", "PPID": "1"})
+             for i in range(20)}
+    state.update({"PORT_TABLE|Ethernet%d" % (i * 4): _hash({"state": "ok", "netdev_oper_status": "up"})
+                  for i in range(32)})
+    state["FAN_INFO|fan1"] = _hash({"speed": "50", "status": "True", "timestamp": "20240101 00:00:00"})
+    state["WARM_RESTART_TABLE|bgp"] = _hash({"state": "reconciled", "restore_count": "1"})
+    return {0: appl, 4: config, 6: state}
+
+
+def _change(databases):
+    """Content of the databases after cold boot: volatile fields, a few values and keys differ."""
+    databases = copy.deepcopy(databases)
+    appl, config, state = databases[0], databases[4], databases[6]
+    for key, entry in appl.items():
+        entry["expireat"] += 100
+    appl["LLDP_ENTRY_TABLE:Ethernet0"]["value"]["lldp_rem_time_mark"] = "5678"
+    appl["PORT_TABLE:Ethernet8"]["value"]["oper_status"] = "down"
+    del appl["ROUTE_TABLE:10.0.7.0/24"]
+    appl["ROUTE_TABLE:10.9.9.0/24"] = _hash({"nexthop": "10.0.0.3", "ifname": "PortChannel2"})
+    appl["NEW_TABLE:key"] = _hash({"field": "value"})
+    config["DEVICE_METADATA|localhost"]["value"]["hostname"] = "vlab-02"
+    for key in [key for key in state if key.startswith("PROCESS_STATS|")]:
+        entry = state.pop(key)
+        # Processes get other PIDs, one of them isn't running
+        if entry["value"]["CMD"] != "/usr/bin/proc3":
+            state["PROCESS_STATS|%d" % (int(key.split("|")[1]) + 1000)] = entry
+    state["FAN_INFO|fan1"]["value"].update({"speed": "60", "status": "False", "timestamp": "20240101 00:10:00"})
+    del state["WARM_RESTART_TABLE|bgp"]
+    return databases
+
+
+class StubDut(object):
+    """Files of the DUT are in a local directory, redis-dump dumps the databases held by the stub."""
+
+    hostname = "vlab-01"
+
+    def __init__(self, root, redis_dump_digest):
+        self.root = root
+        self.databases = {}
+        self.redis_dump_digest_module = redis_dump_digest
+        self.fetched_entries = 0
+
+    def _path(self, path):
+        return os.path.join(self.root, path.lstrip("/"))
+
+    def shell(self, cmd, module_ignore_errors=False):
+        match = re.match(r"redis-dump -d (\d+)(?: --pretty)? -o (\S+)$", cmd)
+        if match:
+            os.makedirs(os.path.dirname(self._path(match.group(2))), exist_ok=True)
+            with open(self._path(match.group(2)), "w") as f:
+                json.dump(self.databases[int(match.group(1))], f)
+        elif cmd.startswith("mkdir -p "):
+            os.makedirs(self._path(cmd.split()[-1]), exist_ok=True)
+        elif cmd.startswith("rm -rf "):
+            shutil.rmtree(self._path(cmd.split()[-1]), ignore_errors=True)
+        else:
+            raise AssertionError("Unexpected command {}".format(cmd))
+        return {"rc": 0}
+
+    def fetch(self, src, dest):
+        dest_file = os.path.join(dest, os.path.basename(src))
+        shutil.copy(self._path(src), dest_file)
+        with open(dest_file) as f:
+            self.fetched_entries += len(json.load(f))
+        return {"dest": dest_file}
+
+    def redis_dump_digest(self, path, ignore_fields, tables=None, keys=None):
+        module = self.redis_dump_digest_module
+        with open(self._path(path)) as f:
+            dump = json.load(f)
+        if tables is not None:
+            return {"key_digests": module.get_key_digests(dump, set(ignore_fields), set(tables))}
+        if keys is not None:
+            self.fetched_entries += len(keys)
+            return {"entries": {key: dump[key] for key in keys if key in dump}}
+        return {"digest_tree": module.get_digest_tree(dump, set(ignore_fields))}
+
+
+def _snapshot_and_diff(db_comparison, dut, tmp_path, digest_only):
+    snapshotter = db_comparison.SonicRedisDBSnapshotter(dut, str(tmp_path / "snapshots"))
+    dbs = [db_comparison.DBType.APPL, db_comparison.DBType.CONFIG, db_comparison.DBType.STATE]
+    warm = _databases()
+    dut.databases = warm
+    snapshotter.take_snapshot("after_warmboot", dbs, digest_only=digest_only)
+    dut.databases = _change(warm)
+    snapshotter.take_snapshot("after_coldboot", dbs, digest_only=digest_only)
+    dut.fetched_entries = 0
+    return snapshotter, snapshotter.diff_snapshots("after_warmboot", "after_coldboot")
+
+
+def test_digest_only_diff_matches_full_diff(db_comparison, redis_dump_digest, tmp_path):
+    dut = StubDut(str(tmp_path / "dut"), redis_dump_digest)
+    _, full = _snapshot_and_diff(db_comparison, dut, tmp_path / "full", digest_only=False)
+    snapshotter, digest = _snapshot_and_diff(db_comparison, dut, tmp_path / "digest", digest_only=True)
+
+    assert set(digest) == set(full)
+    for db_type in full:
+        assert digest[db_type].diff == full[db_type].diff, db_type
+        assert digest[db_type].metrics == full[db_type].metrics, db_type
+        assert digest[db_type].to_dict() == full[db_type].to_dict()
+    appl_diff = digest[db_comparison.DBType.APPL].diff
+    assert set(appl_diff) == {"PORT_TABLE:Ethernet8", "ROUTE_TABLE:10.0.7.0/24", "ROUTE_TABLE:10.9.9.0/24",
+                              "NEW_TABLE:key"}
+    assert "PROCESS_STATS|*" in digest[db_comparison.DBType.STATE].diff
+    assert digest[db_comparison.DBType.CONFIG].metrics.num_overall_differing_values == 1
+
+    # Only the entries of the differing keys and the PROCESS_STATS entries are fetched
+    total_entries = sum(len(db) for db in _databases().values()) + sum(len(db) for db in _change(_databases()).values())
+    # APPL: 2 + 3, CONFIG: 1 + 1, STATE: PROCESS_STATS 20 + 16, FAN_INFO 1 + 1, WARM_RESTART_TABLE 1
+    assert dut.fetched_entries == 5 + 2 + 36 + 2 + 1
+    logging.info("Fetched %d of %d entries", dut.fetched_entries, total_entries)
+
+    assert not os.path.exists(os.path.join(str(tmp_path / "snapshots"), "after_warmboot", "APPL.json"))
+    snapshotter.remove_dut_snapshots()
+    assert not os.path.exists(dut._path(db_comparison.DUT_SNAPSHOT_DIR))
+
+
+def test_digest_tree_ignores_volatile_fields(redis_dump_digest):
+    ignore = {"expireat", "ttl", "timestamp"}
+    dump = _databases()[6]
+    tree = redis_dump_digest.get_digest_tree(dump, ignore)
+    assert tree["total_keys"] == len(dump)
+    assert tree["total_values_incl_volatile"] == sum(len(entry["value"]) for entry in dump.values())
+    assert tree["total_values_excl_volatile"] == tree["total_values_incl_volatile"] - 1
+    assert set(tree["tables"]) == {"PROCESS_STATS", "PORT_TABLE", "FAN_INFO", "WARM_RESTART_TABLE"}
+
+    changed = copy.deepcopy(dump)
+    changed["FAN_INFO|fan1"]["value"]["timestamp"] = "later"
+    changed["FAN_INFO|fan1"]["ttl"] = 10
+    assert redis_dump_digest.get_digest_tree(changed, ignore) == tree
+    changed["FAN_INFO|fan1"]["value"]["status"] = "False"
+    changed_tree = redis_dump_digest.get_digest_tree(changed, ignore)
+    assert [t for t in tree["tables"] if tree["tables"][t] != changed_tree["tables"][t]] == ["FAN_INFO"]
+    assert redis_dump_digest.get_key_digests(changed, ignore, {"FAN_INFO"}).keys() == {"FAN_INFO|fan1"}
@@ -0,0 +1,213 @@
+"""Unit tests for ``tests/common/testbed.py``."""
+import copy
+import importlib.util
+import json
+import logging
+import os
+from pathlib import Path
+
+import pytest
+import yaml
+
+
+MODULE_PATH = Path(__file__).resolve().parents[1] / "testbed.py"
+
+TOPO_T0 = """
+topology:
+  host_interfaces:
+    - 0
+    - 1
+    - 2
+  disabled_host_interfaces:
+    - 2
+  VMs:
+    ARISTA01T1:
+      vlans:
+        - 28
+      vm_offset: 0
+configuration_properties:
+  common:
+    dut_asn: 65100
+"""
+
+TESTBED = """
+- conf-name: vms-t0
+  group-name: vms6-1
+  topo: t0
+  ptf_image_name: docker-ptf
+  ptf: ptf_vms6-1
+  ptf_ip: 10.255.0.188/24
+  ptf_ipv6:
+  server: server_1
+  vm_base: VM0100
+  dut:
+    - vlab-01
+  comment: Tests virtual switch vm
+
+- conf-name: vms-t0-vpp
+  group-name: vms6-1
+  topo: t0-vpp
+  ptf_image_name: docker-ptf
+  ptf: ptf_vms6-1
+  ptf_ip: 10.255.0.188/24
+  ptf_ipv6:
+  server: server_1
+  vm_base: VM0100
+  dut:
+    - vlab-02
+  comment: Tests vpp switch vm
+
+- conf-name: vms-missing
+  group-name: vms6-2
+  topo: t1-missing
+  ptf_image_name: docker-ptf
+  ptf: ptf_vms6-2
+  ptf_ip: 10.255.0.189/24
+  ptf_ipv6:
+  server: server_1
+  vm_base: VM0104
+  dut:
+    - vlab-03
+  comment: Topology file doesn't exist
+"""
+
+
+@pytest.fixture(scope="module")
+def testbed():
+    spec = importlib.util.spec_from_file_location("unit_target_testbed", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(autouse=True)
+def _bypass_repo_log_format(monkeypatch):
+    """``tests/pytest.ini`` log format needs ``%(funcNamewithModule)s`` field injected by the
+    ``log_section_start`` plugin, which isn't loaded under ``--noconftest``. Use plain format instead."""
+    import _pytest.logging as _pylog
+    plain = logging.Formatter("%(message)s")
+    monkeypatch.setattr(_pylog.PercentStyleMultiline, "format", lambda self, record: plain.format(record))
+
+
+@pytest.fixture
+def tbinfo_class(testbed, tmp_path, monkeypatch):
+    topo_dir = tmp_path / "vars"
+    topo_dir.mkdir()
+    (topo_dir / "topo_t0.yml").write_text(TOPO_T0)
+    (topo_dir / "topo_t0-vpp.yml").write_text(TOPO_T0)
+    monkeypatch.setattr(testbed, "_topo_file_cache", {})
+
+    class TestbedInfo(testbed.TestbedInfo):
+        TOPOLOGY_FILEPATH = str(topo_dir)
+        TOPOLOGY_CACHE_FILEPATH = str(tmp_path / "cache")
+
+    return TestbedInfo
+
+
+@pytest.fixture
+def testbed_file(tmp_path):
+    path = tmp_path / "testbed.yaml"
+    path.write_text(TESTBED)
+    return str(path)
+
+
+def test_topology_parsed_on_access(tbinfo_class, testbed_file):
+    # The topology file of vms-missing is only needed when vms-missing is used
+    tbinfo = tbinfo_class(testbed_file)
+    assert list(tbinfo.testbed_topo) == ["vms-t0", "vms-t0-vpp", "vms-missing"]
+
+    tb = tbinfo.testbed_topo["vms-t0"]
+    assert tb["duts"] == ["vlab-01"]
+    assert tb["ptf_ip"] == "10.255.0.188" and tb["ptf_netmask"] == "255.255.255.0"
+    topo = tb["topo"]
+    assert topo["name"] == "t0" and topo["type"] == "t0"
+    assert topo["properties"]["configuration_properties"]["common"]["dut_asn"] == 65100
+    assert topo["ptf_map"] == {"0": {"0": 0, "1": 1, "2": 2, "28": 28}}
+    assert topo["ptf_map_disabled"] == {"0": {"2": 2}}
+    assert topo["ptf_dut_intf_map"]["28"] == {"0": 28}
+    assert tbinfo.testbed_topo.get("vms-t0-vpp")["topo"]["name"] == "t0"
+    assert tbinfo.testbed_topo.get("unknown") is None
+    assert tbinfo.testbed_topo.get("unknown", {}) == {}
+
+    with pytest.raises(IOError):
+        tbinfo.testbed_topo["vms-missing"]
+
+
+def test_failed_topology_fails_again(tbinfo_class, testbed_file, monkeypatch):
+    tbinfo = tbinfo_class(testbed_file)
+    for _ in range(2):
+        with pytest.raises(IOError):
+            tbinfo.testbed_topo["vms-missing"]
+    assert dict.__getitem__(tbinfo.testbed_topo, "vms-missing")["topo"] == "t1-missing"
+
+    # A testbed failing to parse after loading its topology file keeps the topology name
+    calculate_ptf_index_map_disabled = tbinfo_class.calculate_ptf_index_map_disabled
+
+    def _fail_once(self, tb):
+        monkeypatch.setattr(tbinfo_class, "calculate_ptf_index_map_disabled", calculate_ptf_index_map_disabled)
+        raise ValueError("invalid disabled_host_interfaces")
+
+    monkeypatch.setattr(tbinfo_class, "calculate_ptf_index_map_disabled", _fail_once)
+    with pytest.raises(ValueError):
+        tbinfo.testbed_topo["vms-t0"]
+    assert dict.__getitem__(tbinfo.testbed_topo, "vms-t0")["topo"] == "t0"
+    assert tbinfo.testbed_topo["vms-t0"]["topo"]["ptf_map_disabled"] == {"0": {"2": 2}}
+
+
+def test_all_access_paths_return_parsed_info(tbinfo_class, testbed_file):
+    tbinfo = tbinfo_class(testbed_file)
+    del tbinfo.testbed_topo["vms-missing"]
+    assert all(isinstance(tb["topo"], dict) for tb in tbinfo.testbed_topo.values())
+    assert all(isinstance(tb["topo"], dict) for _name, tb in tbinfo.testbed_topo.items())
+
+    tbinfo = tbinfo_class(testbed_file)
+    del tbinfo.testbed_topo["vms-missing"]
+    dumped = json.loads(json.dumps(tbinfo.testbed_topo))
+    assert dumped["vms-t0"]["topo"]["name"] == "t0"
+
+    tbinfo = tbinfo_class(testbed_file)
+    del tbinfo.testbed_topo["vms-missing"]
+    copied = copy.deepcopy(tbinfo.testbed_topo)
+    assert copied["vms-t0"]["topo"]["ptf_map"] == tbinfo.testbed_topo["vms-t0"]["topo"]["ptf_map"]
+    assert copied == tbinfo.testbed_topo
+    tbinfo.parse_topo()
+
+
+def test_topology_copies_are_independent(tbinfo_class, testbed_file):
+    tbinfo1 = tbinfo_class(testbed_file)
+    tbinfo2 = tbinfo_class(testbed_file)
+    tbinfo1.testbed_topo["vms-t0"]["topo"]["properties"]["topology"]["VMs"].clear()
+    assert tbinfo2.testbed_topo["vms-t0"]["topo"]["properties"]["topology"]["VMs"]
+
+
+def test_load_topo_file_disk_cache(testbed, tmp_path, monkeypatch):
+    topo_file = tmp_path / "topo_t0.yml"
+    topo_file.write_text(TOPO_T0)
+    cache_dir = str(tmp_path / "cache")
+    monkeypatch.setattr(testbed, "_topo_file_cache", {})
+
+    topo = testbed.load_topo_file(str(topo_file), cache_dir)
+    assert topo == yaml.safe_load(TOPO_T0)
+    assert os.listdir(cache_dir) == ["topo_t0.yml.cache"]
+
+    # Another process: nothing in memory, the topology is read from the cache file
+    monkeypatch.setattr(testbed, "_topo_file_cache", {})
+    with monkeypatch.context() as m:
+        m.setattr(testbed.yaml, "load", pytest.fail)
+        assert testbed.load_topo_file(str(topo_file), cache_dir) == topo
+
+    # Changed topology file is parsed again
+    topo_file.write_text(TOPO_T0.replace("65100", "65200"))
+    os.utime(str(topo_file), ns=(0, 10 ** 9))
+    changed = testbed.load_topo_file(str(topo_file), cache_dir)
+    assert changed["configuration_properties"]["common"]["dut_asn"] == 65200
+    monkeypatch.setattr(testbed, "_topo_file_cache", {})
+    assert testbed.load_topo_file(str(topo_file), cache_dir) == changed
+
+
+def test_load_topo_file_without_disk_cache(testbed, tmp_path, monkeypatch):
+    topo_file = tmp_path / "topo_t0.yml"
+    topo_file.write_text(TOPO_T0)
+    monkeypatch.setattr(testbed, "_topo_file_cache", {})
+    assert testbed.load_topo_file(str(topo_file)) == yaml.safe_load(TOPO_T0)
+    assert os.listdir(str(tmp_path)) == ["topo_t0.yml"]
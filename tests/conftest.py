@@ -313,6 +313,13 @@ def pytest_addoption(parser):
     ##############################
     parser.addoption("--trim_inv", action="store_true", default=False, help="Trim inventory files")
 
+    ############################
+    #   facts cache options    #
+    ############################
+    parser.addoption("--facts_cache_backend", action="store", default="file", choices=["file", "sqlite"],
+                     help="Backend for storing cached facts. 'file' stores pickle files, "
+                          "'sqlite' stores facts in a database shared by all the pytest-xdist workers")
+
     ##############################
     # gnmi connection options      #
     ##############################
@@ -435,6 +442,7 @@ def pytest_addoption(parser):
 
 
 def pytest_configure(config):
+    cache.set_backend(config.getoption("facts_cache_backend"))
     if config.getoption("enable_macsec"):
         topo = config.getoption("topology")
         if topo is not None and "t2" in topo:
@@ -726,6 +734,7 @@ def pytest_sessionstart(session):
 
 
 def pytest_sessionfinish(session, exitstatus):
+    cache.log_stats()
     if (session.config.cache.get("duthosts_fixture_failed", None) or
             session.config.cache.get("ptfhost_exception", None)):
         session.config.cache.set("duthosts_fixture_failed", None)